@@ -4,24 +4,217 @@ Performance benchmark script for comparing Thorium Docker containers
 with chromedp/docker-headless-shell and different instruction sets.
 """
 
+import asyncio
 import json
 import time
 import subprocess
+import aiohttp
 import requests
 import psutil
 import statistics
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any
 import argparse
 import sys
 import os
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services'))
+
+from cache_proxy import CacheProxy, stats_delta
+from cdp_client import CDPSession
+from flag_matrix import DEFAULT_BROWSER_FLAGS, browser_command, flag_deltas, load_flag_matrix, merge_flags
+from image_budget import REGISTRY, ImageBudget, budget_deltas
+from intercept_benchmark import run_intercept_benchmark
+from load_generator import LoadGenerator, find_knee
+from page_server import PageServer
+from pool import BrowserPool
+from render_benchmark import parse_format, parse_viewport, run_render_benchmark
+from request_policy import load_policies
+from resource_sampler import CgroupSampler, find_container_cgroup
+from results_store import ResultStore, host_cpu_model
+from startup_profiler import STARTUP_PHASES, StartupProfiler
+from stats import significantly_lower, summarize
+from tracing import BREAKDOWN, BREAKDOWN_LABELS, aggregate_traces, explain_difference, traced_navigation
+from watchdog_benchmark import KILL_SIGNALS, run_kill_benchmark
+
+# Chromium prints this to stderr once the remote debugging server is bound
+DEVTOOLS_LISTENING = 'DevTools listening on ws://'
+
+# Hostname containers use to reach the local page corpus server
+CORPUS_HOST = 'host.docker.internal'
+
+# Default port of the shared caching proxy (--cache-proxy)
+CACHE_PROXY_PORT = 3128
+
+# Images compared by run_all_benchmarks, each on its own host port
+CONTAINERS = [
+    {
+        'image': 'chromedp/headless-shell:latest',
+        'name': 'benchmark-chromedp',
+        'port': 9222
+    },
+    {
+        'image': 'thorium-docker:avx2',
+        'name': 'benchmark-thorium-avx2',
+        'port': 9223
+    },
+    {
+        'image': 'thorium-docker:avx',
+        'name': 'benchmark-thorium-avx',
+        'port': 9224
+    },
+    {
+        'image': 'thorium-docker:sse3',
+        'name': 'benchmark-thorium-sse3',
+        'port': 9225
+    },
+    {
+        'image': 'thorium-docker:sse4',
+        'name': 'benchmark-thorium-sse4',
+        'port': 9226
+    }
+]
+
+# Images measured by --image-budget; the first one is the baseline
+BUDGET_IMAGES = ['thorium-docker:avx2', 'thorium-docker:avx2-slim']
+BUDGET_PORT = 9240
+
+# Supervisor bundled in the Thorium image; runs K browsers behind port 9222
+SUPERVISOR = '/opt/thorium/services/supervisor.py'
+
+
+def shard_variants(containers: List[Dict[str, Any]], shard_counts: List[int]) -> List[Dict[str, Any]]:
+    """
+    Expand every Thorium image into one entry per shard count.
+    
+    Each variant runs the image's supervisor with ``--shards K`` on its own
+    host port. Images without the supervisor (chromedp) are kept as a
+    single-process baseline.
+    """
+    variants = []
+    for container in containers:
+        if not container['image'].startswith('thorium-docker'):
+            variants.append(container)
+            continue
+        for index, shards in enumerate(shard_counts):
+            variants.append(dict(
+                container,
+                name=f"{container['name']}-k{shards}",
+                port=container['port'] + 10 * index,
+                shards=shards
+            ))
+    return variants
+
+
+def seed_variants(containers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Expand every Thorium image into a seeded-profile and an empty-profile run.
+    
+    The images copy a build-time warmed profile template into an empty
+    profile unless ``THORIUM_SEED_PROFILE=0``; comparing the two isolates the
+    template's effect on the cold first load.
+    """
+    variants = []
+    for container in containers:
+        if not container['image'].startswith('thorium-docker'):
+            variants.append(container)
+            continue
+        for index, seeded in enumerate((True, False)):
+            variants.append(dict(
+                container,
+                name=f"{container['name']}-{'seeded' if seeded else 'empty'}",
+                port=container['port'] + 100 * index,
+                seed_profile=seeded
+            ))
+    return variants
+
+
+def flag_variants(containers: List[Dict[str, Any]], flag_matrix: Dict[str, List[str]]) -> List[Dict[str, Any]]:
+    """
+    Expand every Thorium image into one entry per flag set.
+    
+    Each variant overrides the container command with the default browser
+    flags plus the set's flags. Images without wrapped-thorium (chromedp) are
+    kept as they are.
+    """
+    variants = []
+    for container in containers:
+        if not container['image'].startswith('thorium-docker'):
+            variants.append(container)
+            continue
+        for index, (flag_set, flags) in enumerate(flag_matrix.items()):
+            variants.append(dict(
+                container,
+                name=f"{container['name']}-f{index}",
+                port=container['port'] + 1000 * index,
+                flag_set=flag_set,
+                flags=flags
+            ))
+    return variants
+
+
+def supervisor_command(shards: int, flags: List[str] = None) -> List[str]:
+    """Container command that runs ``shards`` browser processes behind port 9222."""
+    return ['python3', SUPERVISOR, '--shards', str(shards), '--'] + merge_flags(DEFAULT_BROWSER_FLAGS, flags or [])
+
+
+def allocate_cpusets(count: int, cpus_per_container: int = None,
+                     available: List[int] = None) -> List[str]:
+    """
+    Split the host CPUs into ``count`` disjoint cpusets for ``--cpuset-cpus``.
+    
+    Args:
+        count (int): Number of containers to pin
+        cpus_per_container (int): CPUs per container (default: an even split)
+        available (list): CPU ids to allocate from (default: this process's affinity)
+        
+    Returns:
+        list: Comma-separated CPU lists, one per container
+    """
+    if available is None:
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+    per_container = cpus_per_container or len(available) // count
+    if per_container < 1 or per_container * count > len(available):
+        raise ValueError(f"Cannot pin {count} containers to {per_container} CPUs each "
+                         f"with only {len(available)} CPUs available")
+    
+    return [
+        ','.join(str(cpu) for cpu in available[i * per_container:(i + 1) * per_container])
+        for i in range(count)
+    ]
+
 
 class BenchmarkRunner:
     """Performance benchmark runner for headless browser containers."""
     
-    def __init__(self, iterations: int = 5, timeout: int = 30):
+    def __init__(self, iterations: int = 5, timeout: int = 30, concurrency: int = 0,
+                 load_duration: float = 30, load_rate: float = None, sample_interval: float = 0.2,
+                 pool_size: int = 0, renders: int = 0, render_viewports: List[str] = None,
+                 render_formats: List[str] = None, render_url: str = None, screencast_frames: int = 0,
+                 screencast_url: str = None, trace_dir: str = None, intercept_policies: Dict[str, Any] = None,
+                 cache_proxy: CacheProxy = None, kill_test: str = None, kills: int = 3):
         self.iterations = iterations
         self.timeout = timeout
+        self.concurrency = concurrency
+        self.load_duration = load_duration
+        self.load_rate = load_rate
+        self.sample_interval = sample_interval
+        self.pool_size = pool_size
+        self.renders = renders
+        self.render_viewports = render_viewports
+        self.render_formats = render_formats
+        self.render_url = render_url
+        self.screencast_frames = screencast_frames
+        self.screencast_url = screencast_url
+        self.trace_dir = trace_dir
+        self.intercept_policies = intercept_policies
+        self.cache_proxy = cache_proxy
+        self.kill_test = kill_test
+        self.kills = kills
         self.results = {}
         
     def run_command(self, cmd: List[str], timeout: int = None) -> Dict[str, Any]:
@@ -73,8 +266,10 @@ class BenchmarkRunner:
                 'end_time': time.time()
             }
     
-    def start_container(self, image: str, name: str, port: int) -> Dict[str, Any]:
-        """Start a container and measure startup time."""
+    def start_container(self, image: str, name: str, port: int, cpuset: str = None,
+                        memory: str = None, command: List[str] = None,
+                        env: Dict[str, str] = None) -> Dict[str, Any]:
+        """Start a container (optionally pinned to a cpuset and memory limit) and measure startup time."""
         print(f"Starting container: {image}")
         
         # Stop and remove existing container
@@ -82,122 +277,160 @@ class BenchmarkRunner:
         self.run_command(['docker', 'rm', name], timeout=10)
         
         # Start container
-        cmd = [
-            'docker', 'run', '-d',
-            '--name', name,
-            '-p', f'{port}:9222',
-            '--security-opt', 'seccomp=unconfined',
-            '--cap-add', 'SYS_ADMIN',
-            '--shm-size', '2G',
-            image
-        ]
+        cmd = ['docker', 'run', '-d'] + self.container_args(name, port, cpuset, memory, env)
+        cmd.append(image)
+        if command:
+            cmd += command
         
         result = self.run_command(cmd)
         
         if result['success']:
             # Wait for container to be ready
-            ready_time = self.wait_for_container_ready(port)
-            result['ready_time'] = ready_time
-            result['total_startup_time'] = result['execution_time'] + ready_time
+            result.update(self.wait_for_container_ready(port, name=name))
+            result['total_startup_time'] = result['execution_time'] + result['ready_time']
         else:
             result['ready_time'] = 0
             result['total_startup_time'] = result['execution_time']
         
         return result
     
-    def wait_for_container_ready(self, port: int, max_wait: int = 60) -> float:
-        """Wait for container to be ready and return wait time."""
-        start_time = time.time()
+    def container_args(self, name: str, port: int, cpuset: str = None, memory: str = None,
+                       env: Dict[str, str] = None) -> List[str]:
+        """Options shared by ``docker run`` and ``docker create`` for a benchmark container."""
+        args = [
+            '--name', name,
+            '-p', f'{port}:9222',
+            '--security-opt', 'seccomp=unconfined',
+            '--cap-add', 'SYS_ADMIN',
+            '--shm-size', '2G',
+            # Lets the browser reach the local page corpus server on the host
+            '--add-host', f'{CORPUS_HOST}:host-gateway'
+        ]
+        if cpuset:
+            args += ['--cpuset-cpus', cpuset]
+        if memory:
+            args += ['--memory', memory, '--memory-swap', memory]
+        for key, value in (env or {}).items():
+            args += ['-e', f'{key}={value}']
+        return args
+    
+    def wait_for_container_ready(self, port: int, max_wait: int = 60, name: str = None) -> Dict[str, Any]:
+        """
+        Wait for the browser's DevTools endpoint and return how long it took.
+        
+        Follows ``docker logs -f`` for the "DevTools listening on ws://" line
+        when ``name`` is given, with an exponential-backoff HTTP probe of
+        ``/json/version`` (10 ms doubling to 250 ms) as a fallback for images
+        that log elsewhere. ``ready_source`` records which signal fired first.
+        """
+        start_time = time.perf_counter()
         url = f'http://localhost:{port}/json/version'
+        log_ready = threading.Event()
+        follower = None
         
-        while time.time() - start_time < max_wait:
+        if name:
             try:
-                response = requests.get(url, timeout=5)
-                if response.status_code == 200:
-                    return time.time() - start_time
-            except:
-                pass
-            time.sleep(1)
+                follower = subprocess.Popen(
+                    self.log_follow_command(name),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True
+                )
+            except OSError:
+                follower = None
+        
+        if follower:
+            def follow_logs():
+                for line in follower.stdout:
+                    if DEVTOOLS_LISTENING in line:
+                        log_ready.set()
+                        return
+            threading.Thread(target=follow_logs, daemon=True).start()
+        
+        delay = 0.01
+        try:
+            while time.perf_counter() - start_time < max_wait:
+                try:
+                    response = requests.get(url, timeout=1)
+                    if response.status_code == 200:
+                        return {'ready_time': time.perf_counter() - start_time, 'ready_source': 'http'}
+                except requests.RequestException:
+                    pass
+                if log_ready.wait(delay):
+                    return {'ready_time': time.perf_counter() - start_time, 'ready_source': 'log'}
+                delay = min(delay * 2, 0.25)
+        finally:
+            if follower:
+                follower.kill()
+                follower.wait()
         
-        return max_wait
+        return {'ready_time': max_wait, 'ready_source': 'timeout'}
     
-    def test_page_load(self, port: int, url: str) -> Dict[str, Any]:
-        """Test page loading performance using Chrome DevTools Protocol."""
+    def image_info(self, image: str) -> Dict[str, str]:
+        """Thorium version and instruction set from the image's environment ('' if not set)."""
+        info = {'thorium_version': '', 'instruction_set': ''}
+        result = self.run_command(['docker', 'image', 'inspect', '--format', '{{json .Config.Env}}', image],
+                                  timeout=10)
+        if result['success']:
+            try:
+                env = dict(entry.partition('=')[::2] for entry in json.loads(result['stdout']))
+            except ValueError:
+                env = {}
+            info['thorium_version'] = env.get('THORIUM_VERSION', '')
+            info['instruction_set'] = env.get('INSTRUCTION_SET', '')
+        return info
+    
+    def log_follow_command(self, name: str) -> List[str]:
+        """Command that streams a container's output from the start."""
+        return ['docker', 'logs', '--follow', name]
+    
+    def test_page_load(self, port: int, url: str, trace_path: str = None) -> Dict[str, Any]:
+        """
+        Test page loading performance using Chrome DevTools Protocol.
+        
+        With ``trace_path`` the navigation is traced to that file and the
+        result gets a ``trace`` breakdown (see tracing.py).
+        """
         try:
-            # Get page info
-            response = requests.get(f'http://localhost:{port}/json/new')
+            # Create a new target (recent Chromium only accepts PUT here)
+            response = requests.put(f'http://localhost:{port}/json/new', timeout=10)
             if response.status_code != 200:
                 return {'success': False, 'error': 'Failed to create new page'}
             
-            page_data = response.json()
-            page_id = page_data['id']
-            
-            # Navigate to page
-            navigate_cmd = {
-                'id': 1,
-                'method': 'Page.navigate',
-                'params': {'url': url}
-            }
-            
-            start_time = time.time()
-            response = requests.post(
-                f'http://localhost:{port}/json/protocol/{page_id}',
-                json=navigate_cmd,
-                timeout=30
-            )
-            
-            if response.status_code != 200:
-                return {'success': False, 'error': 'Navigation failed'}
-            
-            # Wait for page load
-            load_time = self.wait_for_page_load(port, page_id)
-            
-            # Get page metrics
-            metrics_cmd = {
-                'id': 2,
-                'method': 'Page.getMetrics',
-                'params': {}
-            }
+            page_id = response.json()['id']
+            ws_url = f'ws://localhost:{port}/devtools/page/{page_id}'
             
-            response = requests.post(
-                f'http://localhost:{port}/json/protocol/{page_id}',
-                json=metrics_cmd,
-                timeout=10
-            )
-            
-            metrics = {}
-            if response.status_code == 200:
-                metrics = response.json().get('result', {})
-            
-            # Close page
-            requests.post(f'http://localhost:{port}/json/close/{page_id}')
+            try:
+                start_time = time.perf_counter()
+                result = asyncio.run(self._cdp_page_load(ws_url, url, trace_path))
+                result['total_time'] = time.perf_counter() - start_time
+            finally:
+                requests.get(f'http://localhost:{port}/json/close/{page_id}', timeout=10)
             
-            return {
-                'success': True,
-                'load_time': load_time,
-                'total_time': time.time() - start_time,
-                'metrics': metrics
-            }
+            result['success'] = True
+            return result
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def wait_for_page_load(self, port: int, page_id: str, max_wait: int = 30) -> float:
-        """Wait for page to load completely."""
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait:
-            try:
-                response = requests.get(f'http://localhost:{port}/json/protocol/{page_id}')
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('result', {}).get('readyState') == 'complete':
-                        return time.time() - start_time
-            except:
-                pass
-            time.sleep(0.5)
+    async def _cdp_page_load(self, ws_url: str, url: str, trace_path: str = None) -> Dict[str, Any]:
+        """Navigate over the target's WebSocket and collect event timings."""
+        trace = None
+        async with CDPSession(ws_url, timeout=self.timeout) as session:
+            if trace_path:
+                navigation, trace = await traced_navigation(session, url, trace_path)
+            else:
+                navigation = await session.navigate(url)
+            metrics = await session.get_metrics()
         
-        return max_wait
+        result = {
+            'load_time': navigation['load_time'],
+            'lifecycle': navigation['lifecycle'],
+            'metrics': metrics
+        }
+        if trace:
+            result['trace'] = trace
+        return result
     
     def get_container_stats(self, name: str) -> Dict[str, Any]:
         """Get container resource usage statistics."""
@@ -223,164 +456,909 @@ class BenchmarkRunner:
         
         return {}
     
-    def run_benchmark(self, image: str, name: str, port: int, test_urls: List[str]) -> Dict[str, Any]:
-        """Run complete benchmark for a container."""
-        print(f"\n=== Running benchmark for {image} ===")
+    def run_benchmark(self, image: str, name: str, port: int, test_urls: List[str],
+                      pinning: Dict[str, Any] = None, shards: int = None,
+                      seed_profile: bool = None, flag_set: str = None,
+                      flags: List[str] = None) -> Dict[str, Any]:
+        """
+        Run complete benchmark for a container.
+        
+        ``shards`` runs the image as that many browser processes behind the
+        supervisor; ``seed_profile`` forces the warmed profile template on or
+        off (default: the image's default, which seeds). ``flags`` replaces the
+        container command with the default browser flags plus these. With a
+        ``cache_proxy`` Thorium images browse through it and the result records
+        its hit rate over this container's page loads. With ``kill_test``
+        supervised Thorium containers finally have their browser killed
+        (or frozen) mid-load ``kills`` times to time the watchdog's recovery.
+        """
+        label = self.result_label({'image': image, 'shards': shards, 'seed_profile': seed_profile,
+                                   'flag_set': flag_set})
+        print(f"\n=== Running benchmark for {label} ===")
+        pinning = pinning or {'mode': 'sequential', 'cpuset': None, 'memory': None}
         
         # Start container
-        startup_result = self.start_container(image, name, port)
+        command = None
+        if shards:
+            command = supervisor_command(shards, flags)
+        elif flags is not None:
+            command = browser_command(flags)
+        env = {} if seed_profile is None else {'THORIUM_SEED_PROFILE': '1' if seed_profile else '0'}
+        proxied = bool(self.cache_proxy) and image.startswith('thorium-docker')
+        if proxied:
+            env['THORIUM_PROXY_SERVER'] = f'http://{CORPUS_HOST}:{self.cache_proxy.port}'
+        startup_result = self.start_container(image, name, port, pinning['cpuset'], pinning['memory'],
+                                              command, env or None)
         
         if not startup_result['success']:
             print(f"Failed to start container {image}: {startup_result['stderr']}")
             return {
                 'image': image,
+                'shards': shards,
+                'seed_profile': seed_profile,
+                'flag_set': flag_set,
+                'flags': flags,
                 'success': False,
+                'pinning': pinning,
                 'error': startup_result['stderr']
             }
         
-        # Wait a bit for container to stabilize
-        time.sleep(5)
-        
-        # Get initial stats
-        initial_stats = self.get_container_stats(name)
+        # Stream cgroup stats for the whole run; docker stats snapshots are
+        # only taken when the cgroup is not reachable from this process.
+        sampler = None
+        initial_stats = {}
+        cgroup_path = find_container_cgroup(name)
+        if cgroup_path:
+            sampler = CgroupSampler(cgroup_path, self.sample_interval).start()
+            sampler.mark('page_loads_start')
+        else:
+            initial_stats = self.get_container_stats(name)
         
-        # Test page loads
+        # Test page loads. URLs are interleaved per iteration so drift over
+        # the run affects every URL alike; iteration 0 is the cold-cache load.
+        proxy_before = self.cache_proxy.stats if proxied else None
         page_load_results = []
-        for url in test_urls:
-            print(f"Testing page load: {url}")
-            result = self.test_page_load(port, url)
-            page_load_results.append(result)
-            time.sleep(2)  # Wait between tests
+        for iteration in range(self.iterations):
+            for url_index, url in enumerate(test_urls):
+                print(f"Testing page load: {url} (iteration {iteration + 1}/{self.iterations})")
+                trace_path = None
+                if self.trace_dir:
+                    trace_path = os.path.join(self.trace_dir, name, f'url{url_index}-iter{iteration}.json')
+                result = self.test_page_load(port, url, trace_path)
+                result['url'] = url
+                result['iteration'] = iteration
+                result['cold'] = iteration == 0
+                page_load_results.append(result)
+                time.sleep(2)  # Wait between tests
+        
+        if sampler:
+            sampler.mark('page_loads_end')
+        cache_proxy = stats_delta(proxy_before, self.cache_proxy.stats) if proxied else None
+        
+        # Pooled vs cold tab acquisition
+        pool_comparison = None
+        if self.pool_size:
+            pool_comparison = self.run_pool_comparison(port, test_urls)
+        
+        # Concurrent multi-tab load ramp
+        load_test = None
+        if self.concurrency:
+            load_test = self.run_load_test(port, test_urls)
+        
+        # Screenshot and PDF render throughput
+        render_test = None
+        if self.renders:
+            render_test = self.run_render_test(port, self.render_url or test_urls[0], sampler)
+        
+        # Load time and bytes saved by request interception policies
+        intercept_test = None
+        if self.intercept_policies:
+            intercept_test = self.run_intercept_test(port, test_urls)
         
-        # Get final stats
-        final_stats = self.get_container_stats(name)
+        # Recovery from browser crashes or hangs (needs the supervisor, not wrapped-thorium)
+        kill_test = None
+        if self.kill_test and image.startswith('thorium-docker') and (shards or flags is None):
+            kill_test = self.run_kill_test(name, port, test_urls[0])
+        
+        final_stats = {}
+        resources = None
+        if sampler:
+            sampler.stop()
+            resources = sampler.to_dict()
+            successful_loads = len([r for r in page_load_results if r['success']])
+            resources['cpu_seconds_per_page'] = (
+                sampler.cpu_seconds_between('page_loads_start', 'page_loads_end') / successful_loads
+                if successful_loads else None
+            )
+        else:
+            final_stats = self.get_container_stats(name)
         
         # Stop container
         self.run_command(['docker', 'stop', name], timeout=10)
         
+        info = self.image_info(image)
         return {
             'image': image,
+            'thorium_version': info['thorium_version'],
+            'instruction_set': info['instruction_set'],
+            'shards': shards,
+            'seed_profile': seed_profile,
+            'flag_set': flag_set,
+            'flags': flags,
+            'command': command,
             'success': True,
+            'pinning': pinning,
             'startup': startup_result,
             'page_loads': page_load_results,
+            'load_stats': self.summarize_page_loads(page_load_results, test_urls),
             'initial_stats': initial_stats,
             'final_stats': final_stats,
+            'resources': resources,
+            'pool_comparison': pool_comparison,
+            'load_test': load_test,
+            'render_test': render_test,
+            'intercept_test': intercept_test,
+            'kill_test': kill_test,
+            'cache_proxy': cache_proxy,
             'test_urls': test_urls
         }
     
-    def run_all_benchmarks(self, test_urls: List[str]) -> Dict[str, Any]:
-        """Run benchmarks for all containers."""
-        containers = [
-            {
-                'image': 'chromedp/headless-shell:latest',
-                'name': 'benchmark-chromedp',
-                'port': 9222
-            },
-            {
-                'image': 'thorium-docker:avx2',
-                'name': 'benchmark-thorium-avx2',
-                'port': 9223
-            },
-            {
-                'image': 'thorium-docker:avx',
-                'name': 'benchmark-thorium-avx',
-                'port': 9224
-            },
-            {
-                'image': 'thorium-docker:sse3',
-                'name': 'benchmark-thorium-sse3',
-                'port': 9225
-            },
-            {
-                'image': 'thorium-docker:sse4',
-                'name': 'benchmark-thorium-sse4',
-                'port': 9226
+    def format_memory_usage(self, result: Dict[str, Any]) -> str:
+        """Peak memory from the cgroup sampler, or the docker stats snapshot."""
+        if result.get('resources'):
+            return f"{result['resources']['peak_memory_bytes'] / 1024 / 1024:.1f}MiB peak"
+        return result.get('final_stats', {}).get('memory_usage', 'N/A')
+    
+    def summarize_page_loads(self, page_loads: List[Dict[str, Any]], test_urls: List[str]) -> Dict[str, Any]:
+        """Summarize cold and warm load times per URL and across all URLs."""
+        def load_times(url=None, cold=None):
+            return [
+                r['load_time'] for r in page_loads
+                if r['success'] and (url is None or r['url'] == url) and (cold is None or r['cold'] == cold)
+            ]
+        
+        per_url = {}
+        for url in test_urls:
+            cold_times = load_times(url, cold=True)
+            per_url[url] = {
+                'cold': cold_times[0] if cold_times else None,
+                'warm': summarize(load_times(url, cold=False))
             }
-        ]
         
-        all_results = []
+        return {
+            'per_url': per_url,
+            'cold': summarize(load_times(cold=True)),
+            'warm': summarize(load_times(cold=False))
+        }
+    
+    def run_pool_comparison(self, port: int, test_urls: List[str]) -> Dict[str, Any]:
+        """Compare tab acquisition through a warm BrowserPool with cold /json/new tabs."""
+        print(f"Comparing pooled ({self.pool_size} warm tabs) and cold tab acquisition")
+        try:
+            return asyncio.run(self._pool_comparison(port, test_urls))
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    async def _pool_comparison(self, port: int, test_urls: List[str]) -> Dict[str, Any]:
+        samples = max(self.iterations, 2) * len(test_urls)
+        urls = [test_urls[i % len(test_urls)] for i in range(samples)]
+        timings = {mode: {'acquire': [], 'first_load': []} for mode in ('cold', 'pooled')}
+        
+        # Cold: create a target and connect to it for every page
+        async with aiohttp.ClientSession() as http:
+            for url in urls:
+                start = time.perf_counter()
+                async with http.put(f'http://localhost:{port}/json/new') as response:
+                    target_id = (await response.json())['id']
+                async with CDPSession(f'ws://localhost:{port}/devtools/page/{target_id}',
+                                      timeout=self.timeout) as session:
+                    timings['cold']['acquire'].append(time.perf_counter() - start)
+                    await session.navigate(url)
+                    timings['cold']['first_load'].append(time.perf_counter() - start)
+                async with http.get(f'http://localhost:{port}/json/close/{target_id}') as response:
+                    await response.read()
+        
+        # Pooled: lease a warm tab and connect to it
+        async with BrowserPool('localhost', port, size=self.pool_size, timeout=self.timeout) as pool:
+            for url in urls:
+                start = time.perf_counter()
+                async with pool.lease() as tab:
+                    async with CDPSession(tab.ws_url, timeout=self.timeout) as session:
+                        timings['pooled']['acquire'].append(time.perf_counter() - start)
+                        await session.navigate(url)
+                        timings['pooled']['first_load'].append(time.perf_counter() - start)
+            pool_stats = pool.stats()
+        
+        return {
+            'success': True,
+            'pool_size': self.pool_size,
+            'samples': samples,
+            'cold': {metric: summarize(values) for metric, values in timings['cold'].items()},
+            'pooled': {metric: summarize(values) for metric, values in timings['pooled'].items()},
+            'pool_stats': pool_stats
+        }
+    
+    def run_load_test(self, port: int, test_urls: List[str]) -> Dict[str, Any]:
+        """Ramp concurrent tabs up to ``self.concurrency`` and find the knee."""
+        print(f"Running load ramp up to {self.concurrency} concurrent tabs")
+        generator = LoadGenerator('localhost', port, test_urls, timeout=self.timeout)
+        try:
+            levels = asyncio.run(generator.ramp(self.concurrency, self.load_duration, self.load_rate))
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+        
+        return {
+            'success': True,
+            'target_rate': self.load_rate,
+            'levels': levels,
+            'knee': find_knee(levels)
+        }
+    
+    def run_render_test(self, port: int, url: str, sampler: CgroupSampler = None) -> Dict[str, Any]:
+        """Measure screenshots/s and PDFs/s of ``url`` at every viewport and format."""
+        print(f"Measuring render throughput of {url} ({self.renders} renders per case)")
+        return run_render_benchmark('localhost', port, url, viewports=self.render_viewports,
+                                    formats=self.render_formats, renders=self.renders,
+                                    timeout=self.timeout, sampler=sampler,
+                                    screencast_frames=self.screencast_frames,
+                                    screencast_url=self.screencast_url)
+    
+    def run_intercept_test(self, port: int, test_urls: List[str]) -> Dict[str, Any]:
+        """Load every URL under every interception policy and compare with the first policy."""
+        print(f"Measuring request interception policies: {', '.join(self.intercept_policies)}")
+        return run_intercept_benchmark('localhost', port, test_urls, self.intercept_policies,
+                                       iterations=self.iterations, timeout=self.timeout)
+    
+    def run_kill_test(self, name: str, port: int, url: str) -> Dict[str, Any]:
+        """Kill (or freeze) the container's browser mid-load and time each recovery."""
+        print(f"Measuring {self.kill_test} recovery ({self.kills} kills while loading {url})")
+        return run_kill_benchmark(self, name, 'localhost', port, url, mode=self.kill_test,
+                                  kills=self.kills, timeout=self.timeout)
+    
+    def run_all_benchmarks(self, test_urls: List[str], parallel: bool = False,
+                           cpus_per_container: int = None, memory: str = None,
+                           shards: List[int] = None, compare_seed: bool = False,
+                           flag_matrix: Dict[str, List[str]] = None) -> Dict[str, Any]:
+        """
+        Run benchmarks for all containers.
         
-        for container in containers:
+        With ``parallel`` every image runs at the same time on its own
+        disjoint cpuset. ``cpus_per_container`` and ``memory`` also apply to
+        sequential runs, so both modes can be given identical resources.
+        ``shards`` (e.g. ``[1, 4]``) runs each Thorium image once per shard
+        count behind the in-image supervisor. ``compare_seed`` runs each
+        Thorium image with and without the pre-warmed profile template.
+        ``flag_matrix`` (flag-set name -> extra flags) runs each Thorium image
+        once per flag set.
+        """
+        mode = 'parallel' if parallel else 'sequential'
+        containers = shard_variants(CONTAINERS, shards) if shards else CONTAINERS
+        if compare_seed:
+            containers = seed_variants(containers)
+        if flag_matrix:
+            containers = flag_variants(containers, flag_matrix)
+        cpusets = [None] * len(containers)
+        if parallel:
+            cpusets = allocate_cpusets(len(containers), cpus_per_container)
+        elif cpus_per_container:
+            # Sequential runs reuse the same CPUs for every image
+            cpusets = allocate_cpusets(1, cpus_per_container) * len(containers)
+        
+        def run_one(container, cpuset):
+            pinning = {'mode': mode, 'cpuset': cpuset, 'memory': memory}
             try:
-                result = self.run_benchmark(
+                return self.run_benchmark(
                     container['image'],
                     container['name'],
                     container['port'],
-                    test_urls
+                    test_urls,
+                    pinning,
+                    container.get('shards'),
+                    container.get('seed_profile'),
+                    container.get('flag_set'),
+                    container.get('flags')
                 )
-                all_results.append(result)
             except Exception as e:
                 print(f"Error benchmarking {container['image']}: {e}")
-                all_results.append({
+                return {
                     'image': container['image'],
+                    'shards': container.get('shards'),
+                    'seed_profile': container.get('seed_profile'),
+                    'flag_set': container.get('flag_set'),
+                    'flags': container.get('flags'),
                     'success': False,
+                    'pinning': pinning,
                     'error': str(e)
-                })
+                }
+        
+        if parallel:
+            with ThreadPoolExecutor(max_workers=len(containers)) as executor:
+                all_results = list(executor.map(run_one, containers, cpusets))
+        else:
+            all_results = [run_one(container, cpuset) for container, cpuset in zip(containers, cpusets)]
         
         return {
             'timestamp': datetime.now().isoformat(),
             'iterations': self.iterations,
+            'concurrency': self.concurrency,
+            'mode': mode,
+            'shards': shards,
+            'compare_seed': compare_seed,
+            'flag_matrix': flag_matrix,
+            'host_cpu_model': host_cpu_model(),
+            'host_cpus': os.cpu_count(),
             'test_urls': test_urls,
             'results': all_results
         }
     
+    def run_startup_profiles(self, runs: int, cpus_per_container: int = None,
+                             memory: str = None) -> Dict[str, Any]:
+        """Profile ``runs`` cold starts of every image, one container at a time."""
+        cpuset = allocate_cpusets(1, cpus_per_container)[0] if cpus_per_container else None
+        profiler = StartupProfiler(self, runs)
+        results = []
+        for container in CONTAINERS:
+            try:
+                results.append(profiler.profile(container['image'], container['name'], container['port'],
+                                                cpuset, memory))
+            except Exception as e:
+                print(f"Error profiling {container['image']}: {e}")
+                results.append({'image': container['image'], 'success': False, 'error': str(e)})
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'mode': 'startup-profile',
+            'runs': runs,
+            'host_cpu_model': host_cpu_model(),
+            'host_cpus': os.cpu_count(),
+            'results': results
+        }
+    
+    def generate_startup_report(self, profile_results: Dict[str, Any]) -> str:
+        """Per-phase cold-start breakdown (medians across runs) for every image."""
+        report = []
+        report.append("# Thorium Docker Startup Profile")
+        report.append(f"Generated: {profile_results['timestamp']}")
+        report.append(f"Cold starts per image: {profile_results['runs']}")
+        report.append("")
+        report.append("## Startup Breakdown (median seconds)")
+        report.append("")
+        report.append("| Container | " + " | ".join(label for _, label in STARTUP_PHASES) + " | Total | p95 Total |")
+        report.append("|-----------|" + "|".join("-" * (len(label) + 2) for _, label in STARTUP_PHASES) + "|-------|-----------|")
+        for result in profile_results['results']:
+            if not result['success']:
+                report.append(f"| {result['image']} | " + " | ".join('FAILED' for _ in STARTUP_PHASES) + " | FAILED | N/A |")
+                continue
+            cells = [
+                f"{result['phases'][milestone]['median']:.3f}" if result['phases'][milestone]['n'] else 'N/A'
+                for milestone, _ in STARTUP_PHASES
+            ]
+            report.append(f"| {result['image']} | " + " | ".join(cells) +
+                          f" | {result['total']['median']:.3f} | {result['total']['p95']:.3f} |")
+        report.append("")
+        report.append("N/A: the image does not emit that milestone (e.g. no wrapped-thorium markers); "
+                      "its time is counted in the next phase.")
+        report.append("")
+        
+        report.append("## Runs")
+        report.append("")
+        for result in profile_results['results']:
+            report.append(f"### {result['image']}")
+            report.append("")
+            for index, run in enumerate(result.get('runs', [])):
+                if run['success']:
+                    report.append(f"- Run {index + 1}: {run['total']:.3f}s (ready via {run['ready_source']})")
+                else:
+                    report.append(f"- Run {index + 1}: FAILED ({run['error']})")
+            if not result['success'] and 'error' in result:
+                report.append(f"**Error**: {result['error']}")
+            report.append("")
+        
+        return "\n".join(report)
+    
+    def run_image_budget(self, images: List[str], runs: int, registry: str = REGISTRY) -> Dict[str, Any]:
+        """Size, pull and cold-start budget of ``images`` through a local registry."""
+        budget = ImageBudget(self, registry, pulls=runs, starts=runs)
+        if not budget.ensure_registry():
+            raise RuntimeError(f"No registry reachable at {registry}")
+        results = []
+        try:
+            for index, image in enumerate(images):
+                try:
+                    results.append(budget.measure(image, f'benchmark-budget-{index}', BUDGET_PORT + index))
+                except Exception as e:
+                    print(f"Error measuring {image}: {e}")
+                    results.append({'image': image, 'success': False, 'error': str(e)})
+        finally:
+            budget.stop_registry()
+        
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'mode': 'image-budget',
+            'runs': runs,
+            'registry': registry,
+            'host_cpu_model': host_cpu_model(),
+            'host_cpus': os.cpu_count(),
+            'results': results
+        }
+    
+    def generate_budget_report(self, budget_results: Dict[str, Any]) -> str:
+        """Image size, download/pull and cold-start table, compared with the first image."""
+        report = []
+        report.append("# Thorium Docker Image Budget")
+        report.append(f"Generated: {budget_results['timestamp']}")
+        report.append(f"Registry: {budget_results['registry']}, "
+                      f"{budget_results['runs']} pulls and cold starts per image")
+        report.append("")
+        report.append("## Budget (median seconds)")
+        report.append("")
+        report.append("| Image | Layers | Compressed | Uncompressed | Download | Pull + Extract | Reused Layers | DevTools | First Target |")
+        report.append("|-------|--------|------------|--------------|----------|----------------|---------------|----------|--------------|")
+        
+        def median(summary):
+            return f"{summary['median']:.3f}" if summary['n'] else 'N/A'
+        
+        for result in budget_results['results']:
+            if 'compressed_bytes' not in result:
+                report.append(f"| {result['image']} | FAILED | | | | | | | |")
+                continue
+            uncompressed = result['uncompressed_bytes']
+            report.append(
+                f"| {result['image']} | {result['layers']} | {result['compressed_bytes'] / 1e6:.1f} MB | "
+                f"{f'{uncompressed / 1e6:.1f} MB' if uncompressed else 'N/A'} | "
+                f"{median(result['download_time'])} | {median(result['pull_time'])} | {result['layers_reused']} | "
+                f"{median(result['devtools_time'])} | {median(result['first_target_time'])} |"
+            )
+        report.append("")
+        report.append("Download: layer blobs over HTTP from the registry. Pull + Extract: `docker pull` with "
+                      "every tag of the image removed first; layers still held by other local images are "
+                      "reused (Reused Layers) and not downloaded.")
+        report.append("")
+        
+        deltas = budget_deltas(budget_results['results'])
+        if deltas:
+            
+            def signed(value):
+                return f"{value:+.3f}s" if value is not None else 'N/A'
+            
+            report.append(f"## Against {deltas[0]['baseline']}")
+            report.append("")
+            for delta in deltas:
+                report.append(f"- **{delta['image']}**: {delta['compressed_ratio']:.0%} of the compressed size, "
+                              f"download {signed(delta['download_delta'])}, pull {signed(delta['pull_delta'])}, "
+                              f"DevTools {signed(delta['devtools_delta'])}, "
+                              f"first target {signed(delta['first_target_delta'])}")
+            report.append("")
+        
+        for result in budget_results['results']:
+            if not result['success'] and 'error' in result:
+                report.append(f"**{result['image']}**: {result['error']}")
+        
+        return "\n".join(report)
+    
+    @staticmethod
+    def result_label(result: Dict[str, Any]) -> str:
+        """Image name, with the shard count, profile seeding and flag set of variant runs."""
+        variant = []
+        if result.get('shards'):
+            variant.append(f"K={result['shards']}")
+        if result.get('seed_profile') is not None:
+            variant.append('seeded profile' if result['seed_profile'] else 'empty profile')
+        if result.get('flag_set'):
+            variant.append(f"flags={result['flag_set']}")
+        return f"{result['image']} ({', '.join(variant)})" if variant else result['image']
+    
     def generate_report(self, benchmark_results: Dict[str, Any]) -> str:
         """Generate a detailed performance report."""
         report = []
         report.append("# Thorium Docker Performance Benchmark Report")
         report.append(f"Generated: {benchmark_results['timestamp']}")
         report.append(f"Iterations: {benchmark_results['iterations']}")
+        report.append(f"Mode: {benchmark_results.get('mode', 'sequential')}")
         report.append("")
         
         # Summary table
         report.append("## Performance Summary")
         report.append("")
-        report.append("| Container | Startup Time (s) | Avg Load Time (s) | Memory Usage | Success Rate |")
-        report.append("|-----------|------------------|-------------------|--------------|--------------|")
+        report.append("| Container | Startup Time (s) | Cold Load (s) | Warm Load Mean (s) | Warm 95% CI (s) | Memory Usage | Success Rate |")
+        report.append("|-----------|------------------|---------------|--------------------|-----------------|--------------|--------------|")
         
         for result in benchmark_results['results']:
             if result['success']:
                 startup_time = result['startup']['total_startup_time']
+                cold = result['load_stats']['cold']
+                warm = result['load_stats']['warm']
+                cold_load = f"{cold['mean']:.3f}" if cold['n'] else 'N/A'
+                warm_load = f"{warm['mean']:.3f}" if warm['n'] else 'N/A'
+                warm_ci = f"{warm['ci_low']:.3f}-{warm['ci_high']:.3f}" if warm['n'] else 'N/A'
                 
-                # Calculate average load time
-                load_times = [r['load_time'] for r in result['page_loads'] if r['success']]
-                avg_load_time = statistics.mean(load_times) if load_times else 0
-                
-                memory_usage = result['final_stats'].get('memory_usage', 'N/A')
+                memory_usage = self.format_memory_usage(result)
                 success_rate = len([r for r in result['page_loads'] if r['success']]) / len(result['page_loads']) * 100
                 
-                report.append(f"| {result['image']} | {startup_time:.2f} | {avg_load_time:.2f} | {memory_usage} | {success_rate:.1f}% |")
+                report.append(f"| {self.result_label(result)} | {startup_time:.2f} | {cold_load} | {warm_load} | {warm_ci} | {memory_usage} | {success_rate:.1f}% |")
             else:
-                report.append(f"| {result['image']} | FAILED | FAILED | N/A | 0% |")
+                report.append(f"| {self.result_label(result)} | FAILED | FAILED | FAILED | N/A | N/A | 0% |")
         
         report.append("")
         
+        # Per-URL statistics
+        report.append("## Load Time Statistics")
+        report.append("")
+        report.append("Iteration 1 of each URL is the cold-cache load; the remaining iterations are warm.")
+        report.append("")
+        for result in benchmark_results['results']:
+            if not result['success']:
+                continue
+            report.append(f"### {self.result_label(result)}")
+            report.append("")
+            report.append("| URL | Cold (s) | Warm n | Mean (s) | Stddev (s) | Median (s) | p95 (s) | 95% CI (s) |")
+            report.append("|-----|----------|--------|----------|------------|------------|---------|------------|")
+            for url, url_stats in result['load_stats']['per_url'].items():
+                cold = f"{url_stats['cold']:.3f}" if url_stats['cold'] is not None else 'FAILED'
+                warm = url_stats['warm']
+                if warm['n']:
+                    report.append(f"| {url} | {cold} | {warm['n']} | {warm['mean']:.3f} | {warm['stddev']:.3f} | "
+                                  f"{warm['median']:.3f} | {warm['p95']:.3f} | {warm['ci_low']:.3f}-{warm['ci_high']:.3f} |")
+                else:
+                    report.append(f"| {url} | {cold} | 0 | N/A | N/A | N/A | N/A | N/A |")
+            report.append("")
+        
+        # Shared caching proxy: hit rate next to the load times it served
+        if any(r.get('cache_proxy') for r in benchmark_results['results'] if r['success']):
+            report.append("## Shared Cache Proxy")
+            report.append("")
+            report.append("Proxy requests during each container's page loads, in run order; HTTPS is tunnelled "
+                          "uncached and only counted as tunnels.")
+            report.append("")
+            report.append("| Container | Cold Load (s) | Warm Load Mean (s) | Requests | Hits | Revalidated | Misses | "
+                          "Uncacheable | Tunnels | Hit Rate | Byte Hit Rate | From Cache (MiB) |")
+            report.append("|-----------|---------------|--------------------|----------|------|-------------|--------|"
+                          "-------------|---------|----------|---------------|------------------|")
+            for result in benchmark_results['results']:
+                if not result['success']:
+                    continue
+                cold = result['load_stats']['cold']
+                warm = result['load_stats']['warm']
+                loads = (f"{cold['mean']:.3f} | " if cold['n'] else 'N/A | ') + \
+                        (f"{warm['mean']:.3f}" if warm['n'] else 'N/A')
+                proxy = result.get('cache_proxy')
+                if not proxy:
+                    report.append(f"| {self.result_label(result)} | {loads} | not proxied | | | | | | | | |")
+                    continue
+                hit_rate = f"{proxy['hit_rate'] * 100:.1f}%" if proxy['hit_rate'] is not None else 'N/A'
+                byte_hit_rate = f"{proxy['byte_hit_rate'] * 100:.1f}%" if proxy['byte_hit_rate'] is not None else 'N/A'
+                report.append(f"| {self.result_label(result)} | {loads} | {proxy['requests']} | {proxy['hits']} | "
+                              f"{proxy['revalidated']} | {proxy['misses']} | {proxy['uncacheable']} | "
+                              f"{proxy['tunnels']} | {hit_rate} | {byte_hit_rate} | "
+                              f"{proxy['bytes_from_cache'] / 1024 / 1024:.2f} |")
+            report.append("")
+        
+        # Trace breakdown: where the renderer main thread spent each page load
+        traced = [r for r in benchmark_results['results']
+                  if r['success'] and any(p.get('trace') for p in r['page_loads'])]
+        if traced:
+            report.append("## Trace Breakdown")
+            report.append("")
+            report.append("Median main-thread self time per category over the traced warm loads (cold loads "
+                          "if there are none), in ms; Network is the time with requests in flight.")
+            report.append("")
+            for url in benchmark_results.get('test_urls') or traced[0]['test_urls']:
+                breakdowns = []
+                for result in traced:
+                    loads = [p for p in result['page_loads'] if p['url'] == url and p.get('trace')]
+                    warm = [p for p in loads if not p['cold']] or loads
+                    if warm:
+                        breakdowns.append((result, statistics.median(p['load_time'] for p in warm),
+                                           aggregate_traces([p['trace'] for p in warm])))
+                if not breakdowns:
+                    continue
+                report.append(f"### {url}")
+                report.append("")
+                labels = [BREAKDOWN_LABELS[c] for c in BREAKDOWN]
+                report.append("| Container | Load (s) | " + " | ".join(labels) + " | Network |")
+                report.append("|-----------|----------|" + "|".join('-' * (len(l) + 2) for l in labels) + "|---------|")
+                for result, load_time, breakdown in breakdowns:
+                    cells = " | ".join(f"{breakdown[c] * 1000:.1f}" for c in BREAKDOWN + ['network'])
+                    report.append(f"| {self.result_label(result)} | {load_time:.3f} | {cells} |")
+                report.append("")
+                baseline_result, baseline_load, baseline = breakdowns[0]
+                for result, load_time, breakdown in breakdowns[1:]:
+                    reasons = explain_difference(baseline, breakdown)[:3]
+                    if not reasons:
+                        continue
+                    explained = ", ".join(f"{delta * 1000:+.1f}ms {category}" for category, delta in reasons)
+                    report.append(f"- {self.result_label(result)} vs {self.result_label(baseline_result)}: "
+                                  f"load {(load_time - baseline_load) * 1000:+.1f}ms, mostly {explained}")
+                report.append("")
+        
+        # Seeded vs empty profile: cold first loads of the same image
+        seeded_pairs = {}
+        for result in benchmark_results['results']:
+            if result['success'] and result.get('seed_profile') is not None:
+                seeded_pairs.setdefault((result['image'], result.get('shards')), {})[result['seed_profile']] = result
+        seeded_pairs = {key: pair for key, pair in seeded_pairs.items() if len(pair) == 2}
+        if seeded_pairs:
+            report.append("## Profile Seeding: Cold First Load")
+            report.append("")
+            report.append("| Container | Empty Profile (s) | Seeded Profile (s) | Gain (s) | Significant |")
+            report.append("|-----------|-------------------|--------------------|----------|-------------|")
+            for (image, shards), pair in seeded_pairs.items():
+                cold = {
+                    seeded: [r['load_time'] for r in pair[seeded]['page_loads'] if r['success'] and r['cold']]
+                    for seeded in (True, False)
+                }
+                if not cold[True] or not cold[False]:
+                    continue
+                empty_mean = statistics.mean(cold[False])
+                seeded_mean = statistics.mean(cold[True])
+                label = self.result_label({'image': image, 'shards': shards})
+                significant = 'yes' if significantly_lower(cold[True], cold[False]) else 'no'
+                report.append(f"| {label} | {empty_mean:.3f} | {seeded_mean:.3f} | "
+                              f"{empty_mean - seeded_mean:.3f} | {significant} |")
+            report.append("")
+        
+        # Pooled vs cold tab acquisition
+        pool_results = [r for r in benchmark_results['results'] if r['success'] and r.get('pool_comparison')]
+        if pool_results:
+            report.append("## Tab Acquisition: Pooled vs Cold")
+            report.append("")
+            report.append("| Container | Mode | Acquire Median (s) | Acquire p95 (s) | First Load Median (s) | First Load p95 (s) |")
+            report.append("|-----------|------|--------------------|-----------------|-----------------------|--------------------|")
+            for result in pool_results:
+                comparison = result['pool_comparison']
+                if not comparison['success']:
+                    report.append(f"| {self.result_label(result)} | FAILED | {comparison['error']} | | | |")
+                    continue
+                for mode in ('cold', 'pooled'):
+                    acquire = comparison[mode]['acquire']
+                    first_load = comparison[mode]['first_load']
+                    report.append(f"| {self.result_label(result)} | {mode} | {acquire['median']:.4f} | {acquire['p95']:.4f} | "
+                                  f"{first_load['median']:.3f} | {first_load['p95']:.3f} |")
+            report.append("")
+        
+        # Concurrency ramp
+        load_results = [r for r in benchmark_results['results'] if r['success'] and r.get('load_test')]
+        if load_results:
+            report.append("## Concurrency Ramp")
+            report.append("")
+            for result in load_results:
+                load_test = result['load_test']
+                report.append(f"### {self.result_label(result)}")
+                report.append("")
+                if not load_test['success']:
+                    report.append(f"**Error**: {load_test['error']}")
+                    report.append("")
+                    continue
+                report.append(f"**Knee**: {load_test['knee']} concurrent tabs")
+                report.append("")
+                report.append("| Concurrency | Pages | Errors | Throughput (pages/s) | p50 (s) | p95 (s) | p99 (s) |")
+                report.append("|-------------|-------|--------|----------------------|---------|---------|---------|")
+                for level in load_test['levels']:
+                    latency = level['latency']
+                    report.append(f"| {level['concurrency']} | {level['pages']} | {level['errors']} | "
+                                  f"{level['throughput']:.2f} | {latency['p50']:.3f} | "
+                                  f"{latency['p95']:.3f} | {latency['p99']:.3f} |")
+                report.append("")
+        
+        # Shard scaling: peak ramp throughput per image and shard count
+        sharded = [r for r in load_results if r.get('shards') and r['load_test']['success']]
+        if sharded:
+            report.append("## Shard Scaling")
+            report.append("")
+            report.append("| Image | Shards | Peak Throughput (pages/s) | Knee | Speedup |")
+            report.append("|-------|--------|---------------------------|------|---------|")
+            baselines = {}
+            for result in sorted(sharded, key=lambda r: (r['image'], r['shards'])):
+                peak = max(level['throughput'] for level in result['load_test']['levels'])
+                baseline = baselines.setdefault(result['image'], peak)
+                speedup = f"{peak / baseline:.2f}x" if baseline else 'N/A'
+                report.append(f"| {result['image']} | {result['shards']} | {peak:.2f} | "
+                              f"{result['load_test']['knee']} | {speedup} |")
+            report.append("")
+        
+        # Flag sets: deltas against the baseline flag set of the same image
+        flag_sets = benchmark_results.get('flag_matrix') or {}
+        deltas = flag_deltas(benchmark_results['results'], next(iter(flag_sets), None))
+        if deltas:
+            report.append("## Flag Set Matrix")
+            report.append("")
+            report.append("Deltas are relative to the first flag set of the same image; negative is better. "
+                          "\"no baseline\": that run failed, so nothing is compared.")
+            report.append("")
+            report.append("| Container | Flag Set | Warm Load Mean (s) | Δ Warm Load (s) | Latency | Δ Startup (s) | "
+                          "Δ Peak Memory (MiB) | Δ CPU per Page (ms) |")
+            report.append("|-----------|----------|--------------------|-----------------|---------|---------------|"
+                          "---------------------|---------------------|")
+            def fmt(value, scale=1.0, digits=3):
+                return f"{value * scale:+.{digits}f}" if value is not None else 'N/A'
+            
+            for delta in deltas:
+                mean = f"{delta['warm_load_mean']:.3f}" if delta['warm_load_mean'] is not None else 'N/A'
+                label = self.result_label({'image': delta['image'], 'shards': delta['shards'],
+                                           'seed_profile': delta['seed_profile']})
+                report.append(f"| {label} | {delta['flag_set']} | {mean} | {fmt(delta['warm_load_delta'])} | "
+                              f"{delta['latency']} | {fmt(delta['startup_delta'], digits=2)} | "
+                              f"{fmt(delta['peak_memory_delta'], 1 / 1024 / 1024, 1)} | "
+                              f"{fmt(delta['cpu_per_page_delta'], 1000, 1)} |")
+            report.append("")
+            if flag_sets:
+                report.append("| Flag Set | Extra Flags |")
+                report.append("|----------|-------------|")
+                for name, flags in flag_sets.items():
+                    report.append(f"| {name} | {' '.join(f'`{flag}`' for flag in flags) or '(defaults only)'} |")
+                report.append("")
+        
+        # Request interception savings per policy
+        intercept_results = [r for r in benchmark_results['results'] if r['success'] and r.get('intercept_test')]
+        if intercept_results:
+            report.append("## Request Interception")
+            report.append("")
+            report.append("Median per page load with the HTTP cache disabled; savings are relative to the first "
+                          "policy. *: load-time difference significant at 95%.")
+            report.append("")
+            for result in intercept_results:
+                intercept_test = result['intercept_test']
+                report.append(f"### {self.result_label(result)}")
+                report.append("")
+                if not intercept_test['success']:
+                    report.append(f"**Error**: {intercept_test['error']}")
+                    report.append("")
+                    continue
+                report.append("| Policy | Load Time (s) | Load Saving | Transferred (KiB) | Bytes Saving | Requests | "
+                              "Blocked | Stubbed | Decision (µs) |")
+                report.append("|--------|---------------|-------------|-------------------|--------------|----------|"
+                              "---------|---------|---------------|")
+                for policy in intercept_test['savings']:
+                    if not policy['loads']:
+                        report.append(f"| {policy['policy']} | FAILED | | | | | | | |")
+                        continue
+                    load_saving = (f"{policy['load_time_saving']:+.1%}{'*' if policy['significant'] else ''}"
+                                   if policy['load_time_saving'] is not None else 'N/A')
+                    bytes_saving = (f"{policy['bytes_saving']:+.1%}" if policy['bytes_saving'] is not None
+                                    else 'N/A')
+                    if policy['policy'] == intercept_test['policies'][0]:
+                        load_saving = bytes_saving = 'baseline'
+                    decision = f"{policy['decision_us']:.1f}" if policy['decision_us'] is not None else '-'
+                    report.append(f"| {policy['policy']} | {policy['load_time']['median']:.3f} | {load_saving} | "
+                                  f"{policy['bytes']['median'] / 1024:.1f} | {bytes_saving} | "
+                                  f"{policy['requests']['median']:.0f} | {policy['blocked']} | "
+                                  f"{policy['stubbed']} | {decision} |")
+                report.append("")
+        
+        # Watchdog recovery after killed or hung browsers
+        kill_results = [r for r in benchmark_results['results'] if r['success'] and r.get('kill_test')]
+        if kill_results:
+            report.append("## Crash Recovery")
+            report.append("")
+            report.append("Recovery: from the kill signal to the first `/json/version` answered by the restarted "
+                          "browser. Downtime is the supervisor's own measurement; failed loads ran while the "
+                          "browser was down.")
+            report.append("")
+            report.append("| Container | Mode | Kills | Recovery p50 (s) | Recovery p95 (s) | Downtime (s) | "
+                          "Failed Loads | Restarts | Crashes | Hangs |")
+            report.append("|-----------|------|-------|------------------|------------------|--------------|"
+                          "--------------|----------|---------|-------|")
+            for result in kill_results:
+                kill_test = result['kill_test']
+                if not kill_test['success']:
+                    report.append(f"| {self.result_label(result)} | FAILED | {kill_test['error']} | | | | | | | |")
+                    continue
+                recovery = kill_test['recovery_time']
+                p50 = f"{recovery['median']:.3f}" if recovery['n'] else 'N/A'
+                p95 = f"{recovery['p95']:.3f}" if recovery['n'] else 'N/A'
+                unrecovered = f" ({kill_test['unrecovered']} unrecovered)" if kill_test['unrecovered'] else ''
+                report.append(f"| {self.result_label(result)} | {kill_test['mode']} | "
+                              f"{len(kill_test['kills'])}{unrecovered} | {p50} | {p95} | "
+                              f"{kill_test['downtime']:.3f} | {kill_test['failed_loads']}/{kill_test['loads']} | "
+                              f"{kill_test['restarts']} | {kill_test['crashes']} | {kill_test['hangs']} |")
+            report.append("")
+        
+        # Render throughput per viewport and format
+        render_results = [r for r in benchmark_results['results'] if r['success'] and r.get('render_test')]
+        if render_results:
+            report.append("## Render Throughput")
+            report.append("")
+            best = {}
+            for result in render_results:
+                render_test = result['render_test']
+                report.append(f"### {self.result_label(result)}")
+                report.append("")
+                if not render_test['success']:
+                    report.append(f"**Error**: {render_test['error']}")
+                    report.append("")
+                    continue
+                report.append(f"Page: {render_test['url']}, {render_test['renders']} renders per case")
+                report.append("")
+                report.append("| Viewport | Format | Renders/s | p50 (s) | p95 (s) | Mean Size (KiB) | CPU per Render (ms) |")
+                report.append("|----------|--------|-----------|---------|---------|-----------------|---------------------|")
+                for case in render_test['cases']:
+                    fmt = case['format'] + (f" q{case['quality']}" if case['quality'] is not None else '')
+                    if not case['success']:
+                        report.append(f"| {case['viewport']} | {fmt} | FAILED | {case['error']} | | | |")
+                        continue
+                    cpu = case['cpu_seconds_per_render']
+                    cpu = f"{cpu * 1000:.1f}" if cpu is not None else 'N/A'
+                    report.append(f"| {case['viewport']} | {fmt} | {case['renders_per_second']:.2f} | "
+                                  f"{case['latency']['p50']:.3f} | {case['latency']['p95']:.3f} | "
+                                  f"{case['bytes']['mean'] / 1024:.1f} | {cpu} |")
+                    key = (case['viewport'], fmt)
+                    if key not in best or case['renders_per_second'] > best[key][1]:
+                        best[key] = (self.result_label(result), case['renders_per_second'])
+                report.append("")
+            streaming = [(r, case) for r in render_results if r['render_test']['success']
+                         for case in r['render_test'].get('streaming', [])]
+            if streaming:
+                report.append("### Screencast vs One-Shot Capture")
+                report.append("")
+                report.append("| Container | Viewport | Format | One-Shot Frames/s | Screencast Frames/s | "
+                              "One-Shot Peak Client (KiB) | Screencast Peak Client (KiB) |")
+                report.append("|-----------|----------|--------|-------------------|---------------------|"
+                              "----------------------------|------------------------------|")
+                for result, case in streaming:
+                    fmt = case['format'] + (f" q{case['quality']}" if case['quality'] is not None else '')
+                    if not case['success']:
+                        report.append(f"| {self.result_label(result)} | {case['viewport']} | {fmt} | FAILED | "
+                                      f"{case['error']} | | |")
+                        continue
+                    one_shot, screencast = case['one_shot'], case['screencast']
+                    report.append(f"| {self.result_label(result)} | {case['viewport']} | {fmt} | "
+                                  f"{one_shot['frames_per_second']:.2f} | {screencast['frames_per_second']:.2f} | "
+                                  f"{one_shot['peak_client_bytes'] / 1024:.0f} | "
+                                  f"{screencast['peak_client_bytes'] / 1024:.0f} |")
+                report.append("")
+            if len(render_results) > 1 and best:
+                report.append("### Fastest Container per Case")
+                report.append("")
+                report.append("| Viewport | Format | Container | Renders/s |")
+                report.append("|----------|--------|-----------|-----------|")
+                for (viewport, fmt), (label, rate) in best.items():
+                    report.append(f"| {viewport} | {fmt} | {label} | {rate:.2f} |")
+                report.append("")
+        
         # Detailed results
         report.append("## Detailed Results")
         report.append("")
         
         for result in benchmark_results['results']:
-            report.append(f"### {result['image']}")
+            report.append(f"### {self.result_label(result)}")
             report.append("")
             
             if result['success']:
+                pinning = result.get('pinning', {})
+                if pinning.get('cpuset') or pinning.get('memory'):
+                    report.append(f"**Pinning**: cpuset {pinning.get('cpuset') or 'any'}, "
+                                  f"memory {pinning.get('memory') or 'unlimited'}")
                 report.append(f"**Startup Time**: {result['startup']['total_startup_time']:.2f}s")
-                report.append(f"**Ready Time**: {result['startup']['ready_time']:.2f}s")
+                report.append(f"**Ready Time**: {result['startup']['ready_time']:.3f}s "
+                              f"(via {result['startup'].get('ready_source', 'http')})")
                 report.append("")
                 
                 report.append("**Page Load Results**:")
-                for i, page_result in enumerate(result['page_loads']):
-                    url = result['test_urls'][i]
+                for page_result in result['page_loads']:
+                    label = f"{page_result['url']} #{page_result['iteration'] + 1}"
+                    if page_result['cold']:
+                        label += " (cold)"
                     if page_result['success']:
-                        report.append(f"- {url}: {page_result['load_time']:.2f}s")
+                        report.append(f"- {label}: {page_result['load_time']:.3f}s")
                     else:
-                        report.append(f"- {url}: FAILED ({page_result.get('error', 'Unknown error')})")
+                        report.append(f"- {label}: FAILED ({page_result.get('error', 'Unknown error')})")
                 
                 report.append("")
                 report.append("**Resource Usage**:")
-                report.append(f"- CPU: {result['final_stats'].get('cpu_percent', 'N/A')}%")
-                report.append(f"- Memory: {result['final_stats'].get('memory_usage', 'N/A')}")
-                report.append(f"- Memory %: {result['final_stats'].get('memory_percent', 'N/A')}%")
+                resources = result.get('resources')
+                if resources:
+                    cpu_line = f"- CPU: {resources['cpu_seconds']:.2f}s total"
+                    if resources['cpu_seconds_per_page'] is not None:
+                        cpu_line += f", {resources['cpu_seconds_per_page']:.3f}s per page load"
+                    report.append(f"- Peak Memory: {resources['peak_memory_bytes'] / 1024 / 1024:.1f}MiB")
+                    report.append(cpu_line)
+                    report.append(f"- Block I/O: {resources['io_read_bytes'] / 1024 / 1024:.1f}MiB read, "
+                                  f"{resources['io_write_bytes'] / 1024 / 1024:.1f}MiB written")
+                    report.append(f"- Samples: {resources['samples']} every {resources['interval'] * 1000:.0f}ms")
+                else:
+                    report.append(f"- CPU: {result['final_stats'].get('cpu_percent', 'N/A')}%")
+                    report.append(f"- Memory: {result['final_stats'].get('memory_usage', 'N/A')}")
+                    report.append(f"- Memory %: {result['final_stats'].get('memory_percent', 'N/A')}%")
             else:
                 report.append(f"**Error**: {result.get('error', 'Unknown error')}")
             
@@ -388,6 +1366,38 @@ class BenchmarkRunner:
         
         return "\n".join(report)
     
+    def comparison_summary(self, benchmark_results: Dict[str, Any]) -> List[str]:
+        """
+        Name the image with the fastest page loads.
+        
+        An image is only called fastest when its mean is significantly lower
+        than the runner-up's (95% bootstrap CI of the difference below zero).
+        Startup is not compared: a run starts each image once, and a single
+        sample has no confidence interval (``--profile-startup`` repeats
+        cold starts).
+        """
+        def load_samples(result):
+            warm = [r['load_time'] for r in result['page_loads'] if r['success'] and not r['cold']]
+            return warm or [r['load_time'] for r in result['page_loads'] if r['success']]
+        
+        ranked = sorted(
+            ((self.result_label(r), load_samples(r)) for r in benchmark_results['results']
+             if r['success'] and load_samples(r)),
+            key=lambda item: statistics.mean(item[1])
+        )
+        if not ranked:
+            return []
+        best_image, best = ranked[0]
+        best_mean = statistics.mean(best)
+        if len(ranked) == 1:
+            return [f"Fastest page load: {best_image} ({best_mean:.3f}s, only successful image)"]
+        if significantly_lower(best, ranked[1][1]):
+            return [f"Fastest page load: {best_image} ({best_mean:.3f}s vs "
+                    f"{ranked[1][0]} {statistics.mean(ranked[1][1]):.3f}s, significant at 95%)"]
+        return [f"Fastest page load: no significant difference "
+                f"({best_image} {best_mean:.3f}s vs {ranked[1][0]} "
+                f"{statistics.mean(ranked[1][1]):.3f}s, n={len(best)})"]
+    
     def save_results(self, benchmark_results: Dict[str, Any], filename: str = None):
         """Save benchmark results to file."""
         if not filename:
@@ -413,10 +1423,93 @@ def main():
         'https://www.stackoverflow.com',
         'https://www.wikipedia.org'
     ], help='URLs to test')
+    parser.add_argument('--concurrency', type=int, default=0,
+                        help='Ramp concurrent tabs up to N (1, 2, 4, ... N) after the page load tests')
+    parser.add_argument('--load-duration', type=float, default=30,
+                        help='Seconds to run each concurrency level')
+    parser.add_argument('--load-rate', type=float,
+                        help='Aggregate pages/s to schedule in concurrency mode (default: as fast as possible)')
+    parser.add_argument('--parallel', action='store_true',
+                        help='Benchmark all images at the same time, each pinned to a disjoint cpuset')
+    parser.add_argument('--cpus-per-container', type=int,
+                        help='CPUs pinned per container (default in parallel mode: an even split of the host)')
+    parser.add_argument('--memory', help='Memory limit per container, e.g. 4g')
+    parser.add_argument('--sample-interval', type=float, default=0.2,
+                        help='Seconds between cgroup resource samples')
+    parser.add_argument('--local-corpus', action='store_true',
+                        help='Serve the bundled page corpus locally and benchmark it instead of --urls')
+    parser.add_argument('--corpus-port', type=int, default=8080, help='Port for the local page corpus server')
+    parser.add_argument('--corpus-latency', type=float, default=0,
+                        help='Artificial latency per corpus response in seconds')
+    parser.add_argument('--corpus-bandwidth', type=float,
+                        help='Bandwidth limit per corpus response in KiB/s')
+    parser.add_argument('--pool-size', type=int, default=0,
+                        help='Compare tab acquisition from a pool of N warm tabs with cold /json/new tabs')
+    parser.add_argument('--render', type=int, default=0, metavar='N',
+                        help='Measure screenshot/PDF throughput with N renders per viewport and format')
+    parser.add_argument('--render-viewports', nargs='+', metavar='WxH',
+                        help='Viewports for --render (default: 1280x720 1920x1080 390x844)')
+    parser.add_argument('--render-formats', nargs='+', metavar='FORMAT',
+                        help='Formats for --render: png, pdf, jpeg:Q, webp:Q '
+                             '(default: png jpeg:90 jpeg:60 webp:90 webp:60 pdf)')
+    parser.add_argument('--render-url', help='Page to render (default: the first test URL)')
+    parser.add_argument('--render-screencast', type=int, default=0, metavar='N',
+                        help='With --render, also compare N one-shot screenshots with N screencast frames')
+    parser.add_argument('--screencast-url',
+                        help='Continuously painting page for --render-screencast '
+                             '(default: the corpus animation with --local-corpus, else the render page)')
+    parser.add_argument('--shards', type=int, nargs='+',
+                        help='Run each Thorium image as K browser processes behind one endpoint, '
+                             'once per K (e.g. --shards 1 4)')
+    parser.add_argument('--compare-profile-seed', action='store_true',
+                        help='Run each Thorium image with and without the pre-warmed profile template')
+    parser.add_argument('--trace', metavar='DIR',
+                        help='Record a performance trace of every page load into DIR and report a '
+                             'scripting/layout/paint/parse/GC/network breakdown')
+    parser.add_argument('--flag-matrix', nargs='?', const='', metavar='FILE',
+                        help='Run each Thorium image once per browser flag set and report deltas against the '
+                             'first set; FILE is a JSON object of name -> extra flags (default: built-in matrix)')
+    parser.add_argument('--intercept', nargs='?', const='', metavar='FILE',
+                        help='Also load every URL under each request interception policy and report '
+                             'load-time and bytes savings (JSON policies; built-in set when FILE is omitted)')
+    parser.add_argument('--kill-test', choices=sorted(KILL_SIGNALS),
+                        help='Also kill (crash: SIGKILL) or freeze (hang: SIGSTOP) each Thorium browser mid-load '
+                             'and report how fast the supervisor brings it back')
+    parser.add_argument('--kills', type=int, default=3,
+                        help='Kill/recover cycles per container for --kill-test (default: %(default)s)')
+    parser.add_argument('--cache-proxy', action='store_true',
+                        help='Route the Thorium containers through one shared caching HTTP proxy and report '
+                             'its hit rate next to the load times')
+    parser.add_argument('--cache-proxy-port', type=int, default=CACHE_PROXY_PORT,
+                        help='Port for --cache-proxy (default: %(default)s)')
+    parser.add_argument('--cache-dir',
+                        help='Cache directory for --cache-proxy (default: a fresh temporary directory, '
+                             'so the first container starts cold)')
+    parser.add_argument('--cache-size', type=float, default=1024,
+                        help='Cache size bound for --cache-proxy in MiB (default: %(default)s)')
+    parser.add_argument('--profile-startup', type=int, metavar='RUNS',
+                        help='Only profile RUNS cold starts per image and report a per-phase breakdown')
+    parser.add_argument('--image-budget', type=int, metavar='RUNS',
+                        help='Measure compressed size, pull time and cold start of --budget-images instead')
+    parser.add_argument('--budget-images', nargs='+', default=BUDGET_IMAGES, metavar='IMAGE',
+                        help='Images for --image-budget; the first is the baseline (default: %(default)s)')
+    parser.add_argument('--registry', default=REGISTRY,
+                        help='Registry for --image-budget, started as a registry:2 container if unreachable')
+    parser.add_argument('--store', metavar='DB',
+                        help='Also append the results to this SQLite history (see results_store.py compare)')
     parser.add_argument('--output', help='Output file for results')
     parser.add_argument('--report', help='Output file for report')
     
     args = parser.parse_args()
+    try:
+        for viewport in args.render_viewports or []:
+            parse_viewport(viewport)
+        for fmt in args.render_formats or []:
+            parse_format(fmt)
+        flag_matrix = load_flag_matrix(args.flag_matrix) if args.flag_matrix is not None else None
+        intercept_policies = load_policies(args.intercept) if args.intercept is not None else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
     
     # Check if Docker is running
     try:
@@ -426,20 +1519,85 @@ def main():
         sys.exit(1)
     
     # Run benchmarks
-    runner = BenchmarkRunner(iterations=args.iterations, timeout=args.timeout)
+    runner = BenchmarkRunner(
+        iterations=args.iterations,
+        timeout=args.timeout,
+        concurrency=args.concurrency,
+        load_duration=args.load_duration,
+        load_rate=args.load_rate,
+        sample_interval=args.sample_interval,
+        pool_size=args.pool_size,
+        renders=args.render,
+        render_viewports=args.render_viewports,
+        render_formats=args.render_formats,
+        render_url=args.render_url,
+        screencast_frames=args.render_screencast,
+        screencast_url=args.screencast_url,
+        trace_dir=args.trace,
+        intercept_policies=intercept_policies,
+        kill_test=args.kill_test,
+        kills=args.kills
+    )
     
-    print("Starting performance benchmarks...")
-    print(f"Test URLs: {args.urls}")
-    print(f"Iterations: {args.iterations}")
-    print("")
-    
-    results = runner.run_all_benchmarks(args.urls)
+    page_server = None
+    cache_dir = None
+    if args.image_budget:
+        print(f"Measuring the image budget of {', '.join(args.budget_images)}...")
+        results = runner.run_image_budget(args.budget_images, args.image_budget, args.registry)
+        results_file = runner.save_results(results, args.output)
+        report = runner.generate_budget_report(results)
+        summary = [f"{r['image']}: {r['compressed_bytes'] / 1e6:.1f} MB compressed, "
+                   f"median cold start {r['first_target_time']['median']:.3f}s"
+                   for r in results['results'] if r['success']]
+    elif args.profile_startup:
+        print(f"Profiling {args.profile_startup} cold starts per image...")
+        results = runner.run_startup_profiles(args.profile_startup, args.cpus_per_container, args.memory)
+        results_file = runner.save_results(results, args.output)
+        report = runner.generate_startup_report(results)
+        summary = [f"Median cold start of {r['image']}: {r['total']['median']:.3f}s"
+                   for r in results['results'] if r['success']]
+    else:
+        if args.local_corpus:
+            page_server = PageServer('0.0.0.0', args.corpus_port, args.corpus_latency,
+                                     args.corpus_bandwidth).start_background()
+            args.urls = page_server.corpus_urls(host=CORPUS_HOST)
+            if not runner.screencast_url:
+                runner.screencast_url = page_server.url('animation.html', host=CORPUS_HOST)
+            print(f"Serving local page corpus on port {page_server.port}")
+        if args.cache_proxy:
+            cache_dir = args.cache_dir or tempfile.mkdtemp(prefix='thorium-http-cache-')
+            runner.cache_proxy = CacheProxy('0.0.0.0', args.cache_proxy_port, cache_dir,
+                                            int(args.cache_size * 1024 * 1024)).start_background()
+            print(f"Caching proxy on port {runner.cache_proxy.port}, cache in {cache_dir}")
+        
+        print("Starting performance benchmarks...")
+        print(f"Test URLs: {args.urls}")
+        print(f"Iterations: {args.iterations}")
+        if args.concurrency:
+            print(f"Concurrency ramp: up to {args.concurrency} tabs, {args.load_duration:.0f}s per level")
+        print("")
+        
+        results = runner.run_all_benchmarks(
+            args.urls,
+            parallel=args.parallel,
+            cpus_per_container=args.cpus_per_container,
+            memory=args.memory,
+            shards=args.shards,
+            compare_seed=args.compare_profile_seed,
+            flag_matrix=flag_matrix
+        )
+        
+        # Save results
+        results_file = runner.save_results(results, args.output)
+        report = runner.generate_report(results)
+        summary = runner.comparison_summary(results)
     
-    # Save results
-    results_file = runner.save_results(results, args.output)
+    if args.store:
+        with ResultStore(args.store) as store:
+            run_id = store.add_run(results, source=results_file)
+        print(f"Results appended to {args.store} as run {run_id}")
     
-    # Generate and save report
-    report = runner.generate_report(results)
+    # Save report
     if args.report:
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(args.report) if os.path.dirname(args.report) else '.', exist_ok=True)
@@ -456,15 +1614,20 @@ def main():
     print("BENCHMARK SUMMARY")
     print("="*80)
     
-    successful_results = [r for r in results['results'] if r['success']]
-    if successful_results:
-        fastest_startup = min(successful_results, key=lambda x: x['startup']['total_startup_time'])
-        fastest_load = min(successful_results, key=lambda x: statistics.mean([r['load_time'] for r in x['page_loads'] if r['success']]))
-        
-        print(f"Fastest startup: {fastest_startup['image']} ({fastest_startup['startup']['total_startup_time']:.2f}s)")
-        print(f"Fastest page load: {fastest_load['image']} ({statistics.mean([r['load_time'] for r in fastest_load['page_loads'] if r['success']]):.2f}s)")
+    for line in summary:
+        print(line)
     
     print(f"Results saved to: {results_file}")
+    
+    if page_server:
+        page_server.stop_background()
+    if runner.cache_proxy:
+        stats = runner.cache_proxy.stats
+        runner.cache_proxy.stop_background()
+        if stats['hit_rate'] is not None:
+            print(f"Cache proxy hit rate: {stats['hit_rate'] * 100:.1f}% of {stats['requests']} requests")
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
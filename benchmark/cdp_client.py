@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio Chrome DevTools Protocol client.
+
+Talks to a target's ``webSocketDebuggerUrl`` directly, so page load timings
+come from browser events instead of HTTP polling. On a browser connection,
+targets attached with ``flatten`` are addressed by passing their
+``session_id`` to ``send``, ``on`` and ``off``.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+
+class CDPError(Exception):
+    """Raised when a CDP command fails or an expected event never arrives."""
+
+
+class CDPSession:
+    """A single CDP WebSocket connection to a browser target."""
+
+    def __init__(self, ws_url: str, timeout: float = 30):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._http = None
+        self._ws = None
+        self._reader = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._waiters: Set[asyncio.Future] = set()
+        self._listeners: Dict[Any, List[Callable[[Dict[str, Any]], None]]] = {}
+
+    async def __aenter__(self) -> 'CDPSession':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def connect(self) -> None:
+        """Open the WebSocket and start dispatching incoming messages."""
+        self._http = aiohttp.ClientSession()
+        try:
+            self._ws = await self._http.ws_connect(self.ws_url, max_msg_size=0)
+        except Exception:
+            await self._http.close()
+            raise
+        self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def close(self) -> None:
+        """Close the WebSocket and fail any commands still in flight."""
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._ws:
+            await self._ws.close()
+        if self._http:
+            await self._http.close()
+        self._fail_pending(CDPError('Connection closed'))
+
+    @property
+    def closed(self) -> bool:
+        """Whether the WebSocket is not (or no longer) open."""
+        return self._ws is None or self._ws.closed
+
+    async def wait_closed(self) -> None:
+        """Wait until the browser drops the connection (or ``close`` is called)."""
+        if self._reader:
+            try:
+                await asyncio.shield(self._reader)
+            except Exception:
+                pass
+
+    async def _read_loop(self) -> None:
+        async for msg in self._ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                if msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSE):
+                    break
+                continue
+            self._dispatch(json.loads(msg.data))
+        self._fail_pending(CDPError('Connection closed by browser'))
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        if 'id' in message:
+            future = self._pending.pop(message['id'], None)
+            if future and not future.done():
+                if 'error' in message:
+                    future.set_exception(CDPError(message['error'].get('message', str(message['error']))))
+                else:
+                    future.set_result(message.get('result', {}))
+            return
+
+        key = self._listener_key(message.get('method'), message.get('sessionId'))
+        for callback in list(self._listeners.get(key, [])):
+            callback(message.get('params', {}))
+
+    def _fail_pending(self, error: Exception) -> None:
+        # Event waiters too: a browser that dies mid-load will never fire the event
+        for future in list(self._pending.values()) + list(self._waiters):
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._waiters.clear()
+
+    async def send(self, method: str, params: Dict[str, Any] = None,
+                   timeout: float = None, session_id: str = None) -> Dict[str, Any]:
+        """Send a command (to a flattened child session if given) and wait for its result."""
+        if self._ws is None or self._ws.closed:
+            raise CDPError('Not connected')
+
+        command_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = future
+        message = {'id': command_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        await self._ws.send_str(json.dumps(message))
+
+        try:
+            return await asyncio.wait_for(future, timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(command_id, None)
+            raise CDPError(f'{method} timed out')
+
+    @staticmethod
+    def _listener_key(event: str, session_id: str = None):
+        return (session_id, event) if session_id else event
+
+    def on(self, event: str, callback: Callable[[Dict[str, Any]], None], session_id: str = None) -> None:
+        """Register a callback for a CDP event (of a flattened child session if given)."""
+        self._listeners.setdefault(self._listener_key(event, session_id), []).append(callback)
+
+    def off(self, event: str, callback: Callable[[Dict[str, Any]], None], session_id: str = None) -> None:
+        """Remove a callback registered with ``on``."""
+        key = self._listener_key(event, session_id)
+        callbacks = self._listeners.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self._listeners.pop(key, None)
+
+    def expect_event(self, event: str,
+                     predicate: Callable[[Dict[str, Any]], bool] = None) -> asyncio.Future:
+        """
+        Return a future resolved by the next matching event.
+
+        Call this *before* sending the command that triggers the event so a
+        fast browser cannot fire it before anyone is listening.
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        def listener(params):
+            if not future.done() and (predicate is None or predicate(params)):
+                future.set_result(params)
+                self.off(event, listener)
+
+        self.on(event, listener)
+        self._waiters.add(future)
+        future.add_done_callback(lambda _: self.off(event, listener))
+        future.add_done_callback(self._waiters.discard)
+        return future
+
+    async def navigate(self, url: str, timeout: float = None) -> Dict[str, Any]:
+        """
+        Navigate the target and wait for its load event.
+
+        Returns:
+            dict: ``load_time`` in seconds measured on the client from sending
+            ``Page.navigate`` to receiving ``Page.loadEventFired``, and
+            ``lifecycle`` with the main frame's lifecycle event offsets (s)
+            from navigation start on the browser clock.
+        """
+        timeout = timeout or self.timeout
+        lifecycle: List[Dict[str, Any]] = []
+        self.on('Page.lifecycleEvent', lifecycle.append)
+
+        try:
+            await self.send('Page.enable')
+            await self.send('Page.setLifecycleEventsEnabled', {'enabled': True})
+
+            load_fired = self.expect_event('Page.loadEventFired')
+            start_time = time.perf_counter()
+            result = await self.send('Page.navigate', {'url': url}, timeout=timeout)
+            if result.get('errorText'):
+                load_fired.cancel()
+                raise CDPError(f"Navigation failed: {result['errorText']}")
+
+            try:
+                await asyncio.wait_for(load_fired, timeout)
+            except asyncio.TimeoutError:
+                raise CDPError(f'Page load timed out after {timeout}s')
+            load_time = time.perf_counter() - start_time
+        finally:
+            self.off('Page.lifecycleEvent', lifecycle.append)
+
+        return {
+            'load_time': load_time,
+            'lifecycle': self._lifecycle_offsets(lifecycle, result.get('frameId'), result.get('loaderId')),
+            'frame_id': result.get('frameId')
+        }
+
+    @staticmethod
+    def _lifecycle_offsets(events: List[Dict[str, Any]], frame_id: Optional[str],
+                           loader_id: Optional[str]) -> Dict[str, float]:
+        """Convert lifecycle events into offsets (s) from the ``init`` event."""
+        frame_events = [
+            e for e in events
+            if (frame_id is None or e.get('frameId') == frame_id)
+            and (loader_id is None or e.get('loaderId') == loader_id)
+        ]
+        start = next((e['timestamp'] for e in frame_events if e.get('name') == 'init'), None)
+        if start is None and frame_events:
+            start = frame_events[0]['timestamp']
+
+        offsets = {}
+        for event in frame_events:
+            offsets.setdefault(event['name'], event['timestamp'] - start)
+        return offsets
+
+    async def get_metrics(self) -> Dict[str, float]:
+        """Return ``Performance.getMetrics`` as a flat name -> value dict."""
+        await self.send('Performance.enable')
+        result = await self.send('Performance.getMetrics')
+        return {m['name']: m['value'] for m in result.get('metrics', [])}
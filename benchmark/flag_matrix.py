@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Browser flag-set matrix for the benchmark.
+
+A flag matrix maps a flag-set name to the flags added on top of the image's
+default command line (``DEFAULT_BROWSER_FLAGS``, the Dockerfile ``CMD``).
+The benchmark runs every Thorium image once per flag set by overriding the
+container command, and ``flag_deltas`` reports each set's latency, memory and
+CPU change against the first (baseline) set.
+"""
+
+import json
+import statistics
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from stats import significantly_lower
+
+WRAPPED_THORIUM = '/usr/bin/wrapped-thorium'
+
+# Browser flags of the Dockerfile CMD (without the debugging port)
+DEFAULT_BROWSER_FLAGS = ['--headless', '--disable-gpu', '--disable-dev-shm-usage',
+                         '--disable-web-security', '--disable-features=VizDisplayCompositor']
+
+# The extra flags of the thorium-test compose service, one at a time and together
+DEFAULT_FLAG_MATRIX = OrderedDict([
+    ('baseline', []),
+    ('no-timer-throttling', ['--disable-background-timer-throttling']),
+    ('no-occluded-backgrounding', ['--disable-backgrounding-occluded-windows']),
+    ('no-renderer-backgrounding', ['--disable-renderer-backgrounding']),
+    ('no-translate', ['--disable-features=TranslateUI']),
+    ('no-ipc-flooding-protection', ['--disable-ipc-flooding-protection']),
+    ('thorium-test', ['--disable-background-timer-throttling', '--disable-backgrounding-occluded-windows',
+                      '--disable-renderer-backgrounding', '--disable-features=TranslateUI',
+                      '--disable-ipc-flooding-protection']),
+])
+
+# Switches Chromium reads as one comma-separated list; a repeated switch
+# replaces the earlier value instead of adding to it
+LIST_SWITCHES = ('--enable-features', '--disable-features', '--enable-blink-features',
+                 '--disable-blink-features')
+
+
+def merge_flags(base: List[str], extra: List[str]) -> List[str]:
+    """
+    Append ``extra`` to ``base``, merging list switches like ``--disable-features``.
+
+    ``--disable-features=A`` followed by ``--disable-features=B`` would only
+    disable B, so their values are combined into one switch. Other flags that
+    are already present are not repeated.
+    """
+    merged = list(base)
+    for flag in extra:
+        switch, sep, value = flag.partition('=')
+        if switch in LIST_SWITCHES and sep:
+            index = next((i for i, f in enumerate(merged) if f.partition('=')[0] == switch), None)
+            if index is not None:
+                values = merged[index].partition('=')[2].split(',')
+                values += [v for v in value.split(',') if v not in values]
+                merged[index] = f"{switch}={','.join(values)}"
+                continue
+        if flag not in merged:
+            merged.append(flag)
+    return merged
+
+
+def browser_command(flags: List[str]) -> List[str]:
+    """Container command running wrapped-thorium with the default flags plus ``flags``."""
+    return [WRAPPED_THORIUM] + merge_flags(DEFAULT_BROWSER_FLAGS, flags) + ['--remote-debugging-port=9222']
+
+
+def load_flag_matrix(path: str = None) -> Dict[str, List[str]]:
+    """
+    Load a flag matrix from a JSON object of ``{"name": ["--flag", ...]}``.
+
+    Without a path the built-in DEFAULT_FLAG_MATRIX is returned. The first
+    entry is the baseline the other sets are compared with.
+    """
+    if not path:
+        return OrderedDict(DEFAULT_FLAG_MATRIX)
+    with open(path) as f:
+        matrix = json.load(f, object_pairs_hook=OrderedDict)
+    if not isinstance(matrix, dict) or not matrix:
+        raise ValueError(f"{path}: expected a non-empty JSON object of flag lists")
+    for name, flags in matrix.items():
+        if not isinstance(flags, list) or not all(isinstance(flag, str) and flag.startswith('--')
+                                                  for flag in flags):
+            raise ValueError(f"{path}: flag set '{name}' must be a list of --flags")
+    return matrix
+
+
+def _warm_load_times(result: Dict[str, Any]) -> List[float]:
+    return [r['load_time'] for r in result['page_loads'] if r['success'] and not r['cold']]
+
+
+def _delta(candidate, baseline):
+    if candidate is None or baseline is None:
+        return None
+    return candidate - baseline
+
+
+def flag_deltas(results: List[Dict[str, Any]], baseline_set: str = None) -> List[Dict[str, Any]]:
+    """
+    Compare every flag set with the baseline run of the same image.
+
+    The baseline is ``baseline_set`` (by default the first flag set seen) in
+    each (image, shards, seed_profile) group. When that run failed the group
+    has no baseline: its runs are listed with ``baseline`` None and no deltas
+    rather than compared with another flag set. Latency changes are only
+    marked significant when the bootstrap CI of the difference in warm load
+    times excludes zero.
+
+    Returns:
+        list: One entry per successful non-baseline flag-set run
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = OrderedDict()
+    for result in results:
+        if result.get('flag_set') is not None:
+            key = (result['image'], result.get('shards'), result.get('seed_profile'))
+            groups.setdefault(key, []).append(result)
+
+    deltas = []
+    for runs in groups.values():
+        name = baseline_set if baseline_set is not None else runs[0]['flag_set']
+        baseline = next((run for run in runs if run['flag_set'] == name and run.get('success')), None)
+        baseline_times = _warm_load_times(baseline) if baseline else []
+        baseline_resources = (baseline.get('resources') or {}) if baseline else {}
+        for run in runs:
+            if run['flag_set'] == name or not run.get('success'):
+                continue
+            times = _warm_load_times(run)
+            resources = run.get('resources') or {}
+            if baseline is None:
+                verdict = 'no baseline'
+            elif significantly_lower(times, baseline_times):
+                verdict = 'faster'
+            elif significantly_lower(baseline_times, times):
+                verdict = 'slower'
+            else:
+                verdict = 'no change'
+            deltas.append({
+                'image': run['image'],
+                'shards': run.get('shards'),
+                'seed_profile': run.get('seed_profile'),
+                'flag_set': run['flag_set'],
+                'baseline': baseline['flag_set'] if baseline else None,
+                'flags': run.get('flags'),
+                'warm_load_mean': statistics.mean(times) if times else None,
+                'warm_load_delta': (statistics.mean(times) - statistics.mean(baseline_times)
+                                    if times and baseline_times else None),
+                'latency': verdict,
+                'startup_delta': _delta(run['startup']['total_startup_time'],
+                                        baseline['startup']['total_startup_time'] if baseline else None),
+                'peak_memory_delta': _delta(resources.get('peak_memory_bytes'),
+                                            baseline_resources.get('peak_memory_bytes')),
+                'cpu_per_page_delta': _delta(resources.get('cpu_seconds_per_page'),
+                                             baseline_resources.get('cpu_seconds_per_page'))
+            })
+    return deltas
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Image size, pull and cold-start budget.
+
+Every image is pushed to a local registry (a ``registry:2`` container that is
+started when nothing answers at the registry address) and measured as a fresh
+autoscaling node would see it:
+
+- compressed size: the layer sizes of the pushed manifest, i.e. what a node downloads
+- download time: every layer blob fetched from the registry over HTTP, three
+  at a time like the Docker daemon; unaffected by layers already on the host
+- pull time: ``docker pull`` after removing every tag of the image, so it
+  includes extraction. Layers that another local image still holds are not
+  pulled again; how many were reused is reported next to the time. A pull
+  is not timed when the image could not be removed, and a pull that found
+  every layer already present counts as failed.
+- cold start: fresh containers timed to "DevTools listening" and to the first
+  ``/json/new`` target with the StartupProfiler
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from startup_profiler import StartupProfiler
+from stats import summarize
+
+REGISTRY = 'localhost:5000'
+REGISTRY_IMAGE = 'registry:2'
+REGISTRY_CONTAINER = 'benchmark-budget-registry'
+
+MANIFEST_TYPES = ', '.join([
+    'application/vnd.docker.distribution.manifest.v2+json',
+    'application/vnd.oci.image.manifest.v1+json',
+    'application/vnd.docker.distribution.manifest.list.v2+json',
+    'application/vnd.oci.image.index.v1+json',
+])
+INDEX_TYPES = ('application/vnd.docker.distribution.manifest.list.v2+json',
+               'application/vnd.oci.image.index.v1+json')
+
+# dockerd's default max-concurrent-downloads
+DOWNLOAD_CONCURRENCY = 3
+DOWNLOAD_CHUNK = 1024 * 1024
+
+
+def registry_reference(registry: str, image: str) -> str:
+    """Name of ``image`` in the budget registry, e.g. ``localhost:5000/budget/thorium-docker:avx2``."""
+    repository, sep, tag = image.rpartition(':')
+    if not sep or '/' in tag:
+        repository, tag = image, 'latest'
+    return f"{registry}/budget/{repository.rsplit('/', 1)[-1]}:{tag}"
+
+
+def parse_pull_output(output: str) -> Dict[str, int]:
+    """Count layers ``docker pull`` downloaded and layers it found already present."""
+    pulled = reused = 0
+    for line in output.splitlines():
+        if line.rstrip().endswith('Pull complete'):
+            pulled += 1
+        elif line.rstrip().endswith('Already exists'):
+            reused += 1
+    return {'layers_pulled': pulled, 'layers_reused': reused}
+
+
+class ImageBudget:
+    """Size, pull and cold-start measurements of images, driven through a BenchmarkRunner."""
+
+    def __init__(self, runner, registry: str = REGISTRY, pulls: int = 3, starts: int = 3):
+        """
+        Args:
+            runner: BenchmarkRunner used for docker commands and readiness checks
+            registry (str): host:port of the registry to push to and pull from
+            pulls (int): Timed downloads and pulls per image
+            starts (int): Cold starts per image
+        """
+        self.runner = runner
+        self.registry = registry
+        self.pulls = pulls
+        self.starts = starts
+        self.started_registry = False
+
+    @property
+    def registry_url(self) -> str:
+        return f'http://{self.registry}'
+
+    def registry_ready(self) -> bool:
+        try:
+            return requests.get(f'{self.registry_url}/v2/', timeout=2).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def ensure_registry(self, max_wait: float = 30) -> bool:
+        """Start a local registry unless one already answers; True once it is ready."""
+        if self.registry_ready():
+            return True
+        port = self.registry.rpartition(':')[2] or '5000'
+        print(f"Starting local registry on port {port}")
+        self.runner.run_command(['docker', 'rm', '-f', REGISTRY_CONTAINER], timeout=10)
+        result = self.runner.run_command(['docker', 'run', '-d', '--name', REGISTRY_CONTAINER,
+                                          '-p', f'{port}:5000', REGISTRY_IMAGE], timeout=300)
+        if not result['success']:
+            print(f"Could not start registry: {result['stderr']}")
+            return False
+        self.started_registry = True
+        deadline = time.time() + max_wait
+        while time.time() < deadline:
+            if self.registry_ready():
+                return True
+            time.sleep(0.2)
+        return False
+
+    def stop_registry(self) -> None:
+        if self.started_registry:
+            self.runner.run_command(['docker', 'rm', '-f', '-v', REGISTRY_CONTAINER], timeout=30)
+            self.started_registry = False
+
+    def image_tags(self, image: str) -> List[str]:
+        """Every tag pointing at the same image as ``image``."""
+        result = self.runner.run_command(['docker', 'image', 'inspect', '--format', '{{json .RepoTags}}', image],
+                                         timeout=10)
+        if not result['success']:
+            return []
+        return json.loads(result['stdout'] or '[]') or []
+
+    def image_id(self, image: str) -> Optional[str]:
+        """Local image ID of ``image``."""
+        result = self.runner.run_command(['docker', 'image', 'inspect', '--format', '{{.Id}}', image], timeout=10)
+        return result['stdout'].strip() if result['success'] and result['stdout'].strip() else None
+
+    def restore_tags(self, image: str, tags: List[str]) -> bool:
+        """Point ``tags`` at ``image`` (a reference or image ID); False if any could not be tagged."""
+        restored = True
+        for tag in tags:
+            restored = self.runner.run_command(['docker', 'tag', image, tag], timeout=10)['success'] and restored
+        return restored
+
+    def image_size(self, image: str) -> Optional[int]:
+        """Uncompressed image size in bytes."""
+        result = self.runner.run_command(['docker', 'image', 'inspect', '--format', '{{.Size}}', image],
+                                         timeout=10)
+        return int(result['stdout'].strip()) if result['success'] and result['stdout'].strip() else None
+
+    def push(self, image: str) -> Optional[str]:
+        """Push ``image`` to the budget registry and return its reference there."""
+        reference = registry_reference(self.registry, image)
+        tag = self.runner.run_command(['docker', 'tag', image, reference], timeout=10)
+        if not tag['success']:
+            print(f"Could not tag {image}: {tag['stderr']}")
+            return None
+        push = self.runner.run_command(['docker', 'push', reference], timeout=1800)
+        if not push['success']:
+            print(f"Could not push {reference}: {push['stderr']}")
+            return None
+        return reference
+
+    def manifest(self, reference: str) -> Dict[str, Any]:
+        """Image manifest from the registry; an index resolves to its linux/amd64 entry."""
+        name, _, tag = reference[len(self.registry) + 1:].rpartition(':')
+        headers = {'Accept': MANIFEST_TYPES}
+        response = requests.get(f'{self.registry_url}/v2/{name}/manifests/{tag}', headers=headers, timeout=30)
+        response.raise_for_status()
+        manifest = response.json()
+        if manifest.get('mediaType') in INDEX_TYPES:
+            entry = next((m for m in manifest['manifests']
+                          if m.get('platform', {}).get('architecture') == 'amd64'), manifest['manifests'][0])
+            response = requests.get(f"{self.registry_url}/v2/{name}/manifests/{entry['digest']}",
+                                    headers=headers, timeout=30)
+            response.raise_for_status()
+            manifest = response.json()
+        manifest['name'] = name
+        return manifest
+
+    def download_time(self, manifest: Dict[str, Any]) -> float:
+        """Seconds to fetch every layer blob of ``manifest``, DOWNLOAD_CONCURRENCY at a time."""
+        def fetch(layer):
+            url = f"{self.registry_url}/v2/{manifest['name']}/blobs/{layer['digest']}"
+            with requests.get(url, stream=True, timeout=300) as response:
+                response.raise_for_status()
+                for _ in response.iter_content(DOWNLOAD_CHUNK):
+                    pass
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as executor:
+            list(executor.map(fetch, manifest['layers']))
+        return time.perf_counter() - started
+
+    def pull_once(self, reference: str) -> Dict[str, Any]:
+        """
+        Remove every tag of the image, ``docker pull`` it back and restore the tags.
+
+        When the image cannot be removed (typically a container still uses it)
+        nothing is pulled and the tags are put back on the image ID saved
+        beforehand; a pull would only find every layer already present.
+        """
+        image_id = self.image_id(reference)
+        if image_id is None:
+            return {'success': False, 'error': f'{reference} is not present locally'}
+        tags = [tag for tag in self.image_tags(reference) if tag != reference]
+        rmi = self.runner.run_command(['docker', 'rmi', reference] + tags, timeout=60)
+        if not rmi['success']:
+            self.restore_tags(image_id, [reference] + tags)
+            return {'success': False, 'error': f"Could not remove {reference}: {rmi['stderr'].strip()}"}
+
+        pull = self.runner.run_command(['docker', 'pull', reference], timeout=1800)
+        if not pull['success']:
+            if not self.restore_tags(image_id, [reference] + tags):
+                print(f"Pull of {reference} failed; pull it again from the registry and retag it "
+                      f"to restore {', '.join(tags)}")
+            return {'success': False, 'error': pull['stderr']}
+        self.restore_tags(reference, tags)
+        layers = parse_pull_output(pull['stdout'])
+        if not layers['layers_pulled']:
+            return dict(layers, success=False, error='Every layer was already present; nothing was pulled')
+        return dict(layers, success=True, pull_time=pull['execution_time'])
+
+    def measure(self, image: str, name: str, port: int) -> Dict[str, Any]:
+        """Size, download, pull and cold-start budget of one image."""
+        print(f"\n=== Measuring image budget of {image} ===")
+        uncompressed = self.image_size(image)
+        reference = self.push(image)
+        if reference is None:
+            return {'image': image, 'success': False, 'error': 'push to the local registry failed'}
+        manifest = self.manifest(reference)
+        layers = manifest['layers']
+
+        downloads = [self.download_time(manifest) for _ in range(self.pulls)]
+        pulls = [self.pull_once(reference) for _ in range(self.pulls)]
+        successful_pulls = [p for p in pulls if p['success']]
+
+        profile = StartupProfiler(self.runner, self.starts).profile(image, name, port)
+        cold_starts = [run for run in profile['runs'] if run['success']]
+        devtools = [run['milestones']['devtools_listening'] for run in cold_starts
+                    if 'devtools_listening' in run['milestones']]
+
+        return {
+            'image': image,
+            'thorium_version': profile['thorium_version'],
+            'instruction_set': profile['instruction_set'],
+            'success': bool(successful_pulls) and profile['success'],
+            'reference': reference,
+            'layers': len(layers),
+            'compressed_bytes': sum(layer['size'] for layer in layers),
+            'uncompressed_bytes': uncompressed,
+            'downloads': downloads,
+            'download_time': summarize(downloads),
+            'pulls': pulls,
+            'pull_time': summarize([p['pull_time'] for p in successful_pulls]),
+            'layers_reused': max((p['layers_reused'] for p in successful_pulls), default=0),
+            'devtools_times': devtools,
+            'devtools_time': summarize(devtools),
+            'first_target_time': profile['total'],
+            'cold_starts': profile['runs']
+        }
+
+
+def budget_deltas(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Compare every measured image with the first (baseline) one.
+
+    Returns:
+        list: size ratio and median pull / DevTools time differences per non-baseline image
+    """
+    measured = [r for r in results if r.get('success')]
+    if len(measured) < 2:
+        return []
+    baseline = measured[0]
+
+    def median_delta(result, key):
+        if not result[key]['n'] or not baseline[key]['n']:
+            return None
+        return result[key]['median'] - baseline[key]['median']
+
+    return [{
+        'image': result['image'],
+        'baseline': baseline['image'],
+        'compressed_ratio': result['compressed_bytes'] / baseline['compressed_bytes'],
+        'download_delta': median_delta(result, 'download_time'),
+        'pull_delta': median_delta(result, 'pull_time'),
+        'devtools_delta': median_delta(result, 'devtools_time'),
+        'first_target_delta': median_delta(result, 'first_target_time')
+    } for result in measured[1:]]
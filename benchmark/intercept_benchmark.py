@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Load-time and transfer savings of request interception policies.
+
+Every URL is loaded once per policy and iteration (policies interleaved, so
+drift affects them alike) in a fresh target with the HTTP cache disabled, so
+each load transfers the full page weight its policy lets through. Bytes are
+the ``encodedDataLength`` of every ``Network.loadingFinished`` up to the load
+event. ``policy_savings`` compares each policy with the first (baseline) one.
+"""
+
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from cdp_client import CDPError, CDPSession
+from request_policy import RequestInterceptor, RequestPolicy
+from stats import significantly_lower, summarize
+
+
+class TransferCounter:
+    """Counts finished and failed requests and their encoded bytes on a session."""
+
+    def __init__(self, session: CDPSession):
+        self.session = session
+        self.bytes = 0
+        self.finished = 0
+        self.failed = 0
+        self.blocked = 0
+        session.on('Network.loadingFinished', self._finished)
+        session.on('Network.loadingFailed', self._failed)
+
+    def _finished(self, params: Dict[str, Any]) -> None:
+        self.finished += 1
+        self.bytes += int(params.get('encodedDataLength') or 0)
+
+    def _failed(self, params: Dict[str, Any]) -> None:
+        self.failed += 1
+        if params.get('blockedReason') or 'BLOCKED_BY_CLIENT' in params.get('errorText', ''):
+            self.blocked += 1
+
+    def close(self) -> None:
+        self.session.off('Network.loadingFinished', self._finished)
+        self.session.off('Network.loadingFailed', self._failed)
+
+
+async def policy_page_load(session: CDPSession, url: str, policy: RequestPolicy) -> Dict[str, Any]:
+    """Load ``url`` with ``policy`` applied; return load time, bytes and interception stats."""
+    await session.send('Network.enable')
+    await session.send('Network.setCacheDisabled', {'cacheDisabled': True})
+    counter = TransferCounter(session)
+    interceptor = RequestInterceptor(session, policy)
+    try:
+        await interceptor.enable()
+        try:
+            navigation = await session.navigate(url)
+        finally:
+            await interceptor.disable()
+    finally:
+        counter.close()
+    return {
+        'load_time': navigation['load_time'],
+        'bytes': counter.bytes,
+        'requests': counter.finished,
+        'failed_requests': counter.failed,
+        'interception': interceptor.to_dict()
+    }
+
+
+class InterceptBenchmark:
+    """Runs every URL under every policy on one browser endpoint."""
+
+    def __init__(self, host: str, port: int, urls: List[str], policies: Dict[str, RequestPolicy],
+                 iterations: int = 3, timeout: float = 30):
+        """
+        Args:
+            host (str): DevTools host
+            port (int): DevTools port
+            urls (list): Pages to load
+            policies (dict): name -> RequestPolicy; the first is the baseline
+            iterations (int): Loads per URL and policy
+            timeout (float): Per-load timeout in seconds
+        """
+        self.base_url = f'http://{host}:{port}'
+        self.ws_base = f'ws://{host}:{port}'
+        self.urls = urls
+        self.policies = policies
+        self.iterations = iterations
+        self.timeout = timeout
+
+    async def run(self) -> Dict[str, Any]:
+        loads = []
+        async with aiohttp.ClientSession() as http:
+            for iteration in range(self.iterations):
+                for url in self.urls:
+                    for name, policy in self.policies.items():
+                        load = await self.load(http, url, policy)
+                        load.update(url=url, policy=name, iteration=iteration)
+                        loads.append(load)
+        return {
+            'success': True,
+            'iterations': self.iterations,
+            'policies': list(self.policies),
+            'loads': loads,
+            'savings': policy_savings(loads, list(self.policies))
+        }
+
+    async def load(self, http: aiohttp.ClientSession, url: str, policy: RequestPolicy) -> Dict[str, Any]:
+        """One load of ``url`` under ``policy`` in its own target."""
+        async with http.put(f'{self.base_url}/json/new') as response:
+            response.raise_for_status()
+            target_id = (await response.json())['id']
+        try:
+            async with CDPSession(f'{self.ws_base}/devtools/page/{target_id}', timeout=self.timeout) as session:
+                result = await policy_page_load(session, url, policy)
+            result['success'] = True
+        except CDPError as e:
+            result = {'success': False, 'error': str(e)}
+        finally:
+            async with http.get(f'{self.base_url}/json/close/{target_id}') as response:
+                await response.read()
+        return result
+
+
+def policy_savings(loads: List[Dict[str, Any]], policies: List[str]) -> List[Dict[str, Any]]:
+    """
+    Summarize each policy and its savings against the first one.
+
+    Savings are relative differences of the medians (positive: the policy is
+    faster / transfers less). A load-time saving is only marked significant
+    when the bootstrap CI of the mean difference excludes zero.
+
+    Returns:
+        list: One entry per policy, baseline first
+    """
+    by_policy = {name: [load for load in loads if load['policy'] == name and load['success']] for name in policies}
+    baseline_loads = by_policy[policies[0]] if policies else []
+    baseline_times = [load['load_time'] for load in baseline_loads]
+    baseline_bytes = [load['bytes'] for load in baseline_loads]
+
+    def saving(values, baseline):
+        if not values or not baseline or not statistics.median(baseline):
+            return None
+        return 1 - statistics.median(values) / statistics.median(baseline)
+
+    summary = []
+    for name in policies:
+        successful = by_policy[name]
+        times = [load['load_time'] for load in successful]
+        sizes = [load['bytes'] for load in successful]
+        stats = [load['interception'] for load in successful]
+        paused = sum(s['paused'] for s in stats)
+        summary.append({
+            'policy': name,
+            'loads': len(successful),
+            'failed_loads': len([load for load in loads if load['policy'] == name and not load['success']]),
+            'load_time': summarize(times),
+            'bytes': summarize(sizes),
+            'requests': summarize([load['requests'] for load in successful]),
+            'blocked': sum(s['blocked'] for s in stats),
+            'stubbed': sum(s['stubbed'] for s in stats),
+            'paused': paused,
+            'decision_us': sum(s['decision_seconds'] for s in stats) / paused * 1e6 if paused else None,
+            'load_time_saving': saving(times, baseline_times),
+            'bytes_saving': saving(sizes, baseline_bytes),
+            'significant': name != policies[0] and significantly_lower(times, baseline_times)
+        })
+    return summary
+
+
+def run_intercept_benchmark(host: str, port: int, urls: List[str], policies: Dict[str, RequestPolicy],
+                            **kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around ``InterceptBenchmark.run``."""
+    started = time.perf_counter()
+    try:
+        result = asyncio.run(InterceptBenchmark(host, port, urls, policies, **kwargs).run())
+    except (CDPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return {'success': False, 'error': str(e) or type(e).__name__}
+    result['elapsed'] = time.perf_counter() - started
+    return result
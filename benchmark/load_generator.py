@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Concurrent multi-tab load generator.
+
+Opens N targets through ``/json/new`` and keeps them busy navigating the test
+URLs, either as fast as possible (closed loop) or at a fixed aggregate rate
+(open loop), so throughput and tail latency can be measured as concurrency
+ramps up.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from cdp_client import CDPError, CDPSession
+from stats import latency_summary
+
+# Error messages kept per level; the rest are only counted
+ERROR_SAMPLES = 5
+# First and longest pause of a closed-loop tab after a failed navigation (s)
+ERROR_BACKOFF = 0.05
+MAX_ERROR_BACKOFF = 2.0
+
+
+def concurrency_levels(max_concurrency: int) -> List[int]:
+    """Return the ramp 1, 2, 4, ... up to and including ``max_concurrency``."""
+    levels = []
+    level = 1
+    while level < max_concurrency:
+        levels.append(level)
+        level *= 2
+    levels.append(max_concurrency)
+    return levels
+
+
+class LoadGenerator:
+    """Drives one browser endpoint with many concurrent tabs."""
+
+    def __init__(self, host: str, port: int, urls: List[str], timeout: float = 30):
+        self.base_url = f'http://{host}:{port}'
+        self.ws_base = f'ws://{host}:{port}'
+        self.urls = urls
+        self.timeout = timeout
+
+    async def _open_targets(self, http: aiohttp.ClientSession, count: int) -> List[str]:
+        async def open_one():
+            async with http.put(f'{self.base_url}/json/new') as response:
+                response.raise_for_status()
+                return (await response.json())['id']
+
+        return list(await asyncio.gather(*(open_one() for _ in range(count))))
+
+    async def _close_targets(self, http: aiohttp.ClientSession, target_ids: List[str]) -> None:
+        async def close_one(target_id):
+            try:
+                async with http.get(f'{self.base_url}/json/close/{target_id}') as response:
+                    await response.read()
+            except aiohttp.ClientError:
+                pass
+
+        await asyncio.gather(*(close_one(t) for t in target_ids))
+
+    async def run_level(self, concurrency: int, duration: float,
+                        rate: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run one load level.
+
+        Args:
+            concurrency (int): Number of tabs navigating in parallel
+            duration (float): Seconds to keep issuing new navigations
+            rate (float): Aggregate pages/s to schedule; ``None`` runs closed loop
+
+        Returns:
+            dict: Throughput, latency percentiles and error count for the level
+        """
+        latencies: List[float] = []
+        errors = {'count': 0, 'samples': []}
+        url_cycle = itertools.cycle(self.urls)
+        slots = itertools.count()
+
+        async with aiohttp.ClientSession() as http:
+            target_ids = await self._open_targets(http, concurrency)
+            start = time.perf_counter()
+            deadline = start + duration
+
+            def error(e):
+                errors['count'] += 1
+                if len(errors['samples']) < ERROR_SAMPLES:
+                    errors['samples'].append(str(e))
+
+            async def worker(target_id):
+                backoff = ERROR_BACKOFF
+                async with CDPSession(f'{self.ws_base}/devtools/page/{target_id}',
+                                      timeout=self.timeout) as session:
+                    while True:
+                        if rate:
+                            # Open loop: latency counts from the scheduled slot so a
+                            # saturated browser cannot hide queueing delay.
+                            scheduled = start + next(slots) / rate
+                            if scheduled >= deadline:
+                                return
+                            delay = scheduled - time.perf_counter()
+                            if delay > 0:
+                                await asyncio.sleep(delay)
+                        else:
+                            scheduled = time.perf_counter()
+                            if scheduled >= deadline:
+                                return
+
+                        try:
+                            await session.navigate(next(url_cycle))
+                            latencies.append(time.perf_counter() - scheduled)
+                            backoff = ERROR_BACKOFF
+                        except CDPError as e:
+                            error(e)
+                            if not rate:
+                                # A failing tab (e.g. a dead connection) would otherwise spin
+                                await asyncio.sleep(max(0, min(backoff, deadline - time.perf_counter())))
+                                backoff = min(backoff * 2, MAX_ERROR_BACKOFF)
+
+            try:
+                results = await asyncio.gather(*(worker(t) for t in target_ids),
+                                               return_exceptions=True)
+                for result in results:
+                    if isinstance(result, Exception):
+                        error(result)
+            finally:
+                elapsed = time.perf_counter() - start
+                await self._close_targets(http, target_ids)
+
+        return {
+            'concurrency': concurrency,
+            'target_rate': rate,
+            'duration': elapsed,
+            'pages': len(latencies),
+            'errors': errors['count'],
+            'error_samples': errors['samples'],
+            'throughput': len(latencies) / elapsed if elapsed > 0 else 0,
+            'latency': latency_summary(latencies)
+        }
+
+    async def ramp(self, max_concurrency: int, duration: float,
+                   rate: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run ``run_level`` for each step of ``concurrency_levels``."""
+        levels = []
+        for concurrency in concurrency_levels(max_concurrency):
+            print(f"Concurrency {concurrency}: running for {duration:.0f}s")
+            level = await self.run_level(concurrency, duration, rate)
+            print(f"  {level['throughput']:.2f} pages/s, p95 {level['latency']['p95']:.3f}s, "
+                  f"{level['errors']} errors")
+            levels.append(level)
+        return levels
+
+
+def find_knee(levels: List[Dict[str, Any]], min_gain: float = 0.1) -> Optional[int]:
+    """
+    Return the concurrency after which throughput stops scaling.
+
+    The knee is the last level whose successor improves throughput by less
+    than ``min_gain`` (10% by default) while making p95 latency worse.
+    """
+    for current, following in zip(levels, levels[1:]):
+        if current['throughput'] <= 0:
+            continue
+        gain = following['throughput'] / current['throughput'] - 1
+        if gain < min_gain and following['latency']['p95'] > current['latency']['p95']:
+            return current['concurrency']
+    return levels[-1]['concurrency'] if levels else None
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Hermetic local page corpus server.
+
+Serves a fixed, generated set of pages so benchmarks and tests measure the
+browser rather than internet jitter, and work on air-gapped runners:
+
+- ``/static.html``   plain article with CSS
+- ``/spa.html``      JS-heavy single page app that builds and sorts a large DOM
+- ``/cjk.html``      Chinese, Japanese and Korean text (exercises fonts-noto-cjk)
+- ``/images.html``   page with several large PNG images (``/img/<n>.png``)
+- ``/animation.html`` canvas redrawn every animation frame, for screencast capture
+- ``/html``, ``/encoding/utf8``, ``/delay/<s>``  httpbin-compatible pages
+
+Every response can be slowed down with ``?latency=<ms>`` and
+``?bandwidth=<KiB/s>``; ``--latency`` and ``--bandwidth`` set server-wide
+defaults. Values that are not non-negative numbers get a 400.
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+CORPUS_PAGES = ['static.html', 'spa.html', 'cjk.html', 'images.html']
+
+IMAGE_COUNT = 4
+IMAGE_SIZE = 1024
+
+_STATIC_PARAGRAPH = (
+    "Thorium is a Chromium fork tuned for speed. This paragraph is repeated to give the "
+    "layout engine a realistic amount of text to shape, wrap and paint. "
+)
+
+_MOBY_DICK = (
+    "Availing himself of the mild, summer-cool weather that now reigned in these latitudes, "
+    "and in preparation for the peculiarly active pursuits shortly to be anticipated, Perth, "
+    "the begrimed, blistered old blacksmith, had not removed his portable forge to the hold "
+    "again, after concluding his contributory work for Ahab's leg, but still retained it on "
+    "deck, fast lashed to ringbolts by the foremast."
+)
+
+_CJK_LINES = [
+    "你好，世界！这是一段用于测试中文字体渲染的文本。",
+    "繁體中文：瀏覽器需要正確顯示這些字元。",
+    "こんにちは、世界。日本語のテキストを表示するテストです。",
+    "カタカナとひらがなと漢字が混在しています。",
+    "안녕하세요, 세계! 한국어 글꼴 렌더링 테스트입니다.",
+]
+
+_SPA_SCRIPT = """
+(function () {
+  var root = document.getElementById('app');
+  var rows = [];
+  for (var i = 0; i < 5000; i++) {
+    rows.push({id: i, name: 'item-' + ((i * 7919) % 5000), value: Math.sin(i) * 1000});
+  }
+  rows.sort(function (a, b) { return a.value - b.value; });
+  var hash = 0;
+  for (var round = 0; round < 200; round++) {
+    for (var j = 0; j < rows.length; j++) {
+      hash = (hash * 31 + rows[j].id + round) | 0;
+    }
+  }
+  var table = document.createElement('table');
+  rows.forEach(function (row) {
+    var tr = document.createElement('tr');
+    tr.innerHTML = '<td>' + row.id + '</td><td>' + row.name + '</td><td>' + row.value.toFixed(3) + '</td>';
+    table.appendChild(tr);
+  });
+  root.appendChild(table);
+  document.title = 'SPA ready ' + hash;
+})();
+"""
+
+
+_ANIMATION_SCRIPT = """
+(function () {
+  var canvas = document.getElementById('stage');
+  var ctx = canvas.getContext('2d');
+  function resize() { canvas.width = innerWidth; canvas.height = innerHeight; }
+  resize();
+  addEventListener('resize', resize);
+  function draw(t) {
+    var w = canvas.width, h = canvas.height;
+    ctx.fillStyle = 'hsl(' + (t / 20 % 360) + ', 60%, 85%)';
+    ctx.fillRect(0, 0, w, h);
+    for (var i = 0; i < 40; i++) {
+      var x = (Math.sin(t / 700 + i) * 0.45 + 0.5) * w;
+      var y = (Math.cos(t / 500 + i * 1.3) * 0.45 + 0.5) * h;
+      ctx.fillStyle = 'hsl(' + ((i * 9 + t / 10) % 360) + ', 70%, 45%)';
+      ctx.beginPath();
+      ctx.arc(x, y, 20 + i, 0, 2 * Math.PI);
+      ctx.fill();
+    }
+    ctx.fillStyle = '#000';
+    ctx.font = '24px sans-serif';
+    ctx.fillText('frame ' + Math.floor(t), 20, 40);
+    requestAnimationFrame(draw);
+  }
+  requestAnimationFrame(draw);
+})();
+"""
+
+
+def _page(title: str, body: str, head: str = '') -> str:
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{title}</title>\n{head}</head>\n<body>\n{body}\n</body>\n</html>\n"
+    )
+
+
+def _png(width: int, height: int, seed: int) -> bytes:
+    """Deterministic noisy RGB PNG that barely compresses, like a photo."""
+    rng = random.Random(seed)
+    raw = bytearray()
+    for _ in range(height):
+        raw.append(0)
+        raw.extend(rng.randbytes(width * 3))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(bytes(raw), 6)) + chunk(b'IEND', b''))
+
+
+def _non_negative(value: str, name: str) -> float:
+    """Parse a request parameter, answering 400 Bad Request when it is not a non-negative number."""
+    try:
+        number = float(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f'{name} must be a number, got {value!r}')
+    if not math.isfinite(number) or number < 0:
+        raise web.HTTPBadRequest(text=f'{name} must be a non-negative number, got {value!r}')
+    return number
+
+
+def build_corpus(image_size: int = IMAGE_SIZE) -> Dict[str, tuple]:
+    """Return path -> (content type, body bytes) for every corpus resource."""
+    css = "body { font-family: sans-serif; max-width: 60em; margin: auto; } p { line-height: 1.5; }"
+    corpus = {
+        'style.css': ('text/css', css.encode()),
+        'spa.js': ('application/javascript', _SPA_SCRIPT.encode()),
+        'static.html': ('text/html', _page(
+            'Static page',
+            '<h1>Static page</h1>\n' + '\n'.join(f'<p>{_STATIC_PARAGRAPH * 8}</p>' for _ in range(40)),
+            '<link rel="stylesheet" href="/style.css">\n'
+        ).encode()),
+        'spa.html': ('text/html', _page(
+            'SPA loading',
+            '<div id="app"></div>\n<script src="/spa.js"></script>'
+        ).encode()),
+        'cjk.html': ('text/html', _page(
+            'CJK text',
+            '\n'.join(f'<p lang="{lang}">{line * 20}</p>'
+                      for lang, line in zip(['zh-CN', 'zh-TW', 'ja', 'ja', 'ko'], _CJK_LINES) for _ in range(10))
+        ).encode()),
+        'images.html': ('text/html', _page(
+            'Large images',
+            '\n'.join(f'<img src="/img/{n}.png" width="{image_size}" height="{image_size}">'
+                      for n in range(IMAGE_COUNT))
+        ).encode()),
+        'animation.html': ('text/html', _page(
+            'Animation',
+            '<canvas id="stage"></canvas>\n<script>' + _ANIMATION_SCRIPT + '</script>',
+            '<style>body { margin: 0; overflow: hidden; }</style>\n'
+        ).encode()),
+        'html': ('text/html', _page(
+            'Herman Melville - Moby-Dick',
+            f'<h1>Herman Melville - Moby-Dick</h1>\n<p>{_MOBY_DICK}</p>'
+        ).encode()),
+        'encoding/utf8': ('text/html', _page(
+            'Unicode Demo',
+            '<h1>Unicode Demo</h1>\n' + '\n'.join(f'<p>{line}</p>' for line in _CJK_LINES)
+        ).encode()),
+    }
+    for n in range(IMAGE_COUNT):
+        corpus[f'img/{n}.png'] = ('image/png', _png(image_size, image_size, n))
+    return corpus
+
+
+class PageServer:
+    """Serves the corpus, optionally from a background thread."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0,
+                 bandwidth: Optional[float] = None, image_size: int = IMAGE_SIZE):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.corpus = build_corpus(image_size)
+        self.requests = 0
+        self._runner = None
+        self._loop = None
+        self._thread = None
+
+    def url(self, path: str, host: str = None) -> str:
+        return f'http://{host or self.host}:{self.port}/{path.lstrip("/")}'
+
+    def corpus_urls(self, host: str = None) -> List[str]:
+        return [self.url(page, host) for page in CORPUS_PAGES]
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/delay/{seconds}', self._delay)
+        app.router.add_get('/{path:.*}', self._serve)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def start_background(self) -> 'PageServer':
+        """
+        Run the server on its own event loop thread (for sync callers).
+
+        Raises whatever kept the server from starting, e.g. ``OSError`` when the port is taken.
+        """
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(self.start())
+            except BaseException as e:
+                errors.append(e)
+                self._loop.close()
+                self._loop = None
+                return
+            finally:
+                ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        if not ready.wait(30):
+            raise RuntimeError('Page server did not start within 30s')
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop_background(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def _send(self, request: web.Request, content_type: str, body: bytes) -> web.StreamResponse:
+        self.requests += 1
+        latency = self.latency
+        if 'latency' in request.query:
+            latency = _non_negative(request.query['latency'], 'latency') / 1000
+        bandwidth = self.bandwidth
+        if 'bandwidth' in request.query:
+            bandwidth = _non_negative(request.query['bandwidth'], 'bandwidth')
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        charset = 'utf-8' if content_type.startswith('text/') or content_type.endswith('javascript') else None
+        if not bandwidth:
+            return web.Response(body=body, content_type=content_type, charset=charset)
+
+        # Throttle by writing fixed time slices of the body
+        response = web.StreamResponse(headers={'Content-Length': str(len(body))})
+        response.content_type = content_type
+        if charset:
+            response.charset = charset
+        await response.prepare(request)
+        slice_seconds = 0.05
+        chunk_size = max(1, int(bandwidth * 1024 * slice_seconds))
+        for offset in range(0, len(body), chunk_size):
+            await response.write(body[offset:offset + chunk_size])
+            await asyncio.sleep(slice_seconds)
+        await response.write_eof()
+        return response
+
+    async def _serve(self, request: web.Request) -> web.StreamResponse:
+        path = request.match_info['path'] or 'static.html'
+        if path not in self.corpus:
+            raise web.HTTPNotFound()
+        content_type, body = self.corpus[path]
+        return await self._send(request, content_type, body)
+
+    async def _delay(self, request: web.Request) -> web.StreamResponse:
+        seconds = min(_non_negative(request.match_info['seconds'], 'seconds'), 10)
+        await asyncio.sleep(seconds)
+        return await self._send(request, 'text/html', _page('Delayed', f'<p>Delayed {seconds}s</p>').encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the local benchmark page corpus')
+    parser.add_argument('--host', default='0.0.0.0', help='Address to bind')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0, help='Artificial latency per response in seconds')
+    parser.add_argument('--bandwidth', type=float, help='Bandwidth limit per response in KiB/s')
+    args = parser.parse_args()
+
+    server = PageServer(args.host, args.port, args.latency, args.bandwidth)
+    print(f"Serving page corpus on http://{args.host}:{args.port}/ ({', '.join(CORPUS_PAGES)})")
+    web.run_app(server.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
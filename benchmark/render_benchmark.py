@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Screenshot and PDF render-throughput benchmark.
+
+Loads one page per viewport size and then repeatedly calls
+``Page.captureScreenshot`` (PNG, JPEG and WebP at several quality levels) and
+``Page.printToPDF`` on it, recording renders/s, latency, bytes produced and,
+when a cgroup sampler is available, container CPU seconds per render.
+
+With ``screencast_frames`` it also compares one-shot ``Page.captureScreenshot``
+calls with streaming ``Page.startScreencast`` frames (see ``screencast.py``)
+on an animated page: frames/s and peak client-side Python memory.
+"""
+
+import asyncio
+import base64
+import contextlib
+import time
+import tracemalloc
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from cdp_client import CDPError, CDPSession
+from screencast import FrameBuffer, ScreencastCapture
+from stats import latency_summary, summarize
+
+RENDER_VIEWPORTS = ['1280x720', '1920x1080', '390x844']
+RENDER_FORMATS = ['png', 'jpeg:90', 'jpeg:60', 'webp:90', 'webp:60', 'pdf']
+
+# CSS pixels per inch, used to size PDF pages to the viewport
+CSS_DPI = 96
+
+
+def parse_viewport(spec: str) -> Tuple[int, int]:
+    """Parse ``WIDTHxHEIGHT`` into a (width, height) tuple."""
+    width, _, height = spec.lower().partition('x')
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise ValueError(f"Invalid viewport '{spec}', expected WIDTHxHEIGHT")
+
+
+def parse_format(spec: str) -> Tuple[str, Optional[int]]:
+    """
+    Parse ``png``, ``pdf`` or ``jpeg:QUALITY`` / ``webp:QUALITY``.
+
+    Returns:
+        tuple: (format, quality); quality is None for lossless formats
+    """
+    name, _, quality = spec.lower().partition(':')
+    if name not in ('png', 'jpeg', 'webp', 'pdf'):
+        raise ValueError(f"Unknown render format '{spec}'")
+    if name in ('png', 'pdf'):
+        if quality:
+            raise ValueError(f"Format '{name}' takes no quality level")
+        return name, None
+    return name, int(quality) if quality else 80
+
+
+class RenderBenchmark:
+    """Measures render throughput of one browser endpoint."""
+
+    def __init__(self, host: str, port: int, url: str, viewports: List[str] = None,
+                 formats: List[str] = None, renders: int = 10, timeout: float = 30, sampler=None,
+                 screencast_frames: int = 0, screencast_url: str = None):
+        """
+        Args:
+            host (str): DevTools host
+            port (int): DevTools port
+            url (str): Page to render
+            viewports (list): ``WIDTHxHEIGHT`` sizes (default RENDER_VIEWPORTS)
+            formats (list): Format specs (default RENDER_FORMATS)
+            renders (int): Timed renders per viewport and format
+            timeout (float): Per-command timeout in seconds
+            sampler: Optional CgroupSampler of the container for CPU per render
+            screencast_frames (int): Frames per method for the one-shot vs screencast comparison
+            screencast_url (str): Continuously painting page for the comparison (default: ``url``)
+        """
+        self.base_url = f'http://{host}:{port}'
+        self.ws_base = f'ws://{host}:{port}'
+        self.url = url
+        self.viewports = [parse_viewport(v) for v in (viewports or RENDER_VIEWPORTS)]
+        self.formats = [parse_format(f) for f in (formats or RENDER_FORMATS)]
+        self.renders = renders
+        self.timeout = timeout
+        self.sampler = sampler
+        self.screencast_frames = screencast_frames
+        self.screencast_url = screencast_url or url
+
+    async def run(self) -> Dict[str, Any]:
+        """Render every viewport/format combination and return one entry per case."""
+        cases = []
+        streaming = []
+        async with aiohttp.ClientSession() as http:
+            for width, height in self.viewports:
+                async with self._page(http, width, height, self.url) as session:
+                    for fmt, quality in self.formats:
+                        cases.append(await self.run_case(session, width, height, fmt, quality))
+
+                # Screencast only supports PNG and JPEG
+                stream_formats = [(fmt, quality) for fmt, quality in self.formats if fmt in ('png', 'jpeg')]
+                if self.screencast_frames and stream_formats:
+                    async with self._page(http, width, height, self.screencast_url) as session:
+                        for fmt, quality in stream_formats:
+                            streaming.append(await self.run_streaming_case(session, width, height, fmt, quality))
+
+        result = {'success': True, 'url': self.url, 'renders': self.renders, 'cases': cases}
+        if self.screencast_frames:
+            result.update(screencast_url=self.screencast_url, screencast_frames=self.screencast_frames,
+                          streaming=streaming)
+        return result
+
+    @contextlib.asynccontextmanager
+    async def _page(self, http: aiohttp.ClientSession, width: int, height: int,
+                    url: str) -> AsyncIterator[CDPSession]:
+        """Open a target with the given viewport, load ``url`` and close it afterwards."""
+        async with http.put(f'{self.base_url}/json/new') as response:
+            response.raise_for_status()
+            target_id = (await response.json())['id']
+        try:
+            async with CDPSession(f'{self.ws_base}/devtools/page/{target_id}', timeout=self.timeout) as session:
+                await session.send('Emulation.setDeviceMetricsOverride', {
+                    'width': width, 'height': height, 'deviceScaleFactor': 1, 'mobile': False
+                })
+                await session.navigate(url)
+                yield session
+        finally:
+            async with http.get(f'{self.base_url}/json/close/{target_id}') as response:
+                await response.read()
+
+    async def run_case(self, session: CDPSession, width: int, height: int,
+                       fmt: str, quality: Optional[int]) -> Dict[str, Any]:
+        """Time ``self.renders`` renders of one format after one untimed warm-up render."""
+        case = {'viewport': f'{width}x{height}', 'format': fmt, 'quality': quality}
+        label = f"{case['viewport']}-{fmt}{quality or ''}"
+        try:
+            await self.render(session, width, height, fmt, quality)
+
+            latencies = []
+            sizes = []
+            if self.sampler:
+                self.sampler.mark(f'render:{label}:start')
+            start = time.perf_counter()
+            for _ in range(self.renders):
+                render_start = time.perf_counter()
+                sizes.append(await self.render(session, width, height, fmt, quality))
+                latencies.append(time.perf_counter() - render_start)
+            elapsed = time.perf_counter() - start
+            if self.sampler:
+                self.sampler.mark(f'render:{label}:end')
+        except CDPError as e:
+            return dict(case, success=False, error=str(e))
+
+        cpu_per_render = None
+        if self.sampler:
+            cpu_per_render = self.sampler.cpu_seconds_between(f'render:{label}:start',
+                                                              f'render:{label}:end') / self.renders
+        return dict(
+            case,
+            success=True,
+            renders_per_second=self.renders / elapsed if elapsed else 0,
+            latency=latency_summary(latencies),
+            bytes=summarize(sizes),
+            cpu_seconds_per_render=cpu_per_render
+        )
+
+    async def run_streaming_case(self, session: CDPSession, width: int, height: int,
+                                 fmt: str, quality: Optional[int]) -> Dict[str, Any]:
+        """Capture ``self.screencast_frames`` frames one-shot and streamed, and compare them."""
+        case = {'viewport': f'{width}x{height}', 'format': fmt, 'quality': quality}
+        try:
+            one_shot = await self._measure_client(self._one_shot_frames(session, fmt, quality))
+            screencast = await self._measure_client(self._screencast_frames(session, width, height, fmt, quality))
+        except CDPError as e:
+            return dict(case, success=False, error=str(e))
+        return dict(case, success=True, one_shot=one_shot, screencast=screencast)
+
+    async def _measure_client(self, capture) -> Dict[str, Any]:
+        """Run a capture coroutine under tracemalloc; report frames/s and peak Python memory."""
+        tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            sizes = await capture
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'frames': len(sizes),
+            'frames_per_second': len(sizes) / elapsed if elapsed else 0,
+            'peak_client_bytes': peak,
+            'bytes': summarize(sizes)
+        }
+
+    async def _one_shot_frames(self, session: CDPSession, fmt: str, quality: Optional[int]) -> List[int]:
+        sizes = []
+        for _ in range(self.screencast_frames):
+            sizes.append(await self.render(session, 0, 0, fmt, quality))
+        return sizes
+
+    async def _screencast_frames(self, session: CDPSession, width: int, height: int,
+                                 fmt: str, quality: Optional[int]) -> List[int]:
+        sizes = []
+        # Size the buffer for an uncompressed frame so it is allocated once
+        buffer = FrameBuffer(width * height * 4)
+        async with ScreencastCapture(session, fmt, quality, max_width=width, max_height=height,
+                                     buffer=buffer, timeout=self.timeout) as capture:
+            async for frame in capture.frames(self.screencast_frames):
+                sizes.append(frame.size)
+        return sizes
+
+    async def render(self, session: CDPSession, width: int, height: int,
+                     fmt: str, quality: Optional[int]) -> int:
+        """Render once and return the size of the decoded output in bytes."""
+        if fmt == 'pdf':
+            result = await session.send('Page.printToPDF', {
+                'printBackground': True,
+                'paperWidth': width / CSS_DPI,
+                'paperHeight': height / CSS_DPI,
+                'marginTop': 0, 'marginBottom': 0, 'marginLeft': 0, 'marginRight': 0
+            })
+        else:
+            params = {'format': fmt}
+            if quality is not None:
+                params['quality'] = quality
+            result = await session.send('Page.captureScreenshot', params)
+        return len(base64.b64decode(result.get('data', '')))
+
+
+def run_render_benchmark(host: str, port: int, url: str, **kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around ``RenderBenchmark.run``."""
+    try:
+        return asyncio.run(RenderBenchmark(host, port, url, **kwargs).run())
+    except (CDPError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return {'success': False, 'url': url, 'error': str(e) or type(e).__name__}
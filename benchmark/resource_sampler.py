@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Background cgroup v2 resource sampler for benchmark containers.
+
+Reads ``cpu.stat``, ``memory.current``, ``memory.peak`` and ``io.stat``
+straight from the container's cgroup every few hundred milliseconds, which is
+far cheaper than ``docker stats`` and yields numbers the report can aggregate.
+"""
+
+import os
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def find_container_cgroup(name: str, cgroup_root: str = CGROUP_ROOT) -> Optional[str]:
+    """
+    Return the cgroup v2 directory of a running container, or None.
+
+    Resolves the container's init PID and reads its ``/proc/<pid>/cgroup``, so
+    it works with both the systemd and cgroupfs Docker cgroup drivers. Returns
+    None on cgroup v1 hosts or when the PID is not visible (e.g. when the
+    benchmark itself runs in a container).
+    """
+    try:
+        result = subprocess.run(
+            ['docker', 'inspect', '--format', '{{.State.Pid}}', name],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        pid = int(result.stdout.strip())
+        with open(f'/proc/{pid}/cgroup') as f:
+            for line in f:
+                hierarchy, _, path = line.strip().split(':', 2)
+                if hierarchy == '0':
+                    cgroup = os.path.join(cgroup_root, path.lstrip('/'))
+                    if os.path.exists(os.path.join(cgroup, 'cpu.stat')):
+                        return cgroup
+    except (OSError, ValueError, subprocess.SubprocessError):
+        pass
+    return None
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _read_keyed(path: str) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                if value.strip().isdigit():
+                    values[key] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+def _read_io(path: str) -> Dict[str, int]:
+    # io.stat has one line per device: "8:0 rbytes=1 wbytes=2 rios=3 ..."
+    totals = {'rbytes': 0, 'wbytes': 0}
+    try:
+        with open(path) as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key in totals:
+                        totals[key] += int(value)
+    except (OSError, ValueError):
+        pass
+    return totals
+
+
+class CgroupSampler:
+    """Samples one cgroup on a background thread."""
+
+    FIELDS = ('t', 'cpu_seconds', 'memory_bytes', 'io_read_bytes', 'io_write_bytes')
+
+    def __init__(self, cgroup_path: str, interval: float = 0.2):
+        self.cgroup_path = cgroup_path
+        self.interval = interval
+        self.series: Dict[str, List[float]] = {field: [] for field in self.FIELDS}
+        self.marks: Dict[str, float] = {}
+        self.memory_peak = 0
+        self._start = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> 'CgroupSampler':
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+
+    def mark(self, label: str) -> None:
+        """Record a named point in time (seconds since start) and sample it."""
+        self.marks[label] = self.sample()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self) -> float:
+        """Take one sample and return its timestamp."""
+        cpu = _read_keyed(os.path.join(self.cgroup_path, 'cpu.stat'))
+        memory = _read_int(os.path.join(self.cgroup_path, 'memory.current'))
+        io = _read_io(os.path.join(self.cgroup_path, 'io.stat'))
+        # memory.peak only exists on Linux 5.19+; fall back to the sampled max
+        peak = _read_int(os.path.join(self.cgroup_path, 'memory.peak'))
+
+        with self._lock:
+            t = round(time.perf_counter() - self._start, 4)
+            self.memory_peak = max(self.memory_peak, peak or 0, memory or 0)
+            self.series['t'].append(t)
+            self.series['cpu_seconds'].append(cpu.get('usage_usec', 0) / 1e6)
+            self.series['memory_bytes'].append(memory or 0)
+            self.series['io_read_bytes'].append(io['rbytes'])
+            self.series['io_write_bytes'].append(io['wbytes'])
+        return t
+
+    def _value_at(self, field: str, t: float) -> float:
+        # Last sample taken at or before t
+        value = self.series[field][0]
+        for sample_t, sample_value in zip(self.series['t'], self.series[field]):
+            if sample_t > t:
+                break
+            value = sample_value
+        return value
+
+    def cpu_seconds_between(self, start_mark: str, end_mark: str) -> float:
+        """CPU seconds the cgroup used between two marks."""
+        return (self._value_at('cpu_seconds', self.marks[end_mark])
+                - self._value_at('cpu_seconds', self.marks[start_mark]))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary plus the full time series for the results JSON."""
+        cpu = self.series['cpu_seconds']
+        return {
+            'interval': self.interval,
+            'samples': len(self.series['t']),
+            'peak_memory_bytes': self.memory_peak,
+            'cpu_seconds': cpu[-1] - cpu[0] if cpu else 0,
+            'io_read_bytes': self.series['io_read_bytes'][-1] - self.series['io_read_bytes'][0] if cpu else 0,
+            'io_write_bytes': self.series['io_write_bytes'][-1] - self.series['io_write_bytes'][0] if cpu else 0,
+            'marks': self.marks,
+            'series': self.series
+        }
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Append-only SQLite history of benchmark results, with regression detection.
+
+Every run's samples (startup time, cold and warm load time per URL, peak
+memory; compressed size, pull time and DevTools time of image budget runs)
+are stored keyed by image, variant, Thorium version, instruction set, host
+CPU model and URL. ``compare`` tests a candidate set of runs against a
+baseline with a bootstrap confidence interval (or a relative threshold for
+metrics with a single sample) and exits non-zero when any metric got worse
+or could not be compared, so image builds can be gated on it:
+
+    python3 results_store.py add results/benchmark_results.json
+    python3 results_store.py compare --baseline-version M130.0.6723.174 --candidate-version M131.0.6778.85
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from stats import significantly_lower
+
+DEFAULT_STORE = 'results/history.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    host_cpu_model TEXT NOT NULL,
+    host_cpus INTEGER,
+    source TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    image TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    thorium_version TEXT NOT NULL,
+    instruction_set TEXT NOT NULL,
+    host_cpu_model TEXT NOT NULL,
+    url TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_key
+    ON samples (image, variant, instruction_set, host_cpu_model, url, metric);
+CREATE TRIGGER IF NOT EXISTS runs_append_only_update BEFORE UPDATE ON runs
+    BEGIN SELECT RAISE(ABORT, 'results store is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS runs_append_only_delete BEFORE DELETE ON runs
+    BEGIN SELECT RAISE(ABORT, 'results store is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS samples_append_only_update BEFORE UPDATE ON samples
+    BEGIN SELECT RAISE(ABORT, 'results store is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS samples_append_only_delete BEFORE DELETE ON samples
+    BEGIN SELECT RAISE(ABORT, 'results store is append-only'); END;
+"""
+
+# (image, variant, instruction_set, host_cpu_model, url, metric)
+SampleKey = Tuple[str, str, str, str, str, str]
+
+
+def host_cpu_model(cpuinfo_path: str = '/proc/cpuinfo') -> str:
+    """The host CPU's ``model name`` from /proc/cpuinfo, or '' when unavailable."""
+    try:
+        with open(cpuinfo_path) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() == 'model name':
+                    return value.strip()
+    except OSError:
+        pass
+    return ''
+
+
+def _variant(result: Dict[str, Any]) -> str:
+    parts = []
+    if result.get('shards'):
+        parts.append(f"shards={result['shards']}")
+    if result.get('seed_profile') is not None:
+        parts.append(f"seed_profile={int(result['seed_profile'])}")
+    if result.get('flag_set'):
+        parts.append(f"flags={result['flag_set']}")
+    return ','.join(parts)
+
+
+def extract_samples(benchmark_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a ``run_all_benchmarks``, ``run_startup_profiles`` or ``run_image_budget`` result into metric samples."""
+    samples = []
+    for result in benchmark_results.get('results', []):
+        if not result.get('success'):
+            continue
+        key = {
+            'image': result['image'],
+            'variant': _variant(result),
+            'thorium_version': result.get('thorium_version') or '',
+            'instruction_set': result.get('instruction_set') or '',
+        }
+
+        def add(metric, value, url=''):
+            samples.append(dict(key, url=url, metric=metric, value=float(value)))
+
+        if benchmark_results.get('mode') == 'startup-profile':
+            for run in result['runs']:
+                if run['success']:
+                    add('startup_time', run['total'])
+            continue
+        if benchmark_results.get('mode') == 'image-budget':
+            add('compressed_bytes', result['compressed_bytes'])
+            for pull in result['pulls']:
+                if pull['success']:
+                    add('pull_time', pull['pull_time'])
+            for value in result['devtools_times']:
+                add('devtools_time', value)
+            for run in result['cold_starts']:
+                if run['success']:
+                    add('startup_time', run['total'])
+            continue
+
+        add('startup_time', result['startup']['total_startup_time'])
+        for load in result['page_loads']:
+            if load['success']:
+                add('cold_load_time' if load['cold'] else 'load_time', load['load_time'], load['url'])
+        if result.get('resources'):
+            add('peak_memory_bytes', result['resources']['peak_memory_bytes'])
+    return samples
+
+
+def compare_samples(baseline: Dict[SampleKey, List[float]], candidate: Dict[SampleKey, List[float]],
+                    min_change: float = 0.05, single_change: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compare every key present on both sides. All stored metrics (startup,
+    cold and warm load time, peak memory, image size, pull time) are
+    lower-is-better.
+
+    A key regresses when the baseline is significantly lower than the
+    candidate (95% bootstrap CI of the mean difference) and the candidate mean
+    is at least ``min_change`` (relative) worse; the mirror case is an
+    improvement. Metrics recorded once per run (startup time, peak memory,
+    image size) often have a single sample on one side: those are compared
+    with a ``single_change`` relative threshold instead, and the candidate
+    must also lie outside the range of the baseline samples. Keys whose
+    baseline mean is zero are reported as ``insufficient``.
+    """
+    comparisons = []
+    for key in sorted(set(baseline) & set(candidate)):
+        base, cand = baseline[key], candidate[key]
+        base_mean, cand_mean = statistics.mean(base), statistics.mean(cand)
+        change = (cand_mean - base_mean) / base_mean if base_mean else 0.0
+        method = 'bootstrap'
+        if not base_mean:
+            status = 'insufficient'
+        elif len(base) < 2 or len(cand) < 2:
+            method = 'threshold'
+            if change >= single_change and cand_mean > max(base):
+                status = 'regression'
+            elif change <= -single_change and cand_mean < min(base):
+                status = 'improvement'
+            else:
+                status = 'unchanged'
+        elif change >= min_change and significantly_lower(base, cand):
+            status = 'regression'
+        elif change <= -min_change and significantly_lower(cand, base):
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        image, variant, instruction_set, cpu_model, url, metric = key
+        comparisons.append({
+            'image': image,
+            'variant': variant,
+            'instruction_set': instruction_set,
+            'host_cpu_model': cpu_model,
+            'url': url,
+            'metric': metric,
+            'baseline_n': len(base),
+            'baseline_mean': base_mean,
+            'candidate_n': len(cand),
+            'candidate_mean': cand_mean,
+            'change': change,
+            'method': method,
+            'status': status
+        })
+    return comparisons
+
+
+class ResultStore:
+    """SQLite-backed, append-only benchmark history."""
+
+    def __init__(self, path: str = DEFAULT_STORE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def add_run(self, benchmark_results: Dict[str, Any], source: str = '') -> int:
+        """Append one benchmark run and its samples; returns the new run id."""
+        cpu_model = benchmark_results.get('host_cpu_model') or host_cpu_model()
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO runs (timestamp, mode, host_cpu_model, host_cpus, source) VALUES (?, ?, ?, ?, ?)',
+                (benchmark_results.get('timestamp') or datetime.now().isoformat(),
+                 benchmark_results.get('mode', 'sequential'), cpu_model,
+                 benchmark_results.get('host_cpus'), source)
+            )
+            run_id = cursor.lastrowid
+            self.db.executemany(
+                'INSERT INTO samples (run_id, image, variant, thorium_version, instruction_set, '
+                'host_cpu_model, url, metric, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, s['image'], s['variant'], s['thorium_version'], s['instruction_set'],
+                  cpu_model, s['url'], s['metric'], s['value'])
+                 for s in extract_samples(benchmark_results)]
+            )
+        return run_id
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """All runs, oldest first, with the Thorium versions they measured."""
+        rows = self.db.execute(
+            'SELECT r.id, r.timestamp, r.mode, r.host_cpu_model, r.source, COUNT(s.run_id), '
+            "GROUP_CONCAT(DISTINCT NULLIF(s.thorium_version, '')) "
+            'FROM runs r LEFT JOIN samples s ON s.run_id = r.id GROUP BY r.id ORDER BY r.id'
+        ).fetchall()
+        return [
+            {'id': row[0], 'timestamp': row[1], 'mode': row[2], 'host_cpu_model': row[3],
+             'source': row[4], 'samples': row[5], 'versions': sorted((row[6] or '').split(',')) if row[6] else []}
+            for row in rows
+        ]
+
+    def samples(self, run_ids: List[int] = None,
+                thorium_version: str = None) -> Dict[SampleKey, List[float]]:
+        """Sample values grouped by key, filtered by run ids and/or Thorium version."""
+        query = ('SELECT image, variant, instruction_set, host_cpu_model, url, metric, value '
+                 'FROM samples WHERE 1 = 1')
+        params = []
+        if run_ids is not None:
+            query += f" AND run_id IN ({','.join('?' * len(run_ids))})"
+            params += run_ids
+        if thorium_version is not None:
+            query += ' AND thorium_version = ?'
+            params.append(thorium_version)
+        grouped = {}
+        for row in self.db.execute(query, params):
+            grouped.setdefault(tuple(row[:6]), []).append(row[6])
+        return grouped
+
+    def compare(self, baseline_version: str = None, candidate_version: str = None,
+                baseline_runs: int = 5, candidate_runs: int = 1,
+                min_change: float = 0.05, single_change: float = 0.10) -> List[Dict[str, Any]]:
+        """
+        Compare candidate samples against a baseline.
+
+        With both versions given, every stored sample of each Thorium version
+        is used; otherwise the latest ``candidate_runs`` runs are the
+        candidate and the ``baseline_runs`` runs before them the baseline.
+        Samples are pooled per key across the runs of each side.
+        """
+        if (baseline_version is None) != (candidate_version is None):
+            raise ValueError("baseline and candidate versions must be given together")
+        if baseline_version is not None:
+            return compare_samples(self.samples(thorium_version=baseline_version),
+                                   self.samples(thorium_version=candidate_version), min_change, single_change)
+
+        run_ids = [run['id'] for run in self.runs()]
+        cutoff = max(0, len(run_ids) - candidate_runs)
+        return compare_samples(
+            self.samples(run_ids[max(0, cutoff - baseline_runs):cutoff]),
+            self.samples(run_ids[cutoff:]),
+            min_change,
+            single_change
+        )
+
+
+def format_comparison(comparisons: List[Dict[str, Any]]) -> str:
+    """Markdown table of a comparison, regressions first."""
+    order = {'regression': 0, 'improvement': 1, 'unchanged': 2, 'insufficient': 3}
+    lines = [
+        "| Status | Image | Variant | URL | Metric | Baseline (n) | Candidate (n) | Change | Test |",
+        "|--------|-------|---------|-----|--------|--------------|---------------|--------|------|",
+    ]
+    for c in sorted(comparisons, key=lambda c: (order[c['status']], c['image'], c['url'], c['metric'])):
+        status = c['status'].upper() if c['status'] == 'regression' else c['status']
+        lines.append(f"| {status} | {c['image']} | {c['variant'] or '-'} | {c['url'] or '-'} | {c['metric']} | "
+                     f"{c['baseline_mean']:.4g} ({c['baseline_n']}) | {c['candidate_mean']:.4g} ({c['candidate_n']}) | "
+                     f"{c['change'] * 100:+.1f}% | {c['method']} |")
+    return "\n".join(lines)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark result history and regression detection')
+    parser.add_argument('--db', default=DEFAULT_STORE, help=f'SQLite store (default: {DEFAULT_STORE})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='Append benchmark result JSON files to the store')
+    add.add_argument('files', nargs='+')
+
+    commands.add_parser('list', help='List stored runs')
+
+    compare = commands.add_parser('compare', help='Flag significant regressions; exits 1 if any, '
+                                                  '2 if nothing or not every metric could be compared')
+    compare.add_argument('--baseline-version', help='Thorium version of the baseline runs')
+    compare.add_argument('--candidate-version', help='Thorium version of the candidate runs')
+    compare.add_argument('--baseline-runs', type=int, default=5,
+                         help='Runs before the candidate used as baseline (default: 5)')
+    compare.add_argument('--candidate-runs', type=int, default=1,
+                         help='Latest runs used as candidate (default: 1)')
+    compare.add_argument('--min-change', type=float, default=0.05,
+                         help='Smallest relative slowdown reported as a regression (default: 0.05)')
+    compare.add_argument('--single-change', type=float, default=0.10,
+                         help='Relative slowdown that counts as a regression for metrics with a single '
+                              'sample on a side, e.g. startup time of one run (default: 0.10)')
+    compare.add_argument('--json', action='store_true', help='Print the comparison as JSON')
+
+    args = parser.parse_args(argv)
+
+    with ResultStore(args.db) as store:
+        if args.command == 'add':
+            for filename in args.files:
+                with open(filename) as f:
+                    run_id = store.add_run(json.load(f), source=filename)
+                print(f"Added {filename} as run {run_id}")
+            return 0
+
+        if args.command == 'list':
+            for run in store.runs():
+                print(f"{run['id']:>4}  {run['timestamp']}  {run['mode']:<16} {run['samples']:>5} samples  "
+                      f"{', '.join(run['versions']) or '-'}  {run['host_cpu_model']}")
+            return 0
+
+        if (args.baseline_version is None) != (args.candidate_version is None):
+            parser.error('--baseline-version and --candidate-version must be given together')
+        comparisons = store.compare(args.baseline_version, args.candidate_version,
+                                    args.baseline_runs, args.candidate_runs, args.min_change,
+                                    args.single_change)
+
+    regressions = [c for c in comparisons if c['status'] == 'regression']
+    insufficient = [c for c in comparisons if c['status'] == 'insufficient']
+    if args.json:
+        print(json.dumps(comparisons, indent=2))
+    elif comparisons:
+        print(format_comparison(comparisons))
+    else:
+        print("Nothing to compare: no matching samples on both sides")
+    print(f"\n{len(regressions)} regression(s) in {len(comparisons)} compared metrics"
+          f"{f', {len(insufficient)} insufficient' if insufficient else ''}", file=sys.stderr)
+    if regressions:
+        return 1
+    # A gate that compared nothing has not passed
+    return 2 if insufficient or not comparisons else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Streaming screenshot capture built on ``Page.startScreencast``.
+
+Instead of one ``Page.captureScreenshot`` round trip per image, the browser
+pushes ``Page.screencastFrame`` events as the page paints. Each frame is only
+acknowledged once the consumer is done with it, so a slow consumer throttles
+the browser instead of queueing frames in memory, and the base64 payload is
+decoded in chunks straight into a reused buffer or an open file rather than
+into a fresh ``bytes`` object per frame.
+"""
+
+import asyncio
+import binascii
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional
+
+from cdp_client import CDPError, CDPSession
+
+# Base64 characters decoded per step; a multiple of 4 so chunks stay aligned
+DECODE_CHUNK = 64 * 1024
+
+
+def decoded_length(data: str) -> int:
+    """Number of bytes ``data`` (unwrapped base64) decodes to."""
+    return len(data) // 4 * 3 - data[-2:].count('=') if data else 0
+
+
+def decode_base64_into(data: str, out: memoryview) -> int:
+    """
+    Decode base64 ``data`` into ``out`` chunk by chunk.
+
+    Only one chunk's worth of decoded bytes is alive at a time, whatever the
+    frame size. ``out`` must be at least ``decoded_length(data)`` long.
+
+    Returns:
+        int: Number of bytes written
+    """
+    offset = 0
+    for start in range(0, len(data), DECODE_CHUNK):
+        chunk = binascii.a2b_base64(data[start:start + DECODE_CHUNK])
+        out[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    return offset
+
+
+def decode_base64_to_file(data: str, out: BinaryIO) -> int:
+    """Decode base64 ``data`` chunk by chunk into a binary file; return bytes written."""
+    written = 0
+    for start in range(0, len(data), DECODE_CHUNK):
+        written += out.write(binascii.a2b_base64(data[start:start + DECODE_CHUNK]))
+    return written
+
+
+class FrameBuffer:
+    """Preallocated frame buffer that only grows when a frame does not fit."""
+
+    def __init__(self, size: int = 1024 * 1024):
+        self._buffer = bytearray(size)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    def decode(self, data: str) -> memoryview:
+        """Decode a base64 frame into the buffer and return a view of it."""
+        needed = decoded_length(data)
+        if needed > len(self._buffer):
+            self._buffer = bytearray(max(needed, len(self._buffer) * 2))
+        size = decode_base64_into(data, memoryview(self._buffer))
+        return memoryview(self._buffer)[:size]
+
+
+class ScreencastFrame:
+    """One decoded frame. ``data`` is only valid until the next frame is read."""
+
+    def __init__(self, index: int, data: memoryview, metadata: Dict[str, Any]):
+        self.index = index
+        self.data = data
+        self.metadata = metadata
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+class ScreencastCapture:
+    """
+    Streams screencast frames from one target.
+
+    Usage::
+
+        async with ScreencastCapture(session, fmt='jpeg', quality=80) as capture:
+            async for frame in capture.frames(100):
+                consume(frame.data)
+    """
+
+    def __init__(self, session: CDPSession, fmt: str = 'jpeg', quality: int = None,
+                 max_width: int = None, max_height: int = None, every_nth_frame: int = 1,
+                 buffer: FrameBuffer = None, timeout: float = None):
+        """
+        Args:
+            session (CDPSession): Connected session of a page target
+            fmt (str): ``jpeg`` or ``png``
+            quality (int): JPEG quality 0-100
+            max_width (int): Maximum frame width (default: viewport width)
+            max_height (int): Maximum frame height (default: viewport height)
+            every_nth_frame (int): Only send every n-th painted frame
+            buffer (FrameBuffer): Buffer to decode frames into (default: a new 1 MiB one)
+            timeout (float): Seconds to wait for a frame (default: the session timeout)
+        """
+        if fmt not in ('jpeg', 'png'):
+            raise ValueError(f"Screencast format must be jpeg or png, not '{fmt}'")
+        self.session = session
+        self.params = {'format': fmt, 'everyNthFrame': every_nth_frame}
+        if quality is not None and fmt == 'jpeg':
+            self.params['quality'] = quality
+        if max_width:
+            self.params['maxWidth'] = max_width
+        if max_height:
+            self.params['maxHeight'] = max_height
+        self.buffer = buffer or FrameBuffer()
+        self.timeout = timeout or session.timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self.frames_received = 0
+        self.bytes_received = 0
+
+    async def __aenter__(self) -> 'ScreencastCapture':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    def _on_frame(self, params: Dict[str, Any]) -> None:
+        self._queue.put_nowait(params)
+
+    async def start(self) -> None:
+        """Subscribe to frames and start the screencast."""
+        self._queue = asyncio.Queue()
+        self.session.on('Page.screencastFrame', self._on_frame)
+        await self.session.send('Page.enable')
+        await self.session.send('Page.startScreencast', self.params)
+
+    async def stop(self) -> None:
+        """Stop the screencast; frames still queued are dropped unacknowledged."""
+        self.session.off('Page.screencastFrame', self._on_frame)
+        try:
+            await self.session.send('Page.stopScreencast')
+        except CDPError:
+            pass
+
+    async def _next_event(self) -> Dict[str, Any]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), self.timeout)
+        except asyncio.TimeoutError:
+            raise CDPError(f'No screencast frame within {self.timeout}s (is the page painting?)')
+
+    async def _ack(self, params: Dict[str, Any]) -> None:
+        try:
+            await self.session.send('Page.screencastFrameAck', {'sessionId': params['sessionId']})
+        except CDPError:
+            # The screencast or connection is already gone
+            pass
+
+    async def frames(self, count: int = None) -> AsyncIterator[ScreencastFrame]:
+        """
+        Yield up to ``count`` frames (forever if None), decoded into the buffer.
+
+        A frame is acknowledged when the consumer asks for the next one, so the
+        browser never runs more than its in-flight window ahead of the consumer.
+        """
+        index = 0
+        while count is None or index < count:
+            params = await self._next_event()
+            frame = ScreencastFrame(index, self.buffer.decode(params['data']), params.get('metadata', {}))
+            self.frames_received += 1
+            self.bytes_received += frame.size
+            try:
+                yield frame
+            finally:
+                await self._ack(params)
+            index += 1
+
+    async def save(self, path_pattern: str, count: int) -> int:
+        """
+        Write ``count`` frames to files named ``path_pattern.format(index)``.
+
+        Frames are decoded chunk by chunk straight into each file.
+
+        Returns:
+            int: Total bytes written
+        """
+        written = 0
+        for index in range(count):
+            params = await self._next_event()
+            try:
+                with open(path_pattern.format(index), 'wb') as f:
+                    written += decode_base64_to_file(params['data'], f)
+                self.frames_received += 1
+            finally:
+                await self._ack(params)
+        self.bytes_received += written
+        return written
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Cold-start profiler for browser containers.
+
+Splits one container start into phases using host timestamps, the container's
+``State.StartedAt`` and ``docker logs --timestamps``: docker create, container
+start, entrypoint exec, the wrapper (``services/supervisor.py`` or the older
+wrapped-thorium script: profile preparation), browser exec to first log line,
+DevTools listening, and the first ``/json/new`` target. Repeating this over fresh containers gives a per-phase
+distribution for each image.
+"""
+
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from stats import summarize
+
+DEVTOOLS_LISTENING = 'DevTools listening on ws://'
+
+# Printed to stderr by services/supervisor.py and /usr/bin/wrapped-thorium (see Dockerfile)
+ENTRYPOINT_MARKER = '[supervisor] entrypoint'
+BROWSER_EXEC_MARKER = '[supervisor] exec browser'
+ENTRYPOINT_MARKERS = (ENTRYPOINT_MARKER, '[wrapped-thorium] entrypoint')
+BROWSER_EXEC_MARKERS = (BROWSER_EXEC_MARKER, '[wrapped-thorium] exec browser')
+# The supervisor's own log lines (profile seeding etc.) are not browser output
+SUPERVISOR_LOG_PREFIX = '[supervisor] '
+
+# Milestones in the order they happen, with the phase that ends at each one
+STARTUP_PHASES = [
+    ('created', 'docker create'),
+    ('started', 'container start'),
+    ('entrypoint', 'entrypoint exec'),
+    ('browser_exec', 'wrapper (profile preparation)'),
+    ('first_log', 'browser exec to first log line'),
+    ('devtools_listening', 'DevTools listening'),
+    ('first_target', 'first target ready'),
+]
+
+_DOCKER_TIME = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$')
+
+
+def parse_docker_time(value: str) -> Optional[float]:
+    """Parse an RFC 3339 timestamp with nanoseconds (as Docker prints them) to epoch seconds."""
+    match = _DOCKER_TIME.match(value.strip())
+    if not match:
+        return None
+    seconds, fraction, offset = match.groups()
+    if offset == 'Z':
+        tz = timezone.utc
+    else:
+        sign = -1 if offset[0] == '-' else 1
+        tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6])))
+    base = datetime.strptime(seconds, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=tz).timestamp()
+    return base + float(f'0.{fraction or 0}')
+
+
+def parse_log_milestones(log_text: str) -> Dict[str, float]:
+    """
+    Find the wrapper markers, first browser log line and DevTools line in
+    ``docker logs --timestamps`` output.
+    """
+    entries = []
+    for line in log_text.splitlines():
+        stamp, _, message = line.partition(' ')
+        t = parse_docker_time(stamp)
+        if t is not None:
+            entries.append((t, message))
+    # stdout and stderr are captured separately; merge them back in time order
+    entries.sort(key=lambda entry: entry[0])
+
+    milestones = {}
+    for t, message in entries:
+        if any(marker in message for marker in ENTRYPOINT_MARKERS):
+            milestones.setdefault('entrypoint', t)
+        elif any(marker in message for marker in BROWSER_EXEC_MARKERS):
+            milestones.setdefault('browser_exec', t)
+        elif message.startswith(SUPERVISOR_LOG_PREFIX):
+            continue
+        else:
+            milestones.setdefault('first_log', t)
+            if DEVTOOLS_LISTENING in message:
+                milestones.setdefault('devtools_listening', t)
+    return milestones
+
+
+def phase_breakdown(t0: float, milestones: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """
+    Duration of each phase in seconds, keyed by the milestone that ends it.
+
+    A phase whose milestone was not observed (e.g. images without the
+    wrapper) is None and its time is attributed to the next observed phase.
+    """
+    phases = {}
+    previous = t0
+    for milestone, _ in STARTUP_PHASES:
+        t = milestones.get(milestone)
+        if t is None:
+            phases[milestone] = None
+            continue
+        phases[milestone] = t - previous
+        previous = t
+    return phases
+
+
+class StartupProfiler:
+    """Repeated cold starts of one image, driven through a BenchmarkRunner."""
+
+    def __init__(self, runner, runs: int = 5):
+        """
+        Args:
+            runner: BenchmarkRunner used for docker commands and readiness checks
+            runs (int): Number of fresh containers to start per image
+        """
+        self.runner = runner
+        self.runs = runs
+
+    def profile(self, image: str, name: str, port: int, cpuset: str = None,
+                memory: str = None, command: List[str] = None) -> Dict[str, Any]:
+        """Profile ``self.runs`` cold starts and summarize every phase."""
+        print(f"\n=== Profiling startup of {image} ({self.runs} cold starts) ===")
+        runs = []
+        for index in range(self.runs):
+            print(f"Cold start {index + 1}/{self.runs}")
+            runs.append(self.profile_once(image, name, port, cpuset, memory, command))
+
+        successful = [run for run in runs if run['success']]
+        phases = {}
+        for milestone, _ in STARTUP_PHASES:
+            phases[milestone] = summarize([
+                run['phases'][milestone] for run in successful if run['phases'][milestone] is not None
+            ])
+        info = self.runner.image_info(image)
+        return {
+            'image': image,
+            'thorium_version': info['thorium_version'],
+            'instruction_set': info['instruction_set'],
+            'success': bool(successful),
+            'runs': runs,
+            'phases': phases,
+            'total': summarize([run['total'] for run in successful])
+        }
+
+    def profile_once(self, image: str, name: str, port: int, cpuset: str = None,
+                     memory: str = None, command: List[str] = None) -> Dict[str, Any]:
+        """Start one fresh container and timestamp each startup milestone."""
+        run = self.runner.run_command
+        run(['docker', 'rm', '-f', name], timeout=10)
+
+        try:
+            t0 = time.time()
+            create = run(['docker', 'create'] + self.runner.container_args(name, port, cpuset, memory)
+                         + [image] + (command or []))
+            if not create['success']:
+                return {'success': False, 'error': create['stderr']}
+            created = time.time()
+
+            start = run(['docker', 'start', name])
+            if not start['success']:
+                return {'success': False, 'error': start['stderr']}
+
+            ready = self.runner.wait_for_container_ready(port, name=name)
+            first_target = self.wait_for_first_target(port, deadline=t0 + 60)
+
+            started_at = run(['docker', 'inspect', '--format', '{{.State.StartedAt}}', name], timeout=10)
+            logs = run(['docker', 'logs', '--timestamps', name], timeout=10)
+        finally:
+            run(['docker', 'rm', '-f', name], timeout=10)
+
+        milestones = {'created': created, 'started': parse_docker_time(started_at['stdout'])}
+        milestones.update(parse_log_milestones(logs['stdout'] + '\n' + logs['stderr']))
+        milestones['first_target'] = first_target
+
+        if first_target is None:
+            return {'success': False, 'error': 'No target could be created',
+                    'ready_source': ready['ready_source']}
+        return {
+            'success': True,
+            'ready_source': ready['ready_source'],
+            'milestones': {key: value - t0 for key, value in milestones.items() if value is not None},
+            'phases': phase_breakdown(t0, milestones),
+            'total': first_target - t0
+        }
+
+    def wait_for_first_target(self, port: int, deadline: float) -> Optional[float]:
+        """Poll ``/json/new`` until a target is created; return the wall-clock time it succeeded."""
+        delay = 0.01
+        while time.time() < deadline:
+            try:
+                response = requests.put(f'http://localhost:{port}/json/new', timeout=1)
+                if response.status_code == 200:
+                    ready = time.time()
+                    requests.get(f"http://localhost:{port}/json/close/{response.json()['id']}", timeout=5)
+                    return ready
+            except requests.RequestException:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+        return None
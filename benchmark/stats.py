@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Statistics helpers shared by the benchmark modules.
+"""
+
+import math
+import random
+import statistics
+from typing import Callable, Dict, List, Sequence, Tuple
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Return the ``pct`` percentile (0-100) using linear interpolation."""
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[int(rank)]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def latency_summary(values: List[float]) -> dict:
+    """Return p50/p95/p99 for a list of latencies."""
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99)
+    }
+
+
+def _mean(values: Sequence[float]) -> float:
+    # statistics.mean is exact but far too slow for thousands of resamples
+    return math.fsum(values) / len(values)
+
+
+def bootstrap_ci(values: Sequence[float], statistic: Callable[[Sequence[float]], float] = _mean,
+                 confidence: float = 0.95, resamples: int = 2000, seed: int = 0) -> Tuple[float, float]:
+    """
+    Return a percentile bootstrap confidence interval for ``statistic``.
+
+    A fixed ``seed`` keeps reports reproducible for the same samples.
+    """
+    if not values:
+        return (0.0, 0.0)
+    if len(values) == 1:
+        return (values[0], values[0])
+
+    rng = random.Random(seed)
+    n = len(values)
+    estimates = [statistic([values[rng.randrange(n)] for _ in range(n)]) for _ in range(resamples)]
+    alpha = (1 - confidence) / 2 * 100
+    return (percentile(estimates, alpha), percentile(estimates, 100 - alpha))
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """Return n, mean, stddev, median, p95 and a 95% bootstrap CI of the mean."""
+    values = list(values)
+    if not values:
+        return {'n': 0}
+
+    ci_low, ci_high = bootstrap_ci(values)
+    return {
+        'n': len(values),
+        'mean': statistics.mean(values),
+        'stddev': statistics.stdev(values) if len(values) > 1 else 0.0,
+        'median': statistics.median(values),
+        'p95': percentile(values, 95),
+        'ci_low': ci_low,
+        'ci_high': ci_high
+    }
+
+
+def mean_difference_ci(a: Sequence[float], b: Sequence[float], confidence: float = 0.95,
+                       resamples: int = 2000, seed: int = 0) -> Tuple[float, float]:
+    """Return a bootstrap confidence interval for ``mean(a) - mean(b)``."""
+    rng = random.Random(seed)
+    a, b = list(a), list(b)
+    differences = []
+    for _ in range(resamples):
+        resample_a = [a[rng.randrange(len(a))] for _ in a]
+        resample_b = [b[rng.randrange(len(b))] for _ in b]
+        differences.append(_mean(resample_a) - _mean(resample_b))
+    alpha = (1 - confidence) / 2 * 100
+    return (percentile(differences, alpha), percentile(differences, 100 - alpha))
+
+
+def significantly_lower(a: Sequence[float], b: Sequence[float], confidence: float = 0.95) -> bool:
+    """
+    Return True if ``a`` has a significantly lower mean than ``b``.
+
+    Needs at least two samples on each side; the whole confidence interval
+    of ``mean(a) - mean(b)`` must lie below zero.
+    """
+    if len(a) < 2 or len(b) < 2:
+        return False
+    return mean_difference_ci(a, b, confidence)[1] < 0
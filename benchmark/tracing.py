@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Per-navigation performance traces and a critical-path breakdown.
+
+``traced_navigation`` wraps one navigation in ``Tracing.start`` /
+``Tracing.end`` with ``transferMode: ReturnAsStream`` and copies the trace to
+disk through ``IO.read`` in chunks, so large traces never sit in one CDP
+message. ``summarize_trace`` then splits the renderer main thread's time into
+scripting, style/layout, paint, parsing and GC (self time, so a forced layout
+inside a script counts as layout), plus the wall-clock time with at least one
+network request in flight.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+from cdp_client import CDPError, CDPSession
+
+TRACE_CATEGORIES = [
+    '-*',
+    'devtools.timeline',
+    'disabled-by-default-devtools.timeline',
+    'disabled-by-default-devtools.timeline.frame',
+    'v8',
+    'v8.execute',
+    'disabled-by-default-v8.gc',
+    'blink',
+    'blink.user_timing',
+    'loading',
+    'toplevel',
+]
+
+# Trace event name -> breakdown category. Names missing here count as "other".
+EVENT_CATEGORIES = {
+    'scripting': ['EvaluateScript', 'v8.compile', 'v8.compileModule', 'v8.evaluateModule', 'CompileScript',
+                  'FunctionCall', 'TimerFire', 'EventDispatch', 'FireAnimationFrame', 'FireIdleCallback',
+                  'RunMicrotasks', 'V8.Execute', 'v8.run', 'XHRReadyStateChange', 'XHRLoad',
+                  'v8.callFunction', 'CompileCode', 'OptimizeCode', 'CacheScript', 'StreamingCompileScript'],
+    'layout': ['Layout', 'UpdateLayoutTree', 'RecalculateStyles', 'UpdateLayerTree', 'UpdateLayer',
+               'HitTest', 'ScheduleStyleRecalculation', 'InvalidateLayout', 'Layerize', 'PrePaint'],
+    'paint': ['Paint', 'PaintImage', 'PaintSetup', 'CompositeLayers', 'RasterTask', 'Rasterize',
+              'Decode Image', 'ImageDecodeTask', 'Decode LazyPixelRef', 'Commit', 'UpdateLayerTreeHost'],
+    'parse': ['ParseHTML', 'ParseAuthorStyleSheet', 'ResourceReceivedData'],
+    'gc': ['MinorGC', 'MajorGC', 'GCEvent', 'BlinkGC.AtomicPhase', 'ThreadState::performIdleLazySweep',
+           'ThreadState::completeSweep', 'CppGC.AtomicPhase'],
+}
+
+BREAKDOWN = ['scripting', 'layout', 'paint', 'parse', 'gc', 'other']
+BREAKDOWN_LABELS = {'scripting': 'Scripting', 'layout': 'Style/Layout', 'paint': 'Paint', 'parse': 'Parse',
+                    'gc': 'GC', 'other': 'Other'}
+
+_CATEGORY_BY_NAME = {name: category for category, names in EVENT_CATEGORIES.items() for name in names}
+
+# IO.read chunk size; Chromium caps a single read at a few MiB anyway
+READ_CHUNK = 1024 * 1024
+
+
+def event_category(name: str) -> str:
+    """Breakdown category of a trace event name."""
+    category = _CATEGORY_BY_NAME.get(name)
+    if category:
+        return category
+    if name.startswith(('V8.GC', 'BlinkGC', 'V8.GCScavenger', 'V8.GCCompactor')):
+        return 'gc'
+    return 'other'
+
+
+async def start_tracing(session: CDPSession, categories: List[str] = None) -> None:
+    """Start recording a trace that will be returned as an IO stream."""
+    await session.send('Tracing.start', {
+        'traceConfig': {
+            'recordMode': 'recordAsMuchAsPossible',
+            'includedCategories': [c for c in (categories or TRACE_CATEGORIES) if not c.startswith('-')],
+            'excludedCategories': [c[1:] for c in (categories or TRACE_CATEGORIES) if c.startswith('-')],
+        },
+        'transferMode': 'ReturnAsStream',
+        'streamFormat': 'json',
+        'streamCompression': 'none'
+    })
+
+
+async def stop_tracing(session: CDPSession, path: str, timeout: float = None) -> int:
+    """
+    End tracing and copy the trace stream to ``path`` chunk by chunk.
+
+    Returns:
+        int: Bytes written
+    """
+    complete = session.expect_event('Tracing.tracingComplete')
+    await session.send('Tracing.end')
+    try:
+        params = await asyncio.wait_for(complete, timeout or session.timeout)
+    except asyncio.TimeoutError:
+        raise CDPError('Tracing did not complete')
+    stream = params.get('stream')
+    if not stream:
+        raise CDPError('Tracing completed without a stream handle')
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    try:
+        with open(path, 'wb') as f:
+            while True:
+                chunk = await session.send('IO.read', {'handle': stream, 'size': READ_CHUNK})
+                data = chunk.get('data', '')
+                if chunk.get('base64Encoded'):
+                    written += f.write(base64.b64decode(data))
+                else:
+                    written += f.write(data.encode())
+                if chunk.get('eof'):
+                    break
+    finally:
+        await session.send('IO.close', {'handle': stream})
+    return written
+
+
+async def traced_navigation(session: CDPSession, url: str, path: str,
+                            categories: List[str] = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Navigate with tracing enabled and summarize the trace.
+
+    Returns:
+        tuple: (``CDPSession.navigate`` result, ``summarize_trace`` result with ``file`` and ``bytes``)
+    """
+    await start_tracing(session, categories)
+    try:
+        navigation = await session.navigate(url)
+    finally:
+        size = await stop_tracing(session, path)
+    summary = summarize_trace(load_trace_events(path))
+    summary.update(file=path, bytes=size)
+    return navigation, summary
+
+
+def load_trace_events(path: str) -> List[Dict[str, Any]]:
+    """Read a trace file in either JSON array or ``{"traceEvents": [...]}`` format."""
+    with open(path) as f:
+        data = json.load(f)
+    return data.get('traceEvents', []) if isinstance(data, dict) else data
+
+
+def _main_threads(events: List[Dict[str, Any]]) -> Optional[set]:
+    threads = {(e.get('pid'), e.get('tid')) for e in events
+               if e.get('ph') == 'M' and e.get('name') == 'thread_name'
+               and e.get('args', {}).get('name') == 'CrRendererMain'}
+    return threads or None
+
+
+def _complete_events(events: List[Dict[str, Any]], threads: Optional[set]) -> Dict[tuple, List[tuple]]:
+    """Turn X events and matched B/E pairs into (start, end, name) per thread."""
+    spans: Dict[tuple, List[tuple]] = {}
+    open_spans: Dict[tuple, List[Dict[str, Any]]] = {}
+    for event in sorted((e for e in events if 'ts' in e), key=lambda e: e['ts']):
+        thread = (event.get('pid'), event.get('tid'))
+        if threads is not None and thread not in threads:
+            continue
+        phase = event.get('ph')
+        if phase == 'X':
+            spans.setdefault(thread, []).append((event['ts'], event['ts'] + event.get('dur', 0), event['name']))
+        elif phase == 'B':
+            open_spans.setdefault(thread, []).append(event)
+        elif phase == 'E' and open_spans.get(thread):
+            begin = open_spans[thread].pop()
+            spans.setdefault(thread, []).append((begin['ts'], event['ts'], begin['name']))
+    return spans
+
+
+def _self_times(spans: List[tuple]) -> Dict[str, float]:
+    """Self time (µs) per category for properly nested spans of one thread."""
+    totals = {category: 0.0 for category in BREAKDOWN}
+    # Parents first: earlier start, then longer duration
+    spans = sorted(spans, key=lambda s: (s[0], -(s[1] - s[0])))
+    stack: List[list] = []  # [end, category, child time, duration]
+
+    def pop():
+        end, category, children, duration = stack.pop()
+        totals[category] += max(duration - children, 0)
+
+    for start, end, name in spans:
+        while stack and start >= stack[-1][0]:
+            pop()
+        duration = end - start
+        if stack:
+            stack[-1][2] += duration
+        stack.append([end, event_category(name), 0.0, duration])
+    while stack:
+        pop()
+    return totals
+
+
+def _network_time(events: List[Dict[str, Any]]) -> float:
+    """Wall-clock µs with at least one request between send and finish/failure."""
+    starts: Dict[str, float] = {}
+    intervals = []
+    for event in sorted((e for e in events if 'ts' in e), key=lambda e: e['ts']):
+        data = event.get('args', {}).get('data', {})
+        request_id = data.get('requestId')
+        if not request_id:
+            continue
+        if event.get('name') == 'ResourceSendRequest':
+            starts.setdefault(request_id, event['ts'])
+        elif event.get('name') == 'ResourceFinish' and request_id in starts:
+            intervals.append((starts.pop(request_id), event['ts']))
+
+    total = 0.0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+def summarize_trace(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Break a navigation trace down into where the renderer main thread spent its time.
+
+    Returns:
+        dict: Seconds of main-thread self time per category in BREAKDOWN,
+        ``main_thread`` (their sum), ``network`` (time with requests in
+        flight) and the number of trace events
+    """
+    threads = _main_threads(events)
+    totals = {category: 0.0 for category in BREAKDOWN}
+    for spans in _complete_events(events, threads).values():
+        for category, value in _self_times(spans).items():
+            totals[category] += value
+
+    summary = {category: value / 1e6 for category, value in totals.items()}
+    summary['main_thread'] = sum(totals.values()) / 1e6
+    summary['network'] = _network_time(events) / 1e6
+    summary['events'] = len(events)
+    return summary
+
+
+def aggregate_traces(summaries: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Median of every breakdown category (and network) over several traced loads."""
+    if not summaries:
+        return {}
+    return {key: statistics.median(s[key] for s in summaries)
+            for key in BREAKDOWN + ['main_thread', 'network']}
+
+
+def explain_difference(baseline: Dict[str, float], candidate: Dict[str, float],
+                       threshold: float = 0.001) -> List[Tuple[str, float]]:
+    """
+    Categories whose time changed by more than ``threshold`` seconds,
+    largest absolute change first.
+
+    Returns:
+        list: (category, candidate - baseline) pairs
+    """
+    deltas = [(key, candidate[key] - baseline[key]) for key in BREAKDOWN + ['network']
+              if key in candidate and key in baseline]
+    return sorted([d for d in deltas if abs(d[1]) > threshold], key=lambda d: -abs(d[1]))
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Crash and hang recovery of the supervised browser.
+
+While a stream of page loads runs against the container, the browser process
+is killed mid-load (``kill -KILL``, a crash) or frozen (``kill -STOP``, a hang
+the supervisor's CDP heartbeat has to detect) with ``docker exec``. Recovery
+time runs from the signal to the first ``/json/version`` answered by the
+restarted browser; loads that fail in between are the cost of the outage.
+The supervisor's own restart, crash, hang and downtime counters are read from
+its ``/supervisor`` status endpoint inside the container.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from cdp_client import CDPError, CDPSession
+from stats import summarize
+from supervisor import STATUS_PORT
+
+# Signal sent to the browser for each failure mode
+KILL_SIGNALS = {
+    'crash': '-KILL',
+    'hang': '-STOP'
+}
+
+
+def status_command(status_port: int = STATUS_PORT) -> List[str]:
+    """Command that prints the supervisor status from inside the container."""
+    return ['python3', '-c', 'import urllib.request; print(urllib.request.urlopen('
+                             f'"http://127.0.0.1:{status_port}/supervisor", timeout=5).read().decode())']
+
+
+class KillBenchmark:
+    """Kills (or freezes) one container's browser under load and times the recovery."""
+
+    def __init__(self, runner, name: str, host: str, port: int, url: str, mode: str = 'crash',
+                 kills: int = 3, timeout: float = 30, status_port: int = STATUS_PORT,
+                 lead: float = 0.5, settle: float = 1.0, probe_interval: float = 0.05,
+                 probe_timeout: float = 0.5, recovery_timeout: float = 60):
+        """
+        Args:
+            runner: BenchmarkRunner whose ``run_command`` runs the ``docker exec`` calls
+            name (str): Container name
+            host (str): DevTools host
+            port (int): DevTools port
+            url (str): Page loaded over and over while the browser is killed
+            mode (str): 'crash' (SIGKILL) or 'hang' (SIGSTOP)
+            kills (int): Number of kill/recover cycles
+            timeout (float): Per-load timeout in seconds
+            status_port (int): Port of the supervisor status endpoint in the container
+            lead (float): Seconds of loading before each kill, so it lands mid-load
+            settle (float): Seconds of loading after each recovery
+            probe_interval (float): Seconds between recovery probes
+            probe_timeout (float): Timeout of one recovery probe
+            recovery_timeout (float): Seconds to wait for a recovery before giving up
+        """
+        if mode not in KILL_SIGNALS:
+            raise ValueError(f"Unknown kill mode {mode!r} (expected one of {', '.join(KILL_SIGNALS)})")
+        self.runner = runner
+        self.name = name
+        self.base_url = f'http://{host}:{port}'
+        self.ws_base = f'ws://{host}:{port}'
+        self.url = url
+        self.mode = mode
+        self.kills = kills
+        self.timeout = timeout
+        self.status_port = status_port
+        self.lead = lead
+        self.settle = settle
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.recovery_timeout = recovery_timeout
+
+    async def _exec(self, *command: str) -> Dict[str, Any]:
+        cmd = ['docker', 'exec', self.name] + list(command)
+        return await asyncio.get_running_loop().run_in_executor(None, self.runner.run_command, cmd)
+
+    async def status(self) -> Dict[str, Any]:
+        """The supervisor's status; raises RuntimeError when there is no supervisor."""
+        result = await self._exec(*status_command(self.status_port))
+        if not result['success']:
+            raise RuntimeError(f"No supervisor status: {result['stderr'].strip() or result['returncode']}")
+        return json.loads(result['stdout'])
+
+    async def load(self, http: aiohttp.ClientSession, url: str) -> Dict[str, Any]:
+        """One load of ``url`` in its own target; any failure counts against the outage."""
+        started = time.perf_counter()
+        target_id = None
+        try:
+            async with http.put(f'{self.base_url}/json/new') as response:
+                response.raise_for_status()
+                target_id = (await response.json())['id']
+            async with CDPSession(f'{self.ws_base}/devtools/page/{target_id}', timeout=self.timeout) as session:
+                await session.navigate(url)
+            result = {'success': True}
+        except (CDPError, aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+            result = {'success': False, 'error': str(e) or type(e).__name__}
+        if target_id and result['success']:
+            try:
+                async with http.get(f'{self.base_url}/json/close/{target_id}') as response:
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                pass  # The target died with its browser
+        result.update(started=started, finished=time.perf_counter())
+        return result
+
+    async def _load_loop(self, http: aiohttp.ClientSession, loads: List[Dict[str, Any]],
+                         stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            load = await self.load(http, self.url)
+            loads.append(load)
+            if not load['success']:
+                # Do not spin while the browser is down
+                await asyncio.sleep(self.probe_interval)
+
+    async def _browser_url(self, http: aiohttp.ClientSession) -> Optional[str]:
+        timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+        async with http.get(f'{self.base_url}/json/version', timeout=timeout) as response:
+            response.raise_for_status()
+            return (await response.json(content_type=None)).get('webSocketDebuggerUrl')
+
+    async def wait_for_recovery(self, http: aiohttp.ClientSession, killed_url: Optional[str],
+                                killed_at: float) -> Optional[float]:
+        """
+        Seconds from ``killed_at`` until the restarted browser answers, or None.
+
+        A browser counts as restarted once a probe fails and a later one
+        succeeds, or when ``/json/version`` names a different browser.
+        """
+        down = False
+        while time.perf_counter() - killed_at < self.recovery_timeout:
+            try:
+                browser_url = await self._browser_url(http)
+                if down or browser_url != killed_url:
+                    return time.perf_counter() - killed_at
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+                down = True
+            await asyncio.sleep(self.probe_interval)
+        return None
+
+    async def _restarted_status(self, restarts: int) -> Dict[str, Any]:
+        # The supervisor books the downtime once it sees the new browser's DevTools line
+        deadline = time.perf_counter() + 5
+        while True:
+            status = await self.status()
+            shard = status['shards'][0]
+            if (shard['up'] and shard['restarts'] > restarts) or time.perf_counter() > deadline:
+                return status
+            await asyncio.sleep(self.probe_interval)
+
+    async def kill_once(self, http: aiohttp.ClientSession, status: Dict[str, Any]) -> Dict[str, Any]:
+        """Kill the browser mid-load once and wait until it serves pages again."""
+        shard = status['shards'][0]
+        killed_url = await self._browser_url(http)
+        loads = []
+        stop = asyncio.Event()
+        loader = asyncio.ensure_future(self._load_loop(http, loads, stop))
+        try:
+            await asyncio.sleep(self.lead)
+            killed = await self._exec('kill', KILL_SIGNALS[self.mode], str(shard['pid']))
+            killed_at = time.perf_counter()
+            if not killed['success']:
+                raise RuntimeError(f"kill {shard['pid']} failed: {killed['stderr'].strip()}")
+            recovery_time = await self.wait_for_recovery(http, killed_url, killed_at)
+            if recovery_time is not None:
+                await asyncio.sleep(self.settle)
+        finally:
+            stop.set()
+            await loader
+        after = await self._restarted_status(shard['restarts']) if recovery_time is not None else await self.status()
+        return {
+            'pid': shard['pid'],
+            'new_pid': after['shards'][0]['pid'],
+            'recovery_time': recovery_time,
+            'supervisor_downtime': after['shards'][0]['last_downtime'] if recovery_time is not None else None,
+            'loads': len(loads),
+            'failed_loads': len([load for load in loads if not load['success']]),
+            # Loads that were in flight when the signal landed
+            'interrupted_loads': len([load for load in loads if not load['success']
+                                      and load['started'] <= killed_at <= load['finished']]),
+            'status': after
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        first = await self.status()
+        status = first
+        kills = []
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as http:
+            for _ in range(self.kills):
+                kill = await self.kill_once(http, status)
+                status = kill.pop('status')
+                kills.append(kill)
+                if kill['recovery_time'] is None:
+                    break
+        recovered = [kill['recovery_time'] for kill in kills if kill['recovery_time'] is not None]
+        return {
+            'success': True,
+            'mode': self.mode,
+            'kills': kills,
+            'recovery_time': summarize(recovered),
+            'unrecovered': len(kills) - len(recovered),
+            'loads': sum(kill['loads'] for kill in kills),
+            'failed_loads': sum(kill['failed_loads'] for kill in kills),
+            'interrupted_loads': sum(kill['interrupted_loads'] for kill in kills),
+            # Counted by the supervisor itself over the whole test
+            'restarts': status['restarts'] - first['restarts'],
+            'crashes': status['crashes'] - first['crashes'],
+            'hangs': status['hangs'] - first['hangs'],
+            'downtime': status['downtime'] - first['downtime']
+        }
+
+
+def run_kill_benchmark(runner, name: str, host: str, port: int, url: str, **kwargs) -> Dict[str, Any]:
+    """Synchronous wrapper around ``KillBenchmark.run``."""
+    started = time.perf_counter()
+    try:
+        result = asyncio.run(KillBenchmark(runner, name, host, port, url, **kwargs).run())
+    except (RuntimeError, ValueError, KeyError, IndexError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return {'success': False, 'error': str(e) or type(e).__name__}
+    result['elapsed'] = time.perf_counter() - started
+    return result
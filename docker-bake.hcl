@@ -0,0 +1,100 @@
+# Builds every instruction set in one BuildKit session so the shared `base`
+# stage is built once. scripts/deb_cache.py sets the `debs` context and the
+# per-target THORIUM_DEB_SHA256 so no build downloads a package.
+
+variable "THORIUM_VERSION" {
+  default = "M130.0.6723.174"
+}
+
+group "default" {
+  targets = ["avx2", "avx", "sse3", "sse4"]
+}
+
+# Headless-only images (Dockerfile `slim` stage), with and without the font layer
+group "slim" {
+  targets = ["slim-avx2", "slim-avx", "slim-sse3", "slim-sse4"]
+}
+
+group "slim-fonts" {
+  targets = ["slim-fonts-avx2", "slim-fonts-avx", "slim-fonts-sse3", "slim-fonts-sse4"]
+}
+
+target "_common" {
+  context    = "."
+  dockerfile = "Dockerfile"
+  args = {
+    THORIUM_VERSION = THORIUM_VERSION
+  }
+}
+
+target "avx2" {
+  inherits = ["_common"]
+  args     = { INSTRUCTION_SET = "AVX2" }
+  tags     = ["thorium-docker:avx2", "thorium-docker:latest", "thorium-docker:${THORIUM_VERSION}-AVX2"]
+}
+
+target "avx" {
+  inherits = ["_common"]
+  args     = { INSTRUCTION_SET = "AVX" }
+  tags     = ["thorium-docker:avx", "thorium-docker:${THORIUM_VERSION}-AVX"]
+}
+
+target "sse3" {
+  inherits = ["_common"]
+  args     = { INSTRUCTION_SET = "SSE3" }
+  tags     = ["thorium-docker:sse3", "thorium-docker:${THORIUM_VERSION}-SSE3"]
+}
+
+target "sse4" {
+  inherits = ["_common"]
+  args     = { INSTRUCTION_SET = "SSE4" }
+  tags     = ["thorium-docker:sse4", "thorium-docker:${THORIUM_VERSION}-SSE4"]
+}
+
+target "slim-avx2" {
+  inherits = ["avx2"]
+  target   = "slim"
+  tags     = ["thorium-docker:avx2-slim", "thorium-docker:${THORIUM_VERSION}-AVX2-slim"]
+}
+
+target "slim-avx" {
+  inherits = ["avx"]
+  target   = "slim"
+  tags     = ["thorium-docker:avx-slim", "thorium-docker:${THORIUM_VERSION}-AVX-slim"]
+}
+
+target "slim-sse3" {
+  inherits = ["sse3"]
+  target   = "slim"
+  tags     = ["thorium-docker:sse3-slim", "thorium-docker:${THORIUM_VERSION}-SSE3-slim"]
+}
+
+target "slim-sse4" {
+  inherits = ["sse4"]
+  target   = "slim"
+  tags     = ["thorium-docker:sse4-slim", "thorium-docker:${THORIUM_VERSION}-SSE4-slim"]
+}
+
+target "slim-fonts-avx2" {
+  inherits = ["avx2"]
+  target   = "slim-fonts"
+  tags     = ["thorium-docker:avx2-slim-fonts", "thorium-docker:${THORIUM_VERSION}-AVX2-slim-fonts"]
+}
+
+target "slim-fonts-avx" {
+  inherits = ["avx"]
+  target   = "slim-fonts"
+  tags     = ["thorium-docker:avx-slim-fonts", "thorium-docker:${THORIUM_VERSION}-AVX-slim-fonts"]
+}
+
+target "slim-fonts-sse3" {
+  inherits = ["sse3"]
+  target   = "slim-fonts"
+  tags     = ["thorium-docker:sse3-slim-fonts", "thorium-docker:${THORIUM_VERSION}-SSE3-slim-fonts"]
+}
+
+target "slim-fonts-sse4" {
+  inherits = ["sse4"]
+  target   = "slim-fonts"
+  tags     = ["thorium-docker:sse4-slim-fonts", "thorium-docker:${THORIUM_VERSION}-SSE4-slim-fonts"]
+}
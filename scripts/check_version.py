@@ -2,81 +2,350 @@
 """
 Script to check for latest Thorium version and trigger build if needed.
 Supports multiple instruction sets: AVX2, AVX, SSE3, SSE4
+
+With BACKFILL_RELEASES=N the last N releases are planned instead of only the
+latest: every (version, instruction set) pair without a published tag whose
+.deb asset is attached to the release becomes one entry of the build matrix.
+
+All (version x instruction set) tags are checked concurrently over one pooled
+aiohttp session. Failed requests are retried with exponential backoff, and
+responses carrying an ETag or Last-Modified header are kept in an on-disk
+cache so repeated runs only send conditional requests.
 """
 
+import asyncio
 import json
-import requests
-import sys
 import os
+import sys
+import time
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
 
 # Supported instruction sets
 SUPPORTED_INSTRUCTION_SETS = ['AVX2', 'AVX', 'SSE3', 'SSE4']
 
+THORIUM_REPOSITORY = 'Alex313031/thorium'
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', 'https://api.github.com')
+DOCKER_HUB_URL = os.environ.get('DOCKER_HUB_URL', 'https://hub.docker.com')
+CACHE_PATH = os.environ.get('CHECK_VERSION_CACHE',
+                            os.path.join(os.path.expanduser('~'), '.cache', 'thorium-docker', 'http-cache.json'))
+
+# .deb asset names Thorium releases have used, preferred first
+ASSET_PATTERNS = ['thorium-browser_{number}_{instruction_set}.deb',
+                  'thorium_{version}_amd64_{instruction_set}.deb']
+
+# Statuses worth another attempt; everything else is an answer
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RegistryError(Exception):
+    """Raised when a request still fails after all retries."""
+
+
+class HTTPCache:
+    """
+    ETag / Last-Modified cache persisted as one JSON file.
+
+    Only responses with a validator are stored; they are revalidated with
+    ``If-None-Match`` / ``If-Modified-Since`` and reused on ``304``.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable HTTP cache {path}: {e}")
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Conditional request headers for a cached URL."""
+        entry = self.entries.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(url)
+
+    def store(self, url: str, status: int, headers, body: str) -> None:
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+        if etag or last_modified:
+            self.entries[url] = {'status': status, 'etag': etag, 'last_modified': last_modified, 'body': body}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class RegistryClient:
+    """
+    Pooled async client for the GitHub releases API and Docker Hub tags API.
+
+    Args:
+        cache (HTTPCache): Conditional request cache (default: none)
+        concurrency (int): Maximum open connections
+        retries (int): Extra attempts after a connection error, timeout or retryable status
+        backoff (float): First retry delay in seconds, doubled on every attempt
+        timeout (float): Per-request timeout in seconds
+        github_api_url (str): GitHub API base URL (default: GITHUB_API_URL)
+        docker_hub_url (str): Docker Hub base URL (default: DOCKER_HUB_URL)
+        github_token (str): Optional token for the GitHub API rate limit
+    """
+
+    def __init__(self, cache: HTTPCache = None, concurrency: int = 16, retries: int = 3,
+                 backoff: float = 0.5, timeout: float = 10, github_api_url: str = None,
+                 docker_hub_url: str = None, github_token: str = None):
+        self.cache = cache or HTTPCache()
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.github_api_url = (github_api_url or GITHUB_API_URL).rstrip('/')
+        self.docker_hub_url = (docker_hub_url or DOCKER_HUB_URL).rstrip('/')
+        self.github_token = github_token
+        self.stats = {'requests': 0, 'retries': 0, 'not_modified': 0}
+        self._session = None
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self.cache.save()
+
+    async def get(self, url: str, headers: Dict[str, str] = None) -> Tuple[int, str]:
+        """
+        GET a URL with retries, revalidating cached responses.
+
+        Returns:
+            tuple: (status, body); a ``304`` is answered from the cache
+        """
+        headers = dict(headers or {}, **self.cache.validators(url))
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            self.stats['requests'] += 1
+            try:
+                async with self._session.get(url, headers=headers) as response:
+                    if response.status == 304 and self.cache.get(url):
+                        self.stats['not_modified'] += 1
+                        entry = self.cache.get(url)
+                        return entry['status'], entry['body']
+                    body = await response.text()
+                    if response.status not in RETRY_STATUSES:
+                        self.cache.store(url, response.status, response.headers, body)
+                        return response.status, body
+                    error = f"HTTP {response.status}"
+                    retry_after = response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt < self.retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+                delay *= 2
+        raise RegistryError(f"{url}: {error} after {self.retries + 1} attempts")
+
+    async def get_json(self, url: str) -> Any:
+        headers = {'Accept': 'application/vnd.github+json'}
+        if self.github_token and url.startswith(self.github_api_url):
+            headers['Authorization'] = f'Bearer {self.github_token}'
+        status, body = await self.get(url, headers)
+        if status != 200:
+            raise RegistryError(f"{url}: HTTP {status}")
+        return json.loads(body)
+
+    async def latest_version(self) -> str:
+        """Tag of the latest Thorium release."""
+        release = await self.get_json(f'{self.github_api_url}/repos/{THORIUM_REPOSITORY}/releases/latest')
+        return release['tag_name']
+
+    async def releases(self, count: int = 5) -> List[Dict[str, Any]]:
+        """The ``count`` most recent published Thorium releases, newest first."""
+        releases = await self.get_json(
+            f'{self.github_api_url}/repos/{THORIUM_REPOSITORY}/releases?per_page={max(count * 2, 10)}')
+        return [r for r in releases if not r.get('draft') and not r.get('prerelease')][:count]
+
+    async def release(self, version: str) -> Dict[str, Any]:
+        """The Thorium release tagged ``version``."""
+        return await self.get_json(f'{self.github_api_url}/repos/{THORIUM_REPOSITORY}/releases/tags/{version}')
+
+    async def release_versions(self, count: int = 5) -> List[str]:
+        """Tags of the ``count`` most recent Thorium releases, newest first."""
+        return [r['tag_name'] for r in await self.releases(count)]
+
+    async def tag_exists(self, image_name: str, tag: str) -> bool:
+        """Whether ``image_name:tag`` is published on Docker Hub."""
+        status, _ = await self.get(f'{self.docker_hub_url}/v2/repositories/{image_name}/tags/{tag}/')
+        if status == 200:
+            return True
+        if status == 404:
+            return False
+        raise RegistryError(f"{image_name}:{tag}: HTTP {status}")
+
+    async def check_tags(self, image_name: str, versions: List[str],
+                         instruction_sets: List[str]) -> Dict[Tuple[str, str], bool]:
+        """
+        Check every ``<version>-<INSTRUCTION_SET>`` tag concurrently.
+
+        A tag that could not be checked is reported as missing, so a flaky
+        registry leads to a rebuild rather than a skipped release.
+
+        Returns:
+            dict: (version, instruction_set) -> exists, in input order
+        """
+        pairs = [(version, instruction_set) for version in versions for instruction_set in instruction_sets]
+
+        async def check(version, instruction_set):
+            tag = f"{version}-{instruction_set}"
+            try:
+                exists = await self.tag_exists(image_name, tag)
+            except RegistryError as e:
+                print(f"Error checking Docker image: {e}")
+                return False
+            print(f"Image {image_name}:{tag} {'already exists' if exists else 'does not exist'}")
+            return exists
+
+        found = await asyncio.gather(*(check(*pair) for pair in pairs))
+        return OrderedDict(zip(pairs, found))
+
+
+def asset_names(version: str, instruction_set: str) -> List[str]:
+    """Candidate .deb asset names for a release, preferred first."""
+    return [pattern.format(version=version, number=version.lstrip('M'), instruction_set=instruction_set)
+            for pattern in ASSET_PATTERNS]
+
+
+def find_asset(release: Dict[str, Any], instruction_set: str) -> Optional[Dict[str, Any]]:
+    """
+    The fully uploaded .deb asset of ``release`` for an instruction set.
+
+    Returns:
+        dict: GitHub asset (``name``, ``browser_download_url``, ...), or None
+    """
+    assets = {a['name']: a for a in release.get('assets', []) if a.get('state', 'uploaded') == 'uploaded'}
+    for name in asset_names(release['tag_name'], instruction_set):
+        if name in assets:
+            return assets[name]
+    return None
+
+
+async def plan_builds(client: RegistryClient, image_name: str, releases: List[Dict[str, Any]],
+                      instruction_sets: List[str], rebuild: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Build matrix for the (version, instruction set) pairs that still need an image.
+
+    Pairs whose tag is already published are left out unless ``rebuild`` is
+    set; pairs without a .deb asset on the release are reported as skipped
+    instead of scheduled, since their build could only fail.
+
+    Args:
+        client (RegistryClient): Open client
+        image_name (str): Docker image name
+        releases (list): GitHub releases, newest first
+        instruction_sets (list): Instruction sets to plan
+        rebuild (bool): Also schedule pairs whose tag exists
+
+    Returns:
+        dict: ``include`` (matrix entries with version, instruction_set,
+        deb_url and latest) and ``skipped`` (version, instruction_set, reason)
+    """
+    versions = [release['tag_name'] for release in releases]
+    found = {} if rebuild else await client.check_tags(image_name, versions, instruction_sets)
+    include, skipped = [], []
+    for release in releases:
+        version = release['tag_name']
+        for instruction_set in instruction_sets:
+            if found.get((version, instruction_set)):
+                continue
+            asset = find_asset(release, instruction_set)
+            if asset is None:
+                print(f"Skipping {version}-{instruction_set}: no .deb asset in the release")
+                skipped.append({'version': version, 'instruction_set': instruction_set, 'reason': 'no .deb asset'})
+                continue
+            include.append({
+                'version': version,
+                'instruction_set': instruction_set,
+                'deb_url': asset['browser_download_url'],
+                'latest': version == versions[0]
+            })
+    return {'include': include, 'skipped': skipped}
+
+
+def registry_client(**kwargs) -> RegistryClient:
+    kwargs.setdefault('cache', HTTPCache(CACHE_PATH))
+    kwargs.setdefault('github_token', os.environ.get('GITHUB_TOKEN'))
+    return RegistryClient(**kwargs)
+
+
 def get_latest_thorium_version():
     """
     Get the latest Thorium version from GitHub releases.
-    
+
     Returns:
         str: Latest version tag
     """
+    async def fetch():
+        async with registry_client() as client:
+            return await client.latest_version()
+
     try:
-        url = "https://api.github.com/repos/Alex313031/thorium/releases/latest"
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        
-        release_data = response.json()
-        latest_version = release_data['tag_name']
-        
+        latest_version = asyncio.run(fetch())
         print(f"Latest Thorium version: {latest_version}")
         return latest_version
-        
-    except requests.RequestException as e:
+    except RegistryError as e:
         print(f"Error fetching latest version: {e}")
         return None
-    except KeyError as e:
+    except (KeyError, ValueError) as e:
         print(f"Error parsing release data: {e}")
         return None
 
+
 def check_docker_image_exists(image_name, version, instruction_set):
     """
     Check if Docker image with specific version and instruction set already exists.
-    
+
     Args:
         image_name (str): Docker image name
         version (str): Version to check
         instruction_set (str): Instruction set to check
-        
+
     Returns:
         bool: True if image exists, False otherwise
     """
-    try:
-        # Use Docker Hub API to check if image exists
-        tag = f"{version}-{instruction_set}"
-        url = f"https://hub.docker.com/v2/repositories/{image_name}/tags/{tag}/"
-        response = requests.get(url, timeout=30)
-        
-        if response.status_code == 200:
-            print(f"Image {image_name}:{tag} already exists")
-            return True
-        else:
-            print(f"Image {image_name}:{tag} does not exist")
-            return False
-            
-    except requests.RequestException as e:
-        print(f"Error checking Docker image: {e}")
-        return False
+    return check_all_instruction_sets(image_name, version, [instruction_set])[1] == []
+
 
 def get_instruction_sets_to_build():
     """
     Get instruction sets to build from environment or default to all.
-    
+
     Returns:
         list: List of instruction sets to build
     """
     # Check if specific instruction set is requested
     instruction_set = os.environ.get('INSTRUCTION_SET', '').strip()
-    
+
     if instruction_set and instruction_set.upper() in SUPPORTED_INSTRUCTION_SETS:
         return [instruction_set.upper()]
     elif instruction_set and instruction_set.lower() == 'all':
@@ -85,76 +354,123 @@ def get_instruction_sets_to_build():
         # Default to all instruction sets
         return SUPPORTED_INSTRUCTION_SETS
 
+
 def check_all_instruction_sets(image_name, version, instruction_sets):
     """
     Check if all instruction set versions exist.
-    
+
     Args:
         image_name (str): Docker image name
         version (str): Version to check
         instruction_sets (list): List of instruction sets to check
-        
+
     Returns:
         tuple: (should_build, missing_sets)
     """
-    missing_sets = []
-    
-    for instruction_set in instruction_sets:
-        if not check_docker_image_exists(image_name, version, instruction_set):
-            missing_sets.append(instruction_set)
-    
+    async def check():
+        async with registry_client() as client:
+            return await client.check_tags(image_name, [version], instruction_sets)
+
+    found = asyncio.run(check())
+    missing_sets = [instruction_set for (_, instruction_set), exists in found.items() if not exists]
+
     should_build = len(missing_sets) > 0
     return should_build, missing_sets
 
+
+def set_output(name, value):
+    """Publish a step output for GitHub Actions."""
+    output_file = os.environ.get('GITHUB_OUTPUT')
+    if output_file:
+        with open(output_file, 'a') as f:
+            f.write(f"{name}={value}\n")
+    else:
+        print(f"::set-output name={name}::{value}")
+
+
 def main():
     """
-    Main function to check version and determine if build is needed.
+    Main function to check versions and plan the builds that are needed.
+
+    Exits 0 whether or not anything needs building (see ``should_build``)
+    and 1 only when the releases could not be fetched.
     """
-    # Get repository name from environment
-    repo_name = os.environ.get('GITHUB_REPOSITORY', 'chennqqi/thorium-docker')
-    
-    # Get latest version
-    latest_version = get_latest_thorium_version()
-    if not latest_version:
-        print("Failed to get latest version")
-        sys.exit(1)
-    
+    # Image to check: the workflow's IMAGE_NAME, else the repository name
+    repo_name = os.environ.get('IMAGE_NAME') or os.environ.get('GITHUB_REPOSITORY', 'chennqqi/thorium-docker')
+    requested_version = os.environ.get('THORIUM_VERSION', '').strip() or None
+    release_count = int(os.environ.get('BACKFILL_RELEASES', '').strip() or 1)
+    rebuild = os.environ.get('REBUILD_EXISTING', '').strip().lower() == 'true'
+
     # Get instruction sets to build
     instruction_sets = get_instruction_sets_to_build()
     print(f"Checking instruction sets: {', '.join(instruction_sets)}")
-    
-    # Check if images already exist
-    should_build, missing_sets = check_all_instruction_sets(repo_name, latest_version, instruction_sets)
-    
+
+    async def run():
+        async with registry_client() as client:
+            if requested_version:
+                releases = [await client.release(requested_version)]
+            else:
+                releases = await client.releases(release_count)
+            if not releases:
+                raise RegistryError("no published Thorium releases")
+            print(f"Planning releases: {', '.join(r['tag_name'] for r in releases)}")
+            plan = await plan_builds(client, repo_name, releases, instruction_sets, rebuild)
+            return releases, plan, client.stats
+
+    started = time.perf_counter()
+    try:
+        releases, plan, stats = asyncio.run(run())
+    except RegistryError as e:
+        print(f"Error fetching releases: {e}")
+        print("Failed to get latest version")
+        sys.exit(1)
+    except (KeyError, ValueError) as e:
+        print(f"Error parsing release data: {e}")
+        sys.exit(1)
+    print(f"Checked {len(releases) * len(instruction_sets)} tags in {time.perf_counter() - started:.2f}s "
+          f"({stats['requests']} requests, {stats['retries']} retries, {stats['not_modified']} not modified)")
+
+    latest_version = releases[0]['tag_name']
+    versions = [release['tag_name'] for release in releases]
+    missing_sets = [b['instruction_set'] for b in plan['include'] if b['version'] == latest_version]
+    should_build = len(plan['include']) > 0
+
     # Output results for GitHub Actions
-    print(f"::set-output name=latest_version::{latest_version}")
-    print(f"::set-output name=should_build::{should_build}")
-    print(f"::set-output name=instruction_sets::{','.join(instruction_sets)}")
-    
+    set_output('latest_version', latest_version)
+    set_output('versions', ','.join(versions))
+    set_output('should_build', str(should_build).lower())
+    # Whether the newest release itself is being built (backfills of older ones are not)
+    set_output('latest_missing', str(bool(missing_sets)).lower())
+    set_output('instruction_sets', ','.join(instruction_sets))
+    set_output('matrix', json.dumps({'include': plan['include']}, separators=(',', ':')))
+
     if missing_sets:
-        print(f"::set-output name=missing_sets::{','.join(missing_sets)}")
-    
+        set_output('missing_sets', ','.join(missing_sets))
+
     # Create version info file
     version_info = {
         'latest_version': latest_version,
+        'versions': versions,
         'should_build': should_build,
         'instruction_sets': instruction_sets,
         'missing_sets': missing_sets,
+        'builds': plan['include'],
+        'skipped': plan['skipped'],
         'checked_at': datetime.utcnow().isoformat(),
         'repository': repo_name
     }
-    
+
     with open('version_info.json', 'w') as f:
         json.dump(version_info, f, indent=2)
-    
+
     print(f"Version info saved to version_info.json")
-    
+
     if should_build:
-        print(f"Build needed for missing instruction sets: {', '.join(missing_sets)}")
-        sys.exit(0)
+        for build in plan['include']:
+            print(f"Build needed: {build['version']}-{build['instruction_set']}")
     else:
         print("No build needed - all instruction set versions exist")
-        sys.exit(1)
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of Thorium .deb packages for image builds.
+
+``fetch`` resolves the package of every requested instruction set through the
+GitHub releases API, downloads the missing ones concurrently and stores each
+one as ``<cache>/sha256/<digest>``, checked against the size and digest GitHub
+publishes for the asset. ``build`` then runs ``docker buildx bake`` for all
+instruction sets at once, so the builds share the ``base`` stage and none of
+them downloads a package. Each target's ``debs`` build context is
+``<cache>/contexts/<digest>``, holding a hard link to its own package only:
+a build ships one .deb to BuildKit, and a new package does not invalidate the
+other targets' layers. ``prune`` drops every other version from the cache.
+
+    python3 scripts/deb_cache.py build --version M130.0.6723.174
+    python3 scripts/deb_cache.py prune --version M130.0.6723.174
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from check_version import (RETRY_STATUSES, SUPPORTED_INSTRUCTION_SETS, RegistryError, find_asset,
+                           registry_client)
+
+CACHE_DIR = os.environ.get('THORIUM_DEB_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'thorium-docker', 'debs'))
+DEFAULT_VERSION = 'M130.0.6723.174'
+BAKE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'docker-bake.hcl')
+
+# Read/write size while hashing packages
+CHUNK_SIZE = 1024 * 1024
+
+
+class DebCacheError(Exception):
+    """Raised when a package cannot be fetched or fails verification."""
+
+
+def file_sha256(path: str) -> str:
+    """Hex sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DebCache:
+    """
+    Packages stored by sha256 plus an index of (version, instruction set) -> digest.
+
+    Args:
+        path (str): Cache directory (default: CACHE_DIR)
+        retries (int): Extra download attempts after a connection error or retryable status
+        backoff (float): First retry delay in seconds, doubled on every attempt
+        timeout (float): Per-download timeout in seconds
+    """
+
+    def __init__(self, path: str = None, retries: int = 3, backoff: float = 1.0, timeout: float = 900):
+        self.path = path or CACHE_DIR
+        self.blob_dir = os.path.join(self.path, 'sha256')
+        self.context_root = os.path.join(self.path, 'contexts')
+        self.index_path = os.path.join(self.path, 'index.json')
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.stats = {'hits': 0, 'downloads': 0, 'bytes': 0}
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest)
+
+    def context_dir(self, digest: str) -> str:
+        """
+        Build context holding only the blob ``digest``, hard linked (copied across filesystems).
+        """
+        context = os.path.join(self.context_root, digest)
+        path = os.path.join(context, digest)
+        # A blob fetched again after corruption is a new file; relink it
+        if os.path.exists(path) and os.path.samefile(path, self.blob_path(digest)):
+            return context
+        os.makedirs(context, exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        try:
+            os.link(self.blob_path(digest), path)
+        except OSError:
+            shutil.copyfile(self.blob_path(digest), path)
+        return context
+
+    def prune(self, keep_versions: List[str]) -> Tuple[int, int]:
+        """
+        Forget every version not in ``keep_versions`` and delete blobs nothing refers to.
+
+        Per-target build contexts are removed as well; ``context_dir`` recreates them.
+
+        Returns:
+            tuple: (blobs removed, bytes freed)
+        """
+        self.index = {key: entry for key, entry in self.index.items()
+                      if key.partition('/')[0] in keep_versions}
+        self.save_index()
+        if os.path.isdir(self.context_root):
+            shutil.rmtree(self.context_root)
+
+        referenced = {entry['sha256'] for entry in self.index.values()}
+        removed = freed = 0
+        if os.path.isdir(self.blob_dir):
+            for name in os.listdir(self.blob_dir):
+                # Skips in-progress downloads (.<name>.<pid>.part) too
+                if name in referenced or name.startswith('.'):
+                    continue
+                freed += os.path.getsize(self.blob_path(name))
+                os.remove(self.blob_path(name))
+                removed += 1
+        return removed, freed
+
+    def save_index(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def lookup(self, version: str, instruction_set: str, verify: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Cached entry of a package whose blob is present (and intact when ``verify``).
+
+        A blob whose content no longer matches its digest is deleted.
+        """
+        entry = self.index.get(f'{version}/{instruction_set}')
+        if not entry or not os.path.exists(self.blob_path(entry['sha256'])):
+            return None
+        if verify and file_sha256(self.blob_path(entry['sha256'])) != entry['sha256']:
+            print(f"Cached {entry['name']} is corrupt, fetching it again")
+            os.remove(self.blob_path(entry['sha256']))
+            return None
+        return entry
+
+    async def fetch(self, version: str, instruction_sets: List[str], client=None,
+                    verify: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Make sure the packages of ``version`` are cached, downloading missing ones concurrently.
+
+        Args:
+            version (str): Thorium release tag
+            instruction_sets (list): Instruction sets to fetch
+            client (RegistryClient): Open client for the releases API (default: a new one)
+            verify (bool): Re-hash cached blobs before trusting them
+
+        Returns:
+            dict: instruction_set -> entry (sha256, size, name, url)
+        """
+        entries = {}
+        missing = []
+        for instruction_set in instruction_sets:
+            entry = self.lookup(version, instruction_set, verify)
+            if entry:
+                self.stats['hits'] += 1
+                entries[instruction_set] = entry
+            else:
+                missing.append(instruction_set)
+
+        if missing:
+            if client is None:
+                async with registry_client() as own_client:
+                    release = await own_client.release(version)
+            else:
+                release = await client.release(version)
+            os.makedirs(self.blob_dir, exist_ok=True)
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                downloaded = await asyncio.gather(*(self._download(session, release, instruction_set)
+                                                    for instruction_set in missing))
+            for instruction_set, entry in zip(missing, downloaded):
+                self.index[f'{version}/{instruction_set}'] = entry
+                entries[instruction_set] = entry
+            self.save_index()
+
+        return {instruction_set: entries[instruction_set] for instruction_set in instruction_sets}
+
+    async def _download(self, session: aiohttp.ClientSession, release: Dict[str, Any],
+                        instruction_set: str) -> Dict[str, Any]:
+        asset = find_asset(release, instruction_set)
+        if asset is None:
+            raise DebCacheError(f"{release['tag_name']} has no .deb asset for {instruction_set}")
+        url = asset['browser_download_url']
+        part_path = os.path.join(self.blob_dir, f".{asset['name']}.{os.getpid()}.part")
+        print(f"Downloading {asset['name']}...")
+
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                digest, size = await self._stream(session, url, part_path)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, RegistryError) as e:
+                error = str(e) or type(e).__name__
+            if attempt == self.retries:
+                self._discard(part_path)
+                raise DebCacheError(f"{url}: {error} after {self.retries + 1} attempts")
+            await asyncio.sleep(delay)
+            delay *= 2
+
+        expected = (asset.get('digest') or '').partition('sha256:')[2]
+        if asset.get('size') and size != asset['size']:
+            self._discard(part_path)
+            raise DebCacheError(f"{asset['name']}: got {size} bytes, release lists {asset['size']}")
+        if expected and digest != expected:
+            self._discard(part_path)
+            raise DebCacheError(f"{asset['name']}: sha256 {digest} does not match the release ({expected})")
+
+        os.replace(part_path, self.blob_path(digest))
+        self.stats['downloads'] += 1
+        self.stats['bytes'] += size
+        return {'sha256': digest, 'size': size, 'name': asset['name'], 'url': url}
+
+    async def _stream(self, session: aiohttp.ClientSession, url: str, part_path: str):
+        digest = hashlib.sha256()
+        size = 0
+        async with session.get(url) as response:
+            if response.status in RETRY_STATUSES:
+                raise RegistryError(f"HTTP {response.status}")
+            if response.status != 200:
+                raise DebCacheError(f"{url}: HTTP {response.status}")
+            with open(part_path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        return digest.hexdigest(), size
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Bake target prefix of each image variant (see docker-bake.hcl)
+VARIANTS = {'full': '', 'slim': 'slim-', 'slim-fonts': 'slim-fonts-'}
+
+
+def bake_command(entries: Dict[str, Dict[str, Any]], cache: DebCache, load: bool = True,
+                 push: bool = False, variant: str = 'full') -> List[str]:
+    """
+    ``docker buildx bake`` command building the given instruction sets from the cache.
+
+    Args:
+        entries (dict): instruction_set -> cache entry from DebCache.fetch
+        cache (DebCache): Cache providing each target's single-package ``debs`` context
+        load (bool): Load the images into the local Docker engine
+        push (bool): Push the images instead
+        variant (str): Image variant, one of VARIANTS
+
+    Returns:
+        list: Command line
+    """
+    command = ['docker', 'buildx', 'bake', '-f', os.path.normpath(BAKE_FILE)]
+    targets = [VARIANTS[variant] + instruction_set.lower() for instruction_set in entries]
+    for target, entry in zip(targets, entries.values()):
+        command += ['--set', f"{target}.contexts.debs={cache.context_dir(entry['sha256'])}",
+                    '--set', f"{target}.args.THORIUM_DEB_SHA256={entry['sha256']}"]
+    if push:
+        command.append('--push')
+    elif load:
+        command.append('--load')
+    return command + targets
+
+
+def main():
+    """
+    Prefetch packages, list or prune the cache, or build every instruction set from it.
+    """
+    parser = argparse.ArgumentParser(description='Content-addressed Thorium .deb cache for image builds')
+    parser.add_argument('command', choices=['fetch', 'build', 'list', 'prune'],
+                        help='fetch: prefetch and verify; build: fetch then bake all images; list: cache contents; '
+                             'prune: drop every version but --version')
+    parser.add_argument('--version', default=os.environ.get('THORIUM_VERSION') or DEFAULT_VERSION,
+                        help=f'Thorium release (default: {DEFAULT_VERSION})')
+    parser.add_argument('--isa', nargs='+', default=SUPPORTED_INSTRUCTION_SETS,
+                        type=str.upper, choices=SUPPORTED_INSTRUCTION_SETS, help='Instruction sets (default: all)')
+    parser.add_argument('--cache', default=CACHE_DIR, help=f'Cache directory (default: {CACHE_DIR})')
+    parser.add_argument('--no-verify', action='store_true', help='Trust cached blobs without re-hashing them')
+    parser.add_argument('--variant', choices=list(VARIANTS), default='full',
+                        help='build: full image, headless-only slim image, or slim plus the font layer')
+    parser.add_argument('--push', action='store_true', help='build: push the images instead of loading them')
+    parser.add_argument('--dry-run', action='store_true', help='build: print the bake command only')
+    args = parser.parse_args()
+
+    cache = DebCache(args.cache)
+    if args.command == 'list':
+        for key, entry in sorted(cache.index.items()):
+            present = os.path.exists(cache.blob_path(entry['sha256']))
+            print(f"{key:28} sha256:{entry['sha256'][:16]}  {entry['size'] / 1e6:7.1f} MB  "
+                  f"{entry['name']}{'' if present else '  (missing)'}")
+        return
+    if args.command == 'prune':
+        removed, freed = cache.prune([args.version])
+        print(f"Removed {removed} package(s), freed {freed / 1e6:.1f} MB; kept {args.version}")
+        return
+
+    try:
+        entries = asyncio.run(cache.fetch(args.version, args.isa, verify=not args.no_verify))
+    except (DebCacheError, RegistryError) as e:
+        print(f"Error fetching packages: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{cache.stats['hits']} cached, {cache.stats['downloads']} downloaded "
+          f"({cache.stats['bytes'] / 1e6:.1f} MB)")
+    for instruction_set, entry in entries.items():
+        print(f"  {instruction_set:5} sha256:{entry['sha256']}  {entry['name']}")
+
+    if args.command == 'build':
+        command = bake_command(entries, cache, push=args.push, variant=args.variant)
+        print(' '.join(command))
+        if not args.dry_run:
+            env = dict(os.environ, THORIUM_VERSION=args.version)
+            sys.exit(subprocess.call(command, env=env, cwd=os.path.dirname(os.path.normpath(BAKE_FILE))))
+
+
+if __name__ == "__main__":
+    main()
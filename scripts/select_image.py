@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Pick the fastest Thorium image the host CPU can run.
+
+Reads the CPU flags from /proc/cpuinfo, maps them to the best compatible
+instruction set build (AVX2 > AVX > SSE4 > SSE3) and prints the image tag for
+compose/k8s templating. With --benchmark it also loads a JS-heavy page from
+the local page corpus in every compatible image to confirm the choice.
+
+    docker run -d -p 9222:9222 --security-opt seccomp=unconfined --cap-add SYS_ADMIN "$(python3 scripts/select_image.py)"
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+# Fastest first. Flag names as the Linux kernel reports them ("pni" is SSE3).
+INSTRUCTION_SET_FLAGS = [
+    ('AVX2', {'avx2', 'fma', 'avx', 'sse4_2', 'sse4_1', 'ssse3', 'pni'}),
+    ('AVX', {'avx', 'sse4_2', 'sse4_1', 'ssse3', 'pni'}),
+    ('SSE4', {'sse4_2', 'sse4_1', 'ssse3', 'pni'}),
+    ('SSE3', {'pni'}),
+]
+
+DEFAULT_IMAGE = 'thorium-docker'
+
+
+def read_cpu_flags(cpuinfo_path='/proc/cpuinfo'):
+    """
+    Read the CPU flags supported by every core.
+
+    Args:
+        cpuinfo_path (str): Path to cpuinfo
+
+    Returns:
+        set: Flags present on all processors (empty if none are listed)
+    """
+    flags = None
+    with open(cpuinfo_path) as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key.strip() == 'flags':
+                core_flags = set(value.split())
+                flags = core_flags if flags is None else flags & core_flags
+    return flags or set()
+
+
+def compatible_instruction_sets(flags):
+    """
+    List the instruction set builds the CPU can run, fastest first.
+
+    Args:
+        flags (set): CPU flags from read_cpu_flags
+
+    Returns:
+        list: Instruction set names, e.g. ['AVX', 'SSE4', 'SSE3']
+    """
+    return [name for name, required in INSTRUCTION_SET_FLAGS if required <= flags]
+
+
+def image_tag(image, instruction_set, version=None):
+    """
+    Build the image tag for an instruction set.
+
+    Local builds are tagged ``thorium-docker:avx2``; published images with a
+    version use ``<version>-<INSTRUCTION_SET>`` like check_version.py.
+    """
+    if version:
+        return f"{image}:{version}-{instruction_set}"
+    return f"{image}:{instruction_set.lower()}"
+
+
+def micro_benchmark(image, instruction_sets, iterations=5, version=None):
+    """
+    Load the local corpus SPA page in each image and time the warm loads.
+
+    Args:
+        image (str): Image repository
+        instruction_sets (list): Instruction sets to try
+        iterations (int): Page loads per image (the first one is discarded)
+        version (str): Thorium version tag, if using published images
+
+    Returns:
+        dict: Instruction set -> list of warm load times in seconds
+    """
+    from benchmark import CORPUS_HOST, BenchmarkRunner
+    from page_server import PageServer
+
+    runner = BenchmarkRunner(iterations=iterations)
+    server = PageServer('0.0.0.0').start_background()
+    url = server.url('spa.html', host=CORPUS_HOST)
+    timings = {}
+    try:
+        for index, instruction_set in enumerate(instruction_sets):
+            tag = image_tag(image, instruction_set, version)
+            name = f"select-image-{instruction_set.lower()}"
+            port = 9290 + index
+            startup = runner.start_container(tag, name, port)
+            if not startup['success']:
+                print(f"Could not start {tag}: {startup['stderr'].strip()}", file=sys.stderr)
+                continue
+            try:
+                loads = [runner.test_page_load(port, url) for _ in range(iterations)]
+            finally:
+                runner.run_command(['docker', 'rm', '-f', name], timeout=30)
+            timings[instruction_set] = [load['load_time'] for load in loads[1:] if load['success']]
+            print(f"{tag}: {len(timings[instruction_set])} warm loads", file=sys.stderr)
+    finally:
+        server.stop_background()
+    return timings
+
+
+def recommend(flags, timings=None):
+    """
+    Pick the instruction set to run.
+
+    The fastest compatible build by CPU flags is recommended unless the
+    micro-benchmark shows another compatible build significantly faster.
+
+    Returns:
+        dict: recommendation with the compatible sets and benchmark verdict
+    """
+    from stats import significantly_lower
+
+    compatible = compatible_instruction_sets(flags)
+    recommendation = {
+        'instruction_set': compatible[0] if compatible else None,
+        'compatible': compatible,
+        'confirmed': None
+    }
+    if not compatible or not timings:
+        return recommendation
+
+    chosen = compatible[0]
+    measured = {isa: times for isa, times in timings.items() if times}
+    recommendation['benchmark'] = {isa: statistics.mean(times) for isa, times in measured.items()}
+    if chosen not in measured:
+        return recommendation
+    fastest = min(measured, key=lambda isa: statistics.mean(measured[isa]))
+    if fastest != chosen and significantly_lower(measured[fastest], measured[chosen]):
+        recommendation['instruction_set'] = fastest
+        recommendation['confirmed'] = False
+    else:
+        recommendation['confirmed'] = True
+    return recommendation
+
+
+def main():
+    """
+    Print the recommended image for this host.
+    """
+    parser = argparse.ArgumentParser(description='Recommend the fastest Thorium image for this CPU')
+    parser.add_argument('--image', default=os.environ.get('THORIUM_IMAGE_REPO', DEFAULT_IMAGE),
+                        help=f'Image repository (default: {DEFAULT_IMAGE})')
+    parser.add_argument('--version', help='Thorium version for published <version>-<SET> tags')
+    parser.add_argument('--cpuinfo', default='/proc/cpuinfo', help='cpuinfo file to read')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Confirm with a short page-load micro-benchmark of every compatible image')
+    parser.add_argument('--iterations', type=int, default=5, help='Page loads per image for --benchmark')
+    parser.add_argument('--format', choices=['tag', 'env', 'json'], default='tag',
+                        help='tag: image tag only; env: THORIUM_IMAGE/INSTRUCTION_SET lines; json: details')
+    args = parser.parse_args()
+
+    if platform.machine() not in ('x86_64', 'AMD64') and args.cpuinfo == '/proc/cpuinfo':
+        print(f"No Thorium build for {platform.machine()}; images are x86-64 only", file=sys.stderr)
+        sys.exit(1)
+
+    flags = read_cpu_flags(args.cpuinfo)
+    timings = None
+    if args.benchmark:
+        timings = micro_benchmark(args.image, compatible_instruction_sets(flags), args.iterations, args.version)
+
+    recommendation = recommend(flags, timings)
+    if not recommendation['instruction_set']:
+        print("CPU supports none of: " + ', '.join(name for name, _ in INSTRUCTION_SET_FLAGS), file=sys.stderr)
+        sys.exit(1)
+
+    tag = image_tag(args.image, recommendation['instruction_set'], args.version)
+    if recommendation['confirmed'] is False:
+        print(f"Micro-benchmark overrides CPU flags: {recommendation['instruction_set']} was fastest",
+              file=sys.stderr)
+
+    if args.format == 'json':
+        print(json.dumps(dict(recommendation, image=tag), indent=2))
+    elif args.format == 'env':
+        print(f"THORIUM_IMAGE={tag}")
+        print(f"INSTRUCTION_SET={recommendation['instruction_set']}")
+    else:
+        print(tag)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Shared caching HTTP forward proxy for Thorium containers.
+
+Browsers started with ``--proxy-server=http://<host>:3128`` send their plain
+HTTP requests here; cacheable responses are stored in one on-disk cache
+shared by every container and profile, bounded by ``--max-size`` with
+least-recently-used eviction. HTTPS is tunnelled with ``CONNECT`` and cannot
+be cached without terminating TLS, so it only counts as a tunnel.
+
+Caching follows the shared-cache rules of RFC 9111 in a reduced form:
+
+- only ``GET`` responses with a heuristically cacheable status are stored;
+  ``no-store``, ``private``, ``Set-Cookie``, ``Authorization`` and ``Vary``
+  on anything but ``Accept-Encoding`` keep a response out of the cache
+- freshness comes from ``s-maxage``, ``max-age`` or ``Expires``, else 10% of
+  the ``Last-Modified`` age, else ``--default-ttl``
+- stale entries with an ``ETag`` or ``Last-Modified`` are revalidated with a
+  conditional request; a ``304`` refreshes them
+
+Run as a service:
+
+    python3 cache_proxy.py --port 3128 --cache-dir /cache --max-size 2048
+
+    GET http://<proxy>/stats  -> hit/miss counters, hit rate and cache size
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+
+# Statuses a shared cache may store without explicit freshness (RFC 9110 15.1)
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501}
+
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'proxy-connection',
+              'te', 'trailer', 'transfer-encoding', 'upgrade'}
+
+REASONS = {200: 'OK', 204: 'No Content', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+           502: 'Bad Gateway', 504: 'Gateway Timeout'}
+
+# Upper bound on a request head (request line plus headers)
+MAX_HEAD_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    """``max-age=60, no-cache`` -> ``{'max-age': '60', 'no-cache': None}``."""
+    directives = {}
+    for part in value.split(','):
+        name, sep, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip('"') if sep else None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers: Dict[str, str], default_ttl: float, now: float = None) -> Optional[float]:
+    """
+    Seconds a response stays fresh, or None when a shared cache must not store it.
+
+    Args:
+        headers (dict): Response headers with lower-case names
+        default_ttl (float): Lifetime of responses without freshness information
+    """
+    directives = parse_cache_control(headers.get('cache-control', ''))
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0.0
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                return max(float(directives[name]), 0.0)
+            except (TypeError, ValueError):
+                return 0.0
+    now = now or time.time()
+    date = _http_date(headers.get('date')) or now
+    if 'expires' in headers:
+        expires = _http_date(headers['expires'])
+        return max(expires - date, 0.0) if expires else 0.0
+    last_modified = _http_date(headers.get('last-modified'))
+    if last_modified and last_modified < date:
+        return (date - last_modified) / 10
+    return default_ttl
+
+
+def storable(method: str, status: int, request_headers: Dict[str, str],
+             response_headers: Dict[str, str]) -> bool:
+    """Whether a shared cache may store this response (before freshness is considered)."""
+    if method != 'GET' or status not in CACHEABLE_STATUSES or 'set-cookie' in response_headers:
+        return False
+    directives = parse_cache_control(response_headers.get('cache-control', ''))
+    if 'authorization' in request_headers and not ({'public', 's-maxage'} & set(directives)):
+        return False
+    vary = {v.strip().lower() for v in response_headers.get('vary', '').split(',') if v.strip()}
+    return vary <= {'accept-encoding'}
+
+
+class DiskCache:
+    """
+    Responses on disk, evicted least-recently-used beyond ``max_bytes``.
+
+    Each entry is one file ``<dir>/<key[:2]>/<key>``: a 4-byte length, the
+    JSON metadata (URL, status, headers, expiry) and the body. The LRU order
+    is rebuilt from file modification times on start; hits touch the file.
+    Safe to call from several threads: the index is guarded by a lock, file
+    reads and writes happen outside it.
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_object_bytes: int = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes or max_bytes // 8
+        self.entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.size = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(url: str, accept_encoding: str = '') -> str:
+        normalized = ','.join(sorted(e.strip().lower() for e in accept_encoding.split(',') if e.strip()))
+        return hashlib.sha256(f'{url}\n{normalized}'.encode()).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key)
+
+    def _load(self) -> None:
+        found = []
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                if name.endswith('.tmp'):
+                    os.remove(path)
+                    continue
+                try:
+                    with open(path, 'rb') as f:
+                        meta = json.loads(f.read(struct.unpack('>I', f.read(4))[0]))
+                    found.append((os.stat(path).st_mtime, name, meta))
+                except (OSError, ValueError, struct.error):
+                    os.remove(path)
+        for _, key, meta in sorted(found, key=lambda item: item[0]):
+            self.entries[key] = meta
+            self.size += meta['size']
+        self._evict()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """Metadata and body of an entry, marking it most recently used."""
+        with self._lock:
+            meta = self.entries.get(key)
+        if meta is None:
+            return None
+        try:
+            with open(self._file(key), 'rb') as f:
+                f.seek(4 + struct.unpack('>I', f.read(4))[0])
+                body = f.read()
+            os.utime(self._file(key))
+        except (OSError, struct.error):
+            with self._lock:
+                # Unless it was replaced meanwhile
+                if self.entries.get(key) is meta:
+                    self._remove(key)
+            return None
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return meta, body
+
+    def put(self, key: str, meta: Dict[str, Any], body: bytes) -> bool:
+        """Store an entry; False when it is larger than ``max_object_bytes``."""
+        if len(body) > self.max_object_bytes:
+            return False
+        meta = dict(meta, size=len(body))
+        header = json.dumps(meta).encode()
+        path = self._file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(struct.pack('>I', len(header)) + header + body)
+        with self._lock:
+            os.replace(tmp_path, path)
+            if key in self.entries:
+                self.size -= self.entries.pop(key)['size']
+            self.entries[key] = meta
+            self.size += meta['size']
+            self._evict()
+        return True
+
+    def _remove(self, key: str) -> None:
+        meta = self.entries.pop(key, None)
+        if meta is not None:
+            self.size -= meta['size']
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+
+class CacheProxy:
+    """Forward proxy serving repeated HTTP responses from a DiskCache."""
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 3128, cache_dir: str = '/cache',
+                 max_bytes: int = 1024 * 1024 * 1024, max_object_bytes: int = None,
+                 default_ttl: float = 300, timeout: float = 30):
+        """
+        Args:
+            host (str): Listen address
+            port (int): Listen port (0 picks a free one)
+            cache_dir (str): Directory of the shared cache
+            max_bytes (int): Cache size bound; least recently used entries are evicted beyond it
+            max_object_bytes (int): Largest body that is cached (default: max_bytes / 8)
+            default_ttl (float): Freshness of responses without caching headers
+            timeout (float): Upstream timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.cache = DiskCache(cache_dir, max_bytes, max_object_bytes)
+        self.default_ttl = default_ttl
+        self.timeout = timeout
+        self.counters = {'requests': 0, 'hits': 0, 'revalidated': 0, 'misses': 0, 'uncacheable': 0,
+                         'tunnels': 0, 'errors': 0, 'bytes_from_cache': 0, 'bytes_from_origin': 0}
+        self._server = None
+        self._http = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus hit rates and cache occupancy."""
+        stats = dict(self.counters, entries=len(self.cache.entries), cache_bytes=self.cache.size,
+                     max_bytes=self.cache.max_bytes, evictions=self.cache.evictions)
+        return dict(stats, **hit_rates(stats))
+
+    async def start(self) -> None:
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                           auto_decompress=False)
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+        await self._http.close()
+
+    def start_background(self) -> 'CacheProxy':
+        """Run the proxy on its own event loop thread (for sync callers)."""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait(30)
+        return self
+
+    def stop_background(self) -> None:
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                if method == 'CONNECT':
+                    await self._tunnel(target, reader, writer)
+                    return
+                if target.startswith('/'):
+                    keep_alive = await self._serve_local(target, writer)
+                else:
+                    keep_alive = await self._proxy(method, target, headers, body, writer)
+                if not keep_alive or headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _disk(method, *args):
+        """Run a DiskCache call on the default executor, so file I/O does not stall other clients."""
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        head = await reader.readuntil(b'\r\n\r\n') if not reader.at_eof() else b''
+        if not head:
+            return None
+        if len(head) > MAX_HEAD_BYTES:
+            raise ValueError('request head too large')
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        body = b''
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        elif headers.get('content-length'):
+            body = await reader.readexactly(int(headers['content-length']))
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _head(status: int, headers: List[Tuple[str, str]], reason: str = None) -> bytes:
+        lines = [f'HTTP/1.1 {status} {reason or REASONS.get(status, "Unknown")}']
+        lines += [f'{name}: {value}' for name, value in headers]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, headers: List[Tuple[str, str]],
+                    body: bytes, head_only: bool = False, reason: str = None) -> None:
+        headers = [(n, v) for n, v in headers if n.lower() not in HOP_BY_HOP and n.lower() != 'content-length']
+        if status not in (204, 304):
+            headers.append(('Content-Length', str(len(body))))
+        writer.write(self._head(status, headers, reason))
+        if body and not head_only and status not in (204, 304):
+            writer.write(body)
+        await writer.drain()
+
+    async def _serve_local(self, target: str, writer: asyncio.StreamWriter) -> bool:
+        if target.split('?')[0] == '/stats':
+            body = json.dumps(self.stats).encode()
+            await self._send(writer, 200, [('Content-Type', 'application/json')], body)
+        else:
+            await self._send(writer, 404, [('Content-Type', 'text/plain')], b'Not a proxy request\n')
+        return True
+
+    async def _tunnel(self, target: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.counters['tunnels'] += 1
+        host, _, port = target.rpartition(':')
+        try:
+            upstream_reader, upstream_writer = await asyncio.wait_for(
+                asyncio.open_connection(host.strip('[]'), int(port)), self.timeout)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            self.counters['errors'] += 1
+            await self._send(writer, 502, [], b'')
+            return
+        writer.write(b'HTTP/1.1 200 Connection Established\r\n\r\n')
+        await writer.drain()
+
+        async def pipe(source, sink):
+            try:
+                while True:
+                    data = await source.read(CHUNK_SIZE)
+                    if not data:
+                        break
+                    sink.write(data)
+                    await sink.drain()
+            except ConnectionError:
+                pass
+            finally:
+                sink.close()
+
+        await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+
+    async def _proxy(self, method: str, url: str, headers: Dict[str, str], body: bytes,
+                     writer: asyncio.StreamWriter) -> bool:
+        self.counters['requests'] += 1
+        head_only = method == 'HEAD'
+        request_directives = parse_cache_control(headers.get('cache-control', ''))
+        cacheable_request = method in ('GET', 'HEAD') and 'no-store' not in request_directives
+        key = DiskCache.key(url, headers.get('accept-encoding', ''))
+        cached = await self._disk(self.cache.get, key) if cacheable_request else None
+        now = time.time()
+
+        if cached:
+            meta, cached_body = cached
+            if meta['expires'] > now and 'no-cache' not in request_directives:
+                return await self._send_cached(writer, 'hits', meta, cached_body, now, head_only)
+            validators = [(name, meta['headers_map'][source]) for name, source in
+                          (('If-None-Match', 'etag'), ('If-Modified-Since', 'last-modified'))
+                          if source in meta['headers_map']]
+            if validators:
+                conditional = self._upstream_headers(headers)
+                conditional = [(n, v) for n, v in conditional if not n.lower().startswith('if-')] + validators
+                try:
+                    async with self._http.request('GET', url, headers=conditional,
+                                                  allow_redirects=False) as response:
+                        if response.status == 304:
+                            refreshed = {k.lower(): v for k, v in response.headers.items()}
+                            merged = dict(meta['headers_map'], **{k: v for k, v in refreshed.items()
+                                                                  if k not in HOP_BY_HOP})
+                            lifetime = freshness_lifetime(merged, self.default_ttl, now) or 0.0
+                            meta = dict(meta, headers_map=merged, stored=now, expires=now + lifetime)
+                            await self._disk(self.cache.put, key, meta, cached_body)
+                            return await self._send_cached(writer, 'revalidated', meta, cached_body, now,
+                                                           head_only)
+                        return await self._forward(method, url, headers, response, writer, key)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self.counters['errors'] += 1
+                    await self._send(writer, 502, [], b'')
+                    return False
+
+        try:
+            async with self._http.request(method, url, headers=self._upstream_headers(headers),
+                                          data=body or None, allow_redirects=False) as response:
+                return await self._forward(method, url, headers, response, writer,
+                                           key if cacheable_request else None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.counters['errors'] += 1
+            status = 504 if isinstance(e, asyncio.TimeoutError) else 502
+            await self._send(writer, status, [('Content-Type', 'text/plain')], f'{e}\n'.encode())
+            return False
+
+    @staticmethod
+    def _upstream_headers(headers: Dict[str, str]) -> List[Tuple[str, str]]:
+        return [(name, value) for name, value in headers.items() if name not in HOP_BY_HOP]
+
+    async def _send_cached(self, writer, counter: str, meta: Dict[str, Any], body: bytes, now: float,
+                           head_only: bool) -> bool:
+        self.counters[counter] += 1
+        self.counters['bytes_from_cache'] += len(body)
+        headers = [(n, v) for n, v in meta['headers'] if n.lower() not in ('age', 'x-cache')]
+        headers += [('Age', str(int(now - meta['stored']))), ('X-Cache', 'HIT')]
+        await self._send(writer, meta['status'], headers, body, head_only, meta.get('reason'))
+        return True
+
+    async def _forward(self, method: str, url: str, request_headers: Dict[str, str],
+                       response: aiohttp.ClientResponse, writer: asyncio.StreamWriter, key: Optional[str]) -> bool:
+        """
+        Relay an upstream response, storing it when it is cacheable and small enough.
+
+        A cacheable body is buffered only up to ``max_object_bytes``; one that
+        turns out larger (no Content-Length) is passed through from there on.
+        """
+        headers = [(n, v) for n, v in response.headers.items()]
+        headers_map = {n.lower(): v for n, v in headers}
+        lifetime = None
+        if key and storable(method, response.status, request_headers, headers_map):
+            lifetime = freshness_lifetime(headers_map, self.default_ttl)
+            if lifetime == 0 and not ({'etag', 'last-modified'} & set(headers_map)):
+                lifetime = None
+        length = response.content_length
+        buffered: List[bytes] = []
+        if lifetime is not None and (length is None or length <= self.cache.max_object_bytes):
+            size = 0
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                buffered.append(chunk)
+                size += len(chunk)
+                if size > self.cache.max_object_bytes:
+                    break
+            else:
+                body = b''.join(buffered)
+                self.counters['misses'] += 1
+                self.counters['bytes_from_origin'] += len(body)
+                now = time.time()
+                meta = {'url': url, 'status': response.status, 'reason': response.reason,
+                        'headers': [(n, v) for n, v in headers if n.lower() not in HOP_BY_HOP],
+                        'headers_map': headers_map, 'stored': now, 'expires': now + lifetime}
+                await self._disk(self.cache.put, key, meta, body)
+                await self._send(writer, response.status, headers + [('X-Cache', 'MISS')], body,
+                                 method == 'HEAD', response.reason)
+                return True
+
+        # Not cacheable, or too large to cache: stream it through
+        self.counters['uncacheable'] += 1
+        headers = [(n, v) for n, v in headers if n.lower() not in HOP_BY_HOP and n.lower() != 'content-length']
+        if not buffered and (method == 'HEAD' or response.status in (204, 304)):
+            if length is not None:
+                headers.append(('Content-Length', str(length)))
+            writer.write(self._head(response.status, headers, response.reason))
+            await writer.drain()
+            return True
+        writer.write(self._head(response.status, headers + [('Transfer-Encoding', 'chunked')], response.reason))
+
+        async def relay(chunk):
+            self.counters['bytes_from_origin'] += len(chunk)
+            writer.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+            await writer.drain()
+
+        for chunk in buffered:
+            await relay(chunk)
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            await relay(chunk)
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+        return True
+
+
+def hit_rates(stats: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Request and byte hit rates of a stats dict (or of a difference of two)."""
+    served = stats['hits'] + stats['revalidated']
+    total = served + stats['misses'] + stats['uncacheable']
+    total_bytes = stats['bytes_from_cache'] + stats['bytes_from_origin']
+    return {
+        'hit_rate': served / total if total else None,
+        'byte_hit_rate': stats['bytes_from_cache'] / total_bytes if total_bytes else None
+    }
+
+
+def stats_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Counters accumulated between two ``CacheProxy.stats`` snapshots, with their hit rates."""
+    delta = {name: after[name] - before[name] for name in
+             ('requests', 'hits', 'revalidated', 'misses', 'uncacheable', 'tunnels', 'errors',
+              'bytes_from_cache', 'bytes_from_origin', 'evictions')}
+    delta.update(hit_rates(delta), entries=after['entries'], cache_bytes=after['cache_bytes'])
+    return delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared caching HTTP forward proxy for Thorium containers')
+    parser.add_argument('--host', default='0.0.0.0', help='Listen address')
+    parser.add_argument('--port', type=int, default=3128, help='Listen port')
+    parser.add_argument('--cache-dir', default=os.environ.get('THORIUM_CACHE_DIR', '/cache'),
+                        help='Shared cache directory (default: $THORIUM_CACHE_DIR or /cache)')
+    parser.add_argument('--max-size', type=float, default=1024, help='Cache size bound in MiB')
+    parser.add_argument('--max-object-size', type=float, help='Largest cached response in MiB (default: 1/8 of the cache)')
+    parser.add_argument('--default-ttl', type=float, default=300,
+                        help='Freshness in seconds of responses without caching headers')
+    args = parser.parse_args()
+
+    proxy = CacheProxy(args.host, args.port, args.cache_dir, int(args.max_size * 1024 * 1024),
+                       int(args.max_object_size * 1024 * 1024) if args.max_object_size else None,
+                       args.default_ttl)
+
+    async def run():
+        await proxy.start()
+        print(f"Caching proxy on {args.host}:{proxy.port}, cache {args.cache_dir} "
+              f"({len(proxy.cache.entries)} entries, {proxy.cache.size / 1e6:.1f} MB)", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Prometheus exporter for a running Thorium browser.
+
+Keeps one browser-level CDP connection open. Target lifecycle, crashes and
+page navigations arrive as events; process CPU and memory and per-page JS
+heap sizes are sampled every ``--interval`` seconds. ``/metrics`` only
+formats the last state, so scrapes never reach the browser and the cost on
+the browser is one ``SystemInfo.getProcessInfo`` plus one
+``Runtime.getHeapUsage`` per page per interval.
+
+Series are labelled by process or target type only, so their number does not
+grow with the pages a long-running browser has seen: process CPU and memory
+are summed per type and JS heaps are reported as a sum, a maximum and a page
+count. ``--per-target`` adds one heap series per page for debugging.
+
+    python3 metrics_exporter.py --browser localhost:9222 --port 9464
+
+Resident memory comes from ``/proc/<pid>/statm``, so it needs the browser's
+PID namespace (in the image, or a sidecar with ``pid: service:<browser>``).
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+from cdp_client import CDPError, CDPSession  # noqa: E402
+
+# Navigation latency histogram buckets (s), from init to the load event
+NAVIGATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class Histogram:
+    """Cumulative Prometheus histogram."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def resident_bytes(pid: int) -> int:
+    """Resident set size of a process, or None when it is not visible from here."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    escaped = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def format_metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, Any], float]]) -> List[str]:
+    """Prometheus text exposition lines of one metric family."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines += [f'{name}{_labels(labels)} {value}' for labels, value in samples]
+    return lines
+
+
+class MetricsExporter:
+    """Tracks one browser over a persistent CDP connection and renders its metrics."""
+
+    def __init__(self, host: str = 'localhost', port: int = 9222, interval: float = 15, timeout: float = 5,
+                 per_target: bool = False):
+        """
+        Args:
+            host (str): DevTools host
+            port (int): DevTools port
+            interval (float): Seconds between process and heap samples
+            timeout (float): Timeout of each CDP command
+            per_target (bool): Also export the JS heap of each page, labelled by target id
+        """
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.timeout = timeout
+        self.per_target = per_target
+        self.up = False
+        self.connects = 0
+        self.targets: Dict[str, str] = {}
+        self.sessions: Dict[str, str] = {}
+        self.crashes = Counter()
+        self.navigations = Histogram(NAVIGATION_BUCKETS)
+        self.processes: List[Dict[str, Any]] = []
+        # CPU seconds of every process seen, by type; kept for processes that exited so it never goes down
+        self.cpu_seconds = Counter()
+        self._cpu_times: Dict[int, float] = {}
+        self.heaps: Dict[str, Dict[str, float]] = {}
+        self.samples = 0
+        self.sample_seconds = 0.0
+        self._session = None
+        self._navigation_starts: Dict[str, Tuple[str, float]] = {}
+        self._lifecycle_listeners: Dict[str, Any] = {}
+        self._tasks = set()
+
+    async def browser_ws_url(self) -> str:
+        """Browser WebSocket URL, addressed by IP (DevTools rejects other Host headers)."""
+        # Resolved off the event loop: a slow DNS lookup must not stall the exporter
+        addresses = await asyncio.get_running_loop().getaddrinfo(self.host, self.port, family=socket.AF_INET,
+                                                                 type=socket.SOCK_STREAM)
+        address = addresses[0][4][0]
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as http:
+            async with http.get(f'http://{address}:{self.port}/json/version') as response:
+                response.raise_for_status()
+                ws_url = (await response.json())['webSocketDebuggerUrl']
+        return f'ws://{address}:{self.port}{urlsplit(ws_url).path}'
+
+    async def run(self) -> None:
+        """Watch the browser forever, reconnecting after it restarts or drops the connection."""
+        delay = 1.0
+        while True:
+            try:
+                await self.watch()
+                delay = 1.0
+            except (CDPError, OSError, aiohttp.ClientError, asyncio.TimeoutError, KeyError) as e:
+                if self.up:
+                    print(f"Lost browser connection: {e}", flush=True)
+            self.up = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    async def watch(self) -> None:
+        """Connect, subscribe to target events and sample until the connection fails."""
+        self.targets.clear()
+        self.sessions.clear()
+        self.heaps.clear()
+        self.processes = []
+        self._navigation_starts.clear()
+        self._lifecycle_listeners.clear()
+        async with CDPSession(await self.browser_ws_url(), timeout=self.timeout) as session:
+            self._session = session
+            session.on('Target.targetCreated', self._target_created)
+            session.on('Target.targetDestroyed', self._target_destroyed)
+            session.on('Target.targetCrashed', self._target_crashed)
+            session.on('Target.detachedFromTarget', self._detached)
+            await session.send('Target.setDiscoverTargets', {'discover': True})
+            self.up = True
+            self.connects += 1
+            try:
+                while True:
+                    await self.sample()
+                    await asyncio.sleep(self.interval)
+            finally:
+                for task in list(self._tasks):
+                    task.cancel()
+                self._session = None
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _target_created(self, params: Dict[str, Any]) -> None:
+        info = params['targetInfo']
+        self.targets[info['targetId']] = info['type']
+        if info['type'] == 'page':
+            self._spawn(self._attach(info['targetId']))
+
+    def _target_destroyed(self, params: Dict[str, Any]) -> None:
+        self.targets.pop(params['targetId'], None)
+        self.heaps.pop(params['targetId'], None)
+        self._navigation_starts.pop(params['targetId'], None)
+
+    def _target_crashed(self, params: Dict[str, Any]) -> None:
+        self.crashes[params.get('status') or 'crashed'] += 1
+
+    def _detached(self, params: Dict[str, Any]) -> None:
+        self.sessions.pop(params['sessionId'], None)
+        listener = self._lifecycle_listeners.pop(params['sessionId'], None)
+        if listener and self._session:
+            self._session.off('Page.lifecycleEvent', listener, params['sessionId'])
+
+    async def _attach(self, target_id: str) -> None:
+        """Attach to a page to follow its main-frame lifecycle events."""
+        session = self._session
+        try:
+            session_id = (await session.send('Target.attachToTarget',
+                                             {'targetId': target_id, 'flatten': True}))['sessionId']
+            self.sessions[session_id] = target_id
+            listener = self._lifecycle_listeners[session_id] = lambda params: self._lifecycle(target_id, params)
+            session.on('Page.lifecycleEvent', listener, session_id)
+            await session.send('Page.enable', session_id=session_id)
+            await session.send('Page.setLifecycleEventsEnabled', {'enabled': True}, session_id=session_id)
+        except CDPError:
+            pass  # Closed before we got to it
+
+    def _lifecycle(self, target_id: str, params: Dict[str, Any]) -> None:
+        # The main frame of a page has the target's id
+        if params.get('frameId') != target_id:
+            return
+        if params['name'] == 'init':
+            self._navigation_starts[target_id] = (params.get('loaderId'), params['timestamp'])
+        elif params['name'] == 'load':
+            loader_id, start = self._navigation_starts.pop(target_id, (None, None))
+            if start is not None and loader_id == params.get('loaderId'):
+                self.navigations.observe(params['timestamp'] - start)
+
+    async def sample(self) -> None:
+        """Refresh process CPU/memory and the JS heap of every attached page."""
+        started = time.perf_counter()
+        session = self._session
+        try:
+            info = await session.send('SystemInfo.getProcessInfo')
+            self.processes = [dict(p, rss=resident_bytes(p['id'])) for p in info.get('processInfo', [])]
+            self._count_cpu_time()
+        except CDPError as e:
+            if session.closed:
+                raise
+            print(f"SystemInfo.getProcessInfo failed: {e}", flush=True)
+
+        async def heap(session_id, target_id):
+            try:
+                usage = await session.send('Runtime.getHeapUsage', session_id=session_id)
+            except CDPError:
+                usage = None
+            # The page may have closed while the command was in flight
+            if usage and session_id in self.sessions:
+                self.heaps[target_id] = usage
+            else:
+                self.heaps.pop(target_id, None)
+
+        await asyncio.gather(*(heap(session_id, target_id) for session_id, target_id in list(self.sessions.items())))
+        self.samples += 1
+        self.sample_seconds = time.perf_counter() - started
+
+    def _count_cpu_time(self) -> None:
+        cpu_times = {}
+        for process in self.processes:
+            cpu_time = float(process['cpuTime'])
+            previous = self._cpu_times.get(process['id'], 0.0)
+            # Less than last time: the pid was reused by a new process
+            self.cpu_seconds[process['type']] += cpu_time - previous if cpu_time >= previous else cpu_time
+            cpu_times[process['id']] = cpu_time
+        self._cpu_times = cpu_times
+
+    def render(self) -> str:
+        """The current state in the Prometheus text format."""
+        lines = []
+        lines += format_metric('thorium_up', 'gauge', 'Whether the exporter is connected to the browser.',
+                               [({}, int(self.up))])
+        lines += format_metric('thorium_browser_connects_total', 'counter',
+                               'Browser connections made (more than one means the browser restarted or dropped us).',
+                               [({}, self.connects)])
+        types = Counter(self.targets.values())
+        lines += format_metric('thorium_targets', 'gauge', 'Open targets by type.',
+                               [({'type': t}, n) for t, n in sorted(types.items())])
+        lines += format_metric('thorium_target_crashes_total', 'counter', 'Crashed targets by termination status.',
+                               [({'status': s}, n) for s, n in sorted(self.crashes.items())])
+        processes = Counter(p['type'] for p in self.processes)
+        resident = Counter()
+        for p in self.processes:
+            if p['rss'] is not None:
+                resident[p['type']] += p['rss']
+        lines += format_metric('thorium_processes', 'gauge', 'Running browser processes by type.',
+                               [({'type': t}, n) for t, n in sorted(processes.items())])
+        lines += format_metric('thorium_process_cpu_seconds_total', 'counter',
+                               'CPU time of the browser processes by type (SystemInfo.getProcessInfo).',
+                               [({'type': t}, s) for t, s in sorted(self.cpu_seconds.items())])
+        lines += format_metric('thorium_process_resident_memory_bytes', 'gauge',
+                               'Resident memory of the browser processes by type (needs the browser PID namespace).',
+                               [({'type': t}, n) for t, n in sorted(resident.items())])
+
+        heaps = list(self.heaps.values())
+        lines += format_metric('thorium_js_heap_pages', 'gauge', 'Pages whose JS heap was sampled.',
+                               [({}, len(heaps))])
+        lines += format_metric('thorium_js_heap_used_bytes', 'gauge', 'Used JS heap of all pages.',
+                               [({}, float(sum(h['usedSize'] for h in heaps)))])
+        lines += format_metric('thorium_js_heap_total_bytes', 'gauge', 'Allocated JS heap of all pages.',
+                               [({}, float(sum(h['totalSize'] for h in heaps)))])
+        lines += format_metric('thorium_js_heap_used_max_bytes', 'gauge', 'Largest used JS heap of a page.',
+                               [({}, float(max((h['usedSize'] for h in heaps), default=0)))])
+        if self.per_target:
+            lines += format_metric('thorium_page_js_heap_used_bytes', 'gauge', 'Used JS heap of each page.',
+                                   [({'target': t}, float(h['usedSize'])) for t, h in sorted(self.heaps.items())])
+
+        name = 'thorium_navigation_seconds'
+        histogram = self.navigations
+        lines += [f'# HELP {name} Main-frame navigation time from init to the load event.',
+                  f'# TYPE {name} histogram']
+        lines += [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(histogram.buckets, histogram.counts)]
+        lines += [f'{name}_bucket{{le="+Inf"}} {histogram.count}', f'{name}_sum {histogram.sum}',
+                  f'{name}_count {histogram.count}']
+
+        lines += format_metric('thorium_exporter_samples_total', 'counter', 'Process and heap samples taken.',
+                               [({}, self.samples)])
+        lines += format_metric('thorium_exporter_sample_seconds', 'gauge', 'Duration of the last sample.',
+                               [({}, float(self.sample_seconds))])
+        return '\n'.join(lines) + '\n'
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+
+        async def metrics(request):
+            return web.Response(text=self.render(), content_type='text/plain', charset='utf-8',
+                                headers={'X-Content-Type-Options': 'nosniff'})
+
+        app.router.add_get('/metrics', metrics)
+        return app
+
+
+async def serve(exporter: MetricsExporter, host: str, port: int) -> None:
+    runner = web.AppRunner(exporter.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Exporting metrics of {exporter.host}:{exporter.port} on http://{host}:{port}/metrics", flush=True)
+    try:
+        await exporter.run()
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prometheus exporter for a running Thorium browser')
+    parser.add_argument('--browser', default=os.environ.get('THORIUM_DEVTOOLS', 'localhost:9222'),
+                        help='DevTools host:port (default: $THORIUM_DEVTOOLS or localhost:9222)')
+    parser.add_argument('--host', default='0.0.0.0', help='Listen address for /metrics')
+    parser.add_argument('--port', type=int, default=9464, help='Listen port for /metrics')
+    parser.add_argument('--interval', type=float, default=15, help='Seconds between process and heap samples')
+    parser.add_argument('--per-target', action='store_true',
+                        help='Also export one JS heap series per page (unbounded; for debugging)')
+    args = parser.parse_args()
+
+    host, _, port = args.browser.rpartition(':')
+    exporter = MetricsExporter(host or 'localhost', int(port), args.interval, per_target=args.per_target)
+    try:
+        asyncio.run(serve(exporter, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Warm browser tab pool for production workloads.
+
+Keeps a configurable number of pre-created, pre-warmed tabs on one browser
+endpoint and hands them out with lease/return semantics. Each tab lives in its
+own browser context (``Target.createBrowserContext``), which is disposed and
+replaced (recycled) when the tab is returned, so cookies, storage and cache
+never carry from one lease to the next. With ``isolate=False``
+(``--shared-context``) tabs share the default context (created with
+``/json/new``, closed with ``/json/close``), are reset to ``about:blank`` when
+returned and only recycled after ``max_uses`` leases or when their JS heap
+grows past ``max_heap_bytes``; isolated tabs never reach either limit. Leases
+that are never returned are recycled either way.
+
+Run as a service:
+
+    python3 pool.py --browser localhost:9222 --size 8 --port 9300
+
+    POST /lease            -> {"lease_id", "id", "webSocketDebuggerUrl"}
+    POST /release/<lease>  -> 204
+    GET  /stats            -> pool counters
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import os
+import sys
+import time
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+from cdp_client import CDPError, CDPSession  # noqa: E402
+from stats import latency_summary  # noqa: E402
+
+# Most recent acquire waits kept for the stats percentiles
+ACQUIRE_WAIT_SAMPLES = 1000
+
+
+class PoolError(Exception):
+    """Raised when the pool cannot hand out a tab."""
+
+
+class PooledTab:
+    """A browser tab owned by the pool."""
+
+    def __init__(self, target_id: str, ws_url: str, context_id: str = None):
+        self.id = target_id
+        self.ws_url = ws_url
+        self.context_id = context_id
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.leased_at = None
+        self.lease_id = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'lease_id': self.lease_id,
+            'id': self.id,
+            'webSocketDebuggerUrl': self.ws_url,
+            'uses': self.uses
+        }
+
+
+class BrowserPool:
+    """Pool of warm tabs on a single DevTools endpoint."""
+
+    def __init__(self, host: str = 'localhost', port: int = 9222, size: int = 4,
+                 max_uses: int = 50, max_heap_bytes: int = 256 * 1024 * 1024,
+                 warm_url: str = 'about:blank', lease_timeout: float = 300, timeout: float = 30,
+                 isolate: bool = True):
+        self.base_url = f'http://{host}:{port}'
+        self.ws_base = f'ws://{host}:{port}'
+        self.size = size
+        self.max_uses = max_uses
+        self.max_heap_bytes = max_heap_bytes
+        self.warm_url = warm_url
+        self.lease_timeout = lease_timeout
+        self.timeout = timeout
+        self.isolate = isolate
+        self._idle: asyncio.Queue = None
+        self._leased: Dict[str, PooledTab] = {}
+        self._lease_ids = itertools.count(1)
+        self._http = None
+        self._browser: CDPSession = None
+        self._browser_lock: asyncio.Lock = None
+        self._reaper = None
+        self._background = set()
+        self._acquire_waits: Deque[float] = collections.deque(maxlen=ACQUIRE_WAIT_SAMPLES)
+        self.counters = {'created': 0, 'recycled': 0, 'leases': 0, 'expired': 0, 'errors': 0}
+
+    async def __aenter__(self) -> 'BrowserPool':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Create and warm ``size`` tabs, then start the lease reaper."""
+        self._idle = asyncio.Queue()
+        self._browser_lock = asyncio.Lock()
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        tabs = await asyncio.gather(*(self._create_tab() for _ in range(self.size)))
+        for tab in tabs:
+            self._idle.put_nowait(tab)
+        self._reaper = asyncio.ensure_future(self._reap_expired_leases())
+
+    async def close(self) -> None:
+        """Close every tab the pool owns."""
+        if self._reaper:
+            self._reaper.cancel()
+        for task in list(self._background):
+            task.cancel()
+        tabs = list(self._leased.values())
+        while self._idle and not self._idle.empty():
+            tabs.append(self._idle.get_nowait())
+        await asyncio.gather(*(self._close_tab(tab) for tab in tabs))
+        self._leased.clear()
+        if self._browser:
+            await self._browser.close()
+        if self._http:
+            await self._http.close()
+
+    async def _browser_session(self) -> CDPSession:
+        """The browser-level connection that owns the tabs' contexts, reconnected if it dropped."""
+        async with self._browser_lock:
+            if self._browser is None or self._browser.closed:
+                async with self._http.get(f'{self.base_url}/json/version') as response:
+                    response.raise_for_status()
+                    path = urlsplit((await response.json())['webSocketDebuggerUrl']).path
+                self._browser = CDPSession(f'{self.ws_base}{path}', timeout=self.timeout)
+                await self._browser.connect()
+            return self._browser
+
+    async def _create_tab(self) -> PooledTab:
+        context_id = None
+        if self.isolate:
+            browser = await self._browser_session()
+            context_id = (await browser.send('Target.createBrowserContext'))['browserContextId']
+            target_id = (await browser.send('Target.createTarget', {
+                'url': 'about:blank', 'browserContextId': context_id
+            }))['targetId']
+        else:
+            async with self._http.put(f'{self.base_url}/json/new') as response:
+                response.raise_for_status()
+                target_id = (await response.json())['id']
+        tab = PooledTab(target_id, f'{self.ws_base}/devtools/page/{target_id}', context_id)
+        async with CDPSession(tab.ws_url, timeout=self.timeout) as session:
+            await session.navigate(self.warm_url)
+        self.counters['created'] += 1
+        return tab
+
+    async def _close_tab(self, tab: PooledTab) -> None:
+        if tab.context_id:
+            # Closes the tab along with the context's cookies, storage and cache
+            try:
+                await (await self._browser_session()).send('Target.disposeBrowserContext',
+                                                            {'browserContextId': tab.context_id})
+            except (CDPError, aiohttp.ClientError, OSError):
+                pass
+            return
+        try:
+            async with self._http.get(f'{self.base_url}/json/close/{tab.id}') as response:
+                await response.read()
+        except aiohttp.ClientError:
+            pass
+
+    async def acquire(self, timeout: float = None) -> PooledTab:
+        """Lease an idle tab, waiting up to ``timeout`` seconds for one."""
+        start = time.perf_counter()
+        try:
+            tab = await asyncio.wait_for(self._idle.get(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise PoolError(f'No idle tab within {timeout or self.timeout}s')
+        self._acquire_waits.append(time.perf_counter() - start)
+
+        tab.uses += 1
+        tab.leased_at = time.monotonic()
+        tab.lease_id = f'lease-{next(self._lease_ids)}'
+        self._leased[tab.lease_id] = tab
+        self.counters['leases'] += 1
+        return tab
+
+    async def release(self, lease_id: str) -> None:
+        """Return a leased tab; it is reset or recycled in the background."""
+        tab = self._leased.pop(lease_id, None)
+        if tab is None:
+            raise PoolError(f'Unknown lease {lease_id}')
+        tab.lease_id = None
+        self._spawn(self._reset_or_recycle(tab))
+
+    def lease(self, timeout: float = None) -> '_Lease':
+        """``async with pool.lease() as tab:`` acquires and always releases."""
+        return _Lease(self, timeout)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _reset_or_recycle(self, tab: PooledTab) -> None:
+        if tab.context_id:
+            # Nothing from the last lease may reach the next one: start over in a fresh context
+            await self._recycle(tab)
+            return
+        try:
+            if tab.uses < self.max_uses:
+                async with CDPSession(tab.ws_url, timeout=self.timeout) as session:
+                    heap = (await session.get_metrics()).get('JSHeapUsedSize', 0)
+                    if heap <= self.max_heap_bytes:
+                        await session.navigate('about:blank')
+                        self._idle.put_nowait(tab)
+                        return
+        except (CDPError, aiohttp.ClientError, asyncio.TimeoutError):
+            self.counters['errors'] += 1
+        await self._recycle(tab)
+
+    async def _recycle(self, tab: PooledTab) -> None:
+        """Replace a tab with a freshly created one."""
+        self.counters['recycled'] += 1
+        await self._close_tab(tab)
+        await self._add_tab()
+
+    async def _add_tab(self) -> None:
+        """Create a tab and put it in the idle queue, retrying until the browser allows it."""
+        while True:
+            try:
+                self._idle.put_nowait(await self._create_tab())
+                return
+            except (CDPError, aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                self.counters['errors'] += 1
+                await asyncio.sleep(1)
+
+    async def _reap_expired_leases(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.lease_timeout, 10))
+            now = time.monotonic()
+            for lease_id, tab in list(self._leased.items()):
+                if now - tab.leased_at > self.lease_timeout:
+                    self._leased.pop(lease_id, None)
+                    self.counters['expired'] += 1
+                    self._spawn(self._recycle(tab))
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self.counters,
+            size=self.size,
+            idle=self._idle.qsize() if self._idle else 0,
+            leased=len(self._leased),
+            acquire_wait=latency_summary(list(self._acquire_waits))
+        )
+
+
+class _Lease:
+    def __init__(self, pool: BrowserPool, timeout: Optional[float]):
+        self.pool = pool
+        self.timeout = timeout
+        self.tab = None
+
+    async def __aenter__(self) -> PooledTab:
+        self.tab = await self.pool.acquire(self.timeout)
+        return self.tab
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.pool.release(self.tab.lease_id)
+
+
+def make_app(pool: BrowserPool) -> web.Application:
+    """HTTP lease/return API around a pool."""
+    async def lease(request):
+        try:
+            tab = await pool.acquire(float(request.query.get('timeout', pool.timeout)))
+        except PoolError as e:
+            return web.json_response({'error': str(e)}, status=503)
+        return web.json_response(tab.to_dict())
+
+    async def release(request):
+        try:
+            await pool.release(request.match_info['lease_id'])
+        except PoolError as e:
+            return web.json_response({'error': str(e)}, status=404)
+        return web.Response(status=204)
+
+    async def stats(request):
+        return web.json_response(pool.stats())
+
+    async def on_startup(app):
+        await pool.start()
+
+    async def on_cleanup(app):
+        await pool.close()
+
+    app = web.Application()
+    app.router.add_post('/lease', lease)
+    app.router.add_post('/release/{lease_id}', release)
+    app.router.add_get('/stats', stats)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm tab pool for a Thorium DevTools endpoint')
+    parser.add_argument('--browser', default='localhost:9222', help='DevTools host:port')
+    parser.add_argument('--size', type=int, default=4, help='Number of warm tabs to keep')
+    parser.add_argument('--max-uses', type=int,
+                        help='Recycle a tab after this many leases (default: 50; requires --shared-context, '
+                             'isolated tabs are recycled on every return)')
+    parser.add_argument('--max-heap-mb', type=float,
+                        help='Recycle a tab whose JS heap exceeds this (default: 256; requires --shared-context)')
+    parser.add_argument('--warm-url', default='about:blank', help='URL each new tab loads before joining the pool')
+    parser.add_argument('--lease-timeout', type=float, default=300, help='Recycle leases not returned in time')
+    parser.add_argument('--port', type=int, default=9300, help='Port for the lease API')
+    parser.add_argument('--shared-context', action='store_true',
+                        help='Keep tabs in the default browser context and reuse them across leases '
+                             '(cookies, storage and cache are shared)')
+    args = parser.parse_args()
+    if not args.shared_context and (args.max_uses is not None or args.max_heap_mb is not None):
+        parser.error('--max-uses and --max-heap-mb require --shared-context '
+                     '(isolated tabs are recycled on every return)')
+
+    host, _, port = args.browser.rpartition(':')
+    max_uses = args.max_uses if args.max_uses is not None else 50
+    max_heap_mb = args.max_heap_mb if args.max_heap_mb is not None else 256
+    pool = BrowserPool(host, int(port), args.size, max_uses, int(max_heap_mb * 1024 * 1024),
+                       args.warm_url, args.lease_timeout, isolate=not args.shared_context)
+    web.run_app(make_app(pool), port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Client-side request interception policies on the CDP ``Fetch`` domain.
+
+A ``RequestPolicy`` blocks or stubs sub-resources by resource type, host,
+URL pattern or response size. Its rules are compiled once: resource types and
+hosts are set lookups and all URL patterns are one regular expression, so the
+per-request decision stays in the microseconds however many tabs share the
+policy. ``Fetch.enable`` is only asked to pause the requests the policy can
+act on, e.g. just images and fonts for a type-only policy.
+
+``RequestInterceptor`` applies a policy to one ``CDPSession``:
+
+    async with CDPSession(ws_url) as session:
+        interceptor = RequestInterceptor(session, load_policies()['scrape'])
+        await interceptor.enable()
+        await session.navigate(url)
+        await interceptor.disable()
+
+Blocked requests fail with ``BlockedByClient``. Stubbed requests are answered
+with an empty body of the right content type (a transparent 1x1 GIF for
+images), so layout and script execution carry on without the resource.
+URL patterns use the ``Fetch`` pattern syntax: ``*`` is any run of
+characters, ``?`` exactly one.
+"""
+
+import asyncio
+import base64
+import json
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cdp_client import CDPError, CDPSession
+
+# Network.ResourceType values the Fetch domain reports
+RESOURCE_TYPES = ('Document', 'Stylesheet', 'Image', 'Media', 'Font', 'Script', 'TextTrack', 'XHR', 'Fetch',
+                  'Prefetch', 'EventSource', 'WebSocket', 'Manifest', 'SignedExchange', 'Ping',
+                  'CSPViolationReport', 'Preflight', 'Other')
+
+CONTINUE, BLOCK, STUB = 'continue', 'block', 'stub'
+
+# Transparent 1x1 GIF
+_EMPTY_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+# Resource type -> (content type, body) of a stubbed response
+STUB_BODIES = {
+    'Image': ('image/gif', _EMPTY_GIF),
+    'Stylesheet': ('text/css', b''),
+    'Script': ('application/javascript', b''),
+    'Font': ('font/woff2', b''),
+    'Media': ('video/mp4', b''),
+    'XHR': ('application/json', b'{}'),
+    'Fetch': ('application/json', b'{}'),
+}
+_DEFAULT_STUB = ('text/plain', b'')
+
+# Ad and tracker hosts; subdomains match too
+TRACKER_HOSTS = [
+    'doubleclick.net', 'googlesyndication.com', 'googleadservices.com', 'google-analytics.com',
+    'googletagmanager.com', 'googletagservices.com', 'adservice.google.com', 'facebook.net',
+    'scorecardresearch.com', 'hotjar.com', 'adnxs.com', 'criteo.com', 'criteo.net', 'taboola.com',
+    'outbrain.com', 'amazon-adsystem.com', 'quantserve.com', 'moatads.com', 'pubmatic.com',
+    'rubiconproject.com', 'casalemedia.com', 'openx.net', 'segment.io', 'segment.com', 'mixpanel.com',
+    'newrelic.com', 'nr-data.net', 'clarity.ms', 'bat.bing.com', 'ads-twitter.com',
+    'analytics.tiktok.com', 'mc.yandex.ru',
+]
+
+# Built-in policies; the first is the no-interception baseline
+DEFAULT_POLICIES = OrderedDict([
+    ('none', {}),
+    ('no-fonts', {'stub_types': ['Font']}),
+    ('no-media', {'block_types': ['Media'], 'stub_types': ['Image']}),
+    ('no-trackers', {'block_hosts': TRACKER_HOSTS}),
+    ('scrape', {'block_types': ['Media', 'Font', 'Image'], 'block_hosts': TRACKER_HOSTS,
+                'stub_types': ['Stylesheet'], 'max_bytes': 1024 * 1024}),
+    ('pdf', {'block_types': ['Media'], 'block_hosts': TRACKER_HOSTS, 'max_bytes': 5 * 1024 * 1024}),
+])
+
+_POLICY_KEYS = ('block_types', 'stub_types', 'block_urls', 'stub_urls', 'block_hosts', 'max_bytes')
+
+
+def url_pattern_regex(pattern: str) -> str:
+    """Translate a ``Fetch`` URL pattern (``*`` and ``?`` wildcards, ``\\`` escapes) to a regex."""
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return ''.join(parts)
+
+
+class RequestPolicy:
+    """
+    Precompiled block / stub rules.
+
+    Resource-type rules win over host rules, host rules over URL patterns,
+    and block over stub within each. Top-level documents are only affected by
+    host and URL rules, never by type or size rules.
+
+    Args:
+        name (str): Policy name used in stats and reports
+        block_types (list): Resource types to fail
+        stub_types (list): Resource types to answer with an empty body
+        block_urls (list): URL patterns to fail
+        stub_urls (list): URL patterns to answer with an empty body
+        block_hosts (list): Hosts whose requests fail, including their subdomains
+        max_bytes (int): Fail responses whose Content-Length exceeds this
+    """
+
+    def __init__(self, name: str, block_types: List[str] = (), stub_types: List[str] = (),
+                 block_urls: List[str] = (), stub_urls: List[str] = (), block_hosts: List[str] = (),
+                 max_bytes: Optional[int] = None):
+        unknown = [t for t in list(block_types) + list(stub_types) if t not in RESOURCE_TYPES]
+        if unknown:
+            raise ValueError(f"Policy '{name}': unknown resource type(s) {', '.join(unknown)}")
+        if 'Document' in list(block_types) + list(stub_types):
+            raise ValueError(f"Policy '{name}': block documents by host or URL, not by type")
+        self.name = name
+        self.max_bytes = max_bytes
+        self._types = {t: STUB for t in stub_types}
+        self._types.update({t: BLOCK for t in block_types})
+        self._hosts = frozenset(host.lower().strip('.') for host in block_hosts)
+        self._url_rules = [(BLOCK, p) for p in block_urls] + [(STUB, p) for p in stub_urls]
+        self._url_regex = None
+        if self._url_rules:
+            self._url_regex = re.compile('|'.join(f'(?P<r{index}>{url_pattern_regex(pattern)})'
+                                                  for index, (_, pattern) in enumerate(self._url_rules)))
+
+    @classmethod
+    def from_dict(cls, name: str, spec: Dict[str, Any]) -> 'RequestPolicy':
+        unknown = set(spec) - set(_POLICY_KEYS)
+        if unknown:
+            raise ValueError(f"Policy '{name}': unknown key(s) {', '.join(sorted(unknown))}")
+        return cls(name, **spec)
+
+    @property
+    def intercepts(self) -> bool:
+        """True when the policy can change any request."""
+        return bool(self._types or self._hosts or self._url_rules or self.max_bytes)
+
+    def fetch_patterns(self) -> List[Dict[str, str]]:
+        """``Fetch.enable`` patterns pausing only the requests this policy may act on."""
+        if self._hosts or self._url_rules:
+            patterns = [{'urlPattern': '*', 'requestStage': 'Request'}]
+        else:
+            patterns = [{'urlPattern': '*', 'resourceType': t, 'requestStage': 'Request'} for t in self._types]
+        if self.max_bytes:
+            patterns.append({'urlPattern': '*', 'requestStage': 'Response'})
+        return patterns
+
+    def decide(self, url: str, resource_type: str) -> Tuple[str, Optional[str]]:
+        """
+        Decision for a request about to be sent.
+
+        Returns:
+            tuple: (CONTINUE, BLOCK or STUB, matching rule such as ``type:Font``)
+        """
+        action = self._types.get(resource_type)
+        if action:
+            return action, f'type:{resource_type}'
+        if self._hosts:
+            host = (urlsplit(url).hostname or '').lower()
+            while host:
+                if host in self._hosts:
+                    return BLOCK, f'host:{host}'
+                host = host.partition('.')[2]
+        if self._url_regex:
+            match = self._url_regex.fullmatch(url)
+            if match:
+                action, pattern = self._url_rules[int(match.lastgroup[1:])]
+                return action, f'url:{pattern}'
+        return CONTINUE, None
+
+    def decide_response(self, resource_type: str, headers: List[Dict[str, str]]) -> Tuple[str, Optional[str]]:
+        """Decision for a response whose headers have arrived (size rule only)."""
+        if not self.max_bytes or resource_type == 'Document':
+            return CONTINUE, None
+        for header in headers or []:
+            if header.get('name', '').lower() == 'content-length':
+                try:
+                    size = int(header.get('value', ''))
+                except ValueError:
+                    break
+                if size > self.max_bytes:
+                    return BLOCK, f'size>{self.max_bytes}'
+                break
+        return CONTINUE, None
+
+    def respond(self, params: Dict[str, Any]) -> Tuple[str, Optional[str], str, Dict[str, Any]]:
+        """
+        Turn a ``Fetch.requestPaused`` event into the command that resolves it.
+
+        Returns:
+            tuple: (action, rule, CDP method, params)
+        """
+        request_id = params['requestId']
+        resource_type = params.get('resourceType', 'Other')
+        if 'responseStatusCode' in params or 'responseErrorReason' in params:
+            action, rule = self.decide_response(resource_type, params.get('responseHeaders'))
+        else:
+            action, rule = self.decide(params['request']['url'], resource_type)
+
+        if action == BLOCK:
+            return action, rule, 'Fetch.failRequest', {'requestId': request_id, 'errorReason': 'BlockedByClient'}
+        if action == STUB:
+            content_type, body = STUB_BODIES.get(resource_type, _DEFAULT_STUB)
+            return action, rule, 'Fetch.fulfillRequest', {
+                'requestId': request_id,
+                'responseCode': 200,
+                'responseHeaders': [{'name': 'Content-Type', 'value': content_type},
+                                    {'name': 'Access-Control-Allow-Origin', 'value': '*'}],
+                'body': base64.b64encode(body).decode()
+            }
+        return action, rule, 'Fetch.continueRequest', {'requestId': request_id}
+
+
+def load_policies(path: str = None) -> Dict[str, RequestPolicy]:
+    """
+    Load policies from a JSON object of ``{"name": {"block_types": [...], ...}}``.
+
+    Keys per policy: block_types, stub_types, block_urls, stub_urls,
+    block_hosts and max_bytes. Without a path the built-in DEFAULT_POLICIES
+    are returned; the first policy is the baseline others are compared with.
+    """
+    if path:
+        with open(path) as f:
+            specs = json.load(f, object_pairs_hook=OrderedDict)
+        if not isinstance(specs, dict) or not specs:
+            raise ValueError(f"{path}: expected a non-empty JSON object of policies")
+    else:
+        specs = DEFAULT_POLICIES
+    policies = OrderedDict()
+    for name, spec in specs.items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"Policy '{name}' must be an object")
+        policies[name] = RequestPolicy.from_dict(name, spec)
+    return policies
+
+
+class RequestInterceptor:
+    """Applies a RequestPolicy to the requests of one CDP session."""
+
+    def __init__(self, session: CDPSession, policy: RequestPolicy):
+        self.session = session
+        self.policy = policy
+        self.enabled = False
+        self.stats = {'paused': 0, 'continued': 0, 'blocked': 0, 'stubbed': 0, 'decision_seconds': 0.0}
+        self.rules: Counter = Counter()
+        self._tasks = set()
+
+    async def enable(self) -> None:
+        """Start pausing matching requests; a policy without rules leaves Fetch disabled."""
+        if not self.policy.intercepts:
+            return
+        self.session.on('Fetch.requestPaused', self._on_paused)
+        await self.session.send('Fetch.enable', {'patterns': self.policy.fetch_patterns()})
+        self.enabled = True
+
+    async def disable(self) -> None:
+        """Resolve outstanding requests and stop intercepting."""
+        if not self.enabled:
+            return
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.session.off('Fetch.requestPaused', self._on_paused)
+        self.enabled = False
+        try:
+            await self.session.send('Fetch.disable')
+        except CDPError:
+            pass
+
+    def _on_paused(self, params: Dict[str, Any]) -> None:
+        task = asyncio.ensure_future(self._resolve(params))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, params: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        action, rule, method, command = self.policy.respond(params)
+        self.stats['decision_seconds'] += time.perf_counter() - started
+        self.stats['paused'] += 1
+        self.stats[{CONTINUE: 'continued', BLOCK: 'blocked', STUB: 'stubbed'}[action]] += 1
+        if rule:
+            self.rules[rule] += 1
+        try:
+            await self.session.send(method, command)
+        except CDPError:
+            # The request was cancelled or its target navigated away meanwhile
+            pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.stats, policy=self.policy.name, rules=dict(self.rules))
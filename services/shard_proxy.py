@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+CDP-aware reverse proxy in front of several browser processes.
+
+Exposes a single DevTools endpoint: ``/json/new`` is balanced across shards
+(fewest open pages wins), ``/json/list`` aggregates every shard, and
+``/devtools/page/<id>`` WebSockets are routed to the shard that owns the
+target. WebSocket URLs in responses are rewritten to point at the proxy.
+
+Each shard's pages are followed over a browser-level CDP connection
+(``Target.setDiscoverTargets``), so pages opened or closed without going
+through the proxy (``window.open``, ``Target.closeTarget``, a renderer
+crash, a browser restart) still count. An unreachable shard is answered
+with 502 Bad Gateway.
+"""
+
+import asyncio
+import os
+import re
+import sys
+from typing import Any, Dict, List, Set
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+from cdp_client import CDPError, CDPSession  # noqa: E402
+
+_WS_URL = re.compile(r'ws://[^/]+/devtools/')
+
+# Upstream failures answered with 502 Bad Gateway
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class ShardProxy:
+    """Routes DevTools HTTP and WebSocket traffic to browser shards."""
+
+    def __init__(self, shards: List[str], timeout: float = 30):
+        """
+        Args:
+            shards (list): ``host:port`` DevTools endpoints of the shards
+            timeout (float): Upstream HTTP timeout in seconds
+        """
+        self.shards = shards
+        self.timeout = timeout
+        self.owners: Dict[str, int] = {}
+        self.pages: List[Set[str]] = [set() for _ in shards]
+        self._http = None
+        self._watchers = []
+
+    @property
+    def target_counts(self) -> List[int]:
+        """Open pages per shard."""
+        return [len(pages) for pages in self.pages]
+
+    def reset_shard(self, shard: int) -> None:
+        """Forget every target of a shard whose browser went away (e.g. before a restart)."""
+        self.pages[shard].clear()
+        self.owners = {target: owner for target, owner in self.owners.items() if owner != shard}
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._bad_gateway])
+        app.router.add_route('*', '/json/new', self._new_target)
+        app.router.add_get('/json', self._list_targets)
+        app.router.add_get('/json/list', self._list_targets)
+        app.router.add_get('/json/version', self._version)
+        app.router.add_route('*', '/json/{action:close|activate}/{id}', self._target_action)
+        app.router.add_get('/json/protocol', self._forward_first)
+        app.router.add_get('/devtools/{kind:page|browser}/{id}', self._websocket)
+        app.router.add_get('/shards', self._shard_stats)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._watchers = [asyncio.ensure_future(self._watch(shard)) for shard in range(len(self.shards))]
+
+    async def _on_cleanup(self, app):
+        for watcher in self._watchers:
+            watcher.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        await self._http.close()
+
+    @web.middleware
+    async def _bad_gateway(self, request, handler):
+        try:
+            return await handler(request)
+        except UPSTREAM_ERRORS as e:
+            return web.Response(status=502, text=f'Shard unreachable: {str(e) or type(e).__name__}')
+
+    async def _watch(self, shard: int) -> None:
+        """Follow one shard's targets over a browser-level CDP connection, reconnecting after it drops."""
+        delay = 0.5
+        while True:
+            try:
+                _, version = await self._upstream_json(shard, 'GET', '/json/version')
+                path = urlsplit(version['webSocketDebuggerUrl']).path
+                async with CDPSession(f'ws://{self.shards[shard]}{path}', timeout=self.timeout) as session:
+                    session.on('Target.targetCreated', lambda params: self._target_created(shard, params))
+                    session.on('Target.targetDestroyed', lambda params: self._target_destroyed(shard, params))
+                    # Discovery reports every page that exists now; a restarted browser has none of the old ones
+                    self.pages[shard].clear()
+                    await session.send('Target.setDiscoverTargets', {'discover': True})
+                    delay = 0.5
+                    await session.wait_closed()
+            except (CDPError, OSError, KeyError, TypeError, *UPSTREAM_ERRORS):
+                pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+
+    def _target_created(self, shard: int, params: Dict[str, Any]) -> None:
+        info = params['targetInfo']
+        self.owners[info['targetId']] = shard
+        if info.get('type') == 'page':
+            self.pages[shard].add(info['targetId'])
+
+    def _target_destroyed(self, shard: int, params: Dict[str, Any]) -> None:
+        if self.owners.get(params['targetId']) == shard:
+            del self.owners[params['targetId']]
+        self.pages[shard].discard(params['targetId'])
+
+    @staticmethod
+    def _rewrite(data, host: str):
+        """Point every DevTools WebSocket URL in a JSON payload at the proxy."""
+        if isinstance(data, list):
+            return [ShardProxy._rewrite(item, host) for item in data]
+        if isinstance(data, dict):
+            return {
+                key: _WS_URL.sub(f'ws://{host}/devtools/', value) if isinstance(value, str)
+                else ShardProxy._rewrite(value, host)
+                for key, value in data.items()
+            }
+        return data
+
+    async def _upstream_json(self, shard: int, method: str, path: str):
+        async with self._http.request(method, f'http://{self.shards[shard]}{path}') as response:
+            if response.content_type != 'application/json':
+                return response.status, await response.text()
+            return response.status, await response.json()
+
+    def _pick_shard(self) -> int:
+        return min(range(len(self.shards)), key=lambda i: self.target_counts[i])
+
+    async def _new_target(self, request):
+        shard = self._pick_shard()
+        path = '/json/new' + (f'?{request.query_string}' if request.query_string else '')
+        status, data = await self._upstream_json(shard, request.method, path)
+        if status != 200 or not isinstance(data, dict):
+            return web.Response(status=status, text=str(data))
+        self.owners[data['id']] = shard
+        self.pages[shard].add(data['id'])
+        return web.json_response(self._rewrite(data, request.host))
+
+    async def _list_targets(self, request):
+        results = await asyncio.gather(
+            *(self._upstream_json(i, 'GET', '/json/list') for i in range(len(self.shards))),
+            return_exceptions=True
+        )
+        targets = []
+        for shard, result in enumerate(results):
+            if isinstance(result, Exception) or result[0] != 200:
+                continue
+            for target in result[1]:
+                self.owners.setdefault(target['id'], shard)
+                if target.get('type') == 'page':
+                    self.pages[shard].add(target['id'])
+                targets.append(target)
+        return web.json_response(self._rewrite(targets, request.host))
+
+    async def _version(self, request):
+        status, data = await self._upstream_json(0, 'GET', '/json/version')
+        if isinstance(data, dict):
+            match = re.search(r'/devtools/browser/([^/]+)$', data.get('webSocketDebuggerUrl', ''))
+            if match:
+                self.owners[match.group(1)] = 0
+            data = self._rewrite(data, request.host)
+            return web.json_response(data, status=status)
+        return web.Response(status=status, text=data)
+
+    async def _target_action(self, request):
+        target_id = request.match_info['id']
+        shard = self.owners.get(target_id)
+        if shard is None:
+            return web.Response(status=404, text='No such target id: ' + target_id)
+        path = f"/json/{request.match_info['action']}/{target_id}"
+        async with self._http.request(request.method, f'http://{self.shards[shard]}{path}') as response:
+            body = await response.text()
+        if request.match_info['action'] == 'close' and response.status == 200:
+            self.owners.pop(target_id, None)
+            self.pages[shard].discard(target_id)
+        return web.Response(status=response.status, text=body)
+
+    async def _forward_first(self, request):
+        status, data = await self._upstream_json(0, 'GET', request.path)
+        return web.json_response(data, status=status)
+
+    async def _shard_stats(self, request):
+        return web.json_response([
+            {'shard': i, 'endpoint': endpoint, 'targets': self.target_counts[i]}
+            for i, endpoint in enumerate(self.shards)
+        ])
+
+    async def _websocket(self, request):
+        target_id = request.match_info['id']
+        shard = self.owners.get(target_id)
+        if shard is None:
+            # Targets created behind the proxy's back (e.g. window.open)
+            await self._list_targets(request)
+            shard = self.owners.get(target_id)
+        if shard is None:
+            return web.Response(status=404, text='No such target id: ' + target_id)
+
+        # Connected before the client handshake so a dead shard can still be answered with a 502
+        upstream_url = f"ws://{self.shards[shard]}/devtools/{request.match_info['kind']}/{target_id}"
+        async with self._http.ws_connect(upstream_url, max_msg_size=0) as upstream:
+            client = web.WebSocketResponse(max_msg_size=0)
+            await client.prepare(request)
+
+            async def pump(source, sink):
+                async for msg in source:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        await sink.send_str(msg.data)
+                    elif msg.type == aiohttp.WSMsgType.BINARY:
+                        await sink.send_bytes(msg.data)
+                    else:
+                        break
+
+            pumps = [asyncio.ensure_future(pump(client, upstream)),
+                     asyncio.ensure_future(pump(upstream, client))]
+            await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+            for task in pumps:
+                task.cancel()
+        await client.close()
+        return client
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Thorium supervisor and crash/hang watchdog (the image's default command).
+
+Launches K browser processes, each pinned to its own group of CPUs with its
+own ``--user-data-dir`` and a private DevTools port, and serves them behind
+one CDP-aware reverse proxy (``shard_proxy.py``) on the public port. A single
+browser (the default) listens on the public port itself, without the proxy
+hop. "DevTools listening on ws://" is only printed once the public port is
+accepting connections, so log-based readiness checks stay correct.
+
+Every browser is watched: an exit is a crash, and a browser that leaves a
+CDP heartbeat (``Browser.getVersion`` every ``--heartbeat`` seconds)
+unanswered for ``--hang-timeout`` seconds is hung. Either way its process
+group is killed and it is restarted from a clean copy of the profile
+template. ``Browser.getVersion`` is answered by the browser process, so
+with ``--page-timeout`` every page is also probed with
+``Runtime.evaluate('1')``: a page whose renderer leaves it unanswered that
+long is closed, and the browser is restarted if the page is still hung after
+that. A page running a long script or paused in a debugger cannot answer
+either, so the page probe is off by default. Restarts,
+crashes, hangs and downtime are served as JSON on
+``http://127.0.0.1:<--status-port>/supervisor``.
+
+    python3 supervisor.py --shards 4 -- --headless --disable-gpu
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import shlex
+import shutil
+import signal
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from warm_profile import PROFILE_TEMPLATE, seed_profile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+THORIUM_BIN = '/opt/chromium.org/thorium/thorium-browser'
+
+# Flags the wrapped-thorium script always passes
+BASE_FLAGS = [
+    '--ignore-gpu-blocklist',
+    '--no-first-run',
+    '--no-sandbox',
+    '--password-store=basic',
+    '--simulate-outdated-no-au=Tue, 31 Dec 2099 23:59:59 GMT',
+    '--test-type',
+]
+
+DEVTOOLS_LISTENING = 'DevTools listening on ws://'
+
+# Startup phase markers (read by benchmark/startup_profiler.py)
+ENTRYPOINT_MARKER = '[supervisor] entrypoint'
+BROWSER_EXEC_MARKER = '[supervisor] exec browser'
+
+# Port of the /supervisor status endpoint
+STATUS_PORT = 9221
+
+
+def log(message: str) -> None:
+    print(f'[supervisor] {message}', file=sys.stderr, flush=True)
+
+
+def cpu_groups(shards: int, cpus: List[int] = None) -> List[List[int]]:
+    """Split the available CPUs into ``shards`` contiguous groups."""
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0))
+    if shards > len(cpus):
+        # More shards than CPUs: share round-robin rather than fail
+        return [[cpus[i % len(cpus)]] for i in range(shards)]
+    size, extra = divmod(len(cpus), shards)
+    groups, start = [], 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+
+class Shard:
+    """One supervised browser process and its failure history."""
+
+    def __init__(self, index: int, command: List[str], port: int, cpus: Optional[List[int]]):
+        self.index = index
+        self.command = command
+        self.port = port
+        self.cpus = cpus
+        self.process = None
+        self.ws_url = None
+        self.restarts = 0
+        self.crashes = 0
+        self.hangs = 0
+        self.renderer_crashes = 0
+        self.renderer_hangs = 0
+        self.downtime = 0.0
+        self.last_downtime = None
+        self.started_at = None
+        self.last_heartbeat = None
+        self.listening = None
+
+    @property
+    def endpoint(self) -> str:
+        return f'127.0.0.1:{self.port}'
+
+    async def start(self) -> None:
+        # Created on the running loop (Python 3.9 binds events to the loop current at creation)
+        self.listening = asyncio.Event()
+        cpus = self.cpus
+
+        def pin():
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+
+        # After the profile is prepared, so startup_profiler attributes the copy to the wrapper phase
+        print(BROWSER_EXEC_MARKER, file=sys.stderr, flush=True)
+        # Own process group, so a restart also takes down orphaned children
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=pin,
+            start_new_session=True
+        )
+        self.started_at = time.monotonic()
+        asyncio.ensure_future(self._relay_output(self.process))
+
+    async def _relay_output(self, process) -> None:
+        # Re-emit shard output with a prefix; the raw DevTools line would make
+        # readiness checks fire before the public port is up.
+        async for raw in process.stderr:
+            line = raw.decode(errors='replace').rstrip()
+            if DEVTOOLS_LISTENING in line:
+                url = line.split('DevTools listening on ', 1)[1].split()[0]
+                self.ws_url = f'ws://{self.endpoint}{urlsplit(url).path}'
+                self.listening.set()
+                line = line.replace(DEVTOOLS_LISTENING, 'devtools ready at ws://')
+            print(f'[shard {self.index}] {line}', file=sys.stderr, flush=True)
+
+    def kill(self) -> None:
+        """SIGKILL the whole process group (a hung browser does not act on SIGTERM)."""
+        if self.process:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    async def stop(self) -> None:
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), 5)
+            except asyncio.TimeoutError:
+                self.kill()
+                await self.process.wait()
+
+    def to_dict(self) -> Dict[str, Any]:
+        up = self.listening is not None and self.listening.is_set() and self.process is not None and self.process.returncode is None
+        return {
+            'index': self.index,
+            'pid': self.process.pid if self.process else None,
+            'port': self.port,
+            'up': up,
+            'uptime': time.monotonic() - self.started_at if up else 0.0,
+            'restarts': self.restarts,
+            'crashes': self.crashes,
+            'hangs': self.hangs,
+            'renderer_crashes': self.renderer_crashes,
+            'renderer_hangs': self.renderer_hangs,
+            'downtime': self.downtime,
+            'last_downtime': self.last_downtime
+        }
+
+
+class Supervisor:
+    """Runs the shards (behind the proxy when there are several) and restarts failed ones."""
+
+    def __init__(self, browser: str, browser_args: List[str], shards: int = 1, port: int = 9222,
+                 base_port: int = 9320, profile_root: str = '/config/shards', pin: bool = True,
+                 profile_template: str = None, heartbeat: float = 0.25, hang_timeout: float = 2.0,
+                 clean_restart: bool = True, status_port: int = STATUS_PORT, page_timeout: float = 0.0):
+        """
+        Args:
+            heartbeat (float): Seconds between ``Browser.getVersion`` heartbeats
+            hang_timeout (float): Seconds without a heartbeat reply before a browser counts as hung
+            page_timeout (float): Seconds without a page probe reply before its renderer counts as hung
+                (0, the default, disables the page probes; busy or paused pages count as hung too)
+            clean_restart (bool): Restart failed browsers from a fresh profile (template copy)
+            status_port (int): Port of the ``/supervisor`` status endpoint (0 disables it)
+        """
+        self.port = port
+        self.profile_root = profile_root
+        self.profile_template = profile_template
+        self.heartbeat = heartbeat
+        self.hang_timeout = hang_timeout
+        self.clean_restart = clean_restart
+        self.status_port = status_port
+        self.page_timeout = page_timeout
+        # A single browser needs no proxy: it binds the public port itself
+        self.direct = shards == 1
+        groups = cpu_groups(shards) if pin and hasattr(os, 'sched_setaffinity') else [None] * shards
+        self.shards = []
+        for i in range(shards):
+            shard_port = port if self.direct else base_port + i
+            command = shlex.split(browser) + BASE_FLAGS + list(browser_args) + [
+                f'--remote-debugging-port={shard_port}',
+                f'--remote-debugging-address={"0.0.0.0" if self.direct else "127.0.0.1"}',
+                f'--user-data-dir={self._profile(i)}',
+            ]
+            self.shards.append(Shard(i, command, shard_port, groups[i]))
+        self.proxy = None
+        self.started = time.monotonic()
+        self._stopping = False
+
+    def _profile(self, index: int) -> str:
+        return os.path.join(self.profile_root, f'shard-{index}')
+
+    def _prepare_profile(self, shard: Shard, clean: bool = False) -> None:
+        profile = self._profile(shard.index)
+        if clean:
+            shutil.rmtree(profile, ignore_errors=True)
+        if self.profile_template and seed_profile(self.profile_template, profile):
+            log(f'seeded shard {shard.index} profile from {self.profile_template}')
+        os.makedirs(profile, exist_ok=True)
+        for lock in glob.glob(os.path.join(profile, 'Singleton*')):
+            os.remove(lock)
+
+    async def _start_shard(self, shard: Shard, clean: bool = False) -> None:
+        self._prepare_profile(shard, clean)
+        await shard.start()
+
+    async def _heartbeat(self, shard: Shard) -> None:
+        """
+        Return once the browser has left heartbeats unanswered for ``hang_timeout`` seconds,
+        or a page closed as hung is still hung.
+        """
+        import aiohttp
+        from cdp_client import CDPError, CDPSession
+
+        pages = {}  # session id -> target id of attached pages
+        probes = {}  # session id -> (started, task)
+        closed = set()  # target ids closed as hung
+        wedged = asyncio.Event()
+        tasks = []
+
+        def renderer_crashed(params):
+            shard.renderer_crashes += 1
+            log(f'shard {shard.index} renderer crashed ({params.get("status")})')
+
+        async def attach(session, target_id):
+            try:
+                result = await session.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True})
+            except CDPError:
+                return  # Closed before we got to it
+            pages[result['sessionId']] = target_id
+
+        async def probe(session, session_id, target_id):
+            try:
+                await asyncio.wait_for(session.send('Runtime.evaluate', {'expression': '1'},
+                                                    timeout=self.page_timeout + 1, session_id=session_id),
+                                       self.page_timeout)
+            except CDPError:
+                return  # Detached or navigated away mid-probe
+            except asyncio.TimeoutError:
+                if session_id not in pages:
+                    return
+                if target_id in closed:
+                    log(f'shard {shard.index} page {target_id} still hung after closing it')
+                    wedged.set()
+                    return
+                closed.add(target_id)
+                shard.renderer_hangs += 1
+                log(f'shard {shard.index} page {target_id} hung for {self.page_timeout}s, closing it')
+                try:
+                    await session.send('Target.closeTarget', {'targetId': target_id})
+                except CDPError:
+                    pass
+
+        def page_created(session, params):
+            if params['targetInfo'].get('type') == 'page':
+                tasks.append(asyncio.ensure_future(attach(session, params['targetInfo']['targetId'])))
+
+        def page_detached(params):
+            pages.pop(params.get('sessionId'), None)
+
+        def probe_pages(session):
+            now = time.monotonic()
+            for session_id, target_id in list(pages.items()):
+                started, task = probes.get(session_id, (0, None))
+                # One probe in flight per page, at most one a second
+                if (task is None or task.done()) and now - started >= max(self.heartbeat, 1.0):
+                    probes[session_id] = (now, asyncio.ensure_future(probe(session, session_id, target_id)))
+            for session_id in set(probes) - set(pages):
+                del probes[session_id]
+
+        shard.last_heartbeat = time.monotonic()
+        try:
+            async with CDPSession(shard.ws_url, timeout=self.hang_timeout) as session:
+                session.on('Target.targetCrashed', renderer_crashed)
+                if self.page_timeout:
+                    session.on('Target.targetCreated', lambda params: page_created(session, params))
+                    session.on('Target.detachedFromTarget', page_detached)
+                await session.send('Target.setDiscoverTargets', {'discover': True})
+                while not wedged.is_set():
+                    await session.send('Browser.getVersion')
+                    shard.last_heartbeat = time.monotonic()
+                    if self.page_timeout:
+                        probe_pages(session)
+                    await asyncio.sleep(self.heartbeat)
+                return
+        except (CDPError, OSError, aiohttp.ClientError, asyncio.TimeoutError):
+            # A dropped connection may just be the exit arriving first: wait out the rest of the timeout
+            remaining = self.hang_timeout - (time.monotonic() - shard.last_heartbeat)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        finally:
+            for task in tasks + [task for _, task in probes.values()]:
+                task.cancel()
+
+    async def _wait_for_failure(self, shard: Shard) -> str:
+        """Watch a running shard; return 'crash' or 'hang'."""
+        exited = asyncio.ensure_future(shard.process.wait())
+        ready = asyncio.ensure_future(shard.listening.wait())
+        heartbeat = None
+        try:
+            done, _ = await asyncio.wait([exited, ready], timeout=60, return_when=asyncio.FIRST_COMPLETED)
+            if exited in done:
+                return 'crash'
+            if ready not in done:
+                return 'hang'
+            heartbeat = asyncio.ensure_future(self._heartbeat(shard))
+            await asyncio.wait([exited, heartbeat], return_when=asyncio.FIRST_COMPLETED)
+            return 'crash' if shard.process.returncode is not None else 'hang'
+        finally:
+            for task in (exited, ready, heartbeat):
+                if task:
+                    task.cancel()
+
+    async def _watch(self, shard: Shard) -> None:
+        failures = 0
+        while not self._stopping:
+            reason = await self._wait_for_failure(shard)
+            if self._stopping:
+                return
+            # Downtime starts at the exit, or at the last heartbeat a hung browser answered
+            down_since = time.monotonic() if reason == 'crash' else shard.last_heartbeat or time.monotonic()
+            uptime = time.monotonic() - shard.started_at
+            shard.kill()
+            await shard.process.wait()
+            shard.restarts += 1
+            if reason == 'crash':
+                shard.crashes += 1
+                log(f'shard {shard.index} exited with {shard.process.returncode}, '
+                    f'restarting (restart #{shard.restarts})')
+            else:
+                shard.hangs += 1
+                log(f'shard {shard.index} hung for {self.hang_timeout}s, killed, '
+                    f'restarting (restart #{shard.restarts})')
+            if self.proxy:
+                # Its targets are gone
+                self.proxy.reset_shard(shard.index)
+
+            # Back off only while the browser keeps failing right after starting
+            failures = failures + 1 if uptime < 10 else 0
+            if failures > 1:
+                await asyncio.sleep(min(0.1 * 2 ** min(failures, 6), 5))
+            await self._start_shard(shard, clean=self.clean_restart)
+            try:
+                await asyncio.wait_for(shard.listening.wait(), 60)
+            except asyncio.TimeoutError:
+                continue
+            shard.last_downtime = time.monotonic() - down_since
+            shard.downtime += shard.last_downtime
+            log(f'shard {shard.index} back after {shard.last_downtime:.3f}s')
+
+    def status(self) -> Dict[str, Any]:
+        """Restart counts and downtime, in total and per shard."""
+        shards = [shard.to_dict() for shard in self.shards]
+        return {
+            'uptime': time.monotonic() - self.started,
+            'direct': self.direct,
+            'restarts': sum(s['restarts'] for s in shards),
+            'crashes': sum(s['crashes'] for s in shards),
+            'hangs': sum(s['hangs'] for s in shards),
+            'renderer_crashes': sum(s['renderer_crashes'] for s in shards),
+            'renderer_hangs': sum(s['renderer_hangs'] for s in shards),
+            'downtime': sum(s['downtime'] for s in shards),
+            'shards': shards
+        }
+
+    async def run(self) -> None:
+        for shard in self.shards:
+            await self._start_shard(shard)
+
+        # Imported while the browsers start up rather than before them
+        from aiohttp import web
+        from shard_proxy import ShardProxy
+
+        await asyncio.wait_for(asyncio.gather(*(s.listening.wait() for s in self.shards)), 60)
+
+        runners = []
+        if not self.direct:
+            self.proxy = ShardProxy([shard.endpoint for shard in self.shards])
+            runners.append(web.AppRunner(self.proxy.make_app()))
+            await runners[-1].setup()
+            await web.TCPSite(runners[-1], '0.0.0.0', self.port).start()
+        if self.status_port:
+            async def status(request):
+                return web.json_response(self.status())
+
+            app = web.Application()
+            app.router.add_get('/supervisor', status)
+            runners.append(web.AppRunner(app))
+            await runners[-1].setup()
+            await web.TCPSite(runners[-1], '127.0.0.1', self.status_port).start()
+        count = len(self.shards)
+        print(f'{DEVTOOLS_LISTENING}0.0.0.0:{self.port}/devtools/browser '
+              f'({count} shard{"s" if count > 1 else ""})', file=sys.stderr, flush=True)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        watchers = [asyncio.ensure_future(self._watch(shard)) for shard in self.shards]
+        await stop.wait()
+        self._stopping = True
+        for watcher in watchers:
+            watcher.cancel()
+        await asyncio.gather(*(shard.stop() for shard in self.shards))
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main():
+    print(ENTRYPOINT_MARKER, file=sys.stderr, flush=True)
+    parser = argparse.ArgumentParser(description='Run and watch Thorium browsers behind one DevTools endpoint')
+    parser.add_argument('--shards', type=int, default=int(os.environ.get('THORIUM_SHARDS', '1')),
+                        help='Number of browser processes (default: $THORIUM_SHARDS or 1)')
+    parser.add_argument('--port', type=int, default=9222, help='Public DevTools port')
+    parser.add_argument('--base-port', type=int, default=9320, help='First private shard port')
+    parser.add_argument('--profile-root', default='/config/shards', help='Parent of per-shard user data dirs')
+    parser.add_argument('--browser', default=THORIUM_BIN, help='Browser binary (may include arguments)')
+    parser.add_argument('--no-pin', action='store_true', help='Do not pin shards to CPU groups')
+    parser.add_argument('--profile-template', default=PROFILE_TEMPLATE,
+                        help='Pre-warmed profile copied into empty shard profiles')
+    parser.add_argument('--heartbeat', type=float, default=0.25,
+                        help='Seconds between CDP heartbeats to each browser (default: 0.25)')
+    parser.add_argument('--hang-timeout', type=float, default=float(os.environ.get('THORIUM_HANG_TIMEOUT', '2')),
+                        help='Seconds without a heartbeat reply before a browser is killed as hung '
+                             '(default: $THORIUM_HANG_TIMEOUT or 2)')
+    parser.add_argument('--page-timeout', type=float, default=float(os.environ.get('THORIUM_PAGE_TIMEOUT', '0')),
+                        help='Probe every page and close it as hung after this many seconds without a reply. '
+                             'A page busy with a long script or paused in a debugger is closed too, so only '
+                             'enable it for workloads without either (default: $THORIUM_PAGE_TIMEOUT or 0, off)')
+    parser.add_argument('--keep-profile', action='store_true',
+                        help='Restart failed browsers on their old profile instead of a fresh template copy')
+    parser.add_argument('--status-port', type=int, default=STATUS_PORT,
+                        help='Port of the /supervisor status endpoint on 127.0.0.1 (0 disables it)')
+    parser.add_argument('browser_args', nargs='*', help='Extra browser flags (after --)')
+    args = parser.parse_args()
+
+    seed = os.environ.get('THORIUM_SEED_PROFILE', '1') == '1'
+    browser_args = list(args.browser_args)
+    # Same opt-in as wrapped-thorium: route every shard through a shared (caching) proxy
+    proxy = os.environ.get('THORIUM_PROXY_SERVER')
+    if proxy and not any(arg.startswith('--proxy-server=') for arg in browser_args):
+        browser_args.append(f'--proxy-server={proxy}')
+    supervisor = Supervisor(args.browser, browser_args, args.shards, args.port,
+                            args.base_port, args.profile_root, not args.no_pin,
+                            args.profile_template if seed else None, args.heartbeat,
+                            args.hang_timeout, not args.keep_profile, args.status_port, args.page_timeout)
+    asyncio.run(supervisor.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Build-time browser profile warm-up.
+
+Runs Thorium over the local page corpus with a throwaway user data dir and
+keeps the result as a profile template. ``wrapped-thorium`` and
+``supervisor.py`` copy the template into an empty profile at startup, so the
+first launch in a fresh container skips first-run profile creation (``Local
+State``, preferences and the profile databases); the image build runs
+``fc-cache`` alongside it for the fontconfig cache.
+
+The V8 code cache and the HTTP cache are keyed by origin, and the corpus is
+served from a random 127.0.0.1 port, so nothing in them could be reused by
+real traffic: both are removed from the template rather than shipped.
+
+    python3 warm_profile.py --template /opt/thorium/profile-template
+"""
+
+import argparse
+import glob
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmark'))
+
+PROFILE_TEMPLATE = '/opt/thorium/profile-template'
+
+WARMUP_FLAGS = ['--headless', '--disable-gpu', '--no-sandbox', '--no-first-run', '--disable-dev-shm-usage']
+
+# Removed from the template: per-process locks, crash state, and the HTTP and
+# code caches (keyed by the warm-up server's origin, so useless afterwards)
+VOLATILE = ['Singleton*', 'Crashpad', 'Crash Reports', 'Default/Cache', 'Default/Code Cache',
+            'Default/Sessions', 'Default/Current Session', 'Default/Current Tabs']
+
+
+def strip_volatile(profile: str) -> None:
+    """Delete files that must not be shared between browser instances."""
+    for pattern in VOLATILE:
+        for path in glob.glob(os.path.join(profile, pattern)):
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+def warm_profile(browser: str, template: str, passes: int = 1, timeout: float = 60) -> List[str]:
+    """
+    Load every corpus page ``passes`` times into the ``template`` profile.
+
+    Args:
+        browser (str): Browser binary (may include arguments)
+        template (str): User data dir to build
+        passes (int): How many times each page is loaded
+        timeout (float): Per-load timeout in seconds
+
+    Returns:
+        list: The URLs that were loaded
+    """
+    # Only needed at build time; keeps aiohttp out of supervisor.py's import path
+    from page_server import PageServer
+
+    os.makedirs(template, exist_ok=True)
+    server = PageServer().start_background()
+    try:
+        urls = server.corpus_urls()
+        for _ in range(passes):
+            for url in urls:
+                print(f"Warming {url}")
+                subprocess.run(
+                    shlex.split(browser) + WARMUP_FLAGS + [f'--user-data-dir={template}', '--dump-dom', url],
+                    stdout=subprocess.DEVNULL,
+                    check=True,
+                    timeout=timeout
+                )
+    finally:
+        server.stop_background()
+    strip_volatile(template)
+    return urls
+
+
+def seed_profile(template: str, profile: str) -> bool:
+    """
+    Copy ``template`` into ``profile`` if the profile is missing or empty.
+
+    Returns:
+        bool: Whether the profile was seeded
+    """
+    if not os.path.isdir(template) or (os.path.isdir(profile) and os.listdir(profile)):
+        return False
+    shutil.copytree(template, profile, symlinks=True, dirs_exist_ok=True)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a pre-warmed browser profile template')
+    parser.add_argument('--browser', default='/opt/chromium.org/thorium/thorium-browser',
+                        help='Browser binary (may include arguments)')
+    parser.add_argument('--template', default=PROFILE_TEMPLATE, help='Profile template directory to create')
+    parser.add_argument('--passes', type=int, default=1, help='Loads per corpus page (default: 1)')
+    args = parser.parse_args()
+
+    urls = warm_profile(args.browser, args.template, args.passes)
+    print(f"Profile template written to {args.template} ({len(urls)} pages x {args.passes} passes)")
+
+
+if __name__ == "__main__":
+    main()
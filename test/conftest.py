@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Puts the repository's flat module directories on sys.path for every test.
+
+``benchmark/``, ``services/`` and ``scripts/`` are plain script directories,
+not packages, so tests import their modules by name.
+"""
+
+import os
+import sys
+
+for _path in ('benchmark', 'services', 'scripts'):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', _path))
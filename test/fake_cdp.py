@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Fake Chrome DevTools endpoint for offline tests.
+
+Serves the ``/json/*`` HTTP endpoints and per-target WebSockets on a random
+local port, answering just enough of the protocol to drive the clients in
+``benchmark/`` and ``services/``.
+"""
+
+import asyncio
+import base64
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+
+class FakeCDPServer:
+    """
+    Runs a fake browser in a background thread.
+
+    ``load_delay`` is how long each navigation takes before ``load`` fires.
+    Navigations to URLs containing ``fail`` return an ``errorText`` and URLs
+    containing ``hang`` never fire a load event. Give each instance its own
+    ``id_prefix`` when several stand in for shards of one endpoint.
+    Connections that sent ``Target.setDiscoverTargets`` get
+    ``Target.targetCreated``/``targetDestroyed`` for every page.
+    """
+
+    def __init__(self, load_delay: float = 0.05, port: int = 0, id_prefix: str = 'TARGET'):
+        self.load_delay = load_delay
+        self.port = port
+        self.id_prefix = id_prefix
+        self.targets = {}
+        self.contexts = set()
+        self.commands = []
+        self._discovering = set()
+        self._sockets = set()
+        self.handlers = {}
+        self._ids = itertools.count(1)
+        self._context_ids = itertools.count(1)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def ws_url(self, target_id):
+        return f'ws://127.0.0.1:{self.port}/devtools/page/{target_id}'
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_app())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait(10)
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def _shutdown(self):
+        # Like a browser exiting: drop open CDP connections instead of waiting for clients to hang up
+        for ws in list(self._sockets):
+            await ws.close()
+        await self._runner.cleanup()
+
+    async def _start_app(self):
+        app = web.Application()
+        app.router.add_get('/json/version', self._version)
+        app.router.add_route('*', '/json/new', self._new_target)
+        app.router.add_get('/json/list', self._list_targets)
+        app.router.add_get('/json', self._list_targets)
+        app.router.add_get('/json/close/{id}', self._close_target)
+        app.router.add_get('/devtools/page/{id}', self._page_socket)
+        app.router.add_get('/devtools/browser/{id}', self._page_socket)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def _version(self, request):
+        return web.json_response({
+            'Browser': 'Thorium/130.0.6723.174',
+            'Protocol-Version': '1.3',
+            'webSocketDebuggerUrl': f'ws://127.0.0.1:{self.port}/devtools/browser/fake'
+        })
+
+    async def _new_target(self, request):
+        if request.method != 'PUT':
+            return web.Response(status=405, text='Using unsafe HTTP verb GET to invoke /json/new')
+        target = self._add_target(request.query_string or 'about:blank')
+        await self._announce('Target.targetCreated', target['id'])
+        return web.json_response(target)
+
+    def _add_target(self, url, context_id=None):
+        target_id = f'{self.id_prefix}{next(self._ids)}'
+        self.targets[target_id] = {
+            'id': target_id,
+            'type': 'page',
+            'url': url,
+            'webSocketDebuggerUrl': self.ws_url(target_id)
+        }
+        if context_id:
+            self.targets[target_id]['browserContextId'] = context_id
+        return self.targets[target_id]
+
+    async def _list_targets(self, request):
+        return web.json_response(list(self.targets.values()))
+
+    async def _close_target(self, request):
+        if request.match_info['id'] not in self.targets:
+            return web.Response(status=404, text='No such target id')
+        await self._remove_target(request.match_info['id'])
+        return web.Response(text='Target is closing')
+
+    async def _remove_target(self, target_id):
+        await self._announce('Target.targetDestroyed', target_id)
+        del self.targets[target_id]
+
+    async def _announce(self, method, target_id, sockets=None):
+        target = self.targets[target_id]
+        params = {'targetId': target_id}
+        if method == 'Target.targetCreated':
+            params = {'targetInfo': {'targetId': target_id, 'type': target['type'], 'url': target['url']}}
+        for ws in list(self._discovering if sockets is None else sockets):
+            try:
+                await self._event(ws, method, params)
+            except ConnectionResetError:
+                self._discovering.discard(ws)
+
+    async def _page_socket(self, request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        target_id = request.match_info['id']
+
+        async for msg in ws:
+            command = json.loads(msg.data)
+            self.commands.append((target_id, command['method']))
+            handler = self.handlers.get(command['method'])
+            if handler:
+                await handler(ws, command)
+            elif command['method'] == 'Page.navigate':
+                await self._navigate(ws, command)
+            elif command['method'] == 'Target.setDiscoverTargets':
+                await self._reply(ws, command, {})
+                self._discovering.add(ws)
+                for existing in list(self.targets):
+                    await self._announce('Target.targetCreated', existing, [ws])
+            elif command['method'] == 'Target.attachToTarget':
+                await self._reply(ws, command, {'sessionId': f"S-{command['params']['targetId']}"})
+            elif command['method'] == 'Target.closeTarget':
+                target_id = command['params']['targetId']
+                if target_id in self.targets:
+                    await self._remove_target(target_id)
+                await self._reply(ws, command, {'success': True})
+            elif command['method'] == 'Target.createBrowserContext':
+                context_id = f'CTX{next(self._context_ids)}'
+                self.contexts.add(context_id)
+                await self._reply(ws, command, {'browserContextId': context_id})
+            elif command['method'] == 'Target.createTarget':
+                params = command['params']
+                target = self._add_target(params['url'], params.get('browserContextId'))
+                await self._announce('Target.targetCreated', target['id'])
+                await self._reply(ws, command, {'targetId': target['id']})
+            elif command['method'] == 'Target.disposeBrowserContext':
+                context_id = command['params']['browserContextId']
+                self.contexts.discard(context_id)
+                for target_id, target in list(self.targets.items()):
+                    if target.get('browserContextId') == context_id:
+                        await self._remove_target(target_id)
+                await self._reply(ws, command, {})
+            elif command['method'] == 'Performance.getMetrics':
+                await self._reply(ws, command, {'metrics': [
+                    {'name': 'JSHeapUsedSize', 'value': 1048576},
+                    {'name': 'Nodes', 'value': 42}
+                ]})
+            else:
+                await self._reply(ws, command, {})
+        self._discovering.discard(ws)
+        self._sockets.discard(ws)
+        return ws
+
+    @staticmethod
+    async def _reply(ws, command, result):
+        await ws.send_str(json.dumps({'id': command['id'], 'result': result}))
+
+    @staticmethod
+    async def _event(ws, method, params):
+        await ws.send_str(json.dumps({'method': method, 'params': params}))
+
+    async def _navigate(self, ws, command):
+        url = command['params']['url']
+        if 'fail' in url:
+            await self._reply(ws, command, {'frameId': 'F1', 'errorText': 'net::ERR_NAME_NOT_RESOLVED'})
+            return
+
+        loader_id = f'L{command["id"]}'
+        start = time.monotonic()
+        lifecycle = {'frameId': 'F1', 'loaderId': loader_id}
+        await self._event(ws, 'Page.lifecycleEvent', dict(lifecycle, name='init', timestamp=start))
+        await self._reply(ws, command, {'frameId': 'F1', 'loaderId': loader_id})
+        if 'hang' in url:
+            return
+
+        await asyncio.sleep(self.load_delay / 2)
+        await self._event(ws, 'Page.lifecycleEvent',
+                          dict(lifecycle, name='DOMContentLoaded', timestamp=start + self.load_delay / 2))
+        await self._event(ws, 'Page.domContentEventFired', {'timestamp': start + self.load_delay / 2})
+        await asyncio.sleep(self.load_delay / 2)
+        await self._event(ws, 'Page.lifecycleEvent',
+                          dict(lifecycle, name='load', timestamp=start + self.load_delay))
+        await self._event(ws, 'Page.loadEventFired', {'timestamp': start + self.load_delay})
+
+
+class FakeScreencast:
+    """
+    Screencast handlers for a FakeCDPServer.
+
+    Streams numbered frames of ``frame_size`` bytes, sending the next one only
+    after the previous one is acknowledged; ``frames`` caps how many are sent.
+    """
+
+    def __init__(self, server, frame_size=1000, frames=None):
+        self.server = server
+        self.frame_size = frame_size
+        self.frames = frames
+        self.params = None
+        self.sent = 0
+        self.acked = 0
+        self.max_unacked = 0
+        self._acked = None
+        self._task = None
+        server.handlers['Page.startScreencast'] = self.start
+        server.handlers['Page.screencastFrameAck'] = self.ack
+        server.handlers['Page.stopScreencast'] = self.stop
+
+    async def start(self, ws, command):
+        self.params = command['params']
+        self._acked = asyncio.Event()
+        await self.server._reply(ws, command, {})
+        self._task = asyncio.ensure_future(self._stream(ws))
+
+    async def _stream(self, ws):
+        while self.frames is None or self.sent < self.frames:
+            self.sent += 1
+            self.max_unacked = max(self.max_unacked, self.sent - self.acked)
+            data = bytes([self.sent % 256]) * self.frame_size
+            await self.server._event(ws, 'Page.screencastFrame', {
+                'data': base64.b64encode(data).decode(), 'sessionId': self.sent,
+                'metadata': {'deviceWidth': 800, 'deviceHeight': 600}
+            })
+            self._acked.clear()
+            await self._acked.wait()
+
+    async def ack(self, ws, command):
+        self.acked = max(self.acked, command['params']['sessionId'])
+        self._acked.set()
+        await self.server._reply(ws, command, {})
+
+    async def stop(self, ws, command):
+        if self._task:
+            self._task.cancel()
+        await self.server._reply(ws, command, {})
+
+class FakeTracing:
+    """
+    Tracing and IO handlers for a FakeCDPServer.
+
+    ``Tracing.end`` completes with a stream handle whose content is
+    ``{"traceEvents": events}``, served by ``IO.read`` in ``chunk_size``
+    pieces (base64 encoded when ``base64_chunks`` is set).
+    """
+
+    def __init__(self, server, events, chunk_size=64, base64_chunks=False):
+        self.server = server
+        self.data = json.dumps({'traceEvents': events}).encode()
+        self.chunk_size = chunk_size
+        self.base64_chunks = base64_chunks
+        self.start_params = None
+        self.reads = 0
+        self.closed = []
+        self._offsets = {}
+        server.handlers['Tracing.start'] = self.start
+        server.handlers['Tracing.end'] = self.end
+        server.handlers['IO.read'] = self.read
+        server.handlers['IO.close'] = self.close
+
+    async def start(self, ws, command):
+        self.start_params = command['params']
+        await self.server._reply(ws, command, {})
+
+    async def end(self, ws, command):
+        handle = f'stream{len(self._offsets) + 1}'
+        self._offsets[handle] = 0
+        await self.server._reply(ws, command, {})
+        await self.server._event(ws, 'Tracing.tracingComplete', {'dataLossOccurred': False, 'stream': handle})
+
+    async def read(self, ws, command):
+        handle = command['params']['handle']
+        offset = self._offsets[handle]
+        chunk = self.data[offset:offset + self.chunk_size]
+        self._offsets[handle] = offset + len(chunk)
+        self.reads += 1
+        await self.server._reply(ws, command, {
+            'data': base64.b64encode(chunk).decode() if self.base64_chunks else chunk.decode(),
+            'base64Encoded': self.base64_chunks,
+            'eof': self._offsets[handle] >= len(self.data)
+        })
+
+    async def close(self, ws, command):
+        self.closed.append(command['params']['handle'])
+        await self.server._reply(ws, command, {})
+
+
+class FakeSubresources:
+    """
+    Fetch and Network handlers for a FakeCDPServer.
+
+    Every navigation first requests ``resources`` (dicts with ``url``,
+    ``type`` and ``size``), pausing each one in ``Fetch.requestPaused`` when a
+    ``Fetch.enable`` pattern matches its stage and resource type, and reports
+    it with ``Network.loadingFinished`` (``encodedDataLength``) or
+    ``Network.loadingFailed``. ``resolutions`` records (url, stage, method).
+    """
+
+    def __init__(self, server, resources):
+        self.server = server
+        self.resources = resources
+        self.patterns = None
+        self.resolutions = []
+        self._pending = {}
+        self._ids = itertools.count(1)
+        server.handlers['Fetch.enable'] = self.enable
+        server.handlers['Fetch.disable'] = self.disable
+        server.handlers['Page.navigate'] = self.navigate
+        for method in ('Fetch.continueRequest', 'Fetch.failRequest', 'Fetch.fulfillRequest'):
+            server.handlers[method] = self.resolve
+
+    async def enable(self, ws, command):
+        self.patterns = command['params'].get('patterns', [])
+        await self.server._reply(ws, command, {})
+
+    async def disable(self, ws, command):
+        self.patterns = None
+        await self.server._reply(ws, command, {})
+
+    async def resolve(self, ws, command):
+        future = self._pending.pop(command['params']['requestId'], None)
+        if future:
+            future.set_result((command['method'], command['params']))
+        await self.server._reply(ws, command, {})
+
+    async def navigate(self, ws, command):
+        # Runs in the background so the socket keeps reading Fetch.* commands
+        asyncio.ensure_future(self._load(ws, command))
+
+    def _matches(self, stage, resource_type):
+        return self.patterns is not None and any(
+            p.get('requestStage', 'Request') == stage and p.get('resourceType', resource_type) == resource_type
+            for p in self.patterns)
+
+    async def _pause(self, ws, resource, stage, extra):
+        request_id = f'interception-{next(self._ids)}'
+        self._pending[request_id] = asyncio.get_running_loop().create_future()
+        await self.server._event(ws, 'Fetch.requestPaused', dict(
+            extra, requestId=request_id, resourceType=resource['type'], frameId='F1',
+            request={'url': resource['url'], 'method': 'GET', 'headers': {}}))
+        method, params = await self._pending[request_id]
+        self.resolutions.append((resource['url'], stage, method))
+        return method, params
+
+    async def _load(self, ws, command):
+        for index, resource in enumerate(self.resources):
+            method, params = 'Fetch.continueRequest', {}
+            if self._matches('Request', resource['type']):
+                method, params = await self._pause(ws, resource, 'Request', {})
+            if method == 'Fetch.continueRequest' and self._matches('Response', resource['type']):
+                method, params = await self._pause(ws, resource, 'Response', {
+                    'responseStatusCode': 200,
+                    'responseHeaders': [{'name': 'Content-Length', 'value': str(resource['size'])}]})
+            network_id = f'R{index}'
+            if method == 'Fetch.failRequest':
+                await self.server._event(ws, 'Network.loadingFailed', {
+                    'requestId': network_id, 'errorText': 'net::ERR_BLOCKED_BY_CLIENT'})
+            else:
+                size = len(base64.b64decode(params['body'])) if method == 'Fetch.fulfillRequest' \
+                    else resource['size']
+                await self.server._event(ws, 'Network.loadingFinished', {
+                    'requestId': network_id, 'encodedDataLength': size})
+        await self.server._navigate(ws, command)
+
+
+def main():
+    """Stand-in browser binary: ``python fake_cdp.py --remote-debugging-port=N ...``."""
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--remote-debugging-port', type=int, default=0)
+    parser.add_argument('--load-delay', type=float, default=0.05)
+    args, _ = parser.parse_known_args()
+
+    server = FakeCDPServer(args.load_delay, args.remote_debugging_port, id_prefix=f'P{os.getpid()}T')
+    server.start()
+    print(f'DevTools listening on ws://127.0.0.1:{server.port}/devtools/browser/fake',
+          file=sys.stderr, flush=True)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    stop.wait()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
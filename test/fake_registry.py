@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Stub GitHub releases API, Docker Hub tags API and image registry for offline tests.
+
+Serves ``/repos/<owner>/<repo>/releases[/latest|/tags/<tag>]`` and
+``/v2/repositories/<namespace>/<name>/tags/<tag>/`` on a random local port.
+Release responses carry an ETag and honour ``If-None-Match``; release assets
+list their size and sha256 digest and download from ``/download/<tag>/<name>``.
+Images are served through the registry v2 ``/v2/<name>/manifests/<tag>`` and
+``/v2/<name>/blobs/<digest>`` endpoints.
+"""
+
+import asyncio
+import hashlib
+import threading
+
+from aiohttp import web
+
+
+class FakeRegistry:
+    """
+    Runs the stub server in a background thread.
+
+    ``releases`` are tag names, newest first; ``tags`` are the published
+    ``<image>:<tag>`` references. ``assets`` maps a release to its asset
+    names (default: the preferred .deb name for every instruction set).
+    ``failures`` maps a tag to how many requests for it fail with ``503``
+    before it answers, and ``delay`` is added to every tag lookup.
+    ``served`` replaces the bytes downloaded for an asset name without
+    changing the digest the release lists. ``images`` maps a registry
+    ``<name>:<tag>`` to its layer contents.
+    """
+
+    def __init__(self, releases=(), tags=(), assets=None, failures=None, delay: float = 0.0, images=None):
+        self.releases = list(releases)
+        self.images = dict(images or {})
+        self.blobs = {hashlib.sha256(layer).hexdigest(): layer for layers in self.images.values() for layer in layers}
+        self.tags = set(tags)
+        self.assets = dict(assets or {})
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.served = {}
+        self.downloads = []
+        self.port = 0
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_app())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait(10)
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(10)
+
+    async def _start_app(self):
+        app = web.Application()
+        app.router.add_get('/repos/{owner}/{repo}/releases/latest', self._latest)
+        app.router.add_get('/repos/{owner}/{repo}/releases/tags/{tag}', self._release_by_tag)
+        app.router.add_get('/repos/{owner}/{repo}/releases', self._releases)
+        app.router.add_get('/v2/repositories/{namespace}/{name}/tags/{tag}/', self._tag)
+        app.router.add_get('/download/{tag}/{name}', self._download)
+        app.router.add_get('/v2/', self._registry_root)
+        app.router.add_get('/v2/{name:.+}/manifests/{reference}', self._manifest)
+        app.router.add_get('/v2/{name:.+}/blobs/sha256:{digest}', self._blob)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _conditional(self, request, etag, payload):
+        self.requests.append((request.path_qs, dict(request.headers)))
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.json_response(payload, headers={'ETag': etag})
+
+    @staticmethod
+    def package(name):
+        """Content of a release asset: a few hundred KiB derived from its name."""
+        return hashlib.sha256(name.encode()).digest() * (8192 + len(name))
+
+    def release(self, tag):
+        names = self.assets.get(tag)
+        if names is None:
+            names = [f"thorium-browser_{tag.lstrip('M')}_{isa}.deb" for isa in ('AVX2', 'AVX', 'SSE3', 'SSE4')]
+        return {'tag_name': tag, 'draft': False, 'prerelease': False,
+                'assets': [{'name': name, 'state': 'uploaded', 'size': len(self.package(name)),
+                            'digest': f'sha256:{hashlib.sha256(self.package(name)).hexdigest()}',
+                            'browser_download_url': f'{self.base_url}/download/{tag}/{name}'} for name in names]}
+
+    async def _latest(self, request):
+        if not self.releases:
+            return web.json_response({'message': 'Not Found'}, status=404)
+        return self._conditional(request, f'"{self.releases[0]}"', self.release(self.releases[0]))
+
+    async def _release_by_tag(self, request):
+        tag = request.match_info['tag']
+        if tag not in self.releases:
+            return web.json_response({'message': 'Not Found'}, status=404)
+        return self._conditional(request, f'"{tag}"', self.release(tag))
+
+    async def _releases(self, request):
+        count = int(request.query.get('per_page', 30))
+        releases = [self.release(tag) for tag in self.releases[:count]]
+        return self._conditional(request, f'"{len(self.releases)}-{count}"', releases)
+
+    async def _tag(self, request):
+        self.requests.append((request.path_qs, dict(request.headers)))
+        tag = request.match_info['tag']
+        reference = f"{request.match_info['namespace']}/{request.match_info['name']}:{tag}"
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.failures.get(tag, 0) > 0:
+            self.failures[tag] -= 1
+            return web.Response(status=503, headers={'Retry-After': '0'})
+        if reference in self.tags:
+            return web.json_response({'name': tag}, headers={'ETag': f'"{tag}"'})
+        return web.json_response({'message': 'tag not found'}, status=404)
+
+    async def _download(self, request):
+        name = request.match_info['name']
+        self.downloads.append(name)
+        if self.failures.get(name, 0) > 0:
+            self.failures[name] -= 1
+            return web.Response(status=503)
+        return web.Response(body=self.served.get(name, self.package(name)), content_type='application/octet-stream')
+
+    async def _registry_root(self, request):
+        return web.json_response({})
+
+    async def _manifest(self, request):
+        self.requests.append((request.path_qs, dict(request.headers)))
+        layers = self.images.get(f"{request.match_info['name']}:{request.match_info['reference']}")
+        if layers is None:
+            return web.json_response({'errors': [{'code': 'MANIFEST_UNKNOWN'}]}, status=404)
+        media_type = 'application/vnd.docker.distribution.manifest.v2+json'
+        return web.json_response({
+            'schemaVersion': 2,
+            'mediaType': media_type,
+            'layers': [{'mediaType': 'application/vnd.docker.image.rootfs.diff.tar.gzip', 'size': len(layer),
+                        'digest': f'sha256:{hashlib.sha256(layer).hexdigest()}'} for layer in layers]
+        }, content_type=media_type)
+
+    async def _blob(self, request):
+        self.downloads.append(request.match_info['digest'])
+        blob = self.blobs.get(request.match_info['digest'])
+        if blob is None:
+            return web.json_response({'errors': [{'code': 'BLOB_UNKNOWN'}]}, status=404)
+        return web.Response(body=blob, content_type='application/octet-stream')
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Tests for BenchmarkRunner orchestration that do not need Docker.
+"""
+
+import socket
+
+from benchmark import (CONTAINERS, SUPERVISOR, BenchmarkRunner, allocate_cpusets, flag_variants, seed_variants,
+                       shard_variants)
+from fake_cdp import FakeCDPServer
+from flag_matrix import DEFAULT_BROWSER_FLAGS, WRAPPED_THORIUM
+
+
+class RecordingRunner(BenchmarkRunner):
+    """BenchmarkRunner that records docker commands instead of running them."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commands = []
+
+    def run_command(self, cmd, timeout=None):
+        self.commands.append(cmd)
+        return {'success': False, 'stdout': '', 'stderr': 'docker unavailable', 'returncode': 1,
+                'execution_time': 0, 'memory_delta': 0, 'start_time': 0, 'end_time': 0}
+
+
+def test_allocate_cpusets_is_disjoint():
+    cpusets = allocate_cpusets(5, available=list(range(32)))
+    assert cpusets[0] == '0,1,2,3,4,5'
+    assert cpusets[4] == '24,25,26,27,28,29'
+    cpus = [cpu for cpuset in cpusets for cpu in cpuset.split(',')]
+    assert len(cpus) == len(set(cpus)) == 30
+
+    assert allocate_cpusets(2, 2, available=[4, 5, 6, 7, 8]) == ['4,5', '6,7']
+
+
+def test_allocate_cpusets_rejects_oversubscription():
+    try:
+        allocate_cpusets(5, 4, available=list(range(16)))
+    except ValueError as e:
+        assert 'Cannot pin 5 containers' in str(e)
+    else:
+        raise AssertionError('expected ValueError')
+
+
+def test_start_container_passes_pinning():
+    runner = RecordingRunner()
+    runner.start_container('thorium-docker:avx2', 'bench', 9223, cpuset='0,1', memory='4g')
+    run_cmd = runner.commands[-1]
+    assert run_cmd[:3] == ['docker', 'run', '-d']
+    assert run_cmd[run_cmd.index('--cpuset-cpus') + 1] == '0,1'
+    assert run_cmd[run_cmd.index('--memory') + 1] == '4g'
+    assert run_cmd[-1] == 'thorium-docker:avx2'
+
+
+def test_parallel_results_carry_pinning(monkeypatch):
+    monkeypatch.setattr('os.sched_getaffinity', lambda pid: set(range(16)), raising=False)
+    runner = RecordingRunner()
+    results = runner.run_all_benchmarks(['http://a.test/'], parallel=True, cpus_per_container=1, memory='2g')
+
+    assert results['mode'] == 'parallel'
+    assert [r['image'] for r in results['results']] == [c['image'] for c in CONTAINERS]
+    cpusets = [r['pinning']['cpuset'] for r in results['results']]
+    assert len(set(cpusets)) == len(CONTAINERS)
+    assert all(r['pinning']['memory'] == '2g' for r in results['results'])
+
+
+def test_sequential_results_share_one_cpuset():
+    runner = RecordingRunner()
+    results = runner.run_all_benchmarks(['http://a.test/'], cpus_per_container=1)
+
+    assert results['mode'] == 'sequential'
+    assert {r['pinning']['cpuset'] for r in results['results']} == {results['results'][0]['pinning']['cpuset']}
+
+
+def test_shard_variants_run_supervisor_per_shard_count():
+    variants = shard_variants(CONTAINERS, [1, 4])
+    assert len(variants) == 1 + 2 * (len(CONTAINERS) - 1)
+    assert 'shards' not in variants[0]
+    ports = [v['port'] for v in variants]
+    assert len(ports) == len(set(ports))
+
+    runner = RecordingRunner()
+    results = runner.run_all_benchmarks(['http://a.test/'], shards=[1, 4])
+    assert [r['shards'] for r in results['results'][:3]] == [None, 1, 4]
+    run_cmd = [cmd for cmd in runner.commands if cmd[:2] == ['docker', 'run']][-1]
+    image_index = run_cmd.index('thorium-docker:sse4')
+    assert run_cmd[image_index + 1:image_index + 5] == ['python3', SUPERVISOR, '--shards', '4']
+    assert runner.result_label(results['results'][-1]) == 'thorium-docker:sse4 (K=4)'
+
+
+def test_seed_variants_toggle_profile_template():
+    variants = seed_variants(CONTAINERS)
+    assert [v.get('seed_profile') for v in variants[:3]] == [None, True, False]
+    assert len({v['port'] for v in variants}) == len(variants)
+
+    runner = RecordingRunner()
+    results = runner.run_all_benchmarks(['http://a.test/'], compare_seed=True)
+    run_cmds = [cmd for cmd in runner.commands if cmd[:2] == ['docker', 'run']]
+    assert 'THORIUM_SEED_PROFILE=1' in run_cmds[1]
+    assert 'THORIUM_SEED_PROFILE=0' in run_cmds[2]
+    assert '-e' not in run_cmds[0]
+    assert runner.result_label(results['results'][2]) == 'thorium-docker:avx2 (empty profile)'
+
+
+def test_flag_variants_override_the_container_command():
+    matrix = {'baseline': [], 'no-ipc': ['--disable-ipc-flooding-protection']}
+    variants = flag_variants(CONTAINERS, matrix)
+    assert len(variants) == 1 + 2 * (len(CONTAINERS) - 1)
+    assert len({v['port'] for v in variants}) == len(variants)
+
+    runner = RecordingRunner()
+    results = runner.run_all_benchmarks(['http://a.test/'], flag_matrix=matrix)
+    run_cmds = [cmd for cmd in runner.commands if cmd[:2] == ['docker', 'run']]
+    assert run_cmds[0][-1] == 'chromedp/headless-shell:latest'
+    assert run_cmds[1][-len(DEFAULT_BROWSER_FLAGS) - 3:] == (
+        ['thorium-docker:avx2', WRAPPED_THORIUM] + DEFAULT_BROWSER_FLAGS + ['--remote-debugging-port=9222'])
+    assert '--disable-ipc-flooding-protection' in run_cmds[2]
+    assert results['flag_matrix'] == matrix
+    assert BenchmarkRunner.result_label(results['results'][2]) == 'thorium-docker:avx2 (flags=no-ipc)'
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LogRunner(BenchmarkRunner):
+    """BenchmarkRunner whose container log is a canned shell script."""
+
+    def __init__(self, script, **kwargs):
+        super().__init__(**kwargs)
+        self.script = script
+
+    def log_follow_command(self, name):
+        return ['sh', '-c', self.script]
+
+
+def test_ready_via_http_probe():
+    with FakeCDPServer() as server:
+        ready = BenchmarkRunner().wait_for_container_ready(server.port, max_wait=5)
+    assert ready['ready_source'] == 'http'
+    assert ready['ready_time'] < 0.5
+
+
+def test_ready_via_devtools_log_line():
+    runner = LogRunner('echo starting; sleep 0.2; '
+                       'echo "DevTools listening on ws://0.0.0.0:9222/devtools/browser/abc"; sleep 5')
+    ready = runner.wait_for_container_ready(unused_port(), max_wait=5, name='bench')
+    assert ready['ready_source'] == 'log'
+    assert 0.2 <= ready['ready_time'] < 1.0
+
+
+def test_ready_times_out():
+    runner = LogRunner('echo starting; sleep 5')
+    ready = runner.wait_for_container_ready(unused_port(), max_wait=0.5, name='bench')
+    assert ready == {'ready_time': 0.5, 'ready_source': 'timeout'}
+
+
+def test_pool_comparison_reports_both_modes():
+    with FakeCDPServer(load_delay=0.02) as server:
+        runner = BenchmarkRunner(iterations=2, timeout=5, pool_size=2)
+        comparison = runner.run_pool_comparison(server.port, ['http://a.test/'])
+
+    assert comparison['success'], comparison
+    assert comparison['samples'] == 2
+    for mode in ('cold', 'pooled'):
+        assert comparison[mode]['acquire']['n'] == 2
+        assert comparison[mode]['first_load']['median'] >= 0.02
+    assert comparison['pool_stats']['leases'] == 2
+
+
+def test_report_lists_render_throughput():
+    runner = BenchmarkRunner()
+    case = {'viewport': '1280x720', 'format': 'jpeg', 'quality': 60, 'success': True,
+            'renders_per_second': 12.5, 'latency': {'p50': 0.08, 'p95': 0.09, 'p99': 0.1},
+            'bytes': {'n': 3, 'mean': 51200}, 'cpu_seconds_per_render': 0.05}
+
+    def result(image, rate):
+        page_loads = [{'success': True, 'url': 'http://a.test/', 'iteration': 0, 'cold': True, 'load_time': 0.5}]
+        return {'image': image, 'success': True, 'startup': {'total_startup_time': 1.0, 'ready_time': 0.5},
+                'page_loads': page_loads, 'final_stats': {},
+                'load_stats': runner.summarize_page_loads(page_loads, ['http://a.test/']),
+                'render_test': {'success': True, 'url': 'http://a.test/', 'renders': 3,
+                                'cases': [dict(case, renders_per_second=rate)]}}
+
+    report = runner.generate_report({'timestamp': 'now', 'iterations': 1, 'results': [
+        result('thorium-docker:avx2', 12.5), result('thorium-docker:sse3', 9.0)]})
+    assert '## Render Throughput' in report
+    assert '| 1280x720 | jpeg q60 | 12.50 | 0.080 | 0.090 | 50.0 | 50.0 |' in report
+    assert '| 1280x720 | jpeg q60 | thorium-docker:avx2 | 12.50 |' in report
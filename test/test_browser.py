@@ -4,6 +4,7 @@ Test script to verify Thorium headless browser functionality.
 """
 
 import json
+import os
 import requests
 import time
 import sys
@@ -13,6 +14,11 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+# Pages are served by the local corpus server (benchmark/page_server.py), which
+# mirrors the httpbin paths used here; set TEST_PAGE_BASE_URL=https://httpbin.org
+# to test against the public service instead.
+PAGE_BASE_URL = os.environ.get('TEST_PAGE_BASE_URL', 'http://page-server:8080').rstrip('/')
+
 def test_remote_debugging():
     """
     Test remote debugging connection.
@@ -51,7 +57,7 @@ def test_browser_functionality():
         
         # Test 1: Navigate to a simple page
         print("Testing navigation...")
-        driver.get("https://httpbin.org/html")
+        driver.get(f"{PAGE_BASE_URL}/html")
         title = driver.title
         print(f"Page title: {title}")
         
@@ -76,7 +82,7 @@ def test_browser_functionality():
         
         # Test 5: Test multi-language support
         print("Testing multi-language support...")
-        driver.get("https://httpbin.org/encoding/utf8")
+        driver.get(f"{PAGE_BASE_URL}/encoding/utf8")
         content = driver.find_element(By.TAG_NAME, "body").text
         if "こんにちは" in content or "你好" in content:
             print("✓ Multi-language support working")
@@ -105,7 +111,7 @@ def test_performance():
         
         # Test page load time
         start_time = time.time()
-        driver.get("https://httpbin.org/delay/1")
+        driver.get(f"{PAGE_BASE_URL}/delay/1")
         load_time = time.time() - start_time
         
         print(f"Page load time: {load_time:.2f} seconds")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared caching proxy against the local page server, and its benchmark wiring.
+"""
+
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+
+from benchmark import CORPUS_HOST, BenchmarkRunner
+from cache_proxy import CacheProxy, DiskCache, freshness_lifetime, stats_delta, storable
+from page_server import PageServer
+
+
+def fetch_all(proxy, urls, headers=None):
+    """GET every URL through the proxy; return (status, X-Cache, body) per URL."""
+    async def run():
+        results = []
+        async with aiohttp.ClientSession() as http:
+            for url in urls:
+                async with http.get(url, proxy=f'http://127.0.0.1:{proxy.port}', headers=headers) as response:
+                    results.append((response.status, response.headers.get('X-Cache'), await response.read()))
+        return results
+    return asyncio.run(run())
+
+
+class Origin:
+    """An origin with explicit caching headers, counting requests per path."""
+
+    def __init__(self):
+        self.requests = []
+        self.server = PageServer()
+        self.server.make_app = self.make_app
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_get('/{path}', self.serve)
+        return app
+
+    async def serve(self, request):
+        path = request.match_info['path']
+        self.requests.append((path, request.headers.get('If-None-Match')))
+        if path == 'etag':
+            if request.headers.get('If-None-Match') == '"v1"':
+                return web.Response(status=304, headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0'})
+            return web.Response(body=b'tagged', headers={'ETag': '"v1"', 'Cache-Control': 'max-age=0'})
+        if path == 'stream':
+            # Chunked, so there is no Content-Length to check against the object size cap
+            response = web.StreamResponse(headers={'Cache-Control': 'max-age=60'})
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            for _ in range(int(request.query.get('chunks', 1))):
+                await response.write(b'x' * 600)
+            await response.write_eof()
+            return response
+        headers = {'no-store': {'Cache-Control': 'no-store'}, 'cookie': {'Set-Cookie': 'id=1'},
+                   'vary': {'Vary': 'User-Agent'}}.get(path, {'Cache-Control': 'max-age=60'})
+        return web.Response(body=path.encode() * 10, headers=headers)
+
+    def __enter__(self):
+        self.server.start_background()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.stop_background()
+
+    def url(self, path):
+        return self.server.url(path)
+
+
+def test_freshness_and_storability():
+    assert freshness_lifetime({'cache-control': 'public, max-age=60, s-maxage=600'}, 300) == 600
+    assert freshness_lifetime({'cache-control': 'private, max-age=60'}, 300) is None
+    assert freshness_lifetime({'cache-control': 'no-cache'}, 300) == 0
+    assert freshness_lifetime({'date': 'Thu, 01 Jan 2026 00:00:00 GMT',
+                               'expires': 'Thu, 01 Jan 2026 00:02:00 GMT'}, 300) == 120
+    assert freshness_lifetime({'date': 'Thu, 11 Jan 2026 00:00:00 GMT',
+                               'last-modified': 'Thu, 01 Jan 2026 00:00:00 GMT'}, 300) == 86400
+    assert freshness_lifetime({}, 300) == 300
+    assert storable('GET', 200, {}, {'vary': 'Accept-Encoding'})
+    assert not storable('POST', 200, {}, {})
+    assert not storable('GET', 206, {}, {})
+    assert not storable('GET', 200, {'authorization': 'Bearer x'}, {})
+    assert storable('GET', 200, {'authorization': 'Bearer x'}, {'cache-control': 'public'})
+
+
+def test_repeated_corpus_loads_are_served_from_cache(tmp_path):
+    pages = PageServer().start_background()
+    proxy = CacheProxy('127.0.0.1', 0, str(tmp_path), max_bytes=64 * 1024 * 1024).start_background()
+    try:
+        urls = [pages.url('static.html'), pages.url('style.css'), pages.url('img/0.png')]
+        first = fetch_all(proxy, urls)
+        before = dict(proxy.stats)
+        second = fetch_all(proxy, urls)
+        after = proxy.stats
+    finally:
+        proxy.stop_background()
+        pages.stop_background()
+
+    assert [cache for _, cache, _ in first] == ['MISS'] * 3 and [cache for _, cache, _ in second] == ['HIT'] * 3
+    assert [body for _, _, body in first] == [body for _, _, body in second]
+    assert pages.requests == 3
+    delta = stats_delta(before, after)
+    assert delta['hits'] == 3 and delta['misses'] == 0 and delta['hit_rate'] == 1.0
+    assert delta['bytes_from_cache'] == sum(len(body) for _, _, body in second)
+    assert after['hit_rate'] == 0.5 and after['entries'] == 3
+
+    # A restarted proxy finds the entries on disk
+    restarted = CacheProxy('127.0.0.1', 0, str(tmp_path), max_bytes=64 * 1024 * 1024)
+    assert len(restarted.cache.entries) == 3 and restarted.cache.size == after['cache_bytes']
+
+
+def test_uncacheable_responses_and_revalidation(tmp_path):
+    with Origin() as origin:
+        proxy = CacheProxy('127.0.0.1', 0, str(tmp_path)).start_background()
+        try:
+            paths = ['no-store', 'cookie', 'vary', 'etag']
+            fetch_all(proxy, [origin.url(path) for path in paths])
+            results = fetch_all(proxy, [origin.url(path) for path in paths])
+            stats = proxy.stats
+        finally:
+            proxy.stop_background()
+
+    assert [r[1] for r in results[:3]] == [None, None, None]
+    assert results[3] == (200, 'HIT', b'tagged')
+    assert ('etag', '"v1"') in origin.requests and len(origin.requests) == 8
+    assert stats['uncacheable'] == 6 and stats['revalidated'] == 1 and stats['entries'] == 1
+
+
+def test_large_bodies_without_content_length_are_streamed_through(tmp_path):
+    with Origin() as origin:
+        proxy = CacheProxy('127.0.0.1', 0, str(tmp_path), max_object_bytes=1000).start_background()
+        try:
+            urls = [origin.url('stream?chunks=5'), origin.url('stream?chunks=1')]
+            first = fetch_all(proxy, urls)
+            second = fetch_all(proxy, urls)
+            stats = proxy.stats
+        finally:
+            proxy.stop_background()
+
+    assert [(status, len(body)) for status, _, body in first] == [(200, 3000), (200, 600)]
+    # Past the 1000-byte cap the large body is relayed instead of buffered and stored
+    assert [cache for _, cache, _ in first] == [None, 'MISS'] and second[0] == first[0]
+    assert second[1] == (200, 'HIT', b'x' * 600)
+    assert stats['uncacheable'] == 2 and stats['entries'] == 1 and stats['bytes_from_origin'] == 6600
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=250, max_object_bytes=120)
+    meta = {'url': 'u', 'status': 200, 'headers': [], 'headers_map': {}, 'stored': 0, 'expires': 0}
+    for key in ('a', 'b'):
+        assert cache.put(DiskCache.key(key), meta, b'x' * 100)
+    assert cache.get(DiskCache.key('a'))  # b is now least recently used
+    cache.put(DiskCache.key('c'), meta, b'x' * 100)
+    assert cache.get(DiskCache.key('b')) is None and cache.get(DiskCache.key('a'))
+    assert cache.evictions == 1 and cache.size == 200
+    assert not cache.put(DiskCache.key('big'), meta, b'x' * 121)
+    assert DiskCache.key('u', 'gzip, br') == DiskCache.key('u', 'br,gzip') != DiskCache.key('u')
+
+
+def test_stats_endpoint_and_tunnel(tmp_path):
+    with Origin() as origin:
+        proxy = CacheProxy('127.0.0.1', 0, str(tmp_path)).start_background()
+
+        async def run():
+            async with aiohttp.ClientSession() as http:
+                async with http.get(f'http://127.0.0.1:{proxy.port}/stats') as response:
+                    stats = json.loads(await response.read())
+            reader, writer = await asyncio.open_connection('127.0.0.1', proxy.port)
+            writer.write(f'CONNECT 127.0.0.1:{origin.server.port} HTTP/1.1\r\n\r\n'.encode())
+            established = await reader.readuntil(b'\r\n\r\n')
+            writer.write(b'GET /plain HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n')
+            tunnelled = await reader.read()
+            writer.close()
+            return stats, established, tunnelled
+
+        try:
+            stats, established, tunnelled = asyncio.run(run())
+            tunnels = proxy.stats['tunnels']
+        finally:
+            proxy.stop_background()
+
+    assert stats['requests'] == 0 and stats['hit_rate'] is None and stats['max_bytes'] == 1024 ** 3
+    assert established.startswith(b'HTTP/1.1 200') and tunnelled.endswith(b'plain' * 10) and tunnels == 1
+
+
+class ProxiedRunner(BenchmarkRunner):
+    """BenchmarkRunner whose "browser" fetches pages through the cache proxy when its container got one."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.envs = {}
+
+    def run_command(self, cmd, timeout=None):
+        if cmd[:2] == ['docker', 'run']:
+            name = cmd[cmd.index('--name') + 1]
+            self.envs[name] = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-e']
+        return {'success': True, 'stdout': '', 'stderr': '', 'returncode': 0,
+                'execution_time': 0.1, 'memory_delta': 0, 'start_time': 0, 'end_time': 0}
+
+    def wait_for_container_ready(self, port, max_wait=60, name=None):
+        return {'ready_time': 0.01, 'ready_source': 'log'}
+
+    def test_page_load(self, port, url, trace_path=None):
+        started = time.perf_counter()
+        if any(env.startswith('THORIUM_PROXY_SERVER=') for env in self.envs[f'bench-{port}']):
+            fetch_all(self.cache_proxy, [url])
+        return {'success': True, 'load_time': time.perf_counter() - started}
+
+
+def test_benchmark_records_hit_rate_per_container(tmp_path, monkeypatch):
+    monkeypatch.setattr('benchmark.time.sleep', lambda seconds: None)
+    pages = PageServer().start_background()
+    runner = ProxiedRunner(iterations=2)
+    runner.cache_proxy = CacheProxy('127.0.0.1', 0, str(tmp_path)).start_background()
+    try:
+        urls = [pages.url('static.html'), pages.url('img/1.png')]
+        results = [runner.run_benchmark(image, f'bench-{port}', port, urls) for image, port in
+                   (('chromedp/headless-shell:latest', 9222), ('thorium-docker:avx2', 9223),
+                    ('thorium-docker:avx', 9224))]
+    finally:
+        runner.cache_proxy.stop_background()
+        pages.stop_background()
+
+    assert runner.envs['bench-9223'] == [f'THORIUM_PROXY_SERVER=http://{CORPUS_HOST}:{runner.cache_proxy.port}']
+    assert runner.envs['bench-9222'] == [] and results[0]['cache_proxy'] is None
+    # The first Thorium container fills the cache, the second only hits it
+    first, second = results[1]['cache_proxy'], results[2]['cache_proxy']
+    assert (first['misses'], first['hits'], first['hit_rate']) == (2, 2, 0.5)
+    assert (second['misses'], second['hits'], second['hit_rate']) == (0, 4, 1.0)
+    assert pages.requests == 2
+
+    report = runner.generate_report({'timestamp': 'now', 'iterations': 2, 'results': results})
+    assert '## Shared Cache Proxy' in report
+    assert '| chromedp/headless-shell:latest |' in report and '| not proxied |' in report
+    assert '| 4 | 4 | 0 | 0 | 0 | 0 | 100.0% | 100.0% |' in report
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio CDP client against a fake DevTools endpoint.
+"""
+
+import asyncio
+import time
+
+import requests
+
+from fake_cdp import FakeCDPServer
+from cdp_client import CDPError, CDPSession
+from benchmark import BenchmarkRunner
+
+
+def new_target(server):
+    return requests.put(f'{server.base_url}/json/new', timeout=5).json()
+
+
+def test_navigate_reports_event_timings():
+    with FakeCDPServer(load_delay=0.2) as server:
+        target = new_target(server)
+
+        async def run():
+            async with CDPSession(target['webSocketDebuggerUrl'], timeout=5) as session:
+                return await session.navigate('http://example.test/')
+
+        result = asyncio.run(run())
+
+    assert 0.2 <= result['load_time'] < 1.0
+    assert result['lifecycle']['init'] == 0
+    assert abs(result['lifecycle']['load'] - 0.2) < 1e-6
+    assert abs(result['lifecycle']['DOMContentLoaded'] - 0.1) < 1e-6
+    assert result['frame_id'] == 'F1'
+
+
+def test_navigate_error_text_raises():
+    with FakeCDPServer() as server:
+        target = new_target(server)
+
+        async def run():
+            async with CDPSession(target['webSocketDebuggerUrl'], timeout=5) as session:
+                await session.navigate('http://fail.test/')
+
+        try:
+            asyncio.run(run())
+        except CDPError as e:
+            assert 'ERR_NAME_NOT_RESOLVED' in str(e)
+        else:
+            raise AssertionError('expected CDPError')
+
+
+def test_navigate_times_out_without_load_event():
+    with FakeCDPServer() as server:
+        target = new_target(server)
+
+        async def run():
+            async with CDPSession(target['webSocketDebuggerUrl'], timeout=5) as session:
+                await session.navigate('http://hang.test/', timeout=0.3)
+
+        try:
+            asyncio.run(run())
+        except CDPError as e:
+            assert 'timed out' in str(e)
+        else:
+            raise AssertionError('expected CDPError')
+
+
+def test_navigate_fails_fast_when_browser_goes_away():
+    with FakeCDPServer() as server:
+        target = new_target(server)
+
+        async def crash(ws, command):
+            await server._reply(ws, command, {'frameId': 'F1', 'loaderId': 'L1'})
+            await ws.close()
+
+        server.handlers['Page.navigate'] = crash
+
+        async def run():
+            async with CDPSession(target['webSocketDebuggerUrl'], timeout=5) as session:
+                await session.navigate('http://example.test/')
+
+        started = time.perf_counter()
+        try:
+            asyncio.run(run())
+        except CDPError as e:
+            assert 'closed' in str(e) and time.perf_counter() - started < 2
+        else:
+            raise AssertionError('expected CDPError')
+
+
+def test_command_error_is_raised():
+    with FakeCDPServer() as server:
+        target = new_target(server)
+
+        async def fail(ws, command):
+            await ws.send_str('{"id": %d, "error": {"code": -32601, "message": "not found"}}' % command['id'])
+
+        server.handlers['Bogus.method'] = fail
+
+        async def run():
+            async with CDPSession(target['webSocketDebuggerUrl'], timeout=5) as session:
+                await session.send('Bogus.method')
+
+        try:
+            asyncio.run(run())
+        except CDPError as e:
+            assert 'not found' in str(e)
+        else:
+            raise AssertionError('expected CDPError')
+
+
+def test_runner_page_load_closes_target():
+    with FakeCDPServer(load_delay=0.05) as server:
+        runner = BenchmarkRunner(timeout=5)
+        result = runner.test_page_load(server.port, 'http://example.test/')
+
+        assert result['success'], result
+        assert result['load_time'] >= 0.05
+        assert result['total_time'] >= result['load_time']
+        assert result['metrics']['Nodes'] == 42
+        assert server.targets == {}
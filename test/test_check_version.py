@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for the async version and tag checker against a stub registry.
+"""
+
+import asyncio
+import json
+import time
+
+from fake_registry import FakeRegistry
+
+import check_version
+from check_version import HTTPCache, RegistryClient, RegistryError, find_asset, plan_builds
+
+IMAGE = 'someone/thorium-headless'
+VERSIONS = ['M130.0.6723.174', 'M129.0.6668.100']
+
+
+def client(registry, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return RegistryClient(github_api_url=registry.base_url, docker_hub_url=registry.base_url, **kwargs)
+
+
+def run(registry, coroutine_fn, **kwargs):
+    async def main():
+        async with client(registry, **kwargs) as c:
+            return await coroutine_fn(c), c.stats
+    return asyncio.run(main())
+
+
+def test_tags_are_checked_concurrently():
+    published = [f'{IMAGE}:{VERSIONS[0]}-{isa}' for isa in ('AVX2', 'AVX', 'SSE3', 'SSE4')]
+    with FakeRegistry(releases=VERSIONS, tags=published + [f'{IMAGE}:{VERSIONS[1]}-AVX2'], delay=0.2) as registry:
+        started = time.perf_counter()
+        found, stats = run(registry, lambda c: c.check_tags(IMAGE, VERSIONS, check_version.SUPPORTED_INSTRUCTION_SETS))
+        elapsed = time.perf_counter() - started
+
+    assert list(found)[:2] == [(VERSIONS[0], 'AVX2'), (VERSIONS[0], 'AVX')]
+    assert [pair for pair, exists in found.items() if not exists] == [
+        (VERSIONS[1], 'AVX'), (VERSIONS[1], 'SSE3'), (VERSIONS[1], 'SSE4')]
+    assert registry.max_in_flight == 8 and stats['requests'] == 8
+    # Eight 0.2 s lookups would take 1.6 s one after another
+    assert elapsed < 1.0
+
+
+def test_retryable_statuses_are_retried():
+    with FakeRegistry(tags=[f'{IMAGE}:{VERSIONS[0]}-AVX2'], failures={f'{VERSIONS[0]}-AVX2': 2}) as registry:
+        found, stats = run(registry, lambda c: c.check_tags(IMAGE, VERSIONS[:1], ['AVX2']))
+    assert found == {(VERSIONS[0], 'AVX2'): True}
+    assert stats['retries'] == 2 and stats['requests'] == 3
+
+
+def test_exhausted_retries_count_as_missing():
+    with FakeRegistry(tags=[f'{IMAGE}:{VERSIONS[0]}-AVX2'], failures={f'{VERSIONS[0]}-AVX2': 5}) as registry:
+        found, stats = run(registry, lambda c: c.check_tags(IMAGE, VERSIONS[:1], ['AVX2']), retries=1)
+        try:
+            run(registry, lambda c: c.tag_exists(IMAGE, f'{VERSIONS[0]}-AVX2'), retries=0)
+        except RegistryError as e:
+            assert 'HTTP 503 after 1 attempts' in str(e)
+        else:
+            raise AssertionError('expected RegistryError')
+    assert found == {(VERSIONS[0], 'AVX2'): False}
+    assert stats['requests'] == 2
+
+
+def test_connection_errors_are_retried():
+    c = RegistryClient(github_api_url='http://127.0.0.1:9', retries=2, backoff=0.01, timeout=1)
+
+    async def main():
+        async with c:
+            await c.latest_version()
+
+    try:
+        asyncio.run(main())
+    except RegistryError as e:
+        assert 'after 3 attempts' in str(e)
+    else:
+        raise AssertionError('expected RegistryError')
+    assert c.stats['retries'] == 2
+
+
+def test_etag_cache_revalidates_across_runs(tmp_path):
+    path = str(tmp_path / 'cache' / 'http.json')
+    with FakeRegistry(releases=VERSIONS, tags=[f'{IMAGE}:{VERSIONS[0]}-AVX2']) as registry:
+        first, _ = run(registry, lambda c: c.release_versions(2), cache=HTTPCache(path))
+        latest, _ = run(registry, lambda c: c.latest_version(), cache=HTTPCache(path))
+        again, stats = run(registry, lambda c: c.release_versions(2), cache=HTTPCache(path))
+        exists, _ = run(registry, lambda c: c.tag_exists(IMAGE, f'{VERSIONS[0]}-AVX2'), cache=HTTPCache(path))
+
+        registry.releases.insert(0, 'M131.0.6778.0')
+        newer, stats_after_release = run(registry, lambda c: c.latest_version(), cache=HTTPCache(path))
+
+    assert first == again == VERSIONS and latest == VERSIONS[0] and exists
+    assert stats['not_modified'] == 1
+    assert registry.requests[2][1]['If-None-Match'] == '"2-10"'
+    assert newer == 'M131.0.6778.0' and stats_after_release['not_modified'] == 0
+    entries = json.loads(open(path).read())
+    assert f'{registry.base_url}/v2/repositories/{IMAGE}/tags/{VERSIONS[0]}-AVX2/' in entries
+
+
+def test_find_asset_accepts_both_names():
+    release = {'tag_name': 'M130.0.6723.174', 'assets': [
+        {'name': 'thorium_M130.0.6723.174_amd64_SSE3.deb', 'state': 'uploaded', 'browser_download_url': 'b'},
+        {'name': 'thorium-browser_130.0.6723.174_AVX2.deb', 'state': 'uploaded', 'browser_download_url': 'a'},
+        {'name': 'thorium-browser_130.0.6723.174_AVX.deb', 'state': 'open', 'browser_download_url': 'c'}]}
+    assert find_asset(release, 'AVX2')['browser_download_url'] == 'a'
+    assert find_asset(release, 'SSE3')['browser_download_url'] == 'b'
+    assert find_asset(release, 'AVX') is None
+    assert find_asset(release, 'SSE4') is None
+
+
+def test_plan_builds_only_missing_pairs_with_assets():
+    old = VERSIONS[1]
+    tags = [f'{IMAGE}:{VERSIONS[0]}-{isa}' for isa in ('AVX2', 'AVX', 'SSE3', 'SSE4')] + [f'{IMAGE}:{old}-AVX2']
+    assets = {old: [f'thorium-browser_{old[1:]}_AVX2.deb', f'thorium_{old}_amd64_SSE3.deb']}
+    with FakeRegistry(releases=VERSIONS, tags=tags, assets=assets) as registry:
+        (releases, plan), _ = run(registry, lambda c: _plan(c, 2))
+        (_, rebuild), _ = run(registry, lambda c: _plan(c, 1, rebuild=True))
+
+    assert [r['tag_name'] for r in releases] == VERSIONS
+    assert [(b['version'], b['instruction_set']) for b in plan['include']] == [(old, 'SSE3')]
+    assert plan['include'][0]['deb_url'].endswith(f'/download/{old}/thorium_{old}_amd64_SSE3.deb')
+    assert plan['include'][0]['latest'] is False
+    assert [(s['version'], s['instruction_set']) for s in plan['skipped']] == [(old, 'AVX'), (old, 'SSE4')]
+    assert len(rebuild['include']) == 4 and all(b['latest'] for b in rebuild['include'])
+
+
+async def _plan(client, count, rebuild=False):
+    releases = await client.releases(count)
+    return releases, await plan_builds(client, IMAGE, releases, check_version.SUPPORTED_INSTRUCTION_SETS, rebuild)
+
+
+def _main(tmp_path, monkeypatch, registry, **env):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(check_version, 'GITHUB_API_URL', registry.base_url)
+    monkeypatch.setattr(check_version, 'DOCKER_HUB_URL', registry.base_url)
+    monkeypatch.setattr(check_version, 'CACHE_PATH', str(tmp_path / 'cache.json'))
+    outputs = tmp_path / 'outputs'
+    if outputs.exists():
+        outputs.unlink()
+    monkeypatch.setenv('GITHUB_OUTPUT', str(outputs))
+    monkeypatch.setenv('IMAGE_NAME', IMAGE)
+    for name in ('INSTRUCTION_SET', 'THORIUM_VERSION', 'BACKFILL_RELEASES', 'REBUILD_EXISTING'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    check_version.main()
+    return dict(line.split('=', 1) for line in outputs.read_text().splitlines())
+
+
+def test_main_writes_github_outputs(tmp_path, monkeypatch):
+    with FakeRegistry(releases=VERSIONS, tags=[f'{IMAGE}:{VERSIONS[0]}-AVX2']) as registry:
+        outputs = _main(tmp_path, monkeypatch, registry, INSTRUCTION_SET='all')
+        assert check_version.check_docker_image_exists(IMAGE, VERSIONS[0], 'AVX2')
+
+        backfill = _main(tmp_path, monkeypatch, registry, BACKFILL_RELEASES='2', INSTRUCTION_SET='AVX2')
+        pinned = _main(tmp_path, monkeypatch, registry, THORIUM_VERSION=VERSIONS[0], INSTRUCTION_SET='AVX2')
+
+    assert outputs['latest_version'] == VERSIONS[0] and outputs['should_build'] == 'true'
+    assert outputs['latest_missing'] == 'true'
+    assert outputs['instruction_sets'] == 'AVX2,AVX,SSE3,SSE4' and outputs['missing_sets'] == 'AVX,SSE3,SSE4'
+    assert [b['instruction_set'] for b in json.loads(outputs['matrix'])['include']] == ['AVX', 'SSE3', 'SSE4']
+    info = json.loads((tmp_path / 'version_info.json').read_text())
+    assert info['repository'] == IMAGE
+
+    assert backfill['versions'] == ','.join(VERSIONS)
+    assert [(b['version'], b['instruction_set']) for b in json.loads(backfill['matrix'])['include']] == [
+        (VERSIONS[1], 'AVX2')]
+    # Only an older release is missing: no new GitHub release for the latest one
+    assert backfill['should_build'] == 'true' and backfill['latest_missing'] == 'false'
+    assert pinned['should_build'] == 'false' and json.loads(pinned['matrix']) == {'include': []}
+    assert 'missing_sets' not in pinned
+
+
+def test_main_fails_without_releases(tmp_path, monkeypatch):
+    with FakeRegistry() as registry:
+        try:
+            _main(tmp_path, monkeypatch, registry, THORIUM_VERSION='M1.0')
+        except SystemExit as e:
+            assert e.code == 1
+        else:
+            raise AssertionError('expected SystemExit')
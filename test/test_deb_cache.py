@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed .deb cache used by image builds.
+"""
+
+import asyncio
+import hashlib
+import os
+
+from fake_registry import FakeRegistry
+
+from check_version import RegistryClient
+from deb_cache import DebCache, DebCacheError, bake_command
+
+VERSION = 'M130.0.6723.174'
+ISAS = ['AVX2', 'AVX', 'SSE3', 'SSE4']
+
+
+def fetch(registry, cache, isas=ISAS, **kwargs):
+    async def run():
+        async with RegistryClient(github_api_url=registry.base_url, docker_hub_url=registry.base_url) as client:
+            return await cache.fetch(VERSION, isas, client=client, **kwargs)
+    return asyncio.run(run())
+
+
+def test_packages_are_stored_by_digest_and_reused(tmp_path):
+    with FakeRegistry(releases=[VERSION]) as registry:
+        entries = fetch(registry, DebCache(str(tmp_path), backoff=0.01))
+        again = DebCache(str(tmp_path))
+        reused = fetch(registry, again)
+
+    assert list(entries) == ISAS
+    assert sorted(registry.downloads) == sorted(f'thorium-browser_{VERSION[1:]}_{isa}.deb' for isa in ISAS)
+    for isa, entry in entries.items():
+        content = FakeRegistry.package(entry['name'])
+        assert entry['sha256'] == hashlib.sha256(content).hexdigest() and entry['size'] == len(content)
+        with open(os.path.join(str(tmp_path), 'sha256', entry['sha256']), 'rb') as f:
+            assert f.read() == content
+    assert reused == entries
+    assert again.stats == {'hits': 4, 'downloads': 0, 'bytes': 0}
+    assert not [name for name in os.listdir(str(tmp_path / 'sha256')) if name.endswith('.part')]
+
+
+def test_corrupt_blob_is_fetched_again(tmp_path):
+    with FakeRegistry(releases=[VERSION]) as registry:
+        entry = fetch(registry, DebCache(str(tmp_path)), ['SSE3'])['SSE3']
+        with open(os.path.join(str(tmp_path), 'sha256', entry['sha256']), 'r+b') as f:
+            f.write(b'garbage')
+        cache = DebCache(str(tmp_path))
+        assert fetch(registry, cache, ['SSE3'], verify=False) == {'SSE3': entry}
+        assert fetch(registry, cache, ['SSE3'])['SSE3'] == entry
+    assert cache.stats['downloads'] == 1 and registry.downloads.count(entry['name']) == 2
+
+
+def test_downloads_are_verified_and_retried(tmp_path):
+    name = f'thorium-browser_{VERSION[1:]}_AVX.deb'
+    with FakeRegistry(releases=[VERSION], failures={name: 1}) as registry:
+        cache = DebCache(str(tmp_path), backoff=0.01)
+        assert fetch(registry, cache, ['AVX'])['AVX']['name'] == name
+        assert registry.downloads == [name, name]
+
+        registry.served[name] = b'tampered' * 1000
+        try:
+            fetch(registry, DebCache(str(tmp_path / 'other')), ['AVX'])
+        except DebCacheError as e:
+            assert 'bytes' in str(e) or 'sha256' in str(e)
+        else:
+            raise AssertionError('expected DebCacheError')
+    assert os.listdir(str(tmp_path / 'other' / 'sha256')) == []
+
+
+def test_missing_asset_is_an_error(tmp_path):
+    with FakeRegistry(releases=[VERSION], assets={VERSION: []}) as registry:
+        try:
+            fetch(registry, DebCache(str(tmp_path)), ['AVX2'])
+        except DebCacheError as e:
+            assert 'no .deb asset for AVX2' in str(e)
+        else:
+            raise AssertionError('expected DebCacheError')
+
+
+def test_bake_command_feeds_the_cache(tmp_path):
+    cache = DebCache(str(tmp_path))
+    os.makedirs(cache.blob_dir)
+    for digest in ('a' * 64, 'b' * 64, 'c' * 64):
+        (tmp_path / 'sha256' / digest).write_bytes(digest.encode())
+    command = bake_command({'AVX2': {'sha256': 'a' * 64}, 'SSE3': {'sha256': 'b' * 64}}, cache)
+    assert command[:3] == ['docker', 'buildx', 'bake'] and command[4].endswith('docker-bake.hcl')
+    # Each target's context holds its own package and nothing else
+    context = os.path.join(cache.context_root, 'a' * 64)
+    assert f'avx2.contexts.debs={context}' in command and os.listdir(context) == ['a' * 64]
+    assert os.path.samefile(os.path.join(context, 'a' * 64), cache.blob_path('a' * 64))
+    assert f"sse3.args.THORIUM_DEB_SHA256={'b' * 64}" in command
+    assert command[-3:] == ['--load', 'avx2', 'sse3']
+    slim = bake_command({'AVX': {'sha256': 'c' * 64}}, cache, push=True, variant='slim')
+    assert slim[-2:] == ['--push', 'slim-avx'] and f"slim-avx.args.THORIUM_DEB_SHA256={'c' * 64}" in slim
+
+
+def test_prune_keeps_only_the_given_version(tmp_path):
+    with FakeRegistry(releases=[VERSION, 'M128.0.6613.189']) as registry:
+        cache = DebCache(str(tmp_path))
+        kept = fetch(registry, cache, ['AVX2'])['AVX2']
+
+        async def run():
+            async with RegistryClient(github_api_url=registry.base_url, docker_hub_url=registry.base_url) as client:
+                return await cache.fetch('M128.0.6613.189', ['AVX2', 'SSE3'], client=client)
+        old = asyncio.run(run())
+    cache.context_dir(kept['sha256'])
+
+    removed, freed = cache.prune([VERSION])
+
+    assert removed == 2 and freed == old['AVX2']['size'] + old['SSE3']['size']
+    assert list(DebCache(str(tmp_path)).index) == [f'{VERSION}/AVX2']
+    assert os.listdir(cache.blob_dir) == [kept['sha256']] and not os.path.exists(cache.context_root)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the browser flag-set matrix.
+"""
+
+from benchmark import BenchmarkRunner, supervisor_command
+from flag_matrix import (DEFAULT_BROWSER_FLAGS, DEFAULT_FLAG_MATRIX, WRAPPED_THORIUM, browser_command,
+                         flag_deltas, load_flag_matrix, merge_flags)
+
+
+def test_merge_flags_combines_feature_lists():
+    merged = merge_flags(DEFAULT_BROWSER_FLAGS, ['--disable-features=TranslateUI,VizDisplayCompositor',
+                                                 '--disable-renderer-backgrounding', '--headless'])
+    assert merged.count('--headless') == 1
+    assert [f for f in merged if f.startswith('--disable-features')] == [
+        '--disable-features=VizDisplayCompositor,TranslateUI']
+    assert merged[-1] == '--disable-renderer-backgrounding'
+    assert merge_flags(['--a'], ['--enable-features=X']) == ['--a', '--enable-features=X']
+
+
+def test_commands_carry_flags():
+    command = browser_command(['--disable-ipc-flooding-protection'])
+    assert command[0] == WRAPPED_THORIUM
+    assert command[-2:] == ['--disable-ipc-flooding-protection', '--remote-debugging-port=9222']
+    assert supervisor_command(2, ['--disable-features=TranslateUI'])[-1] == \
+        '--disable-features=VizDisplayCompositor,TranslateUI'
+
+
+def test_load_flag_matrix(tmp_path):
+    assert list(load_flag_matrix()) == list(DEFAULT_FLAG_MATRIX)
+    path = tmp_path / 'flags.json'
+    path.write_text('{"defaults": [], "z-first": ["--x"], "a-last": ["--y", "--z"]}')
+    assert list(load_flag_matrix(str(path)).items()) == [
+        ('defaults', []), ('z-first', ['--x']), ('a-last', ['--y', '--z'])]
+    for bad in ('[]', '{}', '{"x": "--flag"}', '{"x": ["flag"]}'):
+        path.write_text(bad)
+        try:
+            load_flag_matrix(str(path))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{bad} should be rejected')
+
+
+def flag_result(flag_set, warm, peak, cpu, image='thorium-docker:avx2'):
+    page_loads = [{'success': True, 'url': 'http://a.test/', 'iteration': i, 'cold': i == 0, 'load_time': t}
+                  for i, t in enumerate([2.0] + warm)]
+    return {'image': image, 'success': True, 'flag_set': flag_set, 'flags': [],
+            'startup': {'total_startup_time': 1.0}, 'page_loads': page_loads,
+            'resources': {'peak_memory_bytes': peak, 'cpu_seconds_per_page': cpu, 'cpu_seconds': cpu * 6,
+                          'io_read_bytes': 0, 'io_write_bytes': 0, 'samples': 10, 'interval': 0.2}}
+
+
+def test_flag_deltas_against_baseline():
+    base = [1.0, 1.01, 0.99, 1.0, 1.02, 0.98]
+    results = [
+        flag_result('baseline', base, 300 << 20, 0.5),
+        flag_result('fast', [t - 0.2 for t in base], 310 << 20, 0.4),
+        flag_result('same', [1.0, 1.02, 0.98, 1.01, 0.99, 1.0], 300 << 20, 0.5),
+        flag_result('baseline', base, 200 << 20, 0.5, image='thorium-docker:sse3'),
+        {'image': 'thorium-docker:sse3', 'success': False, 'flag_set': 'fast'},
+    ]
+    deltas = {d['flag_set']: d for d in flag_deltas(results)}
+    assert set(deltas) == {'fast', 'same'}
+    assert deltas['fast']['latency'] == 'faster'
+    assert abs(deltas['fast']['warm_load_delta'] + 0.2) < 1e-9
+    assert deltas['fast']['peak_memory_delta'] == 10 << 20
+    assert abs(deltas['fast']['cpu_per_page_delta'] + 0.1) < 1e-9
+    assert deltas['same']['latency'] == 'no change'
+
+    report = BenchmarkRunner().generate_report({
+        'timestamp': 'now', 'iterations': 6, 'flag_matrix': {'baseline': [], 'fast': ['--fast']},
+        'results': [dict(r, load_stats={'cold': {'n': 0}, 'warm': {'n': 0}, 'per_url': {}}, final_stats={},
+                         startup={'total_startup_time': 1.0, 'ready_time': 0.1})
+                    for r in results[:3]]})
+    assert '## Flag Set Matrix' in report
+    assert '| thorium-docker:avx2 | fast | 0.800 | -0.200 | faster | +0.00 | +10.0 | -100.0 |' in report
+    assert '| fast | `--fast` |' in report
+
+
+def test_flag_deltas_without_baseline():
+    base = [1.0, 1.01, 0.99, 1.0, 1.02, 0.98]
+    results = [
+        {'image': 'thorium-docker:avx2', 'success': False, 'flag_set': 'baseline'},
+        flag_result('fast', base, 310 << 20, 0.4),
+        flag_result('same', base, 300 << 20, 0.5),
+    ]
+    # The failed baseline is not replaced by the next flag set that worked
+    deltas = {d['flag_set']: d for d in flag_deltas(results)}
+    assert set(deltas) == {'fast', 'same'}
+    assert all(d['baseline'] is None and d['latency'] == 'no baseline' for d in deltas.values())
+    assert deltas['fast']['warm_load_delta'] is None and deltas['fast']['peak_memory_delta'] is None
+    # Nor when the baseline run is missing altogether
+    deltas = flag_deltas(results[1:], 'baseline')
+    assert [d['latency'] for d in deltas] == ['no baseline', 'no baseline']
+
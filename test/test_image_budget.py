@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for the image size / pull / cold-start budget with a stub registry and docker.
+"""
+
+import json
+import time
+from datetime import datetime, timezone
+
+from benchmark import BenchmarkRunner
+from fake_cdp import FakeCDPServer
+from fake_registry import FakeRegistry
+from image_budget import ImageBudget, budget_deltas, parse_pull_output, registry_reference
+from results_store import extract_samples
+
+def docker_time(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f') + '123Z'
+
+
+FULL_LAYERS = [b'base' * 50000, b'fonts' * 80000, b'thorium' * 60000]
+SLIM_LAYERS = [b'slim' * 70000]
+
+
+PULL_OUTPUT = 'a1: Already exists\nb2: Pull complete\nc3: Pull complete\n'
+
+
+class DockerStub(BenchmarkRunner):
+    """
+    Answers docker commands for images whose tags live in ``self.tags``; the
+    image ID of ``self.tags[i]`` is ``sha256:<i>``.
+
+    ``in_use`` makes ``docker rmi`` fail like an image a container still uses,
+    ``pull_output=None`` makes ``docker pull`` fail.
+    """
+
+    def __init__(self, tags, in_use=False, pull_output=PULL_OUTPUT):
+        super().__init__()
+        self.commands = []
+        self.tags = tags
+        self.in_use = in_use
+        self.pull_output = pull_output
+        self.started = None
+
+    def find(self, name):
+        if name.startswith('sha256:'):
+            index = int(name[len('sha256:'):])
+            return self.tags[index] if index < len(self.tags) and self.tags[index] else None
+        return next((tags for tags in self.tags if name in tags), None)
+
+    def run_command(self, cmd, timeout=None):
+        self.commands.append(cmd)
+        stdout = ''
+        success = True
+        if cmd[:3] == ['docker', 'image', 'inspect']:
+            image = self.find(cmd[-1])
+            success = image is not None
+            if success and '.RepoTags' in cmd[4]:
+                stdout = json.dumps(image)
+            elif success and '.Id' in cmd[4]:
+                stdout = f'sha256:{self.tags.index(image)}\n'
+            elif success and '.Size' in cmd[4]:
+                stdout = '500000000\n'
+            elif success:
+                stdout = json.dumps(['THORIUM_VERSION=M130.0.6723.174', 'INSTRUCTION_SET=AVX2'])
+        elif cmd[:2] == ['docker', 'tag']:
+            image = self.find(cmd[2])
+            success = image is not None
+            if success and cmd[3] not in image:
+                image.append(cmd[3])
+        elif cmd[:2] == ['docker', 'rmi']:
+            for tags in self.tags:
+                tags[:] = [tag for tag in tags if tag not in cmd[2:]]
+                # Untagging works, deleting the last reference of a used image does not
+                if self.in_use and not tags:
+                    tags.append(cmd[-1])
+                    success = False
+        elif cmd[:2] == ['docker', 'pull']:
+            success = self.pull_output is not None
+            if success:
+                self.tags.append([cmd[2]])
+                stdout = self.pull_output
+        elif cmd[:2] == ['docker', 'start']:
+            self.started = time.time()
+        elif cmd[:2] == ['docker', 'inspect']:
+            stdout = docker_time(self.started + 0.001) + '\n'
+        elif cmd[:2] == ['docker', 'logs']:
+            stdout = f'{docker_time(self.started + 0.004)} DevTools listening on ws://0.0.0.0:9222/x\n'
+        return {'success': success, 'stdout': stdout, 'stderr': '', 'returncode': 0 if success else 1,
+                'execution_time': 0.25, 'memory_delta': 0, 'start_time': 0, 'end_time': 0}
+
+    def wait_for_container_ready(self, port, max_wait=60, name=None):
+        return {'ready_time': 0.01, 'ready_source': 'log'}
+
+
+def test_registry_reference_and_pull_output():
+    assert registry_reference('localhost:5000', 'thorium-docker:avx2-slim') == \
+        'localhost:5000/budget/thorium-docker:avx2-slim'
+    assert registry_reference('localhost:5000', 'ghcr.io/owner/thorium') == 'localhost:5000/budget/thorium:latest'
+    assert registry_reference('host:5000', 'host:5000/thorium') == 'host:5000/budget/thorium:latest'
+    assert parse_pull_output('x: Pulling fs layer\nx: Pull complete\ny: Already exists\n') == \
+        {'layers_pulled': 1, 'layers_reused': 1}
+
+
+def test_measure_pulls_from_the_registry_and_restores_tags():
+    images = {'budget/thorium-docker:avx2': FULL_LAYERS}
+    with FakeRegistry(images=images) as registry, FakeCDPServer() as browser:
+        address = f'127.0.0.1:{registry.port}'
+        runner = DockerStub([['thorium-docker:avx2', 'thorium-docker:latest']])
+        budget = ImageBudget(runner, address, pulls=2, starts=2)
+        assert budget.ensure_registry() and not budget.started_registry
+        result = budget.measure('thorium-docker:avx2', 'budget', browser.port)
+
+    reference = f'{address}/budget/thorium-docker:avx2'
+    assert result['success'] and result['reference'] == reference
+    assert result['layers'] == 3 and result['compressed_bytes'] == sum(len(layer) for layer in FULL_LAYERS)
+    assert result['uncompressed_bytes'] == 500000000 and result['thorium_version'] == 'M130.0.6723.174'
+    # Every layer blob downloaded once per timed download
+    assert len(registry.downloads) == 6 and result['download_time']['n'] == 2
+    assert result['pull_time']['median'] == 0.25 and result['layers_reused'] == 1
+    assert result['devtools_time']['n'] == 2 and result['first_target_time']['n'] == 2
+
+    # Every tag is removed before each pull and restored afterwards
+    rmis = [cmd for cmd in runner.commands if cmd[:2] == ['docker', 'rmi']]
+    assert len(rmis) == 2 and set(rmis[0][2:]) == {reference, 'thorium-docker:avx2', 'thorium-docker:latest'}
+    assert sorted(tag for tags in runner.tags for tag in tags) == \
+        sorted([reference, 'thorium-docker:avx2', 'thorium-docker:latest'])
+    assert ['docker', 'push', reference] in runner.commands
+
+
+def test_pull_is_not_timed_when_the_image_cannot_be_removed():
+    reference = 'localhost:5000/budget/thorium-docker:avx2'
+    runner = DockerStub([['thorium-docker:avx2', reference]], in_use=True)
+    result = ImageBudget(runner).pull_once(reference)
+
+    assert not result['success'] and 'Could not remove' in result['error']
+    assert not any(cmd[:2] == ['docker', 'pull'] for cmd in runner.commands)
+    # Tags removed before rmi gave up are restored from the saved image ID
+    assert sorted(runner.tags[0]) == sorted(['thorium-docker:avx2', reference])
+
+
+def test_failed_and_fully_reused_pulls_are_failures():
+    reference = 'localhost:5000/budget/thorium-docker:avx2'
+    runner = DockerStub([['thorium-docker:avx2', reference]], pull_output=None)
+    failed = ImageBudget(runner).pull_once(reference)
+    assert not failed['success']
+    # The image is gone after rmi, so nothing can be retagged
+    assert ['docker', 'tag', 'sha256:0', 'thorium-docker:avx2'] in runner.commands
+
+    runner = DockerStub([['thorium-docker:avx2', reference]], pull_output='a1: Already exists\n')
+    reused = ImageBudget(runner).pull_once(reference)
+    assert not reused['success'] and reused['layers_reused'] == 1 and 'already present' in reused['error']
+    assert sorted(tag for tags in runner.tags for tag in tags) == sorted(['thorium-docker:avx2', reference])
+
+
+def test_budget_run_compares_with_the_first_image():
+    images = {'budget/thorium-docker:avx2': FULL_LAYERS, 'budget/thorium-docker:avx2-slim': SLIM_LAYERS}
+    with FakeRegistry(images=images) as registry, FakeCDPServer() as browser:
+        runner = DockerStub([['thorium-docker:avx2'], ['thorium-docker:avx2-slim']])
+        budget = ImageBudget(runner, f'127.0.0.1:{registry.port}', pulls=2, starts=2)
+        results = {
+            'timestamp': '2026-01-01T00:00:00', 'mode': 'image-budget', 'runs': 2, 'registry': budget.registry,
+            'results': [budget.measure(image, 'budget', browser.port)
+                        for image in ('thorium-docker:avx2', 'thorium-docker:avx2-slim', 'thorium-docker:avx')]
+        }
+
+    full, slim, missing = results['results']
+    assert not missing['success']
+    deltas = budget_deltas(results['results'])
+    assert [d['image'] for d in deltas] == ['thorium-docker:avx2-slim']
+    assert deltas[0]['compressed_ratio'] == slim['compressed_bytes'] / full['compressed_bytes'] < 1
+    assert deltas[0]['pull_delta'] == 0
+
+    report = runner.generate_budget_report(results)
+    assert '## Against thorium-docker:avx2' in report and '| thorium-docker:avx | FAILED' in report
+
+    samples = extract_samples(results)
+    metrics = {(s['image'], s['metric']) for s in samples}
+    assert ('thorium-docker:avx2-slim', 'compressed_bytes') in metrics
+    assert sum(1 for s in samples if s['metric'] == 'pull_time') == 4
+    assert sum(1 for s in samples if s['metric'] == 'devtools_time') == 4
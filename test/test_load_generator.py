@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent multi-tab load generator.
+"""
+
+import asyncio
+
+from fake_cdp import FakeCDPServer
+import load_generator
+from load_generator import LoadGenerator, concurrency_levels, find_knee
+from stats import percentile
+
+
+def test_concurrency_levels():
+    assert concurrency_levels(1) == [1]
+    assert concurrency_levels(8) == [1, 2, 4, 8]
+    assert concurrency_levels(20) == [1, 2, 4, 8, 16, 20]
+
+
+def test_percentile_interpolates():
+    values = [1, 2, 3, 4, 5]
+    assert percentile(values, 50) == 3
+    assert percentile(values, 0) == 1
+    assert percentile(values, 100) == 5
+    assert percentile([1, 2], 50) == 1.5
+    assert percentile([], 50) == 0.0
+
+
+def test_run_level_closed_loop():
+    with FakeCDPServer(load_delay=0.02) as server:
+        generator = LoadGenerator('127.0.0.1', server.port, ['http://a.test/', 'http://b.test/'], timeout=5)
+        level = asyncio.run(generator.run_level(4, 0.5))
+
+        assert level['concurrency'] == 4
+        assert level['errors'] == 0
+        assert level['pages'] > 4
+        assert level['throughput'] > 0
+        assert level['latency']['p50'] >= 0.02
+        assert level['latency']['p99'] >= level['latency']['p50']
+        # All targets are closed again
+        assert server.targets == {}
+
+
+def test_run_level_open_loop_respects_rate():
+    with FakeCDPServer(load_delay=0.01) as server:
+        generator = LoadGenerator('127.0.0.1', server.port, ['http://a.test/'], timeout=5)
+        level = asyncio.run(generator.run_level(4, 1.0, rate=10))
+
+        assert 8 <= level['pages'] <= 10
+
+
+def test_run_level_counts_errors():
+    with FakeCDPServer(load_delay=0.01) as server:
+        generator = LoadGenerator('127.0.0.1', server.port, ['http://fail.test/'], timeout=5)
+        level = asyncio.run(generator.run_level(2, 0.2))
+
+        assert level['pages'] == 0
+        # Failing tabs back off (0.05 s, 0.1 s, ...) instead of spinning on the error
+        assert 2 <= level['errors'] <= 10
+        assert 'ERR_NAME_NOT_RESOLVED' in level['error_samples'][0]
+        assert len(level['error_samples']) <= load_generator.ERROR_SAMPLES
+
+
+def test_find_knee():
+    def level(concurrency, throughput, p95):
+        return {'concurrency': concurrency, 'throughput': throughput, 'latency': {'p95': p95}}
+
+    levels = [level(1, 5, 0.2), level(2, 9.5, 0.21), level(4, 18, 0.22), level(8, 19, 0.4), level(16, 19, 0.8)]
+    assert find_knee(levels) == 4
+    assert find_knee(levels[:3]) == 4
+    assert find_knee([]) is None
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus exporter against a fake browser endpoint.
+"""
+
+import asyncio
+import json
+import os
+
+import aiohttp
+
+from fake_cdp import FakeCDPServer
+from metrics_exporter import Histogram, MetricsExporter, format_metric
+
+
+class FakeBrowser:
+    """Browser-level Target, SystemInfo and per-session handlers for a FakeCDPServer."""
+
+    def __init__(self, server):
+        self.server = server
+        self.attached = []
+        server.handlers['Target.setDiscoverTargets'] = self.discover
+        server.handlers['Target.attachToTarget'] = self.attach
+        server.handlers['Page.setLifecycleEventsEnabled'] = self.lifecycle
+        server.handlers['SystemInfo.getProcessInfo'] = self.process_info
+        server.handlers['Runtime.getHeapUsage'] = self.heap_usage
+
+    @staticmethod
+    async def send(ws, method, params, session_id=None):
+        message = {'method': method, 'params': params}
+        if session_id:
+            message['sessionId'] = session_id
+        await ws.send_str(json.dumps(message))
+
+    async def discover(self, ws, command):
+        await self.server._reply(ws, command, {})
+        for target_id, kind in (('P1', 'page'), ('P2', 'page'), ('W1', 'service_worker')):
+            await self.send(ws, 'Target.targetCreated', {'targetInfo': {'targetId': target_id, 'type': kind}})
+
+    async def attach(self, ws, command):
+        target_id = command['params']['targetId']
+        self.attached.append(target_id)
+        await self.server._reply(ws, command, {'sessionId': f'S-{target_id}'})
+
+    async def lifecycle(self, ws, command):
+        await self.server._reply(ws, command, {})
+        session_id = command['sessionId']
+        if session_id == 'S-P1':
+            # One 0.3s navigation of the main frame; the iframe load is ignored
+            for name, frame, timestamp in (('init', 'P1', 10.0), ('load', 'IFRAME', 10.1), ('load', 'P1', 10.3)):
+                await self.send(ws, 'Page.lifecycleEvent', {'frameId': frame, 'loaderId': 'L1', 'name': name,
+                                                            'timestamp': timestamp}, session_id)
+        else:
+            await self.send(ws, 'Target.targetCrashed', {'targetId': 'P2', 'status': 'crashed', 'errorCode': 139})
+            await self.send(ws, 'Target.detachedFromTarget', {'sessionId': session_id, 'targetId': 'P2'})
+            await self.send(ws, 'Target.targetDestroyed', {'targetId': 'P2'})
+
+    async def process_info(self, ws, command):
+        await self.server._reply(ws, command, {'processInfo': [
+            {'type': 'browser', 'id': os.getpid(), 'cpuTime': 12.5},
+            {'type': 'renderer', 'id': 2 ** 22 + 1, 'cpuTime': 3.25}
+        ]})
+
+    async def heap_usage(self, ws, command):
+        await self.server._reply(ws, command, {'usedSize': 2000000, 'totalSize': 4000000})
+
+
+def run_exporter(server, samples=2):
+    exporter = MetricsExporter('127.0.0.1', server.port, interval=0.05)
+
+    async def run():
+        task = asyncio.ensure_future(exporter.run())
+        for _ in range(200):
+            if exporter.samples >= samples and exporter.navigations.count:
+                break
+            await asyncio.sleep(0.01)
+        text = exporter.render()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return text
+
+    return exporter, asyncio.run(run())
+
+
+def test_format_and_histogram():
+    assert format_metric('m', 'gauge', 'Help.', [({'url': 'a"b\\c\nd'}, 1.5)])[2] == 'm{url="a\\"b\\\\c\\nd"} 1.5'
+    histogram = Histogram((0.5, 1))
+    for value in (0.2, 0.7, 3):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2] and histogram.count == 3
+
+
+def test_exporter_follows_targets_processes_and_navigations():
+    with FakeCDPServer() as server:
+        browser = FakeBrowser(server)
+        exporter, text = run_exporter(server)
+
+    assert sorted(browser.attached) == ['P1', 'P2']
+    assert 'thorium_up 1' in text and 'thorium_browser_connects_total 1' in text
+    assert 'thorium_targets{type="page"} 1' in text and 'thorium_targets{type="service_worker"} 1' in text
+    assert 'thorium_target_crashes_total{status="crashed"} 1' in text
+    assert 'thorium_processes{type="renderer"} 1' in text
+    assert 'thorium_process_cpu_seconds_total{type="browser"} 12.5' in text
+    assert 'thorium_process_cpu_seconds_total{type="renderer"} 3.25' in text
+    # Only our own process is visible in /proc
+    assert 'thorium_process_resident_memory_bytes{type="browser"}' in text
+    assert 'thorium_process_resident_memory_bytes{type="renderer"}' not in text
+    # P2 crashed and was destroyed; series never carry a pid or target id
+    assert 'thorium_js_heap_pages 1' in text and 'thorium_js_heap_used_bytes 2000000.0' in text
+    assert 'thorium_js_heap_used_max_bytes 2000000.0' in text
+    assert 'pid=' not in text and 'target=' not in text
+    assert 'thorium_navigation_seconds_bucket{le="0.25"} 0' in text
+    assert 'thorium_navigation_seconds_bucket{le="0.5"} 1' in text and 'thorium_navigation_seconds_count 1' in text
+    # Scrapes are served from the last sample
+    assert server.commands.count(('fake', 'SystemInfo.getProcessInfo')) == exporter.samples
+
+
+def test_browser_ws_url_resolves_the_host_to_an_address():
+    with FakeCDPServer() as server:
+        exporter = MetricsExporter('localhost', server.port)
+        ws_url = asyncio.run(exporter.browser_ws_url())
+
+    assert ws_url == f'ws://127.0.0.1:{server.port}/devtools/browser/fake'
+
+
+def test_process_cpu_counter_survives_exits_and_pid_reuse():
+    exporter = MetricsExporter(per_target=True)
+    for processes in ([('browser', 1, 10.0), ('renderer', 2, 4.0)],
+                      [('browser', 1, 11.0), ('renderer', 3, 1.0)],  # 2 exited, 3 started
+                      [('browser', 1, 12.0), ('renderer', 3, 1.5), ('gpu', 2, 0.5)]):  # pid 2 reused
+        exporter.processes = [{'type': t, 'id': pid, 'cpuTime': cpu, 'rss': None} for t, pid, cpu in processes]
+        exporter._count_cpu_time()
+    exporter.heaps = {'P1': {'usedSize': 10, 'totalSize': 20}, 'P2': {'usedSize': 30, 'totalSize': 40}}
+
+    assert exporter.cpu_seconds == {'browser': 12.0, 'renderer': 5.5, 'gpu': 0.5}
+    text = exporter.render()
+    assert 'thorium_js_heap_used_bytes 40.0' in text and 'thorium_js_heap_used_max_bytes 30.0' in text
+    assert 'thorium_page_js_heap_used_bytes{target="P2"} 30.0' in text
+
+
+def test_metrics_endpoint_reports_down_browser():
+    exporter = MetricsExporter('127.0.0.1', 1, interval=0.05)
+
+    async def run():
+        runner = aiohttp.web.AppRunner(exporter.make_app())
+        await runner.setup()
+        site = aiohttp.web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        task = asyncio.ensure_future(exporter.run())
+        await asyncio.sleep(0.1)
+        try:
+            async with aiohttp.ClientSession() as http:
+                async with http.get(f'http://127.0.0.1:{port}/metrics') as response:
+                    return response.headers['Content-Type'], await response.text()
+        finally:
+            task.cancel()
+            await runner.cleanup()
+
+    content_type, text = asyncio.run(run())
+    assert content_type.startswith('text/plain')
+    assert 'thorium_up 0' in text and 'thorium_navigation_seconds_count 0' in text
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the local page corpus server.
+"""
+
+import time
+
+import requests
+
+from page_server import CORPUS_PAGES, PageServer
+
+
+def test_corpus_pages_are_served():
+    server = PageServer(image_size=64).start_background()
+    try:
+        for url in server.corpus_urls():
+            response = requests.get(url, timeout=5)
+            assert response.status_code == 200, url
+            assert response.headers['Content-Type'].startswith('text/html')
+
+        assert 'Herman Melville' in requests.get(server.url('html'), timeout=5).text
+        utf8 = requests.get(server.url('encoding/utf8'), timeout=5).text
+        assert 'こんにちは' in utf8 and '你好' in utf8
+
+        image = requests.get(server.url('img/0.png'), timeout=5)
+        assert image.headers['Content-Type'] == 'image/png'
+        assert image.content.startswith(b'\x89PNG')
+
+        assert requests.get(server.url('missing.html'), timeout=5).status_code == 404
+        assert server.requests == len(CORPUS_PAGES) + 3
+    finally:
+        server.stop_background()
+
+
+def test_corpus_is_deterministic():
+    first = PageServer(image_size=32)
+    second = PageServer(image_size=32)
+    assert first.corpus == second.corpus
+
+
+def test_latency_and_bandwidth_shaping():
+    server = PageServer(image_size=128).start_background()
+    try:
+        start = time.perf_counter()
+        requests.get(server.url('static.html?latency=200'), timeout=5)
+        assert time.perf_counter() - start >= 0.2
+
+        # 128x128 RGB noise is ~49 KiB; at 200 KiB/s that takes ~0.25 s
+        start = time.perf_counter()
+        image = requests.get(server.url('img/1.png?bandwidth=200'), timeout=5)
+        assert time.perf_counter() - start >= 0.2
+        assert len(image.content) == int(image.headers['Content-Length'])
+    finally:
+        server.stop_background()
+
+
+def test_server_wide_latency_default():
+    server = PageServer(latency=0.15, image_size=32).start_background()
+    try:
+        start = time.perf_counter()
+        requests.get(server.url('cjk.html'), timeout=5)
+        assert time.perf_counter() - start >= 0.15
+    finally:
+        server.stop_background()
+
+
+def test_delay_endpoint():
+    server = PageServer(image_size=32).start_background()
+    try:
+        start = time.perf_counter()
+        assert requests.get(server.url('delay/0.2'), timeout=5).status_code == 200
+        assert time.perf_counter() - start >= 0.2
+    finally:
+        server.stop_background()
+
+
+def test_malformed_parameters_are_bad_requests():
+    server = PageServer(image_size=32).start_background()
+    try:
+        for path in ('static.html?latency=abc', 'static.html?bandwidth=-5', 'static.html?latency=nan',
+                     'delay/soon'):
+            assert requests.get(server.url(path), timeout=5).status_code == 400, path
+    finally:
+        server.stop_background()
+
+
+def test_start_background_raises_when_the_port_is_taken():
+    server = PageServer(image_size=32).start_background()
+    try:
+        start = time.perf_counter()
+        try:
+            PageServer(port=server.port, image_size=32).start_background()
+        except OSError:
+            assert time.perf_counter() - start < 5
+        else:
+            raise AssertionError('expected OSError')
+    finally:
+        server.stop_background()
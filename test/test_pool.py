@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the warm tab pool against a fake DevTools endpoint.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from fake_cdp import FakeCDPServer
+from pool import BrowserPool, PoolError, make_app
+
+
+def test_pool_replaces_isolated_tabs_on_return():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            async with BrowserPool('127.0.0.1', server.port, size=2, warm_url='http://warm.test/') as pool:
+                assert len(server.contexts) == 2
+                first = await pool.acquire()
+                second = await pool.acquire()
+                assert first.context_id != second.context_id
+                assert server.targets[first.id]['browserContextId'] == first.context_id
+                await pool.release(first.lease_id)
+                third = await pool.acquire()
+                # The returned tab's context (cookies, storage, cache) is gone, not handed out again
+                assert first.id not in server.targets and first.context_id not in server.contexts
+                assert third.context_id not in (first.context_id, second.context_id)
+                assert third.uses == 1
+                stats = pool.stats()
+            return stats
+
+        stats = asyncio.run(run())
+        assert stats['created'] == 3
+        assert stats['leases'] == 3
+        assert stats['recycled'] == 1
+        # close() disposes every context, closing its tab
+        assert server.targets == {} and server.contexts == set()
+        assert ('TARGET1', 'Page.navigate') in server.commands
+
+
+def test_pool_leases_and_reuses_shared_context_tabs():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            async with BrowserPool('127.0.0.1', server.port, size=2, warm_url='http://warm.test/',
+                                   isolate=False) as pool:
+                assert len(server.targets) == 2
+                first = await pool.acquire()
+                second = await pool.acquire()
+                assert first.id != second.id
+                await pool.release(first.lease_id)
+                third = await pool.acquire()
+                assert third.id == first.id
+                assert third.uses == 2
+                stats = pool.stats()
+            return stats
+
+        stats = asyncio.run(run())
+        assert stats['created'] == 2
+        assert stats['leases'] == 3
+        assert stats['recycled'] == 0
+        # close() returns every tab to the browser
+        assert server.targets == {}
+        assert server.contexts == set()
+        assert ('TARGET1', 'Page.navigate') in server.commands
+
+
+def test_pool_recycles_after_max_uses():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            async with BrowserPool('127.0.0.1', server.port, size=1, max_uses=2, isolate=False) as pool:
+                ids = []
+                for _ in range(3):
+                    async with pool.lease() as tab:
+                        ids.append(tab.id)
+                return ids, pool.stats()
+
+        ids, stats = asyncio.run(run())
+        assert ids[0] == ids[1] != ids[2]
+        assert stats['recycled'] == 1
+        assert stats['created'] == 2
+
+
+def test_pool_recycles_tabs_over_heap_limit():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            # The fake browser reports a 1 MiB JS heap
+            async with BrowserPool('127.0.0.1', server.port, size=1, max_heap_bytes=1024,
+                                   isolate=False) as pool:
+                async with pool.lease() as tab:
+                    first_id = tab.id
+                async with pool.lease() as tab:
+                    return first_id, tab.id
+
+        first_id, second_id = asyncio.run(run())
+        assert first_id != second_id
+
+
+def test_pool_acquire_times_out():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            async with BrowserPool('127.0.0.1', server.port, size=1) as pool:
+                await pool.acquire()
+                await pool.acquire(timeout=0.1)
+
+        try:
+            asyncio.run(run())
+        except PoolError as e:
+            assert 'No idle tab' in str(e)
+        else:
+            raise AssertionError('expected PoolError')
+
+
+def test_pool_http_api():
+    with FakeCDPServer(load_delay=0.01) as server:
+        async def run():
+            pool = BrowserPool('127.0.0.1', server.port, size=1)
+            async with TestClient(TestServer(make_app(pool))) as client:
+                leased = await (await client.post('/lease')).json()
+                assert leased['webSocketDebuggerUrl'].endswith(leased['id'])
+                busy = await client.post('/lease?timeout=0.1')
+                assert busy.status == 503
+                assert (await client.post(f"/release/{leased['lease_id']}")).status == 204
+                assert (await client.post('/release/lease-999')).status == 404
+                await asyncio.sleep(0.3)
+                return json.loads(await (await client.get('/stats')).text())
+
+        stats = asyncio.run(run())
+        assert stats['leases'] == 1
+        assert stats['idle'] == 1
+
+
+def test_recycle_limits_require_shared_context():
+    pool_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'pool.py')
+    result = subprocess.run([sys.executable, pool_py, '--max-uses', '10'], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 2 and '--shared-context' in result.stderr
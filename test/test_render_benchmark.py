@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for the screenshot/PDF render-throughput benchmark.
+"""
+
+import base64
+
+from fake_cdp import FakeCDPServer, FakeScreencast
+from render_benchmark import parse_format, parse_viewport, run_render_benchmark
+
+
+class MarkSampler:
+    """Stands in for CgroupSampler: every mark adds 10ms of CPU."""
+
+    def __init__(self):
+        self.marks = {}
+
+    def mark(self, label):
+        self.marks[label] = len(self.marks) * 0.01
+
+    def cpu_seconds_between(self, start_mark, end_mark):
+        return self.marks[end_mark] - self.marks[start_mark]
+
+
+def render_handlers(server, calls):
+    async def screenshot(ws, command):
+        calls.append(command['params'])
+        size = 100 if command['params']['format'] == 'png' else command['params']['quality']
+        await server._reply(ws, command, {'data': base64.b64encode(b'x' * size).decode()})
+
+    async def pdf(ws, command):
+        calls.append(command['params'])
+        await server._reply(ws, command, {'data': base64.b64encode(b'%PDF' * 50).decode()})
+
+    server.handlers['Page.captureScreenshot'] = screenshot
+    server.handlers['Page.printToPDF'] = pdf
+
+
+def test_parse_specs():
+    assert parse_viewport('1920x1080') == (1920, 1080)
+    assert parse_format('png') == ('png', None)
+    assert parse_format('JPEG:60') == ('jpeg', 60)
+    assert parse_format('webp') == ('webp', 80)
+    for bad in ('gif', 'png:50'):
+        try:
+            parse_format(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{bad} should be rejected')
+    try:
+        parse_viewport('wide')
+    except ValueError as e:
+        assert 'WIDTHxHEIGHT' in str(e)
+    else:
+        raise AssertionError('expected ValueError')
+
+
+def test_render_cases_cover_viewports_and_formats():
+    calls = []
+    with FakeCDPServer(load_delay=0.01) as server:
+        render_handlers(server, calls)
+        result = run_render_benchmark('127.0.0.1', server.port, 'http://a.test/',
+                                      viewports=['800x600', '390x844'], formats=['png', 'jpeg:60', 'pdf'],
+                                      renders=3, timeout=5, sampler=MarkSampler())
+        assert server.targets == {}
+
+    assert result['success']
+    cases = result['cases']
+    assert [(c['viewport'], c['format'], c['quality']) for c in cases] == [
+        ('800x600', 'png', None), ('800x600', 'jpeg', 60), ('800x600', 'pdf', None),
+        ('390x844', 'png', None), ('390x844', 'jpeg', 60), ('390x844', 'pdf', None)]
+    assert all(c['success'] and c['renders_per_second'] > 0 for c in cases)
+    assert cases[0]['bytes']['mean'] == 100 and cases[1]['bytes']['mean'] == 60
+    assert cases[2]['bytes']['mean'] == 200
+    assert abs(cases[0]['cpu_seconds_per_render'] - 0.01 / 3) < 1e-9
+    # One warm-up render plus the timed ones per case
+    assert len(calls) == 6 * 4
+    assert calls[0] == {'format': 'png'} and calls[4] == {'format': 'jpeg', 'quality': 60}
+    assert calls[8]['paperWidth'] == 800 / 96
+
+
+def test_render_failure_is_reported_per_case():
+    with FakeCDPServer(load_delay=0.01) as server:
+        render_handlers(server, [])
+
+        async def broken(ws, command):
+            await ws.send_str(f'{{"id": {command["id"]}, "error": {{"message": "Printing failed"}}}}')
+
+        server.handlers['Page.printToPDF'] = broken
+        result = run_render_benchmark('127.0.0.1', server.port, 'http://a.test/', viewports=['800x600'],
+                                      formats=['png', 'pdf'], renders=2, timeout=5)
+
+    assert result['success']
+    png, pdf = result['cases']
+    assert png['success'] and png['cpu_seconds_per_render'] is None
+    assert not pdf['success'] and pdf['error'] == 'Printing failed'
+
+
+def test_unreachable_endpoint_fails_cleanly():
+    result = run_render_benchmark('127.0.0.1', 1, 'http://a.test/', viewports=['800x600'], formats=['png'])
+    assert not result['success'] and result['error']
+
+
+def test_screencast_comparison_runs_on_its_own_page():
+    calls = []
+    with FakeCDPServer(load_delay=0.01) as server:
+        render_handlers(server, calls)
+        FakeScreencast(server, frame_size=500)
+        result = run_render_benchmark('127.0.0.1', server.port, 'http://a.test/', viewports=['800x600'],
+                                      formats=['jpeg:60', 'pdf'], renders=2, timeout=5,
+                                      screencast_frames=4, screencast_url='http://a.test/animation.html')
+        navigations = [method for _, method in server.commands if method == 'Page.navigate']
+        assert server.targets == {}
+
+    assert result['screencast_url'] == 'http://a.test/animation.html'
+    assert len(navigations) == 2
+    # PDF has no screencast equivalent
+    [case] = result['streaming']
+    assert case['success'] and (case['viewport'], case['format'], case['quality']) == ('800x600', 'jpeg', 60)
+    assert case['one_shot']['frames'] == case['screencast']['frames'] == 4
+    assert case['one_shot']['bytes']['mean'] == 60 and case['screencast']['bytes']['mean'] == 500
+    assert case['screencast']['frames_per_second'] > 0
+    assert case['one_shot']['peak_client_bytes'] > 0
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Tests for the request interception policies and their benchmark mode.
+"""
+
+import asyncio
+import base64
+import json
+
+from benchmark import BenchmarkRunner
+from cdp_client import CDPSession
+from fake_cdp import FakeCDPServer, FakeSubresources
+from intercept_benchmark import policy_page_load, run_intercept_benchmark
+from request_policy import (BLOCK, CONTINUE, STUB, RequestInterceptor, RequestPolicy, load_policies,
+                            url_pattern_regex)
+
+RESOURCES = [
+    {'url': 'https://example.com/app.js', 'type': 'Script', 'size': 20000},
+    {'url': 'https://example.com/style.css', 'type': 'Stylesheet', 'size': 8000},
+    {'url': 'https://example.com/hero.jpg', 'type': 'Image', 'size': 300000},
+    {'url': 'https://fonts.example.com/inter.woff2', 'type': 'Font', 'size': 50000},
+    {'url': 'https://www.google-analytics.com/analytics.js', 'type': 'Script', 'size': 45000},
+    {'url': 'https://example.com/video.mp4', 'type': 'Media', 'size': 4000000},
+]
+
+
+def test_decisions_by_type_host_and_pattern():
+    policy = RequestPolicy('test', block_types=['Media'], stub_types=['Font', 'Media'],
+                           block_hosts=['doubleclick.net'], block_urls=['*/ads/*'],
+                           stub_urls=['https://cdn.example.com/*.js?v=?'])
+    assert policy.decide('https://x.com/a.mp4', 'Media') == (BLOCK, 'type:Media')
+    assert policy.decide('https://x.com/a.woff2', 'Font') == (STUB, 'type:Font')
+    assert policy.decide('https://ad.g.doubleclick.net/pixel', 'Image') == (BLOCK, 'host:doubleclick.net')
+    assert policy.decide('https://notdoubleclick.net/', 'Image') == (CONTINUE, None)
+    assert policy.decide('https://x.com/ads/banner.png', 'Image') == (BLOCK, 'url:*/ads/*')
+    assert policy.decide('https://cdn.example.com/lib.js?v=2', 'Script')[0] == STUB
+    assert policy.decide('https://cdn.example.com/lib.js?v=22', 'Script') == (CONTINUE, None)
+    assert url_pattern_regex(r'a\*b.c') == r'a\*b\.c'
+
+
+def test_fetch_patterns_only_pause_what_the_policy_can_change():
+    assert RequestPolicy('none').fetch_patterns() == [] and not RequestPolicy('none').intercepts
+    typed = RequestPolicy('typed', block_types=['Image'], stub_types=['Font'])
+    assert sorted(p['resourceType'] for p in typed.fetch_patterns()) == ['Font', 'Image']
+    hosts = RequestPolicy('hosts', block_hosts=['a.com'], max_bytes=100)
+    assert hosts.fetch_patterns() == [{'urlPattern': '*', 'requestStage': 'Request'},
+                                      {'urlPattern': '*', 'requestStage': 'Response'}]
+
+
+def test_respond_builds_fetch_commands():
+    policy = RequestPolicy('p', stub_types=['Image'], max_bytes=1000)
+    action, rule, method, params = policy.respond({'requestId': '1', 'resourceType': 'Image',
+                                                  'request': {'url': 'https://x.com/a.png'}})
+    assert (action, method) == (STUB, 'Fetch.fulfillRequest')
+    assert base64.b64decode(params['body']).startswith(b'GIF89a')
+    big = {'requestId': '2', 'resourceType': 'Script', 'request': {'url': 'https://x.com/a.js'},
+           'responseStatusCode': 200, 'responseHeaders': [{'name': 'content-length', 'value': '5000'}]}
+    assert policy.respond(big)[1:3] == ('size>1000', 'Fetch.failRequest')
+    document = dict(big, resourceType='Document')
+    assert policy.respond(document)[2] == 'Fetch.continueRequest'
+
+
+def test_policy_files_are_validated(tmp_path):
+    assert list(load_policies())[0] == 'none'
+    path = tmp_path / 'policies.json'
+    path.write_text(json.dumps({'base': {}, 'lean': {'block_types': ['Image'], 'max_bytes': 10}}))
+    assert list(load_policies(str(path))) == ['base', 'lean']
+    for bad in ({'x': {'block_types': ['Pictures']}}, {'x': {'block_types': ['Document']}},
+                {'x': {'drop': ['Image']}}, []):
+        path.write_text(json.dumps(bad))
+        try:
+            load_policies(str(path))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'expected ValueError for {bad}')
+
+
+def test_interceptor_resolves_paused_requests():
+    policy = load_policies()['scrape']
+    with FakeCDPServer() as server:
+        fake = FakeSubresources(server, RESOURCES)
+
+        async def run():
+            async with CDPSession(server.ws_url('T')) as session:
+                return await policy_page_load(session, 'http://page.test/', policy)
+
+        result = asyncio.run(run())
+
+    stats = result['interception']
+    # Image, Font, Media and the tracker are blocked, the stylesheet stubbed
+    assert stats['blocked'] == 4 and stats['stubbed'] == 1 and stats['rules']['host:google-analytics.com'] == 1
+    # Only app.js is continued: at the request stage, then its headers at the response stage
+    assert ('https://example.com/app.js', 'Response', 'Fetch.continueRequest') in fake.resolutions
+    assert result['bytes'] == 20000 and result['requests'] == 2 and result['failed_requests'] == 4
+    assert fake.patterns is None  # Fetch disabled again
+    assert stats['decision_seconds'] / stats['paused'] < 0.001
+
+
+def test_type_only_policy_pauses_only_its_types():
+    policy = RequestPolicy('no-fonts', stub_types=['Font'])
+    with FakeCDPServer() as server:
+        fake = FakeSubresources(server, RESOURCES)
+
+        async def run():
+            async with CDPSession(server.ws_url('T')) as session:
+                interceptor = RequestInterceptor(session, policy)
+                await interceptor.enable()
+                await session.navigate('http://page.test/')
+                await interceptor.disable()
+                return interceptor.stats
+
+        stats = asyncio.run(run())
+    assert stats['paused'] == 1 and stats['stubbed'] == 1
+    assert fake.resolutions == [('https://fonts.example.com/inter.woff2', 'Request', 'Fetch.fulfillRequest')]
+
+
+def test_benchmark_reports_savings_per_policy():
+    policies = load_policies()
+    with FakeCDPServer(load_delay=0.01) as server:
+        FakeSubresources(server, RESOURCES)
+        result = run_intercept_benchmark('127.0.0.1', server.port, ['http://page.test/'], policies, iterations=2)
+        assert server.targets == {}
+
+    assert result['success'] and len(result['loads']) == 2 * len(policies)
+    savings = {entry['policy']: entry for entry in result['savings']}
+    baseline = savings['none']
+    assert baseline['bytes']['median'] == sum(r['size'] for r in RESOURCES) and baseline['paused'] == 0
+    assert baseline['bytes_saving'] == 0
+    # Blocked video and stubbed image
+    assert savings['no-media']['bytes_saving'] > 0.9
+    assert savings['scrape']['bytes']['median'] == 20000 and savings['scrape']['blocked'] == 8
+    assert savings['no-fonts']['stubbed'] == 2
+
+    runner = BenchmarkRunner()
+    page_loads = [{'success': True, 'url': 'http://page.test/', 'iteration': 0, 'cold': True, 'load_time': 0.5}]
+    report = runner.generate_report({'timestamp': 'now', 'iterations': 2, 'results': [{
+        'image': 'thorium-docker:avx2', 'success': True, 'page_loads': page_loads, 'final_stats': {},
+        'startup': {'total_startup_time': 1.0, 'ready_time': 0.5}, 'intercept_test': result,
+        'load_stats': runner.summarize_page_loads(page_loads, ['http://page.test/'])}]})
+    assert '## Request Interception' in report and '| none | 0.0' in report and '| baseline |' in report
+    assert '| scrape |' in report and '| 19.5 | +99.5% |' in report
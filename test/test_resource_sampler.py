@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the cgroup v2 resource sampler using a fake cgroup directory.
+"""
+
+import os
+import time
+
+from resource_sampler import CgroupSampler
+
+
+def write_cgroup(path, usage_usec, memory, rbytes=0, wbytes=0, peak=None):
+    with open(os.path.join(path, 'cpu.stat'), 'w') as f:
+        f.write(f'usage_usec {usage_usec}\nuser_usec {usage_usec // 2}\nsystem_usec {usage_usec // 2}\n')
+    with open(os.path.join(path, 'memory.current'), 'w') as f:
+        f.write(f'{memory}\n')
+    with open(os.path.join(path, 'io.stat'), 'w') as f:
+        f.write(f'8:0 rbytes={rbytes} wbytes={wbytes} rios=1 wios=1 dbytes=0 dios=0\n'
+                f'8:16 rbytes={rbytes} wbytes=0 rios=1 wios=0 dbytes=0 dios=0\n')
+    if peak is not None:
+        with open(os.path.join(path, 'memory.peak'), 'w') as f:
+            f.write(f'{peak}\n')
+
+
+def test_sampler_time_series_and_marks(tmp_path):
+    cgroup = str(tmp_path)
+    write_cgroup(cgroup, 1_000_000, 100 * 1024 * 1024)
+
+    sampler = CgroupSampler(cgroup, interval=0.01).start()
+    sampler.mark('page_loads_start')
+    write_cgroup(cgroup, 3_500_000, 300 * 1024 * 1024, rbytes=4096, wbytes=1024)
+    time.sleep(0.05)
+    sampler.mark('page_loads_end')
+    write_cgroup(cgroup, 4_000_000, 150 * 1024 * 1024, rbytes=4096, wbytes=1024)
+    sampler.stop()
+
+    result = sampler.to_dict()
+    assert result['samples'] == len(result['series']['t']) >= 4
+    assert result['series']['t'] == sorted(result['series']['t'])
+    assert result['peak_memory_bytes'] == 300 * 1024 * 1024
+    assert abs(result['cpu_seconds'] - 3.0) < 1e-9
+    assert result['io_read_bytes'] == 8192
+    assert result['io_write_bytes'] == 1024
+    assert abs(sampler.cpu_seconds_between('page_loads_start', 'page_loads_end') - 2.5) < 1e-9
+
+
+def test_sampler_prefers_kernel_memory_peak(tmp_path):
+    cgroup = str(tmp_path)
+    write_cgroup(cgroup, 0, 50, peak=500)
+    sampler = CgroupSampler(cgroup, interval=0.01).start()
+    sampler.stop()
+    assert sampler.to_dict()['peak_memory_bytes'] == 500
+
+
+def test_sampler_tolerates_missing_files(tmp_path):
+    sampler = CgroupSampler(str(tmp_path / 'gone'), interval=0.01).start()
+    sampler.stop()
+    result = sampler.to_dict()
+    assert result['peak_memory_bytes'] == 0
+    assert result['cpu_seconds'] == 0
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Tests for the append-only result history and regression detection.
+"""
+
+import json
+import sqlite3
+
+from results_store import ResultStore, extract_samples, host_cpu_model, main
+
+
+def run_results(version, load_times, startup=2.0, peak=300 * 1024 * 1024):
+    page_loads = [{'success': True, 'url': 'http://a.test/', 'iteration': i, 'cold': i == 0, 'load_time': t}
+                  for i, t in enumerate(load_times)]
+    page_loads.append({'success': False, 'url': 'http://a.test/', 'iteration': 9, 'cold': False,
+                       'error': 'boom'})
+    return {
+        'timestamp': '2024-05-01T12:00:00',
+        'mode': 'sequential',
+        'host_cpu_model': 'Test CPU @ 3.00GHz',
+        'host_cpus': 8,
+        'results': [
+            {'image': 'thorium-docker:avx2', 'thorium_version': version, 'instruction_set': 'AVX2',
+             'success': True, 'startup': {'total_startup_time': startup}, 'page_loads': page_loads,
+             'resources': {'peak_memory_bytes': peak}},
+            {'image': 'thorium-docker:sse3', 'success': False, 'error': 'pull failed'},
+        ]
+    }
+
+
+def test_extract_samples():
+    samples = extract_samples(run_results('M130', [3.0, 1.0, 1.1]))
+    metrics = sorted(s['metric'] for s in samples)
+    assert metrics == ['cold_load_time', 'load_time', 'load_time', 'peak_memory_bytes', 'startup_time']
+    assert all(s['thorium_version'] == 'M130' and s['instruction_set'] == 'AVX2' for s in samples)
+    assert {s['url'] for s in samples if s['metric'] == 'load_time'} == {'http://a.test/'}
+
+    profile = {'mode': 'startup-profile', 'results': [
+        {'image': 'thorium-docker:avx2', 'success': True, 'shards': 4,
+         'runs': [{'success': True, 'total': 1.5}, {'success': False}, {'success': True, 'total': 1.7}]}
+    ]}
+    samples = extract_samples(profile)
+    assert [s['value'] for s in samples] == [1.5, 1.7]
+    assert samples[0]['variant'] == 'shards=4'
+
+
+def test_store_is_append_only(tmp_path):
+    db = str(tmp_path / 'history.db')
+    with ResultStore(db) as store:
+        first = store.add_run(run_results('M130', [3.0, 1.0, 1.1]))
+        second = store.add_run(run_results('M131', [3.0, 1.0, 1.1]), source='b.json')
+        assert second == first + 1
+        runs = store.runs()
+        assert [run['versions'] for run in runs] == [['M130'], ['M131']]
+        assert runs[0]['host_cpu_model'] == 'Test CPU @ 3.00GHz'
+
+    connection = sqlite3.connect(db)
+    for statement in ('DELETE FROM samples', 'UPDATE runs SET mode = "x"'):
+        try:
+            connection.execute(statement)
+        except sqlite3.DatabaseError as e:
+            assert 'append-only' in str(e)
+        else:
+            raise AssertionError(f'{statement} should be rejected')
+
+
+def test_compare_flags_significant_regressions(tmp_path):
+    db = str(tmp_path / 'history.db')
+    fast = [3.0, 1.0, 1.02, 0.98, 1.01, 0.99, 1.0]
+    slow = [3.0, 1.3, 1.32, 1.28, 1.31, 1.29, 1.3]
+    with ResultStore(db) as store:
+        for _ in range(2):
+            store.add_run(run_results('M130', fast, startup=2.0))
+        for startup in (2.01, 1.99):
+            store.add_run(run_results('M131', slow, startup=startup))
+
+        by_metric = {c['metric']: c for c in store.compare('M130', 'M131')}
+        assert by_metric['load_time']['status'] == 'regression'
+        assert abs(by_metric['load_time']['change'] - 0.3) < 1e-9
+        assert by_metric['startup_time']['status'] == 'unchanged'
+        assert by_metric['peak_memory_bytes']['status'] == 'unchanged'
+
+        # Latest run vs the runs before it: one cold sample is compared against a threshold
+        by_metric = {c['metric']: c for c in store.compare(candidate_runs=1, baseline_runs=2)}
+        assert by_metric['cold_load_time']['status'] == 'unchanged'
+        assert by_metric['cold_load_time']['method'] == 'threshold'
+        assert by_metric['load_time']['baseline_n'] == 12
+
+    assert main(['--db', db, 'compare', '--baseline-version', 'M130', '--candidate-version', 'M131']) == 1
+    assert main(['--db', db, 'compare', '--baseline-version', 'M131', '--candidate-version', 'M130']) == 0
+
+
+def test_add_command_reads_result_files(tmp_path, capsys):
+    results_file = tmp_path / 'results.json'
+    results_file.write_text(json.dumps(run_results('M130', [3.0, 1.0])))
+    db = str(tmp_path / 'nested' / 'history.db')
+    assert main(['--db', db, 'add', str(results_file)]) == 0
+    assert main(['--db', db, 'list']) == 0
+    assert 'M130' in capsys.readouterr().out
+
+
+def test_host_cpu_model(tmp_path):
+    cpuinfo = tmp_path / 'cpuinfo'
+    cpuinfo.write_text('processor\t: 0\nmodel name\t: AMD EPYC 7B13\nflags\t\t: sse avx2\n')
+    assert host_cpu_model(str(cpuinfo)) == 'AMD EPYC 7B13'
+    assert host_cpu_model(str(tmp_path / 'missing')) == ''
+
+
+def test_single_sample_metrics_are_gated(tmp_path, capsys):
+    db = str(tmp_path / 'history.db')
+    loads = [3.0, 1.0, 1.02, 0.98]
+    with ResultStore(db) as store:
+        for startup, peak in ((2.0, 300e6), (2.1, 310e6), (1.9, 290e6)):
+            store.add_run(run_results('M130', loads, startup=startup, peak=peak))
+        store.add_run(run_results('M131', loads, startup=10.0, peak=1200e6))
+
+        # One run per side of a per-run metric: no CI, but a 5x slowdown is still a regression
+        by_metric = {c['metric']: c for c in store.compare(candidate_runs=1, baseline_runs=3)}
+        assert by_metric['startup_time']['status'] == 'regression' and by_metric['startup_time']['baseline_n'] == 3
+        assert by_metric['peak_memory_bytes']['status'] == 'regression'
+        assert by_metric['startup_time']['method'] == 'threshold' and by_metric['load_time']['method'] == 'bootstrap'
+
+    assert main(['--db', db, 'compare', '--candidate-runs', '1', '--baseline-runs', '3']) == 1
+    # ... unless the threshold is above the slowdown
+    assert main(['--db', db, 'compare', '--candidate-runs', '1', '--baseline-runs', '1',
+                 '--single-change', '10']) == 0
+    # A gate that compared nothing fails
+    assert main(['--db', db, 'compare', '--baseline-version', 'M130', '--candidate-version', 'M999']) == 2
+    assert 'Nothing to compare' in capsys.readouterr().out
+
+    def budget(size):
+        return {'mode': 'image-budget', 'results': [
+            {'image': 'thorium-docker:avx2-slim', 'success': True, 'compressed_bytes': size, 'pulls': [],
+             'devtools_times': [], 'cold_starts': []}]}
+
+    with ResultStore(db) as store:
+        for size in (100e6, 400e6):
+            store.add_run(budget(size))
+        by_metric = {c['metric']: c for c in store.compare(candidate_runs=1, baseline_runs=1)}
+    assert by_metric['compressed_bytes']['status'] == 'regression'
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming screencast capture.
+"""
+
+import asyncio
+import base64
+import io
+
+import screencast
+from cdp_client import CDPError, CDPSession
+from fake_cdp import FakeCDPServer, FakeScreencast
+from screencast import (FrameBuffer, ScreencastCapture, decode_base64_into, decode_base64_to_file,
+                        decoded_length)
+
+
+def test_chunked_decoding_matches_b64decode(monkeypatch):
+    monkeypatch.setattr(screencast, 'DECODE_CHUNK', 8)
+    for payload in (b'', b'a', b'ab', b'abc', bytes(range(256)) * 3):
+        data = base64.b64encode(payload).decode()
+        assert decoded_length(data) == len(payload)
+        out = bytearray(len(payload) + 5)
+        assert decode_base64_into(data, memoryview(out)) == len(payload)
+        assert bytes(out[:len(payload)]) == payload
+        f = io.BytesIO()
+        assert decode_base64_to_file(data, f) == len(payload)
+        assert f.getvalue() == payload
+
+
+def test_frame_buffer_reuses_and_grows():
+    buffer = FrameBuffer(16)
+    first = buffer.decode(base64.b64encode(b'x' * 10).decode())
+    assert bytes(first) == b'x' * 10 and buffer.capacity == 16
+    second = buffer.decode(base64.b64encode(b'y' * 40).decode())
+    assert bytes(second) == b'y' * 40 and buffer.capacity == 40
+    third = buffer.decode(base64.b64encode(b'z' * 20).decode())
+    assert bytes(third) == b'z' * 20 and buffer.capacity == 40
+
+
+def stream_frames(server, count, **kwargs):
+    async def run():
+        async with CDPSession(server.ws_url('T1'), timeout=5) as session:
+            async with ScreencastCapture(session, **kwargs) as capture:
+                frames = []
+                async for frame in capture.frames(count):
+                    frames.append((frame.index, bytes(frame.data), frame.metadata))
+                    await asyncio.sleep(0.01)  # slow consumer
+                return frames, capture.frames_received, capture.bytes_received
+    return asyncio.run(run())
+
+
+def test_frames_are_streamed_with_backpressure():
+    with FakeCDPServer() as server:
+        fake = FakeScreencast(server, frame_size=300)
+        frames, received, total = stream_frames(server, 5, fmt='jpeg', quality=70, max_width=800)
+
+    assert [index for index, _, _ in frames] == [0, 1, 2, 3, 4]
+    assert [data[0] for _, data, _ in frames] == [1, 2, 3, 4, 5]
+    assert all(len(data) == 300 for _, data, _ in frames)
+    assert frames[0][2]['deviceWidth'] == 800
+    assert received == 5 and total == 1500
+    assert fake.params == {'format': 'jpeg', 'quality': 70, 'everyNthFrame': 1, 'maxWidth': 800}
+    # A slow consumer never has more than one frame in flight
+    assert fake.max_unacked == 1
+    assert fake.acked == 5
+
+
+def test_save_writes_frames_to_files(tmp_path):
+    with FakeCDPServer() as server:
+        FakeScreencast(server, frame_size=200)
+
+        async def run():
+            async with CDPSession(server.ws_url('T1'), timeout=5) as session:
+                async with ScreencastCapture(session, fmt='png') as capture:
+                    return await capture.save(str(tmp_path / 'frame-{}.png'), 3)
+
+        assert asyncio.run(run()) == 600
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['frame-0.png', 'frame-1.png', 'frame-2.png']
+    assert (tmp_path / 'frame-2.png').read_bytes() == bytes([3]) * 200
+
+
+def test_missing_frames_time_out():
+    with FakeCDPServer() as server:
+        FakeScreencast(server, frames=1)
+        try:
+            stream_frames(server, 2, fmt='png', timeout=0.2)
+        except CDPError as e:
+            assert 'No screencast frame' in str(e)
+        else:
+            raise AssertionError('expected CDPError')
+
+
+def test_rejects_unsupported_format():
+    try:
+        ScreencastCapture(CDPSession('ws://unused'), fmt='webp')
+    except ValueError as e:
+        assert 'jpeg or png' in str(e)
+    else:
+        raise AssertionError('expected ValueError')
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for host CPU feature detection and image selection.
+"""
+
+from select_image import compatible_instruction_sets, image_tag, read_cpu_flags, recommend
+
+HASWELL = 'fpu sse sse2 pni ssse3 fma sse4_1 sse4_2 avx avx2 bmi2'
+SANDY_BRIDGE = 'fpu sse sse2 pni ssse3 sse4_1 sse4_2 avx'
+CORE2 = 'fpu sse sse2 pni ssse3 sse4_1'
+
+
+def cpuinfo(tmp_path, *cores):
+    path = tmp_path / 'cpuinfo'
+    path.write_text(''.join(f'processor\t: {i}\nmodel name\t: Test CPU\nflags\t\t: {flags}\n\n'
+                            for i, flags in enumerate(cores)))
+    return str(path)
+
+
+def test_flags_are_intersected_across_cores(tmp_path):
+    flags = read_cpu_flags(cpuinfo(tmp_path, HASWELL, SANDY_BRIDGE))
+    assert 'avx' in flags and 'avx2' not in flags
+    assert read_cpu_flags(cpuinfo(tmp_path)) == set()
+
+
+def test_fastest_compatible_build_is_chosen():
+    assert compatible_instruction_sets(set(HASWELL.split())) == ['AVX2', 'AVX', 'SSE4', 'SSE3']
+    assert compatible_instruction_sets(set(SANDY_BRIDGE.split()))[0] == 'AVX'
+    # SSE4.1 without SSE4.2 only runs the SSE3 build
+    assert compatible_instruction_sets(set(CORE2.split())) == ['SSE3']
+    # AVX2 builds also need FMA
+    assert compatible_instruction_sets(set(HASWELL.split()) - {'fma'})[0] == 'AVX'
+    assert recommend(set())['instruction_set'] is None
+
+
+def test_image_tags():
+    assert image_tag('thorium-docker', 'AVX2') == 'thorium-docker:avx2'
+    assert image_tag('sort/thorium-headless', 'SSE4', 'M130.0.6723.174') == \
+        'sort/thorium-headless:M130.0.6723.174-SSE4'
+
+
+def test_benchmark_confirms_or_overrides_choice():
+    flags = set(HASWELL.split())
+    confirmed = recommend(flags, {'AVX2': [1.0, 1.01, 0.99, 1.0], 'AVX': [1.0, 1.02, 0.98, 1.01]})
+    assert confirmed['instruction_set'] == 'AVX2' and confirmed['confirmed'] is True
+
+    overridden = recommend(flags, {'AVX2': [1.5, 1.52, 1.48, 1.5], 'AVX': [1.0, 1.02, 0.98, 1.01]})
+    assert overridden['instruction_set'] == 'AVX' and overridden['confirmed'] is False
+    assert overridden['benchmark']['AVX'] < overridden['benchmark']['AVX2']
+
+    # The flag-based choice stands if its image could not be measured
+    missing = recommend(flags, {'AVX2': [], 'AVX': [1.0, 1.0]})
+    assert missing['instruction_set'] == 'AVX2' and missing['confirmed'] is None
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Tests for the sharding proxy and supervisor against fake DevTools shards.
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import aiohttp
+import requests
+from aiohttp.test_utils import TestClient, TestServer
+
+from cdp_client import CDPSession
+from fake_cdp import FakeCDPServer
+from shard_proxy import ShardProxy
+from supervisor import Supervisor, cpu_groups
+
+SERVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services')
+
+
+def test_cpu_groups():
+    assert cpu_groups(2, [0, 1, 2, 3, 4]) == [[0, 1, 2], [3, 4]]
+    assert cpu_groups(4, list(range(8))) == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert cpu_groups(3, [0, 1]) == [[0], [1], [0]]
+
+
+def test_proxy_balances_targets_and_keeps_sessions_sticky():
+    with FakeCDPServer(0.01, id_prefix='A') as a, FakeCDPServer(0.01, id_prefix='B') as b:
+        proxy = ShardProxy([f'127.0.0.1:{a.port}', f'127.0.0.1:{b.port}'])
+
+        async def run():
+            async with TestClient(TestServer(proxy.make_app())) as client:
+                host = f'{client.host}:{client.port}'
+                targets = [await (await client.put('/json/new?about:blank')).json() for _ in range(4)]
+                listed = await (await client.get('/json/list')).json()
+
+                # Drive a page through the proxy's WebSocket
+                async with CDPSession(targets[1]['webSocketDebuggerUrl']) as session:
+                    load = await session.navigate('http://example.test/', timeout=5)
+
+                closed = await client.get(f"/json/close/{targets[0]['id']}")
+                unknown = await client.get('/json/close/NOPE')
+                stats = await (await client.get('/shards')).json()
+                return host, targets, listed, load, closed.status, unknown.status, stats
+
+        host, targets, listed, load, closed, unknown, stats = asyncio.run(run())
+
+        assert sorted(t['id'][0] for t in targets) == ['A', 'A', 'B', 'B']
+        assert all(t['webSocketDebuggerUrl'].startswith(f'ws://{host}/devtools/page/') for t in targets)
+        assert len(listed) == 4
+        assert load['load_time'] > 0
+        owner = a if targets[1]['id'].startswith('A') else b
+        assert (targets[1]['id'], 'Page.navigate') in owner.commands
+        assert closed == 200 and unknown == 404
+        assert len(a.targets) + len(b.targets) == 3
+        assert sorted(s['targets'] for s in stats) == [1, 2]
+
+
+def test_proxy_follows_targets_opened_and_closed_behind_its_back():
+    with FakeCDPServer(0.01, id_prefix='A') as a, FakeCDPServer(0.01, id_prefix='B') as b:
+        proxy = ShardProxy([f'127.0.0.1:{a.port}', f'127.0.0.1:{b.port}'])
+
+        async def until(condition):
+            for _ in range(200):
+                if condition():
+                    return True
+                await asyncio.sleep(0.01)
+            return False
+
+        async def run():
+            async with TestClient(TestServer(proxy.make_app())) as client, aiohttp.ClientSession() as http:
+                assert await until(lambda: a._discovering and b._discovering)
+                target = await (await client.put('/json/new?about:blank')).json()
+                owner, other = (a, b) if target['id'].startswith('A') else (b, a)
+                # Closed on the shard itself (Target.closeTarget, a crash, ...)
+                await (await http.get(f"{owner.base_url}/json/close/{target['id']}")).read()
+                closed = await until(lambda: proxy.target_counts == [0, 0])
+                # Opened on the shard itself (window.open, ...)
+                opened = (await (await http.put(f'{other.base_url}/json/new')).json())['id']
+                followed = await until(lambda: proxy.owners.get(opened) == [a, b].index(other))
+                return closed, followed, proxy.target_counts, target['id'] in proxy.owners
+
+        closed, followed, counts, still_owned = asyncio.run(run())
+        assert closed and followed and not still_owned
+        assert sorted(counts) == [0, 1]
+
+
+def test_proxy_forgets_a_restarted_shards_targets():
+    proxy = ShardProxy(['127.0.0.1:1', '127.0.0.1:2'])
+    for shard, target_id in ((0, 'A1'), (0, 'A2'), (1, 'B1')):
+        proxy._target_created(shard, {'targetInfo': {'targetId': target_id, 'type': 'page'}})
+    assert proxy.target_counts == [2, 1] and proxy._pick_shard() == 1
+
+    # What the supervisor does when it restarts shard 0's browser
+    proxy.reset_shard(0)
+    assert proxy.target_counts == [0, 1] and proxy.owners == {'B1': 1}
+    assert proxy._pick_shard() == 0
+
+
+def test_proxy_answers_502_for_an_unreachable_shard():
+    proxy = ShardProxy([f'127.0.0.1:{free_port()}'], timeout=5)
+
+    async def run():
+        async with TestClient(TestServer(proxy.make_app())) as client:
+            version = await client.get('/json/version')
+            new = await client.put('/json/new')
+            return version.status, new.status, await new.text()
+
+    version, new, text = asyncio.run(run())
+    assert version == 502 and new == 502 and 'Shard unreachable' in text
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_supervisor_serves_shards_behind_one_port(tmp_path):
+    port = free_port()
+    base_port = free_port()
+    while port in (base_port, base_port + 1):
+        base_port = free_port()
+    browser = f'{sys.executable} {os.path.join(os.path.dirname(__file__), "fake_cdp.py")}'
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVICES, 'supervisor.py'), '--shards', '2', '--port', str(port),
+         '--base-port', str(base_port), '--profile-root', str(tmp_path), '--browser', browser, '--no-pin'],
+        stderr=subprocess.PIPE, text=True
+    )
+    try:
+        lines = []
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            line = process.stderr.readline()
+            if not line:
+                break
+            lines.append(line)
+            if line.startswith('DevTools listening on ws://'):
+                break
+        # Shard lines are relabelled so only the proxy announces readiness
+        assert lines and lines[-1].startswith('DevTools listening on ws://'), ''.join(lines)
+        assert sum('devtools ready at' in line for line in lines) == 2
+        # Printed by each shard right before its browser is exec'd
+        assert sum(line.startswith('[supervisor] exec browser') for line in lines) == 2
+        assert '(2 shards)' in lines[-1]
+
+        targets = [requests.put(f'http://127.0.0.1:{port}/json/new', timeout=5).json() for _ in range(2)]
+        prefixes = {t['id'].split('T')[0] for t in targets}
+        assert len(prefixes) == 2
+        assert (tmp_path / 'shard-0').is_dir() and (tmp_path / 'shard-1').is_dir()
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+def test_supervisor_runs_under_a_fresh_event_loop(tmp_path, capsys):
+    # Built before asyncio.run(), like main() does (Python 3.9 binds events to the loop current at creation)
+    browser = f'{sys.executable} {os.path.join(os.path.dirname(__file__), "fake_cdp.py")}'
+    supervisor = Supervisor(browser, [], port=free_port(), profile_root=str(tmp_path), pin=False, status_port=0)
+
+    async def run():
+        task = asyncio.ensure_future(supervisor.run())
+        output = ''
+        for _ in range(200):
+            output += capsys.readouterr().err
+            if 'DevTools listening on ws://' in output or task.done():
+                break
+            await asyncio.sleep(0.05)
+        if task.done():
+            task.result()  # Raises what stopped the supervisor
+        version = requests.get(f'http://127.0.0.1:{supervisor.port}/json/version', timeout=5).json()
+        # run() installs its SIGTERM handler in the same step that prints the DevTools line
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(task, 10)
+        return output, version
+
+    output, version = asyncio.run(run())
+    assert '(1 shard)' in output and version['Browser']
+    assert supervisor.shards[0].process.returncode is not None
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the cold-start profiler with canned docker output and a fake browser.
+"""
+
+import time
+from datetime import datetime, timezone
+
+from benchmark import BenchmarkRunner
+from fake_cdp import FakeCDPServer
+from startup_profiler import (BROWSER_EXEC_MARKER, ENTRYPOINT_MARKER, StartupProfiler,
+                              parse_docker_time, parse_log_milestones, phase_breakdown)
+
+
+def docker_time(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f') + '123Z'
+
+
+def test_parse_docker_time():
+    assert parse_docker_time('2024-05-01T12:00:00.123456789Z') == 1714564800.123456789
+    assert parse_docker_time('2024-05-01T14:00:00.5+02:00') == 1714564800.5
+    assert parse_docker_time('2024-05-01T12:00:00Z') == 1714564800.0
+    assert parse_docker_time('not a time') is None
+
+
+def test_log_milestones_merge_streams_in_time_order():
+    stderr = (f'2024-05-01T12:00:00.100000000Z {ENTRYPOINT_MARKER}\n'
+              f'2024-05-01T12:00:00.200000000Z {BROWSER_EXEC_MARKER}\n'
+              '2024-05-01T12:00:00.300000000Z [supervisor] seeded shard 0 profile from /opt/thorium/profile-template\n'
+              '2024-05-01T12:00:01.000000000Z DevTools listening on ws://127.0.0.1:9222/devtools/browser/x\n')
+    stdout = '2024-05-01T12:00:00.600000000Z [0501/120000.600:WARNING] dbus not available\n'
+    milestones = parse_log_milestones(stdout + stderr)
+    base = 1714564800
+    assert abs(milestones['entrypoint'] - (base + 0.1)) < 1e-6
+    assert abs(milestones['browser_exec'] - (base + 0.2)) < 1e-6
+    assert abs(milestones['first_log'] - (base + 0.6)) < 1e-6
+    assert abs(milestones['devtools_listening'] - (base + 1.0)) < 1e-6
+
+
+def test_phase_breakdown_attributes_missing_milestones_to_next_phase():
+    phases = phase_breakdown(0.0, {'created': 0.1, 'started': 0.5, 'first_log': 0.9,
+                                   'devtools_listening': 1.2, 'first_target': 1.3})
+    assert phases['entrypoint'] is None and phases['browser_exec'] is None
+    assert abs(phases['first_log'] - 0.4) < 1e-9
+    assert abs(sum(v for v in phases.values() if v is not None) - 1.3) < 1e-9
+
+
+class DockerStub(BenchmarkRunner):
+    """Answers docker commands with timestamps relative to ``docker start``."""
+
+    def __init__(self):
+        super().__init__()
+        self.commands = []
+        self.started = None
+
+    def run_command(self, cmd, timeout=None):
+        self.commands.append(cmd)
+        stdout = stderr = ''
+        if cmd[:2] == ['docker', 'start']:
+            self.started = time.time()
+        elif cmd[:2] == ['docker', 'inspect']:
+            stdout = docker_time(self.started + 0.001) + '\n'
+        elif cmd[:2] == ['docker', 'logs']:
+            stderr = (f'{docker_time(self.started + 0.002)} {ENTRYPOINT_MARKER}\n'
+                      f'{docker_time(self.started + 0.003)} {BROWSER_EXEC_MARKER}\n'
+                      f'{docker_time(self.started + 0.004)} DevTools listening on ws://0.0.0.0:9222/x\n')
+        return {'success': True, 'stdout': stdout, 'stderr': stderr, 'returncode': 0,
+                'execution_time': 0, 'memory_delta': 0, 'start_time': 0, 'end_time': 0}
+
+    def wait_for_container_ready(self, port, max_wait=60, name=None):
+        time.sleep(0.01)
+        return {'ready_time': 0.01, 'ready_source': 'log'}
+
+
+def test_profile_reports_every_phase():
+    runner = DockerStub()
+    with FakeCDPServer() as server:
+        profile = StartupProfiler(runner, runs=2).profile('thorium-docker:avx2', 'bench', server.port,
+                                                          cpuset='0,1')
+
+    assert profile['success']
+    assert profile['total']['n'] == 2
+    for milestone in ('created', 'started', 'entrypoint', 'browser_exec', 'first_log',
+                      'devtools_listening', 'first_target'):
+        assert profile['phases'][milestone]['n'] == 2, milestone
+    run = profile['runs'][0]
+    assert abs(sum(run['phases'].values()) - run['total']) < 1e-6
+    # The DevTools line is also the first browser log line here
+    assert run['phases']['devtools_listening'] == 0
+
+    create = next(cmd for cmd in runner.commands if cmd[:2] == ['docker', 'create'])
+    assert create[create.index('--cpuset-cpus') + 1] == '0,1'
+    assert create[-1] == 'thorium-docker:avx2'
+    # Every cold start removes any leftover container before and after
+    assert runner.commands.count(['docker', 'rm', '-f', 'bench']) == 4
+    # The probe target is closed again
+    assert server.targets == {}
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for the benchmark statistics and iteration summaries.
+"""
+
+from benchmark import BenchmarkRunner
+from stats import bootstrap_ci, significantly_lower, summarize
+
+
+def test_summarize():
+    result = summarize([1.0, 2.0, 3.0, 4.0, 5.0])
+    assert result['n'] == 5
+    assert result['mean'] == 3.0
+    assert result['median'] == 3.0
+    assert abs(result['stddev'] - 1.5811) < 1e-4
+    assert result['p95'] == 4.8
+    assert result['ci_low'] <= 3.0 <= result['ci_high']
+    assert summarize([]) == {'n': 0}
+    assert summarize([2.0])['stddev'] == 0.0
+
+
+def test_bootstrap_ci_is_reproducible():
+    values = [0.9, 1.1, 1.0, 1.2, 0.8, 1.05]
+    assert bootstrap_ci(values) == bootstrap_ci(values)
+    low, high = bootstrap_ci(values)
+    assert 0.8 <= low < high <= 1.2
+
+
+def test_significantly_lower():
+    fast = [1.0, 1.02, 0.98, 1.01, 0.99, 1.0]
+    slow = [1.5, 1.52, 1.48, 1.51, 1.49, 1.5]
+    noisy = [0.7, 1.4, 0.9, 1.6, 1.2, 0.8]
+    assert significantly_lower(fast, slow)
+    assert not significantly_lower(slow, fast)
+    assert not significantly_lower(fast, noisy)
+    assert not significantly_lower([1.0], [2.0])
+
+
+def page_loads(times_by_url):
+    loads = []
+    for url, times in times_by_url.items():
+        for iteration, load_time in enumerate(times):
+            loads.append({'success': True, 'load_time': load_time, 'url': url,
+                          'iteration': iteration, 'cold': iteration == 0})
+    return loads
+
+
+def test_summarize_page_loads_separates_cold():
+    runner = BenchmarkRunner(iterations=4)
+    loads = page_loads({'a': [3.0, 1.0, 1.1, 0.9], 'b': [2.0, 0.5, 0.6, 0.4]})
+    loads.append({'success': False, 'error': 'boom', 'url': 'b', 'iteration': 4, 'cold': False})
+
+    stats = runner.summarize_page_loads(loads, ['a', 'b'])
+
+    assert stats['per_url']['a']['cold'] == 3.0
+    assert stats['per_url']['a']['warm']['n'] == 3
+    assert abs(stats['per_url']['a']['warm']['mean'] - 1.0) < 1e-9
+    assert stats['cold']['n'] == 2
+    assert stats['warm']['n'] == 6
+
+
+def benchmark_result(image, times):
+    loads = page_loads({'a': times})
+    runner = BenchmarkRunner(iterations=len(times))
+    return {
+        'image': image,
+        'success': True,
+        'startup': {'total_startup_time': 2.0},
+        'page_loads': loads,
+        'load_stats': runner.summarize_page_loads(loads, ['a'])
+    }
+
+
+def test_comparison_summary_requires_significance():
+    runner = BenchmarkRunner()
+    significant = {'results': [
+        benchmark_result('thorium-docker:sse3', [5.0, 1.5, 1.52, 1.48, 1.51, 1.49]),
+        benchmark_result('thorium-docker:avx2', [5.0, 1.0, 1.02, 0.98, 1.01, 0.99]),
+    ]}
+    lines = runner.comparison_summary(significant)
+    # One startup per image cannot be tested for significance, so only page loads are compared
+    assert len(lines) == 1 and lines[0].startswith('Fastest page load: thorium-docker:avx2')
+    assert 'significant at 95%' in lines[0]
+
+    overlapping = {'results': [
+        benchmark_result('thorium-docker:sse3', [5.0, 0.7, 1.4, 0.9, 1.6, 1.2]),
+        benchmark_result('thorium-docker:avx2', [5.0, 1.0, 1.02, 0.98, 1.01, 0.99]),
+    ]}
+    assert runner.comparison_summary(overlapping)[0].startswith('Fastest page load: no significant difference')
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for per-navigation tracing and the critical-path breakdown.
+"""
+
+import asyncio
+import json
+
+from benchmark import BenchmarkRunner
+from cdp_client import CDPSession
+from fake_cdp import FakeCDPServer, FakeTracing
+from tracing import aggregate_traces, explain_difference, summarize_trace, traced_navigation
+
+MAIN = {'pid': 1, 'tid': 10}
+RASTER = {'pid': 1, 'tid': 11}
+
+
+def x(name, ts, dur, thread=MAIN):
+    return dict(thread, ph='X', name=name, ts=ts, dur=dur)
+
+
+TRACE_EVENTS = [
+    dict(MAIN, ph='M', name='thread_name', args={'name': 'CrRendererMain'}),
+    dict(RASTER, ph='M', name='thread_name', args={'name': 'Compositor'}),
+    x('RunTask', 0, 10000),
+    x('ParseHTML', 0, 1000),
+    x('EvaluateScript', 1000, 6000),
+    x('FunctionCall', 1500, 4000),
+    x('Layout', 2000, 1000),          # forced layout inside a script
+    x('V8.GCScavenger', 4000, 500),
+    x('Paint', 8000, 1500),
+    dict(MAIN, ph='B', name='UpdateLayoutTree', ts=12000),
+    dict(MAIN, ph='E', name='UpdateLayoutTree', ts=12400),
+    x('RasterTask', 0, 50000, RASTER),  # not on the main thread
+    dict(MAIN, ph='I', name='ResourceSendRequest', ts=0, args={'data': {'requestId': 'a'}}),
+    dict(MAIN, ph='I', name='ResourceSendRequest', ts=500, args={'data': {'requestId': 'b'}}),
+    dict(MAIN, ph='I', name='ResourceFinish', ts=3000, args={'data': {'requestId': 'a'}}),
+    dict(MAIN, ph='I', name='ResourceFinish', ts=4000, args={'data': {'requestId': 'b'}}),
+    dict(MAIN, ph='I', name='ResourceSendRequest', ts=20000, args={'data': {'requestId': 'c'}}),
+    dict(MAIN, ph='I', name='ResourceFinish', ts=21000, args={'data': {'requestId': 'c'}}),
+]
+
+
+def test_breakdown_uses_main_thread_self_time():
+    summary = summarize_trace(TRACE_EVENTS)
+    assert abs(summary['parse'] - 0.001) < 1e-9
+    # 6ms EvaluateScript minus the 1ms layout and 0.5ms GC nested in it
+    assert abs(summary['scripting'] - 0.0045) < 1e-9
+    assert abs(summary['layout'] - 0.0014) < 1e-9
+    assert abs(summary['gc'] - 0.0005) < 1e-9
+    assert abs(summary['paint'] - 0.0015) < 1e-9
+    # RunTask's uncovered 1.5ms
+    assert abs(summary['other'] - 0.0015) < 1e-9
+    assert abs(summary['main_thread'] - 0.0104) < 1e-9
+    # Overlapping requests a and b count once: 0-4ms, plus 1ms for c
+    assert abs(summary['network'] - 0.005) < 1e-9
+
+
+def test_aggregate_and_explain():
+    fast = dict(summarize_trace(TRACE_EVENTS))
+    slow = dict(fast, scripting=fast['scripting'] + 0.02, paint=fast['paint'] - 0.002)
+    assert aggregate_traces([fast, slow, slow])['scripting'] == slow['scripting']
+    assert aggregate_traces([]) == {}
+    reasons = explain_difference(fast, slow)
+    assert [category for category, _ in reasons] == ['scripting', 'paint']
+    assert abs(reasons[0][1] - 0.02) < 1e-9
+
+
+def test_trace_is_streamed_to_disk(tmp_path):
+    path = tmp_path / 'traces' / 'page.json'
+    with FakeCDPServer() as server:
+        tracing = FakeTracing(server, TRACE_EVENTS, chunk_size=100, base64_chunks=True)
+
+        async def run():
+            async with CDPSession(server.ws_url('T1'), timeout=5) as session:
+                return await traced_navigation(session, 'http://a.test/', str(path))
+
+        navigation, summary = asyncio.run(run())
+
+    assert navigation['load_time'] > 0
+    assert tracing.start_params['transferMode'] == 'ReturnAsStream'
+    assert 'devtools.timeline' in tracing.start_params['traceConfig']['includedCategories']
+    assert tracing.reads == -(-len(tracing.data) // 100)
+    assert tracing.closed == ['stream1']
+    assert json.loads(path.read_text())['traceEvents'] == TRACE_EVENTS
+    assert summary['file'] == str(path) and summary['bytes'] == len(tracing.data)
+    assert abs(summary['scripting'] - 0.0045) < 1e-9
+
+
+def test_benchmark_reports_trace_breakdown(tmp_path):
+    runner = BenchmarkRunner(trace_dir=str(tmp_path))
+    with FakeCDPServer() as server:
+        FakeTracing(server, TRACE_EVENTS, chunk_size=4096)
+        load = runner.test_page_load(server.port, 'http://a.test/', str(tmp_path / 'a.json'))
+        plain = runner.test_page_load(server.port, 'http://a.test/')
+    assert load['success'] and load['trace']['events'] == len(TRACE_EVENTS)
+    assert 'trace' not in plain
+
+    def result(image, scripting):
+        trace = dict(load['trace'], scripting=scripting)
+        page_loads = [dict(load, url='http://a.test/', iteration=i, cold=i == 0, trace=trace) for i in range(3)]
+        return {'image': image, 'success': True, 'page_loads': page_loads, 'test_urls': ['http://a.test/'],
+                'startup': {'total_startup_time': 1.0, 'ready_time': 0.1}, 'final_stats': {},
+                'load_stats': runner.summarize_page_loads(page_loads, ['http://a.test/'])}
+
+    report = runner.generate_report({'timestamp': 'now', 'iterations': 3, 'test_urls': ['http://a.test/'],
+                                     'results': [result('thorium-docker:avx2', 0.010),
+                                                 result('thorium-docker:sse3', 0.030)]})
+    assert '## Trace Breakdown' in report
+    assert '| Container | Load (s) | Scripting | Style/Layout | Paint | Parse | GC | Other | Network |' in report
+    assert 'thorium-docker:sse3 vs thorium-docker:avx2: load +0.0ms, mostly +20.0ms scripting' in report
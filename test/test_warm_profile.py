@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Tests for the build-time profile warm-up and startup seeding.
+"""
+
+import sys
+import textwrap
+
+from page_server import CORPUS_PAGES
+from warm_profile import seed_profile, warm_profile
+
+# Stands in for ``thorium-browser --dump-dom``: fetches the page and writes
+# the kind of files a real profile would get.
+FAKE_BROWSER = textwrap.dedent('''
+    import os, sys, urllib.request
+    profile = next(a.split('=', 1)[1] for a in sys.argv if a.startswith('--user-data-dir='))
+    url = sys.argv[-1]
+    urllib.request.urlopen(url).read()
+    for path in ('Default/Code Cache/js', 'Default/Cache/Cache_Data', 'Crashpad'):
+        os.makedirs(os.path.join(profile, path), exist_ok=True)
+    with open(os.path.join(profile, 'Default/Code Cache/js', url.rsplit('/', 1)[-1]), 'w') as f:
+        f.write('code')
+    with open(os.path.join(profile, 'Local State'), 'a') as f:
+        f.write(url + '\\n')
+    if not os.path.lexists(os.path.join(profile, 'SingletonLock')):
+        os.symlink('host-1', os.path.join(profile, 'SingletonLock'))
+''')
+
+
+def test_warm_profile_builds_a_clean_template(tmp_path):
+    browser_script = tmp_path / 'browser.py'
+    browser_script.write_text(FAKE_BROWSER)
+    template = tmp_path / 'template'
+
+    urls = warm_profile(f'{sys.executable} {browser_script}', str(template), passes=2)
+
+    assert [url.rsplit('/', 1)[-1] for url in urls] == CORPUS_PAGES
+    assert len((template / 'Local State').read_text().splitlines()) == 2 * len(CORPUS_PAGES)
+    # Locks, crash state and the origin-keyed caches are not baked in
+    assert not (template / 'SingletonLock').exists()
+    assert not (template / 'Crashpad').exists()
+    assert not (template / 'Default' / 'Cache').exists()
+    assert not (template / 'Default' / 'Code Cache').exists()
+
+
+def test_seed_profile_only_fills_empty_profiles(tmp_path):
+    template = tmp_path / 'template'
+    (template / 'Default').mkdir(parents=True)
+    (template / 'Local State').write_text('{}')
+
+    fresh = tmp_path / 'fresh'
+    assert seed_profile(str(template), str(fresh))
+    assert (fresh / 'Local State').read_text() == '{}'
+    assert (fresh / 'Default').is_dir()
+
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    assert seed_profile(str(template), str(empty))
+
+    used = tmp_path / 'used'
+    used.mkdir()
+    (used / 'Preferences').write_text('mine')
+    assert not seed_profile(str(template), str(used))
+    assert not (used / 'Local State').exists()
+
+    assert not seed_profile(str(tmp_path / 'missing'), str(tmp_path / 'other'))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests for the supervisor's crash/hang watchdog and the kill benchmark, with fake browsers.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import urllib.request
+
+from benchmark import BenchmarkRunner
+from fake_cdp import FakeCDPServer
+from supervisor import Supervisor
+from test_sharding import SERVICES, free_port
+from watchdog_benchmark import run_kill_benchmark
+
+
+class LocalExecRunner(BenchmarkRunner):
+    """Runs ``docker exec <name> ...`` commands on this machine instead of in a container."""
+
+    def run_command(self, cmd, timeout=None):
+        if cmd[:2] == ['docker', 'exec']:
+            cmd = [sys.executable if arg == 'python3' else arg for arg in cmd[3:]]
+        return super().run_command(cmd, timeout)
+
+
+class SupervisedFakeBrowser:
+    """supervisor.py running one fake browser, with its log collected in the background."""
+
+    def __init__(self, tmp_path, hang_timeout=0.5):
+        self.port = free_port()
+        self.status_port = free_port()
+        browser = f'{sys.executable} {os.path.join(os.path.dirname(__file__), "fake_cdp.py")}'
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(SERVICES, 'supervisor.py'), '--port', str(self.port),
+             '--profile-root', str(tmp_path), '--browser', browser, '--no-pin', '--heartbeat', '0.05',
+             '--hang-timeout', str(hang_timeout), '--status-port', str(self.status_port)],
+            stderr=subprocess.PIPE, text=True
+        )
+        self.lines = []
+        self.ready = threading.Event()
+        threading.Thread(target=self._collect, daemon=True).start()
+
+    def _collect(self):
+        for line in self.process.stderr:
+            self.lines.append(line)
+            if line.startswith('DevTools listening on ws://'):
+                self.ready.set()
+
+    def status(self):
+        with urllib.request.urlopen(f'http://127.0.0.1:{self.status_port}/supervisor', timeout=5) as response:
+            return json.loads(response.read())
+
+    def __enter__(self):
+        assert self.ready.wait(20), ''.join(self.lines)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait(10)
+
+
+def test_watchdog_restarts_killed_and_hung_browsers(tmp_path):
+    with SupervisedFakeBrowser(tmp_path) as supervised:
+        # A single browser listens on the public port itself
+        assert '(1 shard)' in supervised.lines[-1] and supervised.lines[0].startswith('[supervisor] entrypoint')
+        (tmp_path / 'shard-0' / 'stale').write_text('left by the killed browser')
+        runner = LocalExecRunner(timeout=10)
+        crash = run_kill_benchmark(runner, 'thorium', '127.0.0.1', supervised.port, 'http://example.test/',
+                                   mode='crash', kills=2, status_port=supervised.status_port,
+                                   lead=0.2, settle=0.2)
+        hang = run_kill_benchmark(runner, 'thorium', '127.0.0.1', supervised.port, 'http://example.test/',
+                                  mode='hang', kills=1, status_port=supervised.status_port,
+                                  lead=0.2, settle=0.2)
+        status = supervised.status()
+
+    assert crash['success'], crash
+    assert (crash['restarts'], crash['crashes'], crash['hangs'], crash['unrecovered']) == (2, 2, 0, 0)
+    assert crash['recovery_time']['n'] == 2 and crash['recovery_time']['median'] < 5
+    assert all(kill['new_pid'] != kill['pid'] for kill in crash['kills'])
+    assert crash['loads'] > crash['failed_loads'] >= 0
+    assert all(kill['supervisor_downtime'] > 0 for kill in crash['kills'])
+
+    assert hang['success'], hang
+    assert (hang['restarts'], hang['crashes'], hang['hangs']) == (1, 0, 1)
+    # A hang is only noticed once the heartbeat has gone unanswered for the hang timeout
+    assert hang['recovery_time']['median'] >= 0.4 and hang['kills'][0]['supervisor_downtime'] >= 0.4
+
+    assert status['restarts'] == 3 and status['shards'][0]['up'] and status['downtime'] > 0
+    # Every restart starts from a clean profile
+    assert (tmp_path / 'shard-0').is_dir() and not (tmp_path / 'shard-0' / 'stale').exists()
+
+
+def test_heartbeat_closes_hung_pages_and_gives_up_when_they_stay_hung():
+    with FakeCDPServer() as server:
+        closed = []
+
+        async def discover(ws, command):
+            await server._reply(ws, command, {})
+            for target_id in ('OK', 'HUNG'):
+                await server._event(ws, 'Target.targetCreated', {'targetInfo': {'targetId': target_id, 'type': 'page'}})
+            await server._event(ws, 'Target.targetCreated', {'targetInfo': {'targetId': 'SW', 'type': 'service_worker'}})
+
+        async def attach(ws, command):
+            await server._reply(ws, command, {'sessionId': 'S-' + command['params']['targetId']})
+
+        async def evaluate(ws, command):
+            # The hung renderer never answers, even after it was asked to close
+            if command['sessionId'] != 'S-HUNG':
+                await server._reply(ws, command, {'result': {'type': 'number', 'value': 1}})
+
+        async def close(ws, command):
+            closed.append(command['params']['targetId'])
+            await server._reply(ws, command, {'success': True})
+
+        server.handlers.update({'Target.setDiscoverTargets': discover, 'Target.attachToTarget': attach,
+                                'Runtime.evaluate': evaluate, 'Target.closeTarget': close})
+        supervisor = Supervisor('fake', [], heartbeat=0.05, hang_timeout=1.0, page_timeout=0.2, status_port=0)
+        shard = supervisor.shards[0]
+        shard.ws_url = f'ws://127.0.0.1:{server.port}/devtools/browser/fake'
+        asyncio.run(asyncio.wait_for(supervisor._heartbeat(shard), 10))
+        attached = [command for command in server.commands if command[1] == 'Target.attachToTarget']
+
+    # Only pages are probed; the hung one is closed once, then the browser is given up on
+    assert len(attached) == 2 and closed == ['HUNG']
+    assert shard.renderer_hangs == 1 and shard.to_dict()['renderer_hangs'] == 1
+    assert supervisor.status()['renderer_hangs'] == 1
+
+
+def test_busy_pages_are_left_alone_by_default():
+    with FakeCDPServer() as server:
+        async def discover(ws, command):
+            await server._reply(ws, command, {})
+            await server._event(ws, 'Target.targetCreated', {'targetInfo': {'targetId': 'BUSY', 'type': 'page'}})
+
+        async def busy(ws, command):
+            pass  # A long script (or a paused debugger) keeps the renderer from answering
+
+        server.handlers.update({'Target.setDiscoverTargets': discover, 'Runtime.evaluate': busy})
+        supervisor = Supervisor('fake', [], heartbeat=0.05, hang_timeout=1.0, status_port=0)
+        shard = supervisor.shards[0]
+        shard.ws_url = f'ws://127.0.0.1:{server.port}/devtools/browser/fake'
+
+        async def run():
+            heartbeat = asyncio.ensure_future(supervisor._heartbeat(shard))
+            await asyncio.sleep(1.5)
+            running = not heartbeat.done()
+            heartbeat.cancel()
+            return running
+
+        running = asyncio.run(run())
+        methods = {command[1] for command in server.commands}
+
+    # Without --page-timeout pages are neither probed nor closed, and the browser stays up
+    assert running and shard.renderer_hangs == 0
+    assert not methods & {'Target.attachToTarget', 'Runtime.evaluate', 'Target.closeTarget'}
+    assert 'Browser.getVersion' in methods
+
+
+def test_kill_benchmark_reports_missing_supervisor():
+    runner = LocalExecRunner(timeout=5)
+    result = run_kill_benchmark(runner, 'chromedp', '127.0.0.1', free_port(), 'http://example.test/',
+                                status_port=free_port())
+    assert not result['success'] and 'No supervisor status' in result['error']
+
+
+def test_report_lists_crash_recovery():
+    runner = BenchmarkRunner()
+    page_loads = [{'success': True, 'url': 'http://a.test/', 'iteration': 0, 'cold': True, 'load_time': 0.5}]
+    kill_test = {'success': True, 'mode': 'crash', 'kills': [{}, {}], 'unrecovered': 0,
+                 'recovery_time': {'n': 2, 'median': 0.42, 'p95': 0.61}, 'downtime': 0.9,
+                 'loads': 20, 'failed_loads': 3, 'restarts': 2, 'crashes': 2, 'hangs': 0}
+    results = [{'image': 'thorium-docker:avx2', 'success': True,
+                'startup': {'total_startup_time': 1.0, 'ready_time': 0.5}, 'page_loads': page_loads,
+                'final_stats': {}, 'load_stats': runner.summarize_page_loads(page_loads, ['http://a.test/']),
+                'kill_test': kill_test}]
+    report = runner.generate_report({'timestamp': 'now', 'iterations': 1, 'results': results})
+    assert '## Crash Recovery' in report
+    assert '| thorium-docker:avx2 | crash | 2 | 0.420 | 0.610 | 0.900 | 3/20 | 2 | 2 | 0 |' in report